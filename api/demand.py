@@ -0,0 +1,145 @@
+"""
+Render-demand counters for Solar Archive.
+
+Records which (date+time, wavelength) tuples are actually asked for, per
+artifact tier, so the idle-time warmer in main.py can pre-render what
+customers want instead of only the fixed default tuples. Persisted to a
+small JSON file on the same persistent disk as feedback/stats
+(FEEDBACK_DATA_DIR → /var/data on Render), so the ranking survives the
+frequent auto-stop / redeploy cycle.
+
+Compact by design: one counter + last-seen timestamp per key, capped at
+DEMAND_MAX_KEYS entries (the coldest are dropped first). Ranking decays
+with age so last month's burst doesn't outrank this week's interest.
+
+Tiers:
+  preview        — /api/generate_preview (512² RAW/RHEF/JPG trio)
+  hq             — /api/generate, editor single-frame HQ
+  hq_integrated  — /api/generate with integrate=True (checkout print)
+"""
+
+import json
+import math
+import os
+import threading
+import time
+
+from api.feedback_routes import _data_dir  # shared persistent disk
+
+DEMAND_FILE = _data_dir() / "render_demand.json"
+TIERS = ("preview", "hq", "hq_integrated")
+
+_MAX_KEYS = int(os.getenv("DEMAND_MAX_KEYS", "4000"))
+_HALF_LIFE_S = 14 * 86400
+# Counters are bumped on every request but written to disk at most this
+# often — a JSON rewrite per preview poll would be pure volume churn.
+_FLUSH_INTERVAL_S = 60.0
+
+_lock = threading.Lock()
+_counts: dict = {}          # "tier|YYYYmmdd_HHMM|wl" → [count, last_ts]
+_loaded = False
+_dirty = False
+_last_flush = 0.0
+
+
+def _key(tier: str, date_str: str, wl: int) -> str:
+    return f"{tier}|{date_str}|{int(wl)}"
+
+
+def _load_locked() -> None:
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    try:
+        with DEMAND_FILE.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            for k, v in data.items():
+                if isinstance(v, list) and len(v) == 2 and k.count("|") == 2:
+                    _counts[k] = [int(v[0]), float(v[1])]
+    except (OSError, ValueError):
+        pass
+
+
+def _score(count: int, last_ts: float, now: float) -> float:
+    return count * math.pow(0.5, max(0.0, now - last_ts) / _HALF_LIFE_S)
+
+
+def _compact_locked(now: float) -> None:
+    if len(_counts) <= _MAX_KEYS:
+        return
+    ranked = sorted(_counts.items(), key=lambda kv: _score(kv[1][0], kv[1][1], now))
+    for k, _v in ranked[: len(_counts) - _MAX_KEYS]:
+        del _counts[k]
+
+
+def flush(force: bool = False) -> bool:
+    """Write the counters if they changed (and the interval has passed,
+    unless `force`). Atomic replace, same as product_stats.json."""
+    global _dirty, _last_flush
+    with _lock:
+        now = time.time()
+        if not _dirty or (not force and now - _last_flush < _FLUSH_INTERVAL_S):
+            return False
+        snapshot = dict(_counts)
+        _dirty = False
+        _last_flush = now
+    try:
+        DEMAND_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = DEMAND_FILE.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp, DEMAND_FILE)
+        return True
+    except OSError as e:
+        print(f"[demand] flush failed: {e}", flush=True)
+        with _lock:
+            _dirty = True
+        return False
+
+
+def record(tier: str, date_str: str, wl: int) -> None:
+    """Count one request for (date_str, wl) at `tier`. Cheap; never raises.
+    Memory only — main.py's idle loop calls flush() on a worker thread, so
+    the event loop that calls this never touches the disk."""
+    global _dirty
+    if tier not in TIERS:
+        return
+    try:
+        k = _key(tier, date_str, wl)
+    except (TypeError, ValueError):
+        return
+    now = time.time()
+    with _lock:
+        _load_locked()
+        entry = _counts.get(k)
+        if entry is None:
+            _counts[k] = [1, now]
+        else:
+            entry[0] += 1
+            entry[1] = now
+        _compact_locked(now)
+        _dirty = True
+
+
+def top(n: int, tiers=TIERS) -> list:
+    """Hottest keys first: [{tier, date_str, wl, count, score}, …]."""
+    now = time.time()
+    with _lock:
+        _load_locked()
+        items = list(_counts.items())
+    out = []
+    for k, (count, last_ts) in items:
+        tier, date_str, wl = k.split("|")
+        if tier not in tiers:
+            continue
+        out.append({
+            "tier": tier,
+            "date_str": date_str,
+            "wl": int(wl),
+            "count": count,
+            "score": round(_score(count, last_ts, now), 3),
+        })
+    out.sort(key=lambda r: r["score"], reverse=True)
+    return out[:n]
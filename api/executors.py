@@ -0,0 +1,166 @@
+"""
+Named, bounded thread pools for Solar Archive's blocking work.
+
+Every blocking call used to land on the one shared default executor
+(`run_in_executor(None, …)`, `asyncio.to_thread`, starlette's
+`run_in_threadpool`). One slow upstream could fill it: a stalled Helioviewer
+burst held every thread and a customer's checkout queued behind thumbnail
+fetches, while background sweeps and warm scripts competed with request
+handlers for the same threads. Each workload now gets its own pool, so a
+stall stays where it started:
+
+  commerce     — Printify / Shopify request-path I/O (checkout, catalog)
+  compose      — print-file compositing (CPU; sized for the 1 vCPU box)
+  heavy        — FITS + RHEF renders; sized by main.py to the heavy-render
+                 ceiling, so the scheduler, not the pool, is what queues
+  maintenance  — short background chores: demand flushes, frontier
+                 probes, idle-warm candidate picks
+  batch        — operator work that holds a thread for minutes: admin
+                 warms (phase-B mockup grid), Printify draft/product sweeps
+                 and scans. Kept apart so two of them in flight can't stall
+                 the chores above or anything a customer waits on
+  files        — small local disk reads/writes on the request path,
+                 including the pre-render free-space check
+  stages       — sub-stages a heavy job overlaps with its own main thread
+                 (the preview's screenshot fetch, stack warm-up, PNG encode)
+  encode       — row bands of one large PNG deflated in parallel
+                 (api/png_writer.py); leaf tasks only
+
+Pools are created on first use. Sizes are env-tunable (POOL_<NAME>_WORKERS).
+Each one counts queued/active jobs and the time a job waited for a thread,
+which /api/admin/pools reports.
+
+`run()` copies the caller's contextvars into the worker thread the same way
+asyncio.to_thread does; `submit()` is its blocking-caller twin and returns a
+concurrent.futures.Future. The heavy pipelines depend on that: the current job
+id and upstream-limiter lane travel that way.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_WORKERS = {
+    "commerce": 8,
+    "compose": 2,
+    "heavy": 4,
+    "maintenance": 2,
+    "batch": 2,
+    "files": 4,
+    "stages": 4,
+    "encode": 4,
+}
+
+
+class NamedPool:
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max(1, int(max_workers))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                            thread_name_prefix=f"pool-{name}")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.peak_queued = 0
+        self.wait_s_total = 0.0
+        self.wait_s_max = 0.0
+        self.run_s_total = 0.0
+
+    def _job(self, fn, submitted: float):
+        ctx = contextvars.copy_context()
+
+        def call():
+            started = time.monotonic()
+            waited = started - submitted
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.wait_s_total += waited
+                self.wait_s_max = max(self.wait_s_max, waited)
+            try:
+                return ctx.run(fn)
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.run_s_total += time.monotonic() - started
+        return call
+
+    def submit(self, fn, *args, **kwargs):
+        """Start `fn(*args, **kwargs)` on this pool from a plain thread and
+        return its concurrent.futures.Future.
+
+        A task submitted here must not block on another task of the same
+        pool, or a full pool deadlocks waiting on work it can't start.
+        """
+        with self._lock:
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        return self._executor.submit(self._job(functools.partial(fn, *args, **kwargs), time.monotonic()))
+
+    async def run(self, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` on this pool and await the result."""
+        cf = self.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wrap_future(cf)
+        except asyncio.CancelledError:
+            if cf.cancel():
+                # Never started — the worker won't decrement it for us.
+                with self._lock:
+                    self.queued -= 1
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            started = self.completed + self.active
+            return {
+                "workers": self.max_workers,
+                "queued": self.queued,
+                "active": self.active,
+                "completed": self.completed,
+                "peak_queued": self.peak_queued,
+                "avg_wait_s": round(self.wait_s_total / started, 3) if started else 0.0,
+                "max_wait_s": round(self.wait_s_max, 3),
+                "avg_run_s": round(self.run_s_total / self.completed, 3) if self.completed else 0.0,
+            }
+
+
+_pools: dict = {}
+_sizes: dict = {}
+_registry_lock = threading.Lock()
+
+
+def configure(name: str, max_workers: int) -> None:
+    """Set a pool's size before its first use (an env override still wins)."""
+    _sizes[name] = max_workers
+
+
+def pool(name: str) -> NamedPool:
+    p = _pools.get(name)
+    if p is not None:
+        return p
+    with _registry_lock:
+        if name not in _pools:
+            if name not in DEFAULT_WORKERS:
+                raise KeyError(f"unknown executor pool {name!r}")
+            try:
+                n = int(os.environ[f"POOL_{name.upper()}_WORKERS"])
+            except (KeyError, ValueError):
+                n = _sizes.get(name, DEFAULT_WORKERS[name])
+            _pools[name] = NamedPool(name, n)
+        return _pools[name]
+
+
+async def run_in_pool(name: str, fn, *args, **kwargs):
+    """`await run_in_pool("commerce", fn, *args)` — the named-pool
+    counterpart of run_in_threadpool / asyncio.to_thread."""
+    return await pool(name).run(fn, *args, **kwargs)
+
+
+def stats() -> dict:
+    return {name: p.stats() for name, p in sorted(_pools.items())}
@@ -0,0 +1,228 @@
+"""
+Hot in-RAM byte cache for small, frequently served artifacts.
+
+The grid page alone requests hundreds of small files — 512² previews,
+mockup `.thumb.webp`s, `grid_src` 1024s, `default_mockups.json`,
+`vibe_manifest.json` — plus Helioviewer thumbs. Served through
+FileResponse every one of those costs a stat, an open and chunked reads
+against the network volume. This keeps the encoded bytes of the small
+ones in a bounded LRU with a precomputed ETag and Content-Length, so a
+hot hit is a dict lookup and a single send.
+
+Mounted in main.py as the /asset, /asset/preview and /asset/default
+StaticFiles (HotStaticFiles) and used directly by the explicit asset
+routes and the Helioviewer proxy.
+
+Environment (all optional):
+    HOT_CACHE_MAX_MB           total budget for cached bodies (default 48)
+    HOT_CACHE_MAX_ENTRY_KB     larger files bypass the cache (default 2048)
+    HOT_CACHE_REVALIDATE_S     how long a file entry is trusted before its
+                               mtime/size are re-checked (default 10)
+"""
+
+import hashlib
+import mimetypes
+import os
+import stat as _stat
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Optional
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(float(os.environ.get(name, default)))
+    except (TypeError, ValueError):
+        return default
+
+
+class _Entry:
+    __slots__ = ("body", "etag", "media_type", "last_modified",
+                 "mtime_ns", "size", "checked_at", "expires_at")
+
+    def __init__(self, body: bytes, media_type: str, mtime_ns: int = 0,
+                 size: int = 0, expires_at: float = 0.0):
+        self.body = body
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.media_type = media_type
+        self.last_modified = formatdate(mtime_ns / 1e9, usegmt=True) if mtime_ns else None
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.checked_at = time.monotonic()
+        self.expires_at = expires_at
+
+
+class HotByteCache:
+    """Bounded LRU of encoded response bodies.
+
+    Two kinds of key share one budget:
+      - file paths (`get_file`): revalidated against mtime+size at most every
+        `revalidate_s`, so a re-warm under the same name shows up within
+        seconds even if the writer never calls `discard`.
+      - opaque keys (`get` / `put`): caller-owned bytes such as upstream
+        Helioviewer screenshots, expired by an optional TTL.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int, revalidate_s: float):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.revalidate_s = revalidate_s
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ── internal (caller holds _lock) ─────────────────────────────────
+    def _drop(self, key: str) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        self._drop(key)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while self._bytes > self.max_bytes and self._entries:
+            _k, old = self._entries.popitem(last=False)
+            self._bytes -= len(old.body)
+
+    # ── file entries ──────────────────────────────────────────────────
+    def peek_file(self, path: str) -> Optional[_Entry]:
+        """Fresh entry for `path` with no filesystem access, else None."""
+        with self._lock:
+            e = self._entries.get(path)
+            if e is None or (time.monotonic() - e.checked_at) >= self.revalidate_s:
+                return None
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return e
+
+    def get_file(self, path: str, media_type: Optional[str] = None) -> Optional[_Entry]:
+        """Entry for `path`, loading or revalidating it as needed. Returns None
+        for anything that should not be served from RAM (missing, not a
+        regular file, over the per-entry cap) — callers fall back to the
+        normal file path. Blocking; run off the event loop."""
+        fresh = self.peek_file(path)
+        if fresh is not None:
+            return fresh
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._drop(path)
+            return None
+        if not _stat.S_ISREG(st.st_mode) or st.st_size > self.max_entry_bytes:
+            with self._lock:
+                self._drop(path)
+            return None
+        with self._lock:
+            e = self._entries.get(path)
+            if e is not None and e.mtime_ns == st.st_mtime_ns and e.size == st.st_size:
+                e.checked_at = time.monotonic()
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return e
+        try:
+            with open(path, "rb") as fh:
+                body = fh.read()
+        except OSError:
+            return None
+        if len(body) != st.st_size:
+            return None     # caught mid-write; serve from disk this time
+        media_type = media_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        e = _Entry(body, media_type, mtime_ns=st.st_mtime_ns, size=st.st_size)
+        with self._lock:
+            self.misses += 1
+            self._store(path, e)
+        return e
+
+    def discard(self, path) -> None:
+        with self._lock:
+            self._drop(str(path))
+
+    # ── opaque entries ────────────────────────────────────────────────
+    def get(self, key: str) -> Optional[_Entry]:
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                self.misses += 1
+                return None
+            if e.expires_at and time.monotonic() >= e.expires_at:
+                self._drop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return e
+
+    def put(self, key: str, body: bytes, media_type: str, ttl_s: float = 0.0) -> Optional[_Entry]:
+        if len(body) > self.max_entry_bytes:
+            return None
+        e = _Entry(body, media_type, expires_at=(time.monotonic() + ttl_s) if ttl_s else 0.0)
+        with self._lock:
+            self._store(key, e)
+        return e
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+def entry_response(entry: _Entry, request_headers=None, headers: Optional[dict] = None,
+                   media_type: Optional[str] = None) -> Response:
+    """Response for a cached entry, or a 304 when the client's If-None-Match
+    already names it."""
+    out = dict(headers or {})
+    out["ETag"] = entry.etag
+    if entry.last_modified:
+        out["Last-Modified"] = entry.last_modified
+    inm = request_headers.get("if-none-match") if request_headers is not None else None
+    if inm and (inm.strip() == "*" or entry.etag in [t.strip() for t in inm.split(",")]):
+        return Response(status_code=304, headers=out)
+    return Response(content=entry.body, media_type=media_type or entry.media_type, headers=out)
+
+
+class HotStaticFiles(StaticFiles):
+    """StaticFiles that answers small regular files from a HotByteCache.
+
+    Everything it can't serve from RAM — directories, Range requests,
+    oversize files, 404s — falls through to Starlette unchanged."""
+
+    def __init__(self, *args, cache: HotByteCache, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._hot = cache
+        self._root = os.path.realpath(str(self.directory)) if self.directory else None
+
+    async def get_response(self, path: str, scope) -> Response:
+        if self._root and scope["method"] in ("GET", "HEAD"):
+            req_headers = Headers(scope=scope)
+            if "range" not in req_headers:
+                full = os.path.realpath(os.path.join(self._root, path))
+                if full.startswith(self._root + os.sep):
+                    entry = self._hot.peek_file(full)
+                    if entry is None:
+                        entry = await run_in_threadpool(self._hot.get_file, full)
+                    if entry is not None:
+                        return entry_response(entry, req_headers)
+        return await super().get_response(path, scope)
+
+
+hot_cache = HotByteCache(
+    max_bytes=_env_int("HOT_CACHE_MAX_MB", 48) * 1024 * 1024,
+    max_entry_bytes=_env_int("HOT_CACHE_MAX_ENTRY_KB", 2048) * 1024,
+    revalidate_s=_env_int("HOT_CACHE_REVALIDATE_S", 10),
+)
@@ -0,0 +1,266 @@
+"""
+Persistent on-disk cache of Helioviewer takeScreenshot images.
+
+The server used to keep no copy of its own. Thumbnails leaned on the
+Cloudflare edge, so every cold PoP, every purge and every slightly
+different time string went back to Helioviewer. Those calls are
+rate-limited (_HELIOVIEWER_LIMITER) and often take seconds. The in-RAM
+hot cache only helps one machine, and only until the next deploy.
+
+Entries are keyed by what actually determines the picture:
+
+    (Helioviewer sourceId, time snapped to the instrument cadence,
+     imageScale, width, height)
+
+Snapping to the cadence is what makes the key worth having. AIA's EUV
+channels take a frame every 12 s and 1600/1700 every 24 s, so
+"08:30:00Z" and "08:30:05Z" name the same image. Callers fetch at the
+snapped time too (`snap_time`), so a cached body is always exactly what
+that key's URL returns.
+
+Layout is one file per entry, <root>/<sourceId>/<YYYYMMDD>/<HHMMSS>_<scale>_<w>x<h>.
+The media type is sniffed from the magic bytes rather than stored. A hit
+bumps mtime, and `put` evicts by oldest mtime until the directory fits
+its byte budget. The size index is built by one scan on first use.
+
+A miss for a small size can be answered from a larger entry with the same
+field of view (imageScale × width), for example a 256² thumb from the
+1024² screenshot the preview pipeline already pulled. The larger image is
+downsampled locally (Lanczos) and the result is stored under its own key.
+
+Frames from the last RECENT_S are never persisted: for those,
+Helioviewer's "nearest frame" still moves as data is ingested. The
+caller's TTL'd hot cache covers them.
+
+Shared by /api/helioviewer_thumb (and therefore the vibe JPG warmers,
+which go through it), the batch thumb endpoint and the JPG tier of
+_generate_preview_sync.
+"""
+
+import io
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+# Helioviewer data-source ids for SDO/AIA (api.helioviewer.org getDataSources).
+SOURCE_IDS = {94: 8, 131: 9, 171: 10, 193: 11, 211: 12, 304: 13, 335: 14,
+              1600: 15, 1700: 16, 4500: 17}
+# Native AIA cadence in seconds.
+CADENCE_S = {1600: 24, 1700: 24, 4500: 3600}
+DEFAULT_CADENCE_S = 12
+RECENT_S = 48 * 3600
+
+_MAGIC = ((b"\x89PNG\r\n\x1a\n", "image/png"), (b"\xff\xd8\xff", "image/jpeg"),
+          (b"RIFF", "image/webp"))
+
+
+def snap_time(when: datetime, wavelength: int) -> datetime:
+    """`when` (naive = UTC) rounded to the nearest frame of the channel's cadence."""
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    step = CADENCE_S.get(int(wavelength), DEFAULT_CADENCE_S)
+    epoch = datetime(1970, 1, 1)
+    secs = (when - epoch).total_seconds()
+    return epoch + timedelta(seconds=int(round(secs / step)) * step)
+
+
+def sniff_media_type(body: bytes) -> str:
+    for magic, mt in _MAGIC:
+        if body.startswith(magic):
+            return mt
+    return "application/octet-stream"
+
+
+class ScreenshotCache:
+    def __init__(self, root: str, max_bytes: int, max_entry_bytes: int = 16 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self._lock = threading.Lock()
+        self._sizes: Optional[dict] = None     # path → bytes, built lazily
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.derived = 0
+
+    def path_for(self, wavelength: int, when: datetime, image_scale: float,
+                 width: int, height: int) -> Optional[str]:
+        """Entry path for an already-snapped `when`; None if uncacheable."""
+        source = SOURCE_IDS.get(int(wavelength))
+        if source is None:
+            return None
+        return os.path.join(self.root, str(source), when.strftime("%Y%m%d"),
+                            f"{when.strftime('%H%M%S')}_{float(image_scale):.6g}_{int(width)}x{int(height)}")
+
+    def lookup(self, wavelength: int, when: datetime, image_scale: float,
+               width: int, height: int):
+        """(body, media_type) for this exact key, else one derived from a
+        larger cached screenshot of the same frame and field of view."""
+        path = self.path_for(wavelength, when, image_scale, width, height)
+        hit = self.get(path)
+        if hit is not None or path is None:
+            return hit
+        src = self._larger(path, float(image_scale), int(width), int(height))
+        if src is None:
+            return None
+        try:
+            from PIL import Image
+            with Image.open(src) as im:
+                im.load()
+                small = im.resize((int(width), int(height)), Image.LANCZOS)
+            buf = io.BytesIO()
+            small.save(buf, format="PNG")
+        except Exception:
+            return None
+        body = buf.getvalue()
+        self.put(path, when, body)
+        with self._lock:
+            self.derived += 1
+        return body, "image/png"
+
+    def store(self, wavelength: int, when: datetime, image_scale: float,
+              width: int, height: int, body: bytes) -> bool:
+        return self.put(self.path_for(wavelength, when, image_scale, width, height), when, body)
+
+    def _larger(self, path: str, scale: float, width: int, height: int) -> Optional[str]:
+        """Smallest cached entry of the same frame and field of view that is
+        bigger than width × height."""
+        folder, name = os.path.split(path)
+        stamp = name.split("_", 1)[0]
+        fov_w, fov_h = scale * width, scale * height
+        best = None
+        try:
+            names = os.listdir(folder)
+        except OSError:
+            return None
+        for n in names:
+            parts = n.split("_")
+            if len(parts) != 3 or parts[0] != stamp or n.endswith(".tmp"):
+                continue
+            try:
+                s = float(parts[1])
+                w, h = (int(v) for v in parts[2].split("x"))
+            except ValueError:
+                continue
+            if w <= width or h <= height:
+                continue
+            if abs(s * w - fov_w) > 1e-3 * fov_w or abs(s * h - fov_h) > 1e-3 * fov_h:
+                continue
+            if best is None or w < best[0]:
+                best = (w, os.path.join(folder, n))
+        return best[1] if best else None
+
+    def get(self, path: Optional[str]):
+        """(body, media_type) or None."""
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as fh:
+                body = fh.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return body, sniff_media_type(body)
+
+    def put(self, path: Optional[str], when: datetime, body: bytes) -> bool:
+        """Store `body` unless the frame is too recent or the body too big."""
+        if path is None or not body or len(body) > self.max_entry_bytes:
+            return False
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if (now - when).total_seconds() < RECENT_S:
+            return False
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as fh:
+                fh.write(body)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return False
+        with self._lock:
+            sizes = self._index_locked()
+            self._bytes += len(body) - sizes.get(path, 0)
+            sizes[path] = len(body)
+            self.writes += 1
+            over = self._bytes > self.max_bytes
+        if over:
+            self._trim()
+        return True
+
+    def _index_locked(self) -> dict:
+        if self._sizes is None:
+            self._sizes = {}
+            for dirpath, _dirs, files in os.walk(self.root):
+                for name in files:
+                    if name.endswith(".tmp"):
+                        continue
+                    p = os.path.join(dirpath, name)
+                    try:
+                        self._sizes[p] = os.path.getsize(p)
+                    except OSError:
+                        pass
+            self._bytes = sum(self._sizes.values())
+        return self._sizes
+
+    def _trim(self) -> None:
+        with self._lock:
+            paths = list(self._index_locked())
+
+        def mtime(p):
+            try:
+                return os.path.getmtime(p)
+            except OSError:
+                return 0.0
+        for p in sorted(paths, key=mtime):
+            with self._lock:
+                if self._bytes <= self.max_bytes:
+                    return
+                size = self._sizes.pop(p, 0)
+                self._bytes -= size
+                self.evictions += 1
+            try:
+                os.remove(p)
+            except OSError:
+                pass
+
+    def discard(self, path: str) -> bool:
+        """Delete one entry and keep the size index in step. For callers
+        that free disk outside the byte budget (main.py's disk guard);
+        removing files behind the index would leave it over-counting, and
+        the cache would then evict too little."""
+        try:
+            os.remove(path)
+        except OSError:
+            return False
+        with self._lock:
+            if self._sizes is not None:
+                self._bytes -= self._sizes.pop(path, 0)
+            self.evictions += 1
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._sizes) if self._sizes is not None else None,
+                "bytes": self._bytes if self._sizes is not None else None,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "derived": self.derived,
+            }
@@ -0,0 +1,247 @@
+"""
+Durable job registry for Solar Archive.
+
+Backs the HQ task map (`tasks` in main.py) and the in-flight preview keys
+with a small SQLite database in WAL mode on the persistent disk, so a job's
+status, result and params outlive the process. The box auto-stops and
+redeploys often; before this, every restart orphaned in-flight task IDs and
+clients polled /api/status/{task_id} for jobs that no longer existed, then
+resubmitted and redid the whole render.
+
+Every row records the `boot_id` of the process that owns it. A row owned by
+an earlier boot that never reached a terminal status is an ORPHAN: main.py
+re-launches it (same task_id, same params) so a polling client just sees
+its job continue.
+
+The database is opened on first use and writes go through a writer
+thread in batches (see JobStore), so neither importing main.py nor a
+status change on the event loop waits on the disk. A write still queued
+when the process is killed is lost, like an uncommitted one before.
+
+Stdlib-only. If the database can't be opened (read-only or missing disk)
+the store disables itself and main.py runs memory-only exactly as before.
+"""
+
+import atexit
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id    TEXT PRIMARY KEY,
+    state      TEXT NOT NULL,
+    status     TEXT,
+    params     TEXT,
+    output_key TEXT,
+    boot_id    TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_output_key ON tasks(output_key, status);
+CREATE TABLE IF NOT EXISTS inflight (
+    kind       TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    boot_id    TEXT,
+    started_at REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+"""
+
+# "abandoned" is parked, not pending: main.py revives it only when its
+# client polls again, never as a restart orphan.
+TERMINAL = ("completed", "failed", "abandoned")
+
+
+class JobStore:
+    """Opened on first use, not at construction, so importing main.py
+    touches no disk. Writes are queued and committed by a writer thread in
+    one transaction per batch: callers (the event loop, under main.py's
+    status_lock) never wait on SQLite. Reads commit what is queued first,
+    so they always see every earlier write."""
+
+    def __init__(self, path, retain_s: float = 7 * 86400):
+        self.path = str(path)
+        self.retain_s = retain_s
+        self._lock = threading.Lock()          # the connection; held across a batch
+        self._conn: Optional[sqlite3.Connection] = None
+        self._opened = False
+        self._pending: list = []               # [(sql, args)] not yet committed
+        self._pending_lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """The connection, opened on first call; None if the store is
+        unusable. Call with self._lock held."""
+        if self._opened:
+            return self._conn
+        self._opened = True
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0,
+                                   isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # NORMAL is durable across a process kill (what auto-stop does);
+            # only an OS crash can lose the last few commits.
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            cutoff = time.time() - self.retain_s
+            conn.execute("DELETE FROM tasks WHERE updated_at < ?", (cutoff,))
+            conn.execute("DELETE FROM inflight WHERE started_at < ?", (cutoff,))
+            self._conn = conn
+            print(f"[job-store] opened {self.path}", flush=True)
+            atexit.register(self.flush)
+        except (sqlite3.Error, OSError) as e:
+            print(f"[job-store] disabled ({self.path}): {e}", flush=True)
+            self._conn = None
+        return self._conn
+
+    @property
+    def enabled(self) -> bool:
+        with self._lock:
+            return self._connect() is not None
+
+    def _exec(self, sql: str, args=()) -> list:
+        """A read, after committing every queued write."""
+        self.flush()
+        try:
+            with self._lock:
+                conn = self._connect()
+                return conn.execute(sql, args).fetchall() if conn is not None else []
+        except sqlite3.Error as e:
+            # A store hiccup must never fail a render or a status poll.
+            print(f"[job-store] {sql.split()[0]} failed: {e}", flush=True)
+            return []
+
+    def _write(self, sql: str, args=()) -> None:
+        """Queue a write for the writer thread; never blocks on SQLite."""
+        if self._opened and self._conn is None:
+            return                              # disabled
+        with self._pending_lock:
+            self._pending.append((sql, args))
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="job-store", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        while True:
+            self.flush()
+            with self._pending_lock:
+                if not self._pending:
+                    self._writer = None
+                    return
+
+    def flush(self) -> None:
+        """Commit every queued write, in order, as one transaction. The
+        batch is taken under the connection lock so two flushers can't
+        reorder writes."""
+        with self._lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                conn.execute("BEGIN")
+                for sql, args in batch:
+                    conn.execute(sql, args)
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                print(f"[job-store] write of {len(batch)} failed: {e}", flush=True)
+                try:
+                    conn.execute("ROLLBACK")
+                except sqlite3.Error:
+                    pass
+
+    # ── tasks ─────────────────────────────────────────────────────────
+    def put_task(self, task_id: str, state: dict, boot_id: str,
+                 params: Optional[dict] = None, output_key: Optional[str] = None) -> None:
+        now = time.time()
+        self._write(
+            "INSERT INTO tasks (task_id, state, status, params, output_key, boot_id, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(task_id) DO UPDATE SET state=excluded.state, status=excluded.status, "
+            "boot_id=excluded.boot_id, updated_at=excluded.updated_at, "
+            "params=COALESCE(excluded.params, tasks.params), "
+            "output_key=COALESCE(excluded.output_key, tasks.output_key)",
+            (task_id, json.dumps(state), state.get("status"),
+             json.dumps(params) if params is not None else None,
+             output_key, boot_id, now, now),
+        )
+
+    def get_task(self, task_id: str) -> Optional[dict]:
+        rows = self._exec("SELECT state FROM tasks WHERE task_id = ?", (task_id,))
+        if not rows:
+            return None
+        try:
+            return json.loads(rows[0][0])
+        except ValueError:
+            return None
+
+    def find_completed(self, output_key: str) -> Optional[tuple]:
+        """(task_id, state) of the newest completed task for `output_key`."""
+        rows = self._exec(
+            "SELECT task_id, state FROM tasks WHERE output_key = ? AND status = 'completed' "
+            "ORDER BY updated_at DESC LIMIT 1",
+            (output_key,),
+        )
+        if not rows:
+            return None
+        try:
+            return rows[0][0], json.loads(rows[0][1])
+        except ValueError:
+            return None
+
+    def orphaned_tasks(self, boot_id: str) -> list:
+        """[(task_id, params, updated_at)] left non-terminal by an earlier boot."""
+        rows = self._exec(
+            "SELECT task_id, params, updated_at FROM tasks "
+            "WHERE (boot_id IS NULL OR boot_id != ?) AND status NOT IN (%s)" % ", ".join("?" * len(TERMINAL)),
+            (boot_id, *TERMINAL),
+        )
+        out = []
+        for task_id, params, updated_at in rows:
+            try:
+                out.append((task_id, json.loads(params) if params else None, updated_at))
+            except ValueError:
+                out.append((task_id, None, updated_at))
+        return out
+
+    def get_params(self, task_id: str) -> Optional[dict]:
+        rows = self._exec("SELECT params FROM tasks WHERE task_id = ?", (task_id,))
+        if not rows or not rows[0][0]:
+            return None
+        try:
+            return json.loads(rows[0][0])
+        except ValueError:
+            return None
+
+    # ── in-flight keys ────────────────────────────────────────────────
+    def add_key(self, kind: str, key: str, boot_id: str) -> None:
+        self._write(
+            "INSERT OR REPLACE INTO inflight (kind, key, boot_id, started_at) VALUES (?, ?, ?, ?)",
+            (kind, key, boot_id, time.time()),
+        )
+
+    def discard_key(self, kind: str, key: str) -> None:
+        self._write("DELETE FROM inflight WHERE kind = ? AND key = ?", (kind, key))
+
+    def clear_keys(self, kind: str) -> None:
+        self._write("DELETE FROM inflight WHERE kind = ?", (kind,))
+
+    def orphaned_keys(self, kind: str, boot_id: str) -> list:
+        rows = self._exec(
+            "SELECT key FROM inflight WHERE kind = ? AND (boot_id IS NULL OR boot_id != ?)",
+            (kind, boot_id),
+        )
+        return [r[0] for r in rows]
+
+    def prune(self) -> None:
+        cutoff = time.time() - self.retain_s
+        self._write("DELETE FROM tasks WHERE updated_at < ?", (cutoff,))
+        self._write("DELETE FROM inflight WHERE started_at < ?", (cutoff,))
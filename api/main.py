@@ -10,6 +10,7 @@ os.environ.setdefault("MPLBACKEND", "Agg")
 
 import ssl
 import aiohttp
+import yarl
 import certifi
 from parfive import Downloader
 
@@ -190,24 +191,57 @@ import threading
 # FastAPI backend for Solar Archive — date→FITS via SunPy→filtered PNG→Printify product creation
 
 # ──────────────────────────────────────────────────────────────────────
-# Heavy-render concurrency cap
+# Heavy-render admission
 # ──────────────────────────────────────────────────────────────────────
 # A single AIA HQ render holds 500MB–1GB resident (sunpy + matplotlib +
 # numpy on a 4096² float array). Render's Standard plan has 2GB / 1 vCPU,
 # which means we can fit one comfortably and two if we're careful — three
-# OOMs the box. A semaphore around the heavy paths queues incoming jobs
-# instead of fanning out and blowing the instance over.
+# OOMs the box. Heavy paths queue for admission instead of fanning out and
+# blowing the instance over.
 #
-# Concurrency is env-configurable so we can dial it up when on a bigger
-# instance (Pro 4GB → 2, etc.) without a code change. Sticky default of
-# 1 keeps the existing Standard-2GB behaviour.
+# Admission used to be a fixed slot count (SOLAR_ARCHIVE_HEAVY_CONCURRENCY,
+# default 1), so a 512² preview and a full-res integrated print render each
+# took "the" slot, and /api/generate separately 503'd whenever free RAM was
+# under RAM_HEADROOM_MB (now deprecated, below). Jobs now carry a predicted peak-RSS growth
+# (api/mem_model.py, learned from measured runs) and are admitted while
+# that fits in psutil's available memory — see _HeavyScheduler. The env
+# var survives as a hard ceiling on simultaneous jobs (1 vCPU: past a few,
+# parallelism only stretches everyone's latency). Without psutil there's
+# nothing to measure, so the ceiling falls back to the old single slot.
 try:
-    _HEAVY_RENDER_CONCURRENCY = max(1, int(os.environ.get("SOLAR_ARCHIVE_HEAVY_CONCURRENCY", "1")))
+    import psutil as _psutil
+except Exception:
+    _psutil = None
+try:
+    _HEAVY_RENDER_CONCURRENCY = max(1, int(os.environ.get(
+        "SOLAR_ARCHIVE_HEAVY_CONCURRENCY", "4" if _psutil is not None else "1")))
 except (TypeError, ValueError):
     _HEAVY_RENDER_CONCURRENCY = 1
-print(f"[startup] Heavy-render semaphore size: {_HEAVY_RENDER_CONCURRENCY} "
-      f"(override with SOLAR_ARCHIVE_HEAVY_CONCURRENCY)", flush=True)
-_HEAVY_RENDER_SEMAPHORE = asyncio.Semaphore(_HEAVY_RENDER_CONCURRENCY)
+# Kept free beyond every admitted job's prediction: the kernel page cache,
+# uvicorn, and the models' misses all live here.
+_HEAVY_RAM_MARGIN_MB = float(os.environ.get("HEAVY_RAM_MARGIN_MB", "200"))
+# RAM_HEADROOM_MB is deprecated. It meant "503 /api/generate while free RAM
+# is under N MB" (default 400), which the scheduler's queueing replaces.
+# Unset, it no longer applies; a deployment that still sets it keeps that
+# hard floor (_check_ram_headroom) until it moves to HEAVY_RAM_MARGIN_MB.
+try:
+    _RAM_HEADROOM_MB = int(os.environ["RAM_HEADROOM_MB"])
+except (KeyError, ValueError):
+    _RAM_HEADROOM_MB = None
+# Blocking work runs on named per-workload pools (api/executors.py) instead
+# of the shared default executor. The heavy pool matches the admission
+# ceiling: the scheduler already decides how many renders run at once.
+from api import executors as _executors
+from api.executors import run_in_pool
+
+_executors.configure("heavy", _HEAVY_RENDER_CONCURRENCY)
+print(f"[startup] Heavy-render admission: memory-predicted, ≤{_HEAVY_RENDER_CONCURRENCY} at once, "
+      f"{_HEAVY_RAM_MARGIN_MB:.0f} MB margin (SOLAR_ARCHIVE_HEAVY_CONCURRENCY / HEAVY_RAM_MARGIN_MB)"
+      + ("" if _psutil is not None else " — psutil missing, single slot"), flush=True)
+if _RAM_HEADROOM_MB is not None:
+    print(f"[startup] WARNING: RAM_HEADROOM_MB is deprecated — still refusing /api/generate under "
+          f"{_RAM_HEADROOM_MB} MB free; unset it to let the scheduler queue instead "
+          f"(its margin is HEAVY_RAM_MARGIN_MB)", flush=True)
 # Number of jobs currently waiting OR running (waiting + 1 if anything is
 # active). Reported back to clients so the UI can show "Queued · N ahead"
 # instead of an unmoving spinner.
@@ -250,20 +284,321 @@ def _heavy_queue_depth() -> int:
     with _heavy_render_lock:
         return _heavy_render_waiting
 
+
+# ── Abandoned jobs ───────────────────────────────────────────────────
+# Users switch dates or close the tab mid-render all the time, and every
+# abandoned job still held the box for minutes while live users queued
+# behind it. Each client-facing job now has a last-interest timestamp,
+# bumped by whatever the client does while it waits (status polls for HQ,
+# the re-POST of generate_preview for previews). A job nobody has asked
+# about for _JOB_ABANDON_S is dropped when it would have been granted a
+# slot, and a running one stops at the next _job_checkpoint() stage
+# boundary. Jobs that were never touched (admin / idle warms) never count
+# as abandoned. The front end polls at most every 8 s; the default leaves
+# room for a background tab's throttled timers.
+import contextvars
+
+_JOB_ABANDON_S = float(os.environ.get("JOB_ABANDON_S", "120"))
+_job_interest: dict = {}    # job_id → last time a client asked about it
+# The heavy job the current task/thread is working for. Set by
+# _HeavyRenderSlot; run_in_pool copies it into the worker thread, so
+# the sync pipelines can checkpoint without new parameters.
+_job_ctx = contextvars.ContextVar("heavy_job_id", default=None)
+
+
+class _JobAbandoned(BaseException):
+    """Raised at a stage boundary (or instead of a slot grant) when the job's
+    client has gone away. BaseException, like CancelledError, so the
+    pipelines' broad `except Exception` fallbacks don't swallow it."""
+
+
+def _touch_job(job_id) -> None:
+    if job_id is not None:
+        _job_interest[job_id] = time.time()
+
+
+def _forget_job(job_id) -> None:
+    _job_interest.pop(job_id, None)
+
+
+def _job_abandoned(job_id) -> bool:
+    seen = _job_interest.get(job_id)
+    return seen is not None and time.time() - seen > _JOB_ABANDON_S
+
+
+def _job_checkpoint(stage: str) -> None:
+    job_id = _job_ctx.get()
+    if job_id is not None and _job_abandoned(job_id):
+        print(f"[abandon] {job_id}: no client for {_JOB_ABANDON_S:.0f}s — stopping before {stage}", flush=True)
+        raise _JobAbandoned(f"{job_id} abandoned before {stage}")
+
+
+# ── Priority scheduling ──────────────────────────────────────────────
+# The slots used to be a FIFO asyncio.Semaphore, so a single
+# /api/admin/warm_default or vibe-grid warm could sit ahead of a paying
+# customer's preview for minutes. Jobs now carry a class, and a freed slot
+# goes to the best-ranked waiter:
+#
+#   preview  (0)  interactive 512² preview — the user is staring at a spinner
+#   hq       (1)  editor HQ render
+#   checkout (2)  integrated multi-frame print render (user is mid-checkout,
+#                 but it's minutes long and the UI already says so)
+#   warm     (3)  admin / idle-time warming — nobody is waiting on it
+#
+# Aging keeps the low classes from starving under sustained traffic: every
+# _HEAVY_AGING_S seconds of waiting buys a job one class of rank, so a warm
+# job queued three minutes ago ranks with a preview arriving now. Equal rank
+# → FIFO. Running jobs are never pre-empted.
+_HEAVY_CLASSES = {"preview": 0, "hq": 1, "checkout": 2, "warm": 3}
+_HEAVY_AGING_S = float(os.environ.get("SOLAR_ARCHIVE_HEAVY_AGING_S", "60"))
+# Seed run-time estimates (seconds) per class; refined by an EWMA of actual
+# slot hold times so "estimated wait" tracks the box it's running on.
+_HEAVY_EST_S = {"preview": 20.0, "hq": 90.0, "checkout": 180.0, "warm": 120.0}
+# Memory workload a class implies when the caller doesn't say (warm jobs
+# should — the idle warmer renders previews too).
+_HEAVY_CLASS_WORKLOAD = {"preview": "preview", "hq": "hq", "checkout": "hq_integrated", "warm": "hq"}
+# Upstream-limiter lane (api/token_bucket.py) each class fetches in.
+_HEAVY_CLASS_LANE = {"preview": "interactive", "hq": "interactive", "checkout": "interactive", "warm": "background"}
+_HEAVY_RSS_SAMPLE_S = 0.25
+
+from api import mem_model as _mem_model
+
+
+def _heavy_mem_probe():
+    """(available MB, this process's RSS MB), or None without psutil."""
+    if _psutil is None:
+        return None
+    try:
+        return (_psutil.virtual_memory().available / (1024 * 1024),
+                _psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024))
+    except Exception:
+        return None
+
+
+class _HeavyScheduler:
+    """Priority + aging, memory-admitted replacement for the heavy-render
+    semaphore. All mutation happens on the event loop; `position()` may be
+    read anywhere.
+
+    Admission: the best-ranked waiter starts when its predicted RSS growth
+    fits in available memory after subtracting (a) what the running jobs
+    are predicted to still allocate and (b) the safety margin. "Still
+    allocate" = their summed predictions minus how far the process RSS has
+    already grown since the box went busy, so a running HQ that has reached
+    its peak stops double-counting. An empty box always admits (a job
+    bigger than the whole machine must still get its chance rather than
+    queue forever), and a waiter that doesn't fit blocks the ones behind it
+    — otherwise a stream of previews would starve an integrated render.
+
+    While anything runs, a sampler thread tracks peak RSS; a job that ran
+    alone feeds its measured growth back into the model."""
+
+    def __init__(self, slots: int, probe=_heavy_mem_probe, abandoned=_job_abandoned):
+        self.slots = slots
+        self._probe = probe
+        self._abandoned = abandoned
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._waiting = []      # [seq, cls, job_id, enqueued_at, future, shape]
+        self._running = {}      # token → (cls, job_id, started_at, shape)
+        self._measure = {}      # token → [start_rss, peak_rss, solo]
+        self._busy_rss = 0.0
+        self._sampler = None
+
+    def _rank(self, w, now: float) -> tuple:
+        seq, cls, _job, enq, _fut, _shape = w
+        return (_HEAVY_CLASSES[cls] - (now - enq) / _HEAVY_AGING_S, seq)
+
+    def _fits_locked(self, need_mb: float, mem) -> bool:
+        if not self._running:
+            return True
+        if len(self._running) >= self.slots:
+            return False
+        if mem is None:
+            return True         # nothing to measure — the slot ceiling rules
+        avail, rss = mem
+        committed = sum(r[3]["mb"] for r in self._running.values())
+        outstanding = max(0.0, committed - max(0.0, rss - self._busy_rss))
+        return need_mb <= avail - outstanding - _HEAVY_RAM_MARGIN_MB
+
+    def _grant_locked(self) -> None:
+        now = time.monotonic()
+        mem = self._probe() if self._waiting else None
+        while self._waiting:
+            best = min(self._waiting, key=lambda w: self._rank(w, now))
+            seq, cls, job_id, _enq, fut, shape = best
+            if fut.done():          # cancelled while waiting
+                self._waiting.remove(best)
+                continue
+            if job_id is not None and self._abandoned(job_id):
+                self._waiting.remove(best)
+                fut.set_exception(_JobAbandoned(f"{job_id} abandoned while queued"))
+                continue
+            if not self._fits_locked(shape["mb"], mem):
+                break
+            self._waiting.remove(best)
+            rss = mem[1] if mem else 0.0
+            if not self._running:
+                self._busy_rss = rss
+            for m in self._measure.values():
+                m[2] = False        # overlapping runs can't be attributed
+            self._measure[seq] = [rss, rss, not self._running]
+            self._running[seq] = (cls, job_id, now, shape)
+            fut.set_result(seq)
+        if self._running and mem is not None and self._sampler is None:
+            self._sampler = threading.Thread(target=self._sample_loop, name="heavy-rss", daemon=True)
+            self._sampler.start()
+
+    def _sample_loop(self) -> None:
+        while True:
+            mem = self._probe()
+            with self._lock:
+                if not self._running or mem is None:
+                    self._sampler = None
+                    return
+                for m in self._measure.values():
+                    m[1] = max(m[1], mem[1])
+            time.sleep(_HEAVY_RSS_SAMPLE_S)
+
+    async def acquire(self, cls: str, job_id=None, workload=None,
+                      megapixels: float = _mem_model.FULL_RES_MP, frames=None) -> int:
+        workload = workload or _HEAVY_CLASS_WORKLOAD[cls]
+        if frames is None:
+            frames = _mem_model.INTEGRATE_FRAMES if workload == "hq_integrated" else 1
+        shape = {
+            "workload": workload, "megapixels": megapixels, "frames": frames,
+            "mb": _mem_model.predict_mb(workload, megapixels, frames),
+        }
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        with self._lock:
+            self._seq += 1
+            self._waiting.append([self._seq, cls, job_id, time.monotonic(), fut, shape])
+            self._grant_locked()
+        try:
+            return await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                self._waiting = [w for w in self._waiting if w[4] is not fut]
+                if fut.done() and not fut.cancelled():
+                    # Granted in the same tick we were cancelled — give it back.
+                    self._release_locked(fut.result())
+            raise
+
+    def _release_locked(self, token: int):
+        entry = self._running.pop(token, None)
+        measured = self._measure.pop(token, None)
+        sample = None
+        if entry is not None:
+            cls, _job, started, shape = entry
+            held = time.monotonic() - started
+            _HEAVY_EST_S[cls] = 0.7 * _HEAVY_EST_S[cls] + 0.3 * held
+            if measured is not None and measured[2]:
+                mem = self._probe()
+                peak = max(measured[1], mem[1]) if mem else measured[1]
+                sample = (shape, peak - measured[0])
+        self._grant_locked()
+        return sample
+
+    def release(self, token: int) -> None:
+        with self._lock:
+            sample = self._release_locked(token)
+        if sample is not None:
+            shape, grown_mb = sample
+            _mem_model.record(shape["workload"], shape["megapixels"], shape["frames"], grown_mb)
+
+    def position(self, job_id):
+        """{"queue_position", "eta_s", "priority"} for a waiting or running
+        job, else None. queue_position counts the job itself plus everything
+        ahead of it (running jobs included) — the same convention as
+        queue_depth, so the UI's "N ahead" is queue_position - 1."""
+        if job_id is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            for cls, jid, _started, _shape in self._running.values():
+                if jid == job_id:
+                    return {"queue_position": 1, "eta_s": 0, "priority": cls}
+            ranked = sorted(self._waiting, key=lambda w: self._rank(w, now))
+            ahead_s = sum(max(0.0, _HEAVY_EST_S[c] - (now - st)) for c, _j, st, _s in self._running.values())
+            # Whichever job finishes first frees room for the next waiter, so
+            # the work ahead drains roughly as many at a time as run now.
+            lanes = max(1, len(self._running))
+            for i, w in enumerate(ranked):
+                if w[2] == job_id:
+                    eta = (ahead_s + sum(_HEAVY_EST_S[x[1]] for x in ranked[:i])) / lanes
+                    return {
+                        "queue_position": len(self._running) + i + 1,
+                        "eta_s": int(round(eta)),
+                        "priority": w[1],
+                    }
+        return None
+
+    def stats(self) -> dict:
+        mem = self._probe()
+        with self._lock:
+            return {
+                "max_jobs": self.slots,
+                "margin_mb": _HEAVY_RAM_MARGIN_MB,
+                "available_mb": round(mem[0]) if mem else None,
+                "rss_mb": round(mem[1]) if mem else None,
+                "running": [
+                    {"priority": c, "job_id": j, "workload": sh["workload"], "predicted_mb": round(sh["mb"])}
+                    for c, j, _st, sh in self._running.values()
+                ],
+                "waiting": len(self._waiting),
+            }
+
+
+_HEAVY_SCHEDULER = _HeavyScheduler(_HEAVY_RENDER_CONCURRENCY)
+
+
+def _heavy_queue_position(job_id):
+    return _HEAVY_SCHEDULER.position(job_id)
+
+
 class _HeavyRenderSlot:
     """Async context manager that increments the queue counter on enter
-    and decrements on exit — independent of when the semaphore actually
-    grants the slot, so waiters show up in the depth count too."""
+    and decrements on exit — independent of when the scheduler actually
+    grants the slot, so waiters show up in the depth count too.
+
+    `priority` is one of _HEAVY_CLASSES; `job_id` (a task id or preview key)
+    lets status endpoints report that job's queue position and ETA.
+    `workload` / `frames` (see api/mem_model.py) size the job's memory
+    prediction; they default from the priority class."""
+    def __init__(self, priority: str = "hq", job_id=None, workload=None, frames=None):
+        if priority not in _HEAVY_CLASSES:
+            raise ValueError(f"unknown heavy-render priority {priority!r}")
+        if workload is not None and workload not in _mem_model.PRIORS:
+            raise ValueError(f"unknown heavy-render workload {workload!r}")
+        self.priority = priority
+        self.job_id = job_id
+        self.workload = workload
+        self.frames = frames
+        self._token = None
+        self._ctx = None
+        self._lane_ctx = None
+
     async def __aenter__(self):
         global _heavy_render_waiting
         with _heavy_render_lock:
             _heavy_render_waiting += 1
-        await _HEAVY_RENDER_SEMAPHORE.acquire()
+        try:
+            self._token = await _HEAVY_SCHEDULER.acquire(
+                self.priority, self.job_id, workload=self.workload, frames=self.frames)
+        except BaseException:
+            with _heavy_render_lock:
+                _heavy_render_waiting -= 1
+            raise
+        self._ctx = _job_ctx.set(self.job_id)
+        self._lane_ctx = _upstream_lane.set(_HEAVY_CLASS_LANE[self.priority])
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
         global _heavy_render_waiting
-        _HEAVY_RENDER_SEMAPHORE.release()
+        _upstream_lane.reset(self._lane_ctx)
+        _job_ctx.reset(self._ctx)
+        _HEAVY_SCHEDULER.release(self._token)
         with _heavy_render_lock:
             _heavy_render_waiting -= 1
         return False
@@ -273,30 +608,12 @@ class _HeavyRenderSlot:
 # ──────────────────────────────────────────────────────────────────────
 # Both NASA APIs are rate-sensitive — Helioviewer specifically has been
 # known to throttle when slammed. We don't want a beta with 50 testers to
-# get our IP block-listed at NASA. Token-style limiter: each call to
-# .wait() blocks until enough time has elapsed since the last call to
-# satisfy the configured req-per-minute rate. Thread-safe (used from
-# inside threadpooled sync calls).
-class _RateLimiter:
-    def __init__(self, max_per_minute: int, name: str = ""):
-        self.interval = 60.0 / max(1, max_per_minute)
-        self.lock = threading.Lock()
-        self.next_at = 0.0
-        self.name = name or "rate-limiter"
-
-    def wait(self) -> None:
-        with self.lock:
-            now = time.time()
-            sleep_for = self.next_at - now
-            if sleep_for > 0:
-                # Release the lock while sleeping so we don't serialise
-                # threads that arrive at the same instant — they each
-                # update next_at and pick up correct staggered slots.
-                self.next_at = max(self.next_at, now) + self.interval
-            else:
-                self.next_at = now + self.interval
-        if sleep_for > 0:
-            time.sleep(sleep_for)
+# get our IP block-listed at NASA. Priority token buckets (see
+# api/token_bucket.py): awaitable from the event loop or blocking from a
+# worker thread, with interactive fetches served before thumbnail bursts
+# and warm jobs. The lane comes from the heavy job's class (_HeavyRenderSlot
+# sets it), so `.wait()` call sites inside the sync pipelines need no args.
+from api.token_bucket import TokenBucket, current_lane as _upstream_lane
 
 # Helioviewer: 6 req/sec. The wavelength tile picker fires 9 thumb
 # requests in parallel the moment a user picks a date, plus the
@@ -305,11 +622,12 @@ class _RateLimiter:
 # ~3-4s; bumped 2× to 6/sec to absorb the new [-]/[+] time-of-day
 # fine-tune feature (debounced bursts of ~10 thumb refetches per
 # editing session) while still staying below Helioviewer's public
-# soft limit.
-_HELIOVIEWER_LIMITER = _RateLimiter(360, "helioviewer")
+# soft limit. Burst of one second's worth: the average rate is unchanged,
+# but a grid pick no longer trickles out at exactly 1/6 s spacing.
+_HELIOVIEWER_LIMITER = TokenBucket(360, "helioviewer", burst=6)
 # VSO is heavier per-call (FITS download), so throttle it tighter.
-# Bumped 2× alongside the Helioviewer bump for parity.
-_VSO_LIMITER = _RateLimiter(60, "vso")
+# Bumped 2× alongside the Helioviewer bump for parity. No burst.
+_VSO_LIMITER = TokenBucket(60, "vso")
 
 
 def _atomic_image_write(out_path, write_fn) -> None:
@@ -329,6 +647,7 @@ def _atomic_image_write(out_path, write_fn) -> None:
     try:
         write_fn(tmp)
         os.replace(tmp, out_path)
+        hot_cache.discard(os.path.realpath(str(out_path)))
     finally:
         if os.path.exists(tmp):
             try:
@@ -336,6 +655,30 @@ def _atomic_image_write(out_path, write_fn) -> None:
             except OSError:
                 pass
 
+def _savefig_png(out_path) -> None:
+    """plt.savefig(out_path, bbox_inches="tight", pad_inches=0), encoded by
+    the band-parallel PNG writer (api/png_writer.py) instead of PIL's
+    single-threaded deflate, and written atomically.
+
+    matplotlib still rasterises and crops, into an uncompressed PNG in
+    memory (compress_level=0 costs a copy, not a deflate), so the pixels
+    and the tight bounding box are exactly what savefig produced. For a
+    3000² HQ render that encode was seconds at the end of every job.
+    """
+    import io as _io
+    import matplotlib.pyplot as _plt
+    from PIL import Image as _Image
+    from api import png_writer
+    buf = _io.BytesIO()
+    _plt.savefig(buf, format="png", bbox_inches="tight", pad_inches=0,
+                pil_kwargs={"compress_level": 0})
+    buf.seek(0)
+    with _Image.open(buf) as im:
+        px = np.asarray(im)
+    del buf
+    _atomic_image_write(out_path, lambda _p: png_writer.write_png(_p, px))
+
+
 class PreviewRequest(BaseModel):
     date: str
     # User-picked time of day in UTC, "HH:MM" (e.g. "12:00"). Optional —
@@ -684,6 +1027,7 @@ SOHO_EPOCH = datetime(1996, 1, 1)    # after which EIT/LASCO is available
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
+from api.hot_cache import HotStaticFiles, entry_response, hot_cache
 import sys
 import threading
 
@@ -701,7 +1045,12 @@ def _sweep_output_cache(max_age_days: int = 2) -> None:
     cutoff = _t.time() - max_age_days * 86400
     removed = 0
     try:
-        for root, _dirs, files in os.walk(OUTPUT_DIR):
+        for root, dirs, files in os.walk(OUTPUT_DIR):
+            if os.path.samefile(root, OUTPUT_DIR) and "hv_cache" in dirs:
+                # Helioviewer screenshots are _HV_DISK's: its LRU keeps them
+                # under their byte budget, and deleting behind its size
+                # index would leave it over-counting and evicting hot ones.
+                dirs.remove("hv_cache")
             for fn in files:
                 p = os.path.join(root, fn)
                 try:
@@ -753,11 +1102,40 @@ app_dir = Path(__file__).parent
 # Persistent default-image cache (Phase A HQ + Phase B real Printify
 # mockups + default_mockups.json manifest). Lives on /var/data; survives
 # deploys. Served at /asset/default/.
-app.mount("/asset/default", StaticFiles(directory=str(DEFAULT_CACHE_DIR)), name="default_cache")
+#
+# All three are HotStaticFiles: small files (previews, mockup thumbs,
+# grid_src, the JSON manifests) are answered from the in-RAM hot cache
+# (api/hot_cache.py) instead of a stat+open+read on the volume per hit;
+# anything large or odd falls through to plain StaticFiles behaviour.
+app.mount("/asset/default", HotStaticFiles(directory=str(DEFAULT_CACHE_DIR), cache=hot_cache), name="default_cache")
 # Preview images.
-app.mount("/asset/preview", StaticFiles(directory=PREVIEW_DIR), name="asset_preview")
+app.mount("/asset/preview", HotStaticFiles(directory=PREVIEW_DIR, cache=hot_cache), name="asset_preview")
 # Main asset mount: HQ/full-res images from OUTPUT_DIR (the catch-all).
-app.mount("/asset", StaticFiles(directory=OUTPUT_DIR), name="asset")
+app.mount("/asset", HotStaticFiles(directory=OUTPUT_DIR, cache=hot_cache), name="asset")
+
+# Signed, expiring links for the images Printify fetches by URL
+# (api/signed_assets.py). Personalised prints and in-memory grid crops are
+# staged OUTSIDE every public mount and are reachable only through these.
+from api import signed_assets  # noqa: E402
+SIGNED_STAGING_DIR = _persistent_data_dir() / "signed_staging"
+signed_assets.register_root("asset", OUTPUT_DIR)
+signed_assets.register_root("default", DEFAULT_CACHE_DIR)
+signed_assets.register_root(signed_assets.STAGED_ROOT, SIGNED_STAGING_DIR)
+# Composed print files with customer text in them (print_text.has_text).
+# They are cached like print_uploads/, but never under OUTPUT_DIR: /asset
+# serves all of it, and the edge keeps what it serves for 30 days.
+PRIVATE_PRINT_DIR = _persistent_data_dir() / "private_prints"
+signed_assets.register_root(signed_assets.PRIVATE_ROOT, PRIVATE_PRINT_DIR)
+
+
+@app.get(signed_assets.ROUTE_PREFIX + "/{root}/{expires}/{sig}/{rel:path}")
+async def serve_signed_asset(root: str, expires: str, sig: str, rel: str):
+    try:
+        path = signed_assets.resolve(root, expires, sig, rel)
+    except signed_assets.SignedURLError as e:
+        raise HTTPException(status_code=e.status, detail=e.detail)
+    return FileResponse(path, headers={"Cache-Control": "private, no-store",
+                                       "X-Robots-Tag": "noindex"})
 
 @app.get("/api/frontend.html")
 async def serve_frontend():
@@ -937,7 +1315,7 @@ async def api_data_frontier():
     if (_FRONTIER_CACHE["date"] is None
             or (now - _FRONTIER_CACHE["checked_at"]) > _FRONTIER_TTL_SECONDS):
         try:
-            _FRONTIER_CACHE["date"] = await asyncio.to_thread(_probe_data_frontier)
+            _FRONTIER_CACHE["date"] = await run_in_pool("maintenance", _probe_data_frontier)
         except Exception as e:
             print(f"[data_frontier] probe failed: {e}", flush=True)
             _FRONTIER_CACHE["date"] = (
@@ -952,31 +1330,138 @@ async def api_data_frontier():
     }
 
 
+# ── Composed print-file cache ─────────────────────────────────────────
+# A composed print file is a pure function of (source render bytes, the
+# params compose() reads, compose's own version), so it is stored under a
+# digest of exactly that: print_uploads/<key>.png. Shoppers re-open the
+# same design, switch between products of the same aspect, and retry a
+# failed checkout — each used to recompose a multi-megapixel PNG from
+# scratch, against the 12 / 300 s limit. A hit is now a stat, and only
+# misses spend that budget. Identical requests already in flight share one
+# compose.
+_source_digests: dict = {}          # (path, mtime_ns, size) → sha256 hex
+_source_digests_lock = threading.Lock()
+_print_file_inflight: dict = {}     # key → asyncio.Task composing it
+
+
+def _source_digest(path: str) -> str:
+    """sha256 of a render's bytes, memoised on (path, mtime, size) so a
+    hot source is hashed once, not on every request."""
+    st = os.stat(path)
+    memo = (path, st.st_mtime_ns, st.st_size)
+    with _source_digests_lock:
+        hit = _source_digests.get(memo)
+    if hit:
+        return hit
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _source_digests_lock:
+        if len(_source_digests) > 512:
+            _source_digests.clear()
+        _source_digests[memo] = digest
+    return digest
+
+
+def _print_file_key(src_path: str, params: dict) -> str:
+    from api import print_compose
+    ident = "\n".join((_source_digest(src_path), print_compose.canonical_params(params),
+                       f"v{print_compose.COMPOSE_VERSION}"))
+    return hashlib.sha256(ident.encode()).hexdigest()[:32]
+
+
+def _cached_print_file(out_path: str) -> bool:
+    # Print files are written atomically, so one that exists is complete,
+    # however small a flat design compresses.
+    try:
+        os.utime(out_path, None)      # the disk guard prunes oldest first
+        return True
+    except OSError:
+        return False
+
+
+def _compose_print_files(src_path: str, jobs: list) -> None:
+    """Compose [(params, out_path)] from one source, each written atomically.
+    Several jobs go through print_compose.render_batch, which decodes the
+    source once and draws products cut from the same edit once."""
+    from api import png_writer, print_compose
+    if len(jobs) == 1:
+        params, out_path = jobs[0]
+        _atomic_image_write(out_path, lambda _p: print_compose.compose(src_path, params, _p))
+        return
+    for i, pixels in print_compose.render_batch(src_path, [(None, p) for p, _o in jobs]):
+        _atomic_image_write(jobs[i][1], lambda _p: png_writer.write_png(_p, pixels))
+
+
+async def _with_print_area(params: dict, placement):
+    """(params, (w, h) or None): params with targetSize set from the
+    placement's catalog print area, when it names one we can look up."""
+    if not (isinstance(placement, dict) and placement.get("blueprint_id")):
+        return params, None
+    target = await run_in_pool(
+        "commerce", printify_routes.placeholder_size,
+        placement.get("blueprint_id"), placement.get("print_provider_id"),
+        placement.get("variant_id"), str(placement.get("position") or "front"))
+    if not target:
+        return params, None
+    return dict(params, targetSize={"w": target[0], "h": target[1]}), target
+
+
+_PRINT_FILE_BATCH_MAX = 12
+_PRINT_FILE_UNSUPPORTED = "params require client-side rendering (unbundled font or unknown extras)"
+
+
 @app.post("/api/print_file")
 async def api_print_file(request: Request, payload: dict = Body(...)):
     """Compose the print file HERE from edit parameters, instead of shipping
     the 4096² render to the browser and taking a ~40 MB PNG back.
 
-    Phase 1: geometry + colour only. Orders carrying a text overlay (or the
-    other client-drawn extras) are refused with `supported: false`, and the
-    caller keeps using the browser upload path for those — see
-    api/print_compose.py for why that line is drawn where it is.
+    Geometry, colour, masks, and the caption / text overlay / clock
+    numerals / dual-panel extras. Text in a font that isn't bundled in
+    api/fonts is refused with `supported: false`, and the caller keeps
+    using the browser upload path for it — see api/print_compose.py for
+    why that line is drawn where it is.
 
     Returns { url } pointing at a staged PNG under /asset/, which the
-    checkout hands to Printify directly."""
+    checkout hands to Printify directly. A print with text in it (caption,
+    overlay, clock numerals) is the customer's own words: it is filed in
+    PRIVATE_PRINT_DIR instead, and its url is a short-lived signed link
+    (api/signed_assets.py) that the checkout accepts in place of /asset/.
+    The same design composed before returns the same file with
+    `cached: true`.
+
+    An optional `placement` {blueprint_id, print_provider_id, variant_id,
+    position} names the product: the file is then composed at that print
+    area's catalog size (print_compose targetSize) rather than the
+    source's, which is all Printify prints anyway.
+
+    Several products from one source: send `targets`, a list of up to
+    _PRINT_FILE_BATCH_MAX {params, placement}, instead of params/placement.
+    The misses are composed together from one decode of the source, and the
+    reply is { supported, files: [one single-file reply per target] }. Each
+    composed file spends one unit of the compose budget."""
     enforce_origin(request)
-    enforce_rate_limit(request, "print_file", 12, 300.0)
 
-    from api import print_compose
+    from api import print_compose, print_text
 
-    params = payload.get("params") or {}
-    src_url = str(payload.get("source_url") or "")
-    if not print_compose.supports_params(params):
+    batch = payload.get("targets")
+    if batch is None:
+        targets = [{"params": payload.get("params"), "placement": payload.get("placement")}]
+    elif (isinstance(batch, list) and 0 < len(batch) <= _PRINT_FILE_BATCH_MAX
+          and all(isinstance(t, dict) for t in batch)):
+        targets = batch
+    else:
+        raise HTTPException(status_code=400,
+                            detail=f"targets must be a list of 1-{_PRINT_FILE_BATCH_MAX} objects")
+    supported = [print_compose.supports_params(t.get("params") or {}) for t in targets]
+    if batch is None and not supported[0]:
         return JSONResponse(status_code=200, content={
-            "supported": False,
-            "reason": "params require client-side rendering (text overlay or extras)",
+            "supported": False, "reason": _PRINT_FILE_UNSUPPORTED,
         })
 
+    src_url = str(payload.get("source_url") or "")
     # Resolve the source to a local file. Only our own /asset/ paths are
     # accepted — this endpoint must never be a fetch-arbitrary-URL gadget.
     name = os.path.basename(urlparse(src_url).path or "")
@@ -990,25 +1475,69 @@ async def api_print_file(request: Request, payload: dict = Body(...)):
             "supported": False, "reason": "source render not available on this instance",
         })
 
-    import uuid as _uuid
-    out_dir = os.path.join(OUTPUT_DIR, "print_uploads")
-    os.makedirs(out_dir, exist_ok=True)
-    out_name = f"{_uuid.uuid4().hex}.png"
-    out_path = os.path.join(out_dir, out_name)
-    try:
-        await asyncio.to_thread(print_compose.compose, src_path, params, out_path)
-    except Exception as e:
-        print(f"[print_file] compose failed: {e}", flush=True)
-        return JSONResponse(status_code=200, content={
-            "supported": False, "reason": f"compose failed: {str(e)[:120]}",
+    public_dir = os.path.join(OUTPUT_DIR, "print_uploads")
+    os.makedirs(public_dir, exist_ok=True)
+    files = []          # per target: (key, out_path, cached, target size) or None
+    pending = {}        # key → (params, out_path) this request composes
+    tasks = {}          # key → the task composing it, ours or already in flight
+    for t, ok in zip(targets, supported):
+        if not ok:
+            files.append(None)
+            continue
+        params, target = await _with_print_area(t.get("params") or {}, t.get("placement"))
+        key = await run_in_pool("files", _print_file_key, src_path, params)
+        out_dir = str(PRIVATE_PRINT_DIR) if print_text.has_text(params) else public_dir
+        out_path = os.path.join(out_dir, f"{key}.png")
+        cached = await run_in_pool("files", _cached_print_file, out_path)
+        files.append((key, out_path, cached, target))
+        if cached:
+            # Hits are a stat: they get a roomier limit than the compose budget.
+            enforce_rate_limit(request, "print_file_hit", 120, 300.0)
+        elif key in _print_file_inflight:
+            tasks[key] = _print_file_inflight[key]
+        elif key not in pending:
+            enforce_rate_limit(request, "print_file", 12, 300.0)
+            pending[key] = (params, out_path)
+    if pending:
+        task = asyncio.ensure_future(run_in_pool(
+            "compose", _compose_print_files, src_path, list(pending.values())))
+        for key in pending:
+            _print_file_inflight[key] = tasks[key] = task
+            task.add_done_callback(lambda _t, k=key: _print_file_inflight.pop(k, None))
+    errors = {}
+    for task in set(tasks.values()):
+        try:
+            await asyncio.shield(task)
+        except Exception as e:
+            print(f"[print_file] compose failed: {e}", flush=True)
+            errors[task] = e
+
+    replies = []
+    for entry in files:
+        if entry is None:
+            replies.append({"supported": False, "reason": _PRINT_FILE_UNSUPPORTED})
+            continue
+        key, out_path, cached, target = entry
+        # A failed batch may still have written this target before it broke.
+        if not cached and key in tasks and not await run_in_pool("files", _cached_print_file, out_path):
+            e = errors.get(tasks[key]) or RuntimeError("no output")
+            replies.append({"supported": False, "reason": f"compose failed: {str(e)[:120]}"})
+            continue
+        size = os.path.getsize(out_path)
+        out_name = os.path.basename(out_path)
+        print(f"[print_file] {'cache hit' if cached else 'composed'} {out_name} ({size/1e6:.1f} MB) "
+              f"from {os.path.basename(src_path)}"
+              + (f" at {target[0]}x{target[1]}" if target else ""), flush=True)
+        replies.append({
+            "supported": True,
+            "url": (f"/asset/print_uploads/{out_name}" if os.path.dirname(out_path) == public_dir
+                    else signed_assets.sign_path(out_path)),
+            "size_bytes": size,
+            "cached": cached,
         })
-    size = os.path.getsize(out_path)
-    print(f"[print_file] composed {out_name} ({size/1e6:.1f} MB) from {os.path.basename(src_path)}", flush=True)
-    return {
-        "supported": True,
-        "url": f"/asset/print_uploads/{out_name}",
-        "size_bytes": size,
-    }
+    if batch is None:
+        return replies[0] if replies[0]["supported"] else JSONResponse(status_code=200, content=replies[0])
+    return {"supported": any(r["supported"] for r in replies), "files": replies}
 
 
 @app.get("/api/build-info")
@@ -1039,73 +1568,166 @@ async def api_build_info():
 # ──────────────────────────────────────────────────────────────────────────────
 HELIOVIEWER_BASE = "https://api.helioviewer.org/v2/takeScreenshot"
 
-def _fetch_helioviewer_screenshot(url: str, timeout: int = 60):
-    """Sync fetch so we can run in executor; returns (content, content_type) or raises.
+# Persistent screenshot cache (api/hv_cache.py), keyed by (sourceId, time
+# snapped to the AIA cadence, imageScale, width, height). Under OUTPUT_DIR
+# like rhef_cache, so it survives deploys on the volume and the disk guard
+# can prune it.
+from api.hv_cache import ScreenshotCache, snap_time as _hv_snap_time
+try:
+    _HV_DISK_MAX_BYTES = int(float(os.environ.get("HV_CACHE_MAX_MB", "512")) * 1024 * 1024)
+except ValueError:
+    _HV_DISK_MAX_BYTES = 512 * 1024 * 1024
+_HV_DISK = ScreenshotCache(os.path.join(OUTPUT_DIR, "hv_cache"), _HV_DISK_MAX_BYTES)
+
+class _HelioviewerError(requests.RequestException):
+    """Helioviewer said no (HTTP error, JSON error body, tiny body) or the
+    connection failed. A RequestException so the preview pipeline's existing
+    handlers keep catching it."""
+
+
+# takeScreenshot over aiohttp. The proxy used to be a blocking requests.get
+# in an executor thread that returned the whole body, so every in-flight
+# thumb held a thread for its full upstream round-trip (seconds) — the
+# highest-volume dynamic endpoint was capped by the pool size. Now the
+# proxy is thread-free and streams the body through in _HV_CHUNK pieces.
+_HV_CHUNK = 64 * 1024
+_HV_MIN_BODY = 100
 
-    Throttled by _HELIOVIEWER_LIMITER so a beta cohort doesn't slam
-    Helioviewer's takeScreenshot endpoint and trip its rate limit.
-    Each thread waits its turn before the actual outbound HTTP fires.
+
+class _HvSessions:
+    """Lazily-opened aiohttp sessions for one event loop. sessions(False)
+    connects direct (ignores HTTPS_PROXY); sessions(True) honours the env
+    proxy (see _hv_open)."""
+
+    def __init__(self):
+        self._s = {}
+
+    def __call__(self, via_proxy: bool) -> aiohttp.ClientSession:
+        sess = self._s.get(via_proxy)
+        if sess is None or sess.closed:
+            sess = aiohttp.ClientSession(trust_env=via_proxy)
+            self._s[via_proxy] = sess
+        return sess
+
+    async def close(self) -> None:
+        for sess in self._s.values():
+            await sess.close()
+        self._s.clear()
+
+
+_hv_loop_sessions: dict = {}     # event loop → _HvSessions
+
+
+def _hv_app_sessions() -> _HvSessions:
+    loop = asyncio.get_running_loop()
+    for old in [lp for lp in _hv_loop_sessions if lp.is_closed()]:
+        del _hv_loop_sessions[old]
+    if loop not in _hv_loop_sessions:
+        _hv_loop_sessions[loop] = _HvSessions()
+    return _hv_loop_sessions[loop]
+
+
+_hv_ssl = None
+
+
+def _hv_ssl_context() -> ssl.SSLContext:
+    # The app may point SSL_CERT_FILE at the NASA CA bundle (for JSOC/VSO),
+    # which does NOT chain to api.helioviewer.org's public CA — use certifi.
+    global _hv_ssl
+    if _hv_ssl is None:
+        _hv_ssl = ssl.create_default_context(cafile=certifi.where())
+    return _hv_ssl
+
+
+async def _hv_open(url: str, timeout: int, sessions: _HvSessions) -> aiohttp.ClientResponse:
+    """GET `url` and return the open response (caller releases it).
 
     Works across three network shapes without configuration:
       1. External / home wifi: no proxy in use, direct connection succeeds.
       2. Corporate network (dev): outbound direct is blocked, HTTPS_PROXY env
          points at webfilter.nwra.com which does TLS MITM.
-      3. Deployed (Render): no proxy, direct connection succeeds.
-
-    Strategy: try direct first (bypassing any HTTPS_PROXY env var). If direct
-    refuses with a ConnectionError, retry letting requests honor the env
-    proxy. That way external-wifi users aren't trapped by a stale corp-
-    network HTTPS_PROXY in their shell profile, and corp-network users still
-    reach the API via the filter.
-
-    SSL handling: the app may set SSL_CERT_FILE to a NASA CA bundle (needed for
-    JSOC/VSO), which does NOT chain to the public CA that signs api.helioviewer.org.
-    Use certifi's bundle for this single call. If the corporate proxy re-signs
-    certs with its own CA (breaks certifi), fall through to verify=False — the
-    payload is a public read-only image so the downside is minimal.
+      3. Deployed: no proxy, direct connection succeeds.
+
+    Direct first with a 5 s connect timeout, so external-wifi clients
+    succeed fast and corp-network clients fail fast enough to retry via
+    the env proxy — a stale corp HTTPS_PROXY in a shell profile can't trap
+    a home user. If the proxy re-signs certs (breaks certifi), fall back to
+    an unverified fetch: the payload is a public read-only image.
     """
-    import urllib3
-    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    ssl_ctx = _hv_ssl_context()
+    # encoded=True: send the URL byte-for-byte as built (the `layers=[…]`
+    # brackets included), exactly as the requests-based fetcher did.
+    url = yarl.URL(url, encoded=True)
 
-    # Wait our turn at the rate limiter before any outbound attempt.
-    # Sleeps the calling thread; safe inside run_in_threadpool / asyncio.to_thread.
-    _HELIOVIEWER_LIMITER.wait()
+    async def attempt(session, connect_s):
+        t = aiohttp.ClientTimeout(total=None, sock_connect=connect_s, sock_read=timeout)
+        try:
+            return await session.get(url, ssl=ssl_ctx, timeout=t)
+        except (aiohttp.ClientConnectorCertificateError, aiohttp.ClientSSLError):
+            return await session.get(url, ssl=False, timeout=t)
 
     try:
-        import certifi
-        verify_first = certifi.where()
-    except ImportError:
-        verify_first = False
-
-    def _do_get(proxies_arg, req_timeout):
+        return await attempt(sessions(False), 5)
+    except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+        return await attempt(sessions(True), timeout)
+
+
+async def _hv_check(resp: aiohttp.ClientResponse) -> bytes:
+    """Validate an open takeScreenshot response; return its first bytes
+    (at least _HV_MIN_BODY unless the body is shorter, which is an error)."""
+    if resp.status >= 400:
+        raise _HelioviewerError(f"Helioviewer HTTP {resp.status}")
+    if "json" in (resp.content_type or "").lower():
+        text = (await resp.text())[:200]
         try:
-            return requests.get(url, timeout=req_timeout, verify=verify_first, proxies=proxies_arg)
-        except requests.exceptions.SSLError:
-            return requests.get(url, timeout=req_timeout, verify=False, proxies=proxies_arg)
-
-    # Try direct first with an aggressive (connect=5s, read=timeout) timeout
-    # so external-wifi clients succeed fast and corp-network clients fail fast
-    # enough to try the env proxy. A full `timeout` on the direct attempt
-    # would make corp-network clients wait a full minute before falling back.
+            err = json.loads(text)
+            msg = err.get("message", err.get("error", text))
+        except ValueError:
+            msg = text
+        raise _HelioviewerError(f"Helioviewer error: {msg}")
+    head = b""
+    while len(head) < _HV_MIN_BODY:
+        chunk = await resp.content.read(_HV_CHUNK)
+        if not chunk:
+            raise _HelioviewerError(f"Helioviewer returned tiny body ({len(head)} bytes)")
+        head += chunk
+    return head
+
+
+async def _fetch_helioviewer_async(url: str, timeout: int = 60, sessions: _HvSessions = None):
+    """Whole-body fetch → (content, content_type). Caller holds the limiter token."""
+    sessions = sessions or _hv_app_sessions()
     try:
-        r = _do_get({"http": None, "https": None}, (5, timeout))
-    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
-        # Direct refused or couldn't connect — retry via whatever proxy
-        # HTTPS_PROXY / https_proxy points at. proxies=None means "use
-        # default behavior" (env vars).
-        r = _do_get(None, timeout)
-    r.raise_for_status()
-    ct = r.headers.get("Content-Type", "").split(";")[0].strip().lower()
-    if "json" in ct:
+        resp = await _hv_open(url, timeout, sessions)
         try:
-            err = r.json()
-            msg = err.get("message", err.get("error", r.text[:200]))
-            raise requests.RequestException(f"Helioviewer error: {msg}")
-        except ValueError:
-            raise requests.RequestException(f"Helioviewer returned JSON: {r.text[:200]}")
-    if len(r.content) < 100:
-        raise requests.RequestException(f"Helioviewer returned tiny body ({len(r.content)} bytes)")
-    return r.content, r.headers.get("Content-Type", "image/png")
+            body = await _hv_check(resp) + await resp.read()
+            return body, resp.headers.get("Content-Type", "image/png")
+        finally:
+            resp.release()
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        raise _HelioviewerError(f"{type(e).__name__}: {e}") from e
+
+
+def _fetch_helioviewer_screenshot(url: str, timeout: int = 60, throttled: bool = False):
+    """Sync fetch for the pipelines running in worker threads; returns
+    (content, content_type) or raises _HelioviewerError.
+
+    Throttled by _HELIOVIEWER_LIMITER so a beta cohort doesn't slam
+    Helioviewer's takeScreenshot endpoint and trip its rate limit — unless
+    `throttled`, meaning the caller already holds a token. Same aiohttp
+    path as the proxy, on a private loop + sessions for this call (the
+    worker thread has no loop of its own).
+    """
+    if not throttled:
+        _HELIOVIEWER_LIMITER.wait()
+
+    async def go():
+        sessions = _HvSessions()
+        try:
+            return await _fetch_helioviewer_async(url, timeout, sessions)
+        finally:
+            await sessions.close()
+    return asyncio.run(go())
 
 SDO_LAUNCH_DATE = "2010-05-15"  # First-light AIA imagery available from this date.
 
@@ -1170,22 +1792,10 @@ def _validate_solar_date(date_str: str, time_str: str | None = None) -> None:
             )
 
 
-@app.get("/api/helioviewer_thumb")
-async def helioviewer_thumb(
-    request: Request,
-    date: str = Query(..., description="ISO date-time e.g. 2026-02-10T12:00:00Z"),
-    wavelength: int = Query(..., description="AIA wavelength in Å e.g. 171"),
-    image_scale: float = Query(12, description="Helioviewer imageScale (arcsec/pixel)"),
-    size: int = Query(256, description="Width and height in pixels"),
-):
-    """Proxy Helioviewer screenshot API so the frontend can load tiles/canvas without CORS."""
-    # allow_missing: same-origin <img>/TextureLoader GETs send no Origin and
-    # often no Referer, and strict mode 403'd them (editor preview, handoff
-    # confirm image, web3d hero Sun — 2026-08-15). Cross-site hotlinkers still
-    # send Referer and still get blocked; abuse control is the per-IP rate
-    # limit below + the upstream _HELIOVIEWER_LIMITER + the 30-day edge cache.
-    enforce_origin(request, allow_missing=True)
-    enforce_rate_limit(request, "helioviewer_thumb", 60, 60.0)  # 60/min per IP
+_HV_THUMB_HOT_TTL_S = 3600
+
+
+def _validate_thumb_date(date: str) -> None:
     # `date` here is an ISO timestamp like 2026-02-10T12:00:00Z; pluck
     # the time portion if present so the future-time check covers
     # users in time zones ahead of UTC requesting a frame that hasn't
@@ -1198,26 +1808,99 @@ async def helioviewer_thumb(
         except (IndexError, AttributeError):
             _time_part = None
     _validate_solar_date(date, _time_part)
-    # When frontend sends 12, frame out to 1.5 solar radii (~3000 arcsec) so off-limb corona is visible.
-    if image_scale == 12:
-        scale = 3000.0 / max(size, 64)  # arcsec/pixel so FOV = size * scale ≈ 3000 (1.5 R_sun)
-    else:
-        scale = float(image_scale)
-    url = (
+
+
+def _hv_screenshot_url(date: str, wavelength: int, scale: float, width: int, height: int) -> str:
+    return (
         f"{HELIOVIEWER_BASE}/?"
         f"date={requests.utils.quote(date)}"
         f"&imageScale={scale}"
         f"&layers=[SDO,AIA,AIA,{wavelength},1,100]"
-        f"&x0=0&y0=0&width={size}&height={size}&display=true&watermark=false"
+        f"&x0=0&y0=0&width={width}&height={height}&display=true&watermark=false"
     )
+
+
+def _hv_thumb_request(date: str, wavelength: int, image_scale: float, size: int):
+    """(url, disk_key) for a thumb, disk_key being the _HV_DISK lookup/store
+    arguments. A full timestamp is snapped to the channel cadence first, so
+    near-identical times share one upstream fetch and one disk entry; a bare
+    date passes through uncached (disk_key None)."""
+    # When frontend sends 12, frame out to 1.5 solar radii (~3000 arcsec) so off-limb corona is visible.
+    if image_scale == 12:
+        scale = 3000.0 / max(size, 64)  # arcsec/pixel so FOV = size * scale ≈ 3000 (1.5 R_sun)
+    else:
+        scale = float(image_scale)
+    disk_key = None
+    if "T" in date:
+        try:
+            when = _hv_snap_time(datetime.fromisoformat(date.strip().replace("Z", "+00:00")), wavelength)
+        except ValueError:
+            pass
+        else:
+            date = when.strftime("%Y-%m-%dT%H:%M:%SZ")
+            disk_key = (wavelength, when, scale, size, size)
+    return _hv_screenshot_url(date, wavelength, scale, size, size), disk_key
+
+
+def _hv_screenshot_sync(wavelength: int, dt, scale: float, size: int):
+    """(content, content_type) for a square AIA screenshot at `dt`, via the
+    disk cache. For the sync pipelines (worker threads)."""
+    when = _hv_snap_time(dt, wavelength)
+    hit = _HV_DISK.lookup(wavelength, when, scale, size, size)
+    if hit is not None:
+        return hit
+    url = _hv_screenshot_url(when.strftime("%Y-%m-%dT%H:%M:%SZ"), wavelength, scale, size, size)
+    content, media_type = _fetch_helioviewer_screenshot(url)
+    _HV_DISK.store(wavelength, when, scale, size, size, content)
+    return content, media_type
+
+
+@app.get("/api/helioviewer_thumb")
+async def helioviewer_thumb(
+    request: Request,
+    date: str = Query(..., description="ISO date-time e.g. 2026-02-10T12:00:00Z"),
+    wavelength: int = Query(..., description="AIA wavelength in Å e.g. 171"),
+    image_scale: float = Query(12, description="Helioviewer imageScale (arcsec/pixel)"),
+    size: int = Query(256, description="Width and height in pixels"),
+):
+    """Proxy Helioviewer screenshot API so the frontend can load tiles/canvas without CORS."""
+    # allow_missing: same-origin <img>/TextureLoader GETs send no Origin and
+    # often no Referer, and strict mode 403'd them (editor preview, handoff
+    # confirm image, web3d hero Sun — 2026-08-15). Cross-site hotlinkers still
+    # send Referer and still get blocked; abuse control is the per-IP rate
+    # limit below + the upstream _HELIOVIEWER_LIMITER + the 30-day edge cache.
+    enforce_origin(request, allow_missing=True)
+    enforce_rate_limit(request, "helioviewer_thumb", 60, 60.0)  # 60/min per IP
+    _validate_thumb_date(date)
+    url, disk_key = _hv_thumb_request(date, wavelength, image_scale, size)
     timeout = 90 if size >= 1024 else 60
+    # The grid and editor re-request the same (date, wl, size) thumbs over
+    # and over; keep the encoded upstream bytes hot so a repeat costs neither
+    # a Helioviewer round-trip nor a slot on _HELIOVIEWER_LIMITER. TTL, not
+    # forever: for recent dates Helioviewer's "nearest frame" moves as new
+    # data is ingested. Behind it, the on-disk _HV_DISK survives restarts.
+    hot_key = f"hv:{url}"
+    cached = hot_cache.get(hot_key)
+    if cached is None and disk_key:
+        hit = await run_in_pool("files", _HV_DISK.lookup, *disk_key)
+        if hit is not None:
+            if not hot_cache.put(hot_key, hit[0], hit[1], ttl_s=_HV_THUMB_HOT_TTL_S):
+                return Response(content=hit[0], media_type=hit[1], headers=CORS_HEADERS)
+            cached = hot_cache.get(hot_key)
+    if cached is not None:
+        return entry_response(cached, request.headers, CORS_HEADERS)
+    # Queue for Helioviewer on the loop, not in a parked executor thread.
+    # Grid tiles ride the "thumb" lane so the user's own canvas/preview
+    # fetch (1024+, or the preview pipeline) goes out first.
+    await _HELIOVIEWER_LIMITER.acquire("interactive" if size >= 1024 else "thumb")
     try:
-        loop = asyncio.get_event_loop()
-        content, media_type = await loop.run_in_executor(
-            None, lambda: _fetch_helioviewer_screenshot(url, timeout=timeout)
-        )
-        return Response(content=content, media_type=media_type, headers=CORS_HEADERS)
-    except requests.RequestException as e:
+        resp = await _hv_open(url, timeout, _hv_app_sessions())
+        try:
+            head = await _hv_check(resp)
+        except BaseException:
+            resp.release()
+            raise
+    except (aiohttp.ClientError, asyncio.TimeoutError, _HelioviewerError) as e:
         # NEEDS-FIX (workflow wx5fi2brl, raw-exception-leak):
         # log full trace server-side, but return a sanitised body to
         # the client. The exception type often leaks the upstream URL +
@@ -1228,6 +1911,145 @@ async def helioviewer_thumb(
             status_code=502,
             detail="Helioviewer preview is temporarily unavailable. Please try again in a moment.",
         )
+    media_type = resp.headers.get("Content-Type", "image/png")
+    # No Content-Length: the session decompresses, so the upstream's
+    # (compressed) length can be wrong for the bytes streamed here.
+    headers = dict(CORS_HEADERS)
+
+    async def body():
+        # Stream chunks as they arrive (bounded by _HV_CHUNK + aiohttp's read
+        # buffer); keep a copy only while the body still fits a cache.
+        keep_max = max(hot_cache.max_entry_bytes, _HV_DISK.max_entry_bytes if disk_key else 0)
+        keep = bytearray(head) if len(head) <= keep_max else None
+        try:
+            yield head
+            async for chunk in resp.content.iter_chunked(_HV_CHUNK):
+                if keep is not None:
+                    if len(keep) + len(chunk) <= keep_max:
+                        keep += chunk
+                    else:
+                        keep = None
+                yield chunk
+            if keep is not None:
+                content = bytes(keep)
+                hot_cache.put(hot_key, content, media_type, ttl_s=_HV_THUMB_HOT_TTL_S)
+                if disk_key:
+                    await run_in_pool("files", _HV_DISK.store, *disk_key, content)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            # Headers are out; re-raise so the server drops the connection and
+            # the browser sees a truncated image rather than a "complete" one.
+            print(f"[helioviewer_thumb] stream cut {url[:120]}... -> {e}", flush=True)
+            raise
+        finally:
+            resp.release()
+
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+
+# Batched variant for the wavelength picker. Picking a date used to fire
+# one /api/helioviewer_thumb per tile (9 wavelengths × the 256 tile and the
+# 512 editor canvas = 18 requests): 18 round-trips, 18 hits against the
+# 60/min/IP cap, 18 trips through the edge worker. One GET now returns all
+# of them as multipart/form-data — the browser parses that natively with
+# `await response.formData()`. Each image still goes through the hot cache
+# and waits its own turn on _HELIOVIEWER_LIMITER, so a batch can't jump
+# the upstream rate limit; they're just fetched concurrently.
+_HV_BATCH_MAX_ITEMS = 24
+_HV_BATCH_MAX_SIZE = 1024
+_HV_EXT = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+
+
+def _parse_int_list(raw: str, what: str) -> list:
+    try:
+        vals = [int(v) for v in (raw or "").split(",") if v.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{what} must be a comma-separated list of integers")
+    if not vals:
+        raise HTTPException(status_code=400, detail=f"{what} is required")
+    return list(dict.fromkeys(vals))
+
+
+async def _hv_thumb_bytes(url: str, size: int, disk_key=None):
+    """(content, media_type) for one thumb URL: hot cache, disk cache, else
+    limiter + fetch."""
+    hot_key = f"hv:{url}"
+    cached = hot_cache.get(hot_key)
+    if cached is not None:
+        return cached.body, cached.media_type
+    hit = await run_in_pool("files", _HV_DISK.lookup, *disk_key) if disk_key else None
+    if hit is not None:
+        hot_cache.put(hot_key, hit[0], hit[1], ttl_s=_HV_THUMB_HOT_TTL_S)
+        return hit
+    await _HELIOVIEWER_LIMITER.acquire("interactive" if size >= 1024 else "thumb")
+    content, media_type = await _fetch_helioviewer_async(url, 90 if size >= 1024 else 60)
+    hot_cache.put(hot_key, content, media_type, ttl_s=_HV_THUMB_HOT_TTL_S)
+    if disk_key:
+        await run_in_pool("files", _HV_DISK.store, *disk_key, content)
+    return content, media_type
+
+
+@app.get("/api/helioviewer_thumbs")
+async def helioviewer_thumbs(
+    request: Request,
+    date: str = Query(..., description="ISO date-time e.g. 2026-02-10T12:00:00Z"),
+    wavelengths: str = Query(..., description="Comma-separated AIA wavelengths e.g. 94,131,171"),
+    sizes: str = Query("256", description="Comma-separated edge lengths in pixels e.g. 256,512"),
+    image_scale: float = Query(12, description="Helioviewer imageScale (arcsec/pixel)"),
+):
+    """Every (wavelength, size) thumb for one date in a single multipart/form-data
+    response. Parts are named "<wavelength>_<size>"; a final "index" part (JSON)
+    maps each name to {"ok", "content_type"} so the client knows which tiles
+    failed and should fall back to /api/helioviewer_thumb."""
+    enforce_origin(request, allow_missing=True)
+    _validate_thumb_date(date)
+    wls = _parse_int_list(wavelengths, "wavelengths")
+    szs = _parse_int_list(sizes, "sizes")
+    if any(not (16 <= sz <= _HV_BATCH_MAX_SIZE) for sz in szs):
+        raise HTTPException(status_code=400, detail=f"sizes must be between 16 and {_HV_BATCH_MAX_SIZE}")
+    items = [(wl, sz) for wl in wls for sz in szs]
+    if len(items) > _HV_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {_HV_BATCH_MAX_ITEMS} thumbnails per batch")
+    # Charged per tile against /api/helioviewer_thumb's own 60/min bucket,
+    # so batching can't launder more upstream traffic than single requests.
+    enforce_rate_limit(request, "helioviewer_thumb", 60, 60.0, cost=len(items))
+
+    async def one(wl, sz):
+        url, disk_key = _hv_thumb_request(date, wl, image_scale, sz)
+        try:
+            return await _hv_thumb_bytes(url, sz, disk_key)
+        except (aiohttp.ClientError, asyncio.TimeoutError, _HelioviewerError) as e:
+            print(f"[helioviewer_thumbs] {url[:120]}... -> {e}", flush=True)
+            return None
+
+    results = await asyncio.gather(*(one(wl, sz) for wl, sz in items))
+    boundary = _uuid_mod.uuid4().hex
+    parts, index = [], {}
+    for (wl, sz), res in zip(items, results):
+        name = f"{wl}_{sz}"
+        if res is None:
+            index[name] = {"ok": False}
+            continue
+        content, media_type = res
+        index[name] = {"ok": True, "content_type": media_type}
+        ext = _HV_EXT.get(media_type.split(";")[0].strip().lower(), "bin")
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{name}.{ext}"\r\n'
+            f"Content-Type: {media_type}\r\n\r\n".encode() + content + b"\r\n"
+        )
+    if not parts:
+        raise HTTPException(
+            status_code=502,
+            detail="Helioviewer preview is temporarily unavailable. Please try again in a moment.",
+        )
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="index"\r\n'
+        f"Content-Type: application/json\r\n\r\n{json.dumps(index)}\r\n--{boundary}--\r\n".encode()
+    )
+    headers = dict(CORS_HEADERS)
+    # The edge worker only caches a batch when every tile made it.
+    headers["X-Thumbs-Missing"] = str(sum(1 for v in index.values() if not v["ok"]))
+    return Response(content=b"".join(parts), media_type=f"multipart/form-data; boundary={boundary}",
+                    headers=headers)
 
 
 # ──────────────────────────────────────────────────────────────────────────────
@@ -1428,14 +2250,106 @@ def _is_full_res_lev1(path) -> bool:
         return False
 
 
+def _fits_date_obs(path):
+    """DATE-OBS (falling back to T_OBS) of a FITS file as a naive UTC
+    datetime, read from the headers only; None if absent or unreadable."""
+    try:
+        from astropy.io import fits as _fits
+        from astropy.time import Time as _Time
+        with _fits.open(path) as hdul:
+            for hdu in hdul:
+                stamp = hdu.header.get("DATE-OBS") or hdu.header.get("T_OBS")
+                if stamp:
+                    return _Time(str(stamp).rstrip("Z").replace("_TAI", "")).to_datetime()
+    except Exception as e:
+        log_to_queue(f"[generate_preview] DATE-OBS unreadable in {os.path.basename(str(path))}: {e}")
+    return None
+
+
+def _write_preview_jpg(content: bytes, out_path: str, size: int) -> None:
+    """Decode a Helioviewer screenshot, resize to size² and write it as the
+    preview's JPG tier."""
+    import io as _io
+    import matplotlib.pyplot as _plt_jpg
+    from skimage.transform import resize as _sk_resize
+    arr = _plt_jpg.imread(_io.BytesIO(content))
+    if arr.shape[:2] != (size, size):
+        preserve = arr.dtype == np.uint8 or np.issubdtype(arr.dtype, np.integer)
+        arr = _sk_resize(
+            arr, (size, size) + (arr.shape[2:] if arr.ndim == 3 else ()),
+            preserve_range=preserve, anti_aliasing=True
+        )
+        if preserve:
+            arr = np.clip(arr, 0, 255).astype(np.uint8)
+    _atomic_image_write(out_path, lambda _p: _plt_jpg.imsave(_p, arr))
+
+
+_PREVIEW_LUTS: dict = {}    # wavelength → (256, 4) uint8 RGBA colormap LUT
+
+
+def _preview_stack(wl):
+    """Import what the preview render needs and build its colormap LUT.
+
+    Runs on the "stages" pool while the FITS is still being located, so the
+    seconds sunpy.map and its colormap registry cost to import on a cold
+    worker overlap the network instead of following it. Returns
+    (Map, block_reduce, AIAMap, MetaDict, lut); an ImportError surfaces from
+    the future at the map-load stage, where it always used to.
+    """
+    from sunpy.visualization import colormaps as _cm  # noqa: F401  registers sdoaia*
+    import matplotlib as _mpl
+    lut = _PREVIEW_LUTS.get(wl)
+    if lut is None:
+        lut = (_mpl.colormaps[f"sdoaia{wl}"](np.linspace(0.0, 1.0, 256)) * 255).astype(np.uint8)
+        _PREVIEW_LUTS[wl] = lut
+    from skimage.measure import block_reduce
+    from sunpy.map import Map as _Map
+    from sunpy.map.sources.sdo import AIAMap
+    from sunpy.util.metadata import MetaDict
+    return _Map, block_reduce, AIAMap, MetaDict, lut
+
+
+def _write_preview_png(arr, lut, out_path: str, size: int) -> None:
+    """Colormap a preview array (1–99.7 percentile stretch) through `lut` and
+    write it as a size² PNG.
+
+    Replaces the pyplot imshow/savefig render. pyplot's "current figure" is
+    process-global, so two threads drawing at once can paint into each
+    other's figure, and the raw and RHEF PNGs had to be drawn one after the
+    other. This is the LUT path _write_rhef_webp_artifacts already uses and
+    touches no shared state, so it runs on any thread.
+    NaN (off-disk, non-positive) pixels stay transparent as they were under
+    imshow, and rows flip to match origin="lower".
+    """
+    from PIL import Image
+    finite = np.isfinite(arr)
+    if finite.any():
+        vmin = float(np.nanpercentile(arr, 1))
+        span = float(np.nanpercentile(arr, 99.7)) - vmin
+    else:
+        vmin, span = 0.0, 1.0
+    span = span if span > 0 else 1e-8
+    idx = np.clip((np.where(finite, arr, vmin) - vmin) / span, 0.0, 1.0)
+    rgba = lut[(idx * 255.0).astype(np.uint8)]
+    rgba[~finite] = 0
+    img = Image.fromarray(np.ascontiguousarray(rgba[::-1]))
+    if img.size != (size, size):
+        img = img.resize((size, size), Image.LANCZOS)
+    _atomic_image_write(out_path, lambda _p: img.save(_p, format="PNG"))
+
+
 def _generate_preview_sync(dt, wl, date_str, out_path_raw, out_path_filtered, out_path_jpg, url_path_raw, url_path_filtered, url_path_jpg):
     """Blocking FITS fetch + raw and RHEF-filtered PNGs. Also fetches Helioviewer instant preview as JPG.
-    Writes preview_SDO_{wl}_{date_str}_raw.png, _filtered.png, and _jpg.png (Helioviewer) for the UI."""
+    Writes preview_SDO_{wl}_{date_str}_raw.png, _filtered.png, and _jpg.png (Helioviewer) for the UI.
+
+    The stages that don't depend on each other overlap on the "stages" pool:
+    the science-stack imports + colormap LUT run while the FITS is located,
+    the screenshot fetch runs beside the Map load and RHEF, and the raw PNG
+    encodes while RHEF computes. Latency used to be their sum. Every file is
+    published by an atomic rename the moment it's written, so the caller
+    never has to poll for it."""
     import ssl as _ssl
     import certifi
-    from sunpy.net import Fido, attrs as a
-    from sunpy.net.vso import VSOClient
-    import astropy.units as u
     from datetime import timedelta
 
     # Reassert SSL/NASA cert config inside thread (same as do_generate_sync + fido_fetch_map)
@@ -1454,47 +2368,46 @@ def _generate_preview_sync(dt, wl, date_str, out_path_raw, out_path_filtered, ou
     os.makedirs(download_dir, exist_ok=True)
     log_to_queue(f"[generate_preview] download_dir={download_dir}")
 
-    # Fetch Helioviewer instant preview first (JPG option = helioviewer-derived).
-    # Resize to PREVIEW_SIZE so JPG matches raw/filtered; matches PREVIEW_TARGET
-    # used for RHEF. 512 (was 384): the confirm-bridge cards render ~600px wide,
-    # and 384 read as visibly soft/grainy there (Gilly, live 2026-08-15).
+    # JPG tier = the Helioviewer screenshot, resized to PREVIEW_SIZE so it
+    # matches raw/filtered; matches PREVIEW_TARGET used for RHEF. 512 (was
+    # 384): the confirm-bridge cards render ~600px wide, and 384 read as
+    # visibly soft/grainy there (Gilly, live 2026-08-15).
+    #
+    # Fetched ONCE, at the FITS frame's DATE-OBS. It used to be pulled at the
+    # requested time up front and then pulled again after the FITS load to
+    # co-register with RAW/RHEF (Helioviewer snaps to its own nearest frame,
+    # which can drift hours from what VSO returned) — two, and with the
+    # no-FITS fallback three, takeScreenshot calls per preview: the biggest
+    # consumer of the 360/min budget and seconds of serial latency. Now the
+    # early pull only happens when the FITS needs the slow VSO/JSOC path
+    # (so the user has something to look at meanwhile), and it is kept if it
+    # already shows the DATE-OBS frame (same cadence slot, _hv_snap_time).
     PREVIEW_SIZE = 512
+    HV_SCALE = 3000.0 / 1024.0   # 1024² at ~1.5 R☉ FOV; same key as a size=1024 thumb
     os.makedirs(os.path.dirname(out_path_jpg), exist_ok=True)
-    try:
-        # Use the user's exact time (passed in via `dt`) so the JPG and
-        # the FITS query below ask Helioviewer / VSO for the same instant.
-        # Previously this was forced to noon, which created the JPG-vs-
-        # RHEF time drift the user reported.
-        hv_dt = dt.replace(second=0, microsecond=0)
-        hv_date_str = hv_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-        scale = 3000.0 / 1024.0
-        url = (
-            f"{HELIOVIEWER_BASE}/?"
-            f"date={requests.utils.quote(hv_date_str)}"
-            f"&imageScale={scale}"
-            f"&layers=[SDO,AIA,AIA,{wl},1,100]"
-            f"&x0=0&y0=0&width=1024&height=1024&display=true&watermark=false"
-        )
-        content, _ = _fetch_helioviewer_screenshot(url)
-        # Resize to PREVIEW_SIZE so JPG matches raw/filtered and overlays in the UI
-        import io as _io
-        import matplotlib.pyplot as _plt_jpg
-        from skimage.transform import resize as _sk_resize
-        arr = _plt_jpg.imread(_io.BytesIO(content))
-        h, w = arr.shape[0], arr.shape[1]
-        if (h, w) != (PREVIEW_SIZE, PREVIEW_SIZE):
-            preserve = arr.dtype == np.uint8 or np.issubdtype(arr.dtype, np.integer)
-            arr = _sk_resize(
-                arr, (PREVIEW_SIZE, PREVIEW_SIZE) + (arr.shape[2:] if arr.ndim == 3 else ()),
-                preserve_range=preserve, anti_aliasing=True
-            )
-            if preserve:
-                arr = np.clip(arr, 0, 255).astype(np.uint8)
-        _atomic_image_write(out_path_jpg, lambda _p: _plt_jpg.imsave(_p, arr))
-        log_to_queue(f"[generate_preview] Helioviewer JPG saved (resized to {PREVIEW_SIZE}px): {os.path.basename(out_path_jpg)}")
-    except Exception as e:
-        log_to_queue(f"[generate_preview] Helioviewer JPG failed (continuing): {e}")
+    jpg = {"at": None, "content": None}   # cadence slot + bytes of the JPG on disk
 
+    def _jpg_at(when, why):
+        slot = _hv_snap_time(when, wl)
+        if jpg["at"] == slot:
+            log_to_queue(f"[generate_preview] JPG already at {slot:%H:%M:%S} — reused ({why})")
+            return jpg["content"]
+        try:
+            content, _ = _hv_screenshot_sync(wl, when, HV_SCALE, 1024)
+            _write_preview_jpg(content, out_path_jpg, PREVIEW_SIZE)
+        except Exception as e:
+            log_to_queue(f"[generate_preview] Helioviewer JPG failed (continuing): {e}")
+            return None
+        jpg["at"], jpg["content"] = slot, content
+        log_to_queue(f"[generate_preview] Helioviewer JPG saved at {slot:%Y-%m-%dT%H:%M:%SZ} ({why}): "
+                     f"{os.path.basename(out_path_jpg)}")
+        return content
+
+    stages = _executors.pool("stages")
+    stack_job = stages.submit(_preview_stack, wl)
+    jpg_job = None
+
+    _job_checkpoint("fits fetch")
     # Check if we already have a FITS for this date/wavelength cached locally
     import glob as _glob
     date_glob = dt.strftime('%Y_%m_%d')
@@ -1517,7 +2430,16 @@ def _generate_preview_sync(dt, wl, date_str, out_path_raw, out_path_filtered, ou
             log_to_queue(f"[generate_preview] synoptic direct hit: "
                          f"{os.path.basename(fits_path)} (no export queue)")
     if not fits_path:
+        # Slow path ahead (VSO/JSOC can take minutes): show the requested
+        # instant as soon as it lands, without holding up the VSO search;
+        # re-pulled below only if DATE-OBS lands elsewhere.
+        jpg_job = stages.submit(_jpg_at, dt.replace(second=0, microsecond=0),
+                                "requested time, FITS still pending")
         try:
+            # sunpy.net costs seconds to import; only the VSO path needs it.
+            from sunpy.net import Fido, attrs as a
+            from sunpy.net.vso import VSOClient
+            import astropy.units as u
             client = VSOClient()
             # NASA DRMS can be slow; use timeouts that allow slow-but-valid FITS (~10–50MB) to complete.
             # sock_read=60 allows slow streaming; total=180 so one slow file can finish. Broken records
@@ -1603,38 +2525,14 @@ def _generate_preview_sync(dt, wl, date_str, out_path_raw, out_path_filtered, ou
             # Fallback: NASA DRMS often times out; use Helioviewer PNG so user still gets a preview.
             log_to_queue("[generate_preview] VSO/DRMS failed; trying Helioviewer fallback...")
             try:
-                # Same instant the JPG+FITS used above (now user-picked,
-                # not hard-coded to noon).
-                hv_dt = dt.replace(second=0, microsecond=0)
-                hv_date_str = hv_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-                scale = 3000.0 / 1024.0
-                url = (
-                    f"{HELIOVIEWER_BASE}/?"
-                    f"date={requests.utils.quote(hv_date_str)}"
-                    f"&imageScale={scale}"
-                    f"&layers=[SDO,AIA,AIA,{wl},1,100]"
-                    f"&x0=0&y0=0&width=1024&height=1024&display=true&watermark=false"
-                )
-                content, _ = _fetch_helioviewer_screenshot(url)
+                # Same instant the JPG above used — reuse its bytes, no refetch.
+                jpg_job.result()
+                content = _jpg_at(dt.replace(second=0, microsecond=0), "no-FITS fallback")
+                if content is None:
+                    raise RuntimeError("Helioviewer screenshot unavailable")
                 os.makedirs(os.path.dirname(out_path_filtered), exist_ok=True)
                 with open(out_path_filtered, "wb") as f:
                     f.write(content)
-                if not os.path.exists(out_path_jpg) or os.path.getsize(out_path_jpg) < 100:
-                    import io as _io
-                    import matplotlib.pyplot as _plt_jpg2
-                    from skimage.transform import resize as _sk_resize
-                    arr = _plt_jpg2.imread(_io.BytesIO(content))
-                    h, w = arr.shape[0], arr.shape[1]
-                    sz = PREVIEW_SIZE
-                    if (h, w) != (sz, sz):
-                        preserve = arr.dtype == np.uint8 or np.issubdtype(arr.dtype, np.integer)
-                        arr = _sk_resize(
-                            arr, (sz, sz) + (arr.shape[2:] if arr.ndim == 3 else ()),
-                            preserve_range=preserve, anti_aliasing=True
-                        )
-                        if preserve:
-                            arr = np.clip(arr, 0, 255).astype(np.uint8)
-                    _atomic_image_write(out_path_jpg, lambda _p: _plt_jpg2.imsave(_p, arr))
                 log_to_queue(f"[generate_preview] Helioviewer fallback saved: {os.path.basename(out_path_filtered)}")
                 return (url_path_filtered, url_path_filtered, url_path_jpg)
             except Exception as e:
@@ -1642,85 +2540,52 @@ def _generate_preview_sync(dt, wl, date_str, out_path_raw, out_path_filtered, ou
                 if os.environ.get("SOLAR_ARCHIVE_DEBUG"):
                     breakpoint()  # inspect e, out_path before raising 502
                 raise HTTPException(status_code=502, detail="VSO AIA fetch returned no files after all retries")
-    from sunpy.map import Map
-    import matplotlib.pyplot as plt
-    from skimage.measure import block_reduce
-    smap = Map(fits_path)
-
-    # Stash this frame at the shared path so a later HQ render reuses it
-    # instead of re-downloading the same FITS from VSO. Copy (not move) so
-    # the preview's own fits_path stays valid, and overwrite any prior copy
-    # so the shared frame always reflects the most recent preview for this
-    # date+wl. Best-effort: a copy failure just means HQ falls back to VSO.
-    try:
-        # Only a genuine full-res lev1 frame earns the shared slot. A 1024²
-        # synoptic frame is perfect for this preview and wrong for a print,
-        # and the HQ path trusts this file (see _is_full_res_lev1).
-        if not _is_full_res_lev1(fits_path):
-            log_to_queue(f"[generate_preview] Not caching {os.path.basename(fits_path)} for HQ reuse "
-                         f"— not full-res lev1 (synoptic/preview-grade frame).")
-        else:
-            _shared_dst = _shared_lev1_fits_path("SDO", wl, dt)
-            if os.path.abspath(fits_path) != os.path.abspath(_shared_dst):
-                import shutil as _shutil
-                _shutil.copy2(fits_path, _shared_dst)
-                log_to_queue(f"[generate_preview] Cached frame for HQ reuse: {os.path.basename(_shared_dst)}")
-    except Exception as _share_err:
-        log_to_queue(f"[generate_preview] Could not cache frame for HQ reuse: {_share_err}")
-
-    # ── JPG ↔ FITS co-registration ──────────────────────────────
-    # Helioviewer's takeScreenshot snaps to the nearest available
-    # frame at its own discretion, which can drift hours from the
-    # FITS frame VSO actually returned (beta tester reported the JPG
-    # vs RAW/RHEF panes were not on the same observation). Re-issue
-    # the Helioviewer fetch using the FITS file's DATE-OBS so the JPG
-    # pane is forced to the same instant. If the re-fetch fails we
-    # keep the earlier JPG rather than blowing up the preview path.
-    try:
-        fits_obs_dt = getattr(smap, "date", None)
-        fits_obs_dt = fits_obs_dt.to_datetime() if fits_obs_dt is not None else None
-        if fits_obs_dt is not None:
-            hv_obs_str = fits_obs_dt.strftime("%Y-%m-%dT%H:%M:%SZ")
-            hv_scale = 3000.0 / 1024.0
-            hv_url = (
-                f"{HELIOVIEWER_BASE}/?"
-                f"date={requests.utils.quote(hv_obs_str)}"
-                f"&imageScale={hv_scale}"
-                f"&layers=[SDO,AIA,AIA,{wl},1,100]"
-                f"&x0=0&y0=0&width=1024&height=1024&display=true&watermark=false"
-            )
-            hv_content, _hv_meta = _fetch_helioviewer_screenshot(hv_url)
-            import io as _io2
-            import matplotlib.pyplot as _plt_jpg3
-            from skimage.transform import resize as _sk_resize2
-            _arr = _plt_jpg3.imread(_io2.BytesIO(hv_content))
-            _h, _w = _arr.shape[0], _arr.shape[1]
-            if (_h, _w) != (PREVIEW_SIZE, PREVIEW_SIZE):
-                _preserve = _arr.dtype == np.uint8 or np.issubdtype(_arr.dtype, np.integer)
-                _arr = _sk_resize2(
-                    _arr, (PREVIEW_SIZE, PREVIEW_SIZE) + (_arr.shape[2:] if _arr.ndim == 3 else ()),
-                    preserve_range=_preserve, anti_aliasing=True,
-                )
-                if _preserve:
-                    _arr = np.clip(_arr, 0, 255).astype(np.uint8)
-            _atomic_image_write(out_path_jpg, lambda _p: _plt_jpg3.imsave(_p, _arr))
-            log_to_queue(
-                f"[generate_preview] JPG re-fetched at FITS DATE-OBS={hv_obs_str} "
-                f"(co-registered with RAW/RHEF)"
-            )
-    except Exception as _coreg_err:
-        log_to_queue(f"[generate_preview] JPG co-registration skipped: {_coreg_err}")
-
-    # Heavy block — guard with try/finally so figures + arrays release
-    # even if RHEF / matplotlib raises mid-render. Without this, an
-    # exception between plt.figure and plt.close leaked the figure into
-    # matplotlib's registry and the ndarrays into Python's ref graph
-    # until the next gc cycle.
+    # ── JPG at the FITS frame's DATE-OBS (co-registered with RAW/RHEF) ──
+    # From the header alone, so the screenshot fetch runs alongside the Map
+    # load and RHEF instead of ahead of them. The early pull (if any) must
+    # land first: _jpg_at decides from it whether a refetch is needed, and a
+    # stages task must not wait on another one.
+    fits_obs_dt = _fits_date_obs(fits_path)
+    if jpg_job is not None:
+        jpg_job.result()
+    jpg_job = stages.submit(_jpg_at, fits_obs_dt or dt.replace(second=0, microsecond=0),
+                            "FITS DATE-OBS" if fits_obs_dt else "requested time, no DATE-OBS")
+
+    # Heavy block — guard with try/finally so arrays release even if the
+    # Map load or RHEF raises, and so no stage is still writing when we
+    # return or raise.
     data = None
     reduced = None
     rhef_data = None
     smap_reduced = None
+    raw_job = None
     try:
+        _job_checkpoint("map load")
+        Map, block_reduce, AIAMap, MetaDict, lut = stack_job.result()
+        smap = Map(fits_path)
+
+        # Stash this frame at the shared path so a later HQ render reuses it
+        # instead of re-downloading the same FITS from VSO. Copy (not move) so
+        # the preview's own fits_path stays valid, and overwrite any prior copy
+        # so the shared frame always reflects the most recent preview for this
+        # date+wl. Best-effort: a copy failure just means HQ falls back to VSO.
+        try:
+            # Only a genuine full-res lev1 frame earns the shared slot. A 1024²
+            # synoptic frame is perfect for this preview and wrong for a print,
+            # and the HQ path trusts this file (see _is_full_res_lev1).
+            if not _is_full_res_lev1(fits_path):
+                log_to_queue(f"[generate_preview] Not caching {os.path.basename(fits_path)} for HQ reuse "
+                             f"— not full-res lev1 (synoptic/preview-grade frame).")
+            else:
+                _shared_dst = _shared_lev1_fits_path("SDO", wl, dt)
+                if os.path.abspath(fits_path) != os.path.abspath(_shared_dst):
+                    import shutil as _shutil
+                    _shutil.copy2(fits_path, _shared_dst)
+                    log_to_queue(f"[generate_preview] Cached frame for HQ reuse: {os.path.basename(_shared_dst)}")
+        except Exception as _share_err:
+            log_to_queue(f"[generate_preview] Could not cache frame for HQ reuse: {_share_err}")
+
+        _job_checkpoint("rhef")
         data = np.array(smap.data, dtype=np.float32)
         data[data <= 0] = np.nan
         h, w = data.shape
@@ -1732,8 +2597,10 @@ def _generate_preview_sync(dt, wl, date_str, out_path_raw, out_path_filtered, ou
         PREVIEW_TARGET = 512
         block_size = max(1, int(np.ceil(h / PREVIEW_TARGET)))
         reduced = block_reduce(data, block_size=(block_size, block_size), func=np.nanmean)
-        from sunpy.map.sources.sdo import AIAMap
-        from sunpy.util.metadata import MetaDict
+        os.makedirs(os.path.dirname(out_path_raw), exist_ok=True)
+        # Raw preview (no RHEF) — same stretch so toggling is comparable.
+        # Encodes on its own thread while RHEF computes below.
+        raw_job = stages.submit(_write_preview_png, reduced, lut, out_path_raw, PREVIEW_SIZE)
         meta = MetaDict(smap.meta.copy())
         if "cdelt1" in meta and "cdelt2" in meta:
             meta["cdelt1"] = meta["cdelt1"] * block_size
@@ -1743,41 +2610,25 @@ def _generate_preview_sync(dt, wl, date_str, out_path_raw, out_path_filtered, ou
         meta["naxis1"] = reduced.shape[1]
         meta["naxis2"] = reduced.shape[0]
         smap_reduced = AIAMap(reduced, meta)
-        cmap = plt.get_cmap(f"sdoaia{wl}")
-        os.makedirs(os.path.dirname(out_path_raw), exist_ok=True)
-        fig_dpi = 100
-        fig_inches = PREVIEW_SIZE / fig_dpi
-        # Raw preview (no RHEF) — same stretch so toggling is comparable
-        vmin_raw = np.nanpercentile(reduced, 1)
-        vmax_raw = np.nanpercentile(reduced, 99.7)
-        plt.figure(figsize=(fig_inches, fig_inches), dpi=fig_dpi)
-        plt.axis("off")
-        plt.imshow(reduced, cmap=cmap, vmin=vmin_raw, vmax=vmax_raw, origin="lower")
-        plt.tight_layout(pad=0)
-        _atomic_image_write(out_path_raw, lambda _p: plt.savefig(_p, bbox_inches="tight", pad_inches=0))
-        plt.close('all')
         # Filtered preview (RHEF)
-        from sunkit_image import radial
         try:
-            rhef_data = radial.rhef(smap_reduced, progress=True).data
+            rhef_data = _rhef_cached(smap_reduced, progress=True)
         except Exception:
             log_to_queue("[rhef][warn] Preview RHEF failed on Map — using array fallback.")
-            rhef_data = radial.rhef(smap_reduced.data, progress=True).data
-        vmin = np.nanpercentile(rhef_data, 1)
-        vmax = np.nanpercentile(rhef_data, 99.7)
-        plt.figure(figsize=(fig_inches, fig_inches), dpi=fig_dpi)
-        plt.axis("off")
-        plt.imshow(rhef_data, cmap=cmap, vmin=vmin, vmax=vmax, origin="lower")
-        plt.tight_layout(pad=0)
-        _atomic_image_write(out_path_filtered, lambda _p: plt.savefig(_p, bbox_inches="tight", pad_inches=0))
-        plt.close('all')
-        import time
-        for _ in range(50):
-            if os.path.exists(out_path_filtered) and os.path.getsize(out_path_filtered) > 1000:
-                break
-            time.sleep(0.05)
+            rhef_data = _rhef_cached(smap_reduced.data, progress=True)
+        # The filtered PNG is what generate_preview treats as "done", so the
+        # raw one must already be published when it appears.
+        raw_job.result()
+        _write_preview_png(rhef_data, lut, out_path_filtered, PREVIEW_SIZE)
+        jpg_job.result()
         return (url_path_raw, url_path_filtered, url_path_jpg)
     finally:
+        for job in (raw_job, jpg_job):
+            if job is not None:
+                try:
+                    job.result()
+                except Exception:
+                    pass
         # Drop explicit refs so gc.collect inside _finalize_render can
         # reclaim the buffers immediately. del is best-effort — names
         # may be None if the try threw before they were bound.
@@ -1808,7 +2659,8 @@ def _disk_used_pct(path: str = None) -> float:
         return 0.0
 
 def _prune_temp_cache() -> int:
-    """Delete oldest temp_combined_*.npz until usage is back under target.
+    """Delete oldest temp_combined_*.npz / rhef_cache / hv_cache / composed
+    print_uploads and private_prints entries until usage is back under target.
 
     These are derived caches — dropping one costs a re-render, never data.
     ponytail: mtime order, no index. The set is tens of files, not millions.
@@ -1818,22 +2670,31 @@ def _prune_temp_cache() -> int:
         return 0
     try:
         files = sorted(
-            glob.glob(os.path.join(OUTPUT_DIR, "temp_combined_*.npz")),
+            glob.glob(os.path.join(OUTPUT_DIR, "temp_combined_*.npz"))
+            + glob.glob(os.path.join(OUTPUT_DIR, "rhef_cache", "*.npy"))
+            + glob.glob(os.path.join(OUTPUT_DIR, "hv_cache", "*", "*", "*"))
+            + glob.glob(os.path.join(OUTPUT_DIR, "print_uploads", "*.png"))
+            + glob.glob(os.path.join(str(PRIVATE_PRINT_DIR), "*.png")),
             key=lambda p: os.path.getmtime(p),
         )
     except Exception:
         return 0
     removed = 0
+    hv_root = os.path.join(OUTPUT_DIR, "hv_cache") + os.sep
     for f in files:
         if _disk_used_pct() < _TEMP_CACHE_TARGET_PCT:
             break
+        if f.startswith(hv_root):
+            # Through the cache, so its byte accounting drops with the file.
+            removed += _HV_DISK.discard(f)
+            continue
         try:
             os.remove(f)
             removed += 1
         except OSError:
             pass
     if removed:
-        print(f"[disk] pruned {removed} temp_combined caches; now at "
+        print(f"[disk] pruned {removed} derived caches; now at "
               f"{_disk_used_pct():.0f}% of {OUTPUT_DIR}", flush=True)
     return removed
 
@@ -1876,9 +2737,119 @@ def _is_infrastructure_error(exc: Exception) -> bool:
         r"temporarily unavailable|bad gateway",
         str(exc), re.I,
     ))
+# ── Durable job registry ─────────────────────────────────────────────
+# HQ task state and in-flight preview keys are mirrored into SQLite (WAL) on
+# the persistent disk (api/job_store.py) so a restart — auto-stop, redeploy,
+# OOM — no longer orphans them: a client polling /api/status/{task_id} keeps
+# getting its job, and interrupted renders are re-launched under the same id
+# by _resume_orphaned_jobs(). _BOOT_ID tells this process's rows from a dead
+# predecessor's. Falls back to memory-only if the disk isn't writable.
+import uuid as _uuid_mod
+from api.job_store import JobStore
+
+_BOOT_ID = _uuid_mod.uuid4().hex
+# Opened on first use and written by its own thread (JobStore), so neither
+# this import nor a status change on the event loop waits on SQLite.
+_JOB_STORE = JobStore(os.getenv("JOB_DB_PATH") or str(_persistent_data_dir() / "jobs.sqlite3"))
+
+
+class _DurableKeySet:
+    """The set interface generate_preview already used, plus a write-through
+    of each (date_str, wl) key to the job store. Membership is THIS boot's
+    keys only — a key left behind by a dead process is an orphan to resume,
+    not a render in progress (treating it as one would 202 forever)."""
+    def __init__(self, kind: str):
+        self.kind = kind
+        self._keys: set = set()
+
+    @staticmethod
+    def _enc(key) -> str:
+        return f"{key[0]}|{key[1]}"
+
+    def add(self, key) -> None:
+        self._keys.add(key)
+        _JOB_STORE.add_key(self.kind, self._enc(key), _BOOT_ID)
+
+    def discard(self, key) -> None:
+        self._keys.discard(key)
+        _JOB_STORE.discard_key(self.kind, self._enc(key))
+
+    def clear(self) -> None:
+        self._keys.clear()
+        _JOB_STORE.clear_keys(self.kind)
+
+    def __contains__(self, key) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+
 # Keys currently being generated — prevents spawning duplicate background tasks when the
 # client polls and gets 202 multiple times before the task finishes.
-_preview_in_progress: set = set()
+_preview_in_progress = _DurableKeySet("preview")
+
+
+def _preview_paths(date_str: str, wl: int) -> tuple:
+    """(raw, filtered, jpg) output paths then the same three /asset URLs for
+    one preview key. Shared by generate_preview and the idle warmer so both
+    agree on what "already rendered" means."""
+    base = f"preview_SDO_{wl}_{date_str}"
+    return (
+        os.path.join(PREVIEW_DIR, f"{base}_raw.png"),
+        os.path.join(PREVIEW_DIR, f"{base}_filtered.png"),
+        os.path.join(PREVIEW_DIR, f"{base}_jpg.png"),
+        f"/asset/preview/{base}_raw.png",
+        f"/asset/preview/{base}_filtered.png",
+        f"/asset/preview/{base}_jpg.png",
+    )
+
+
+def _preview_job_id(key) -> str:
+    return f"preview:{key[0]}:{key[1]}"
+
+
+def _spawn_preview_job(dt: datetime, wl: int, date_str: str) -> None:
+    """Mark (date_str, wl) in progress and render it in the background.
+    Must be called from the event loop."""
+    key = (date_str, wl)
+    _preview_in_progress.add(key)
+    _touch_job(_preview_job_id(key))
+
+    async def run():
+        # Funnel every heavy preview render through the same global
+        # heavy-render slots so concurrent requests queue rather than fan
+        # out and OOM the box. Previews are the top scheduling class, so
+        # they jump any queued HQ/warm work. The slot context-manager also
+        # keeps the queue-depth counter accurate while we're waiting.
+        try:
+            await run_in_pool("files", _disk_check, "generate_preview")
+            async with _HeavyRenderSlot("preview", job_id=_preview_job_id(key)):
+                await run_in_pool("heavy", _generate_preview_sync, dt, wl, date_str, *_preview_paths(date_str, wl))
+        except _JobAbandoned as e:
+            # Not a failure: a returning client's next poll just re-spawns it.
+            print(f"[generate_preview] dropped: {e}", flush=True)
+        except Exception as e:
+            # Only remember failures we believe are about the DATA. An
+            # infrastructure failure (full disk, OOM, upstream blip) gets
+            # a clean retry next time instead of a permanent — and false —
+            # "no data for this date".
+            if _is_infrastructure_error(e):
+                print(f"[generate_preview] INFRA failure (not blacklisted): {e}", flush=True)
+                _prune_temp_cache()
+            else:
+                _preview_failed[key] = (
+                    time.time() + _PREVIEW_FAIL_TTL_S,
+                    "No VSO AIA data for this date/wavelength",
+                )
+                print(f"[generate_preview] background failed: {e}", flush=True)
+        finally:
+            _preview_in_progress.discard(key)
+            _forget_job(_preview_job_id(key))
+    asyncio.create_task(run())
 
 
 @app.post("/api/clear_preview_failed")
@@ -1909,6 +2880,7 @@ async def generate_preview(request: Request, req: PreviewRequest = Body(...)):
     # a generous per-IP budget (users legitimately preview many dates).
     enforce_origin(request)
     enforce_rate_limit(request, "generate_preview", 90, 60.0)
+    _ensure_orphans_resumed()
     # Server-side date validation — same rules as /api/helioviewer_thumb.
     # The form's HTML5 min/max attributes don't cover direct API hits, and
     # the heavy FITS pipeline is way too expensive to kick off only to
@@ -1935,13 +2907,9 @@ async def generate_preview(request: Request, req: PreviewRequest = Body(...)):
         # independently — e.g. "20260421_1200" vs "20260421_1830".
         date_str = dt.strftime("%Y%m%d_%H%M")
         key = (date_str, wl)
-        base = f"preview_SDO_{wl}_{date_str}"
-        out_path_raw = os.path.join(PREVIEW_DIR, f"{base}_raw.png")
-        out_path_filtered = os.path.join(PREVIEW_DIR, f"{base}_filtered.png")
-        out_path_jpg = os.path.join(PREVIEW_DIR, f"{base}_jpg.png")
-        url_path_raw = f"/asset/preview/{base}_raw.png"
-        url_path_filtered = f"/asset/preview/{base}_filtered.png"
-        url_path_jpg = f"/asset/preview/{base}_jpg.png"
+        _note_user_render("preview", date_str, wl)
+        (out_path_raw, out_path_filtered, out_path_jpg,
+         url_path_raw, url_path_filtered, url_path_jpg) = _preview_paths(date_str, wl)
         if os.path.exists(out_path_filtered):
             raw_url = url_path_raw if os.path.exists(out_path_raw) else None
             jpg_url = url_path_jpg if os.path.exists(out_path_jpg) else None
@@ -1955,6 +2923,7 @@ async def generate_preview(request: Request, req: PreviewRequest = Body(...)):
             )
         # If already generating, return partial results so UI can show JPG while RHEF runs
         if key in _preview_in_progress:
+            _touch_job(_preview_job_id(key))
             if os.path.exists(out_path_filtered):
                 raw_url = url_path_raw if os.path.exists(out_path_raw) else None
                 jpg_url = url_path_jpg if os.path.exists(out_path_jpg) else None
@@ -1968,6 +2937,7 @@ async def generate_preview(request: Request, req: PreviewRequest = Body(...)):
                         "preview_jpg_url": url_path_jpg,
                         "status": "rhef_generating",
                         "queue_depth": _heavy_queue_depth(),
+                        **(_heavy_queue_position(_preview_job_id(key)) or {}),
                     },
                     headers=CORS_HEADERS,
                 )
@@ -1977,41 +2947,12 @@ async def generate_preview(request: Request, req: PreviewRequest = Body(...)):
                     "status": "in_progress",
                     "preview_url": None,
                     "queue_depth": _heavy_queue_depth(),
+                    **(_heavy_queue_position(_preview_job_id(key)) or {}),
                 },
                 headers=CORS_HEADERS,
             )
         # Mark as in-progress and run in background so client gets 202 immediately
-        _preview_in_progress.add(key)
-        async def run():
-            # Funnel every heavy preview render through the same global
-            # semaphore so concurrent requests queue rather than fan out
-            # and OOM the box. The slot context-manager also keeps the
-            # queue-depth counter accurate while we're waiting.
-            try:
-                _disk_check("generate_preview")
-                async with _HeavyRenderSlot():
-                    await asyncio.to_thread(
-                        _generate_preview_sync, dt, wl, date_str,
-                        out_path_raw, out_path_filtered, out_path_jpg,
-                        url_path_raw, url_path_filtered, url_path_jpg
-                    )
-            except Exception as e:
-                # Only remember failures we believe are about the DATA. An
-                # infrastructure failure (full disk, OOM, upstream blip) gets
-                # a clean retry next time instead of a permanent — and false —
-                # "no data for this date".
-                if _is_infrastructure_error(e):
-                    print(f"[generate_preview] INFRA failure (not blacklisted): {e}", flush=True)
-                    _prune_temp_cache()
-                else:
-                    _preview_failed[key] = (
-                        time.time() + _PREVIEW_FAIL_TTL_S,
-                        "No VSO AIA data for this date/wavelength",
-                    )
-                    print(f"[generate_preview] background failed: {e}", flush=True)
-            finally:
-                _preview_in_progress.discard(key)
-        asyncio.create_task(run())
+        _spawn_preview_job(dt, wl, date_str)
         return JSONResponse(
             status_code=202,
             content={
@@ -2056,9 +2997,20 @@ class _LRUTasks(OrderedDict):
     """Plain OrderedDict with a setitem hook that evicts the oldest
     entry whenever the cap is exceeded. Reads do NOT promote (we want
     eviction to be by insertion-order, not access-order, so a slow
-    user polling /generate_status doesn't pin the registry)."""
+    user polling /generate_status doesn't pin the registry).
+
+    Every write also lands in the durable job store, and a miss falls
+    back to it — so an evicted task, or one from before a restart, still
+    answers /api/status instead of "No such task". The cap now only
+    bounds RAM."""
     def __setitem__(self, key, value):
+        self.put(key, value)
+
+    def put(self, key, value, params=None, output_key=None):
+        """tasks[key] = value, recording the task's params and output key
+        in the same store write (start_generate's submit)."""
         super().__setitem__(key, value)
+        _JOB_STORE.put_task(key, value, _BOOT_ID, params=params, output_key=output_key)
         while len(self) > _TASKS_CAP:
             try:
                 evicted_key, _ = self.popitem(last=False)
@@ -2066,10 +3018,45 @@ class _LRUTasks(OrderedDict):
             except KeyError:
                 break
 
+    def get(self, key, default=None):
+        if key in self:
+            return super().__getitem__(key)
+        state = _JOB_STORE.get_task(key)
+        return state if state is not None else default
+
 tasks: dict = _LRUTasks()
 # Thread lock for status updates
 status_lock = threading.Lock()
 
+# ── In-flight HQ dedupe ──────────────────────────────────────────────
+# A popular default date or a shared link brings bursts of IDENTICAL HQ
+# requests. Each used to get its own task and its own turn in the heavy
+# queue, so the queue filled with renders that all cache-hit at the end —
+# after waiting minutes behind each other. A request whose (date,
+# wavelength, mission, detector, integrate, format) matches a job that is
+# still queued or running now gets that job's task_id back; the output is
+# the same file either way. Guarded by status_lock.
+_hq_inflight: dict = {}     # dedupe key → task_id
+
+
+def _hq_dedupe_key(date, wavelength, mission, detector, integrate, format_type) -> str:
+    # The HQ filename already folds date/wl/mission/detector/integrate the
+    # way do_generate_sync does (so "2024-01-01" and "2024-01-01T12:00:00"
+    # match); the raw tuple only matters for a date it can't parse.
+    try:
+        base = _hq_out_name(datetime.fromisoformat(str(date).replace("Z", "")),
+                            int(wavelength), mission, detector, integrate)[0]
+    except (TypeError, ValueError):
+        base = f"{date}|{wavelength}|{mission}|{detector}|{int(bool(integrate))}"
+    return f"{base}|{format_type}"
+
+
+def _hq_inflight_release(task_id: str) -> None:
+    with status_lock:
+        for k in [k for k, v in _hq_inflight.items() if v == task_id]:
+            del _hq_inflight[k]
+
+
 async def run_generation_task(task_id: str, date: str, wavelength: str, mission: str, detector: str, format_type: str = "rhef", integrate: bool = False):
     """
     Actual HQ generation logic for async background task.
@@ -2077,6 +3064,7 @@ async def run_generation_task(task_id: str, date: str, wavelength: str, mission:
     integrate: forward to do_generate_sync — True renders the multi-frame
     time-integrated print (checkout), False the fast single-frame editor HQ.
     """
+    _touch_job(task_id)
     try:
         with status_lock:
             tasks[task_id] = {
@@ -2095,17 +3083,18 @@ async def run_generation_task(task_id: str, date: str, wavelength: str, mission:
         wl = int(wavelength)
         # A 4096² HQ render is the biggest thing we write — check headroom
         # before burning 1–3 min on a render that can't be saved.
-        _disk_check("hq-task")
-        # Heavy semaphore: queues this HQ render behind any preview/HQ
-        # already in flight. status flips from "queued" to "started" the
+        await run_in_pool("files", _disk_check, "hq-task")
+        # Heavy-render slot: queues this HQ render behind any render already
+        # in flight and any waiting preview (integrated checkout renders rank
+        # below editor HQ — see _HEAVY_CLASSES). status flips from "queued" to "started" the
         # instant we acquire the slot, so the UI can differentiate the
         # waiting phase from the actually-rendering phase.
-        async with _HeavyRenderSlot():
+        async with _HeavyRenderSlot("checkout" if integrate else "hq", job_id=task_id):
             with status_lock:
                 tasks[task_id] = {"status": "started", "message": "HQ generation started"}
                 log_to_queue(f"[hq-task][{task_id}] Status: started")
             # format_type ignored for now; only RHEF is produced
-            png_url = await asyncio.to_thread(do_generate_sync, dt, wl, mission, detector, integrate)
+            png_url = await run_in_pool("heavy", do_generate_sync, dt, wl, mission, detector, integrate)
         # Check PNG existence
         png_path = os.path.join(OUTPUT_DIR, os.path.basename(png_url.lstrip("/")))
         if os.path.exists(png_path) and os.path.getsize(png_path) > 1000:
@@ -2124,10 +3113,19 @@ async def run_generation_task(task_id: str, date: str, wavelength: str, mission:
                     "image_url": png_url
                 }
                 log_to_queue(f"[hq-task][{task_id}] Status: completed (HQ PNG reused/cached at {png_url})")
+    except _JobAbandoned as e:
+        # Parked, not failed: get_status re-launches it if the client is
+        # back after all (a background tab catching up on its timers).
+        with status_lock:
+            tasks[task_id] = {"status": "abandoned", "message": "Stopped — nobody was waiting for it"}
+            log_to_queue(f"[hq-task][{task_id}] Status: abandoned ({e})")
     except Exception as e:
         with status_lock:
             tasks[task_id] = {"status": "failed", "message": str(e)}
             log_to_queue(f"[hq-task][{task_id}] Status: failed ({e})")
+    finally:
+        _hq_inflight_release(task_id)
+        _forget_job(task_id)
 
 
 # Helper: HQ generation, sync version for to_thread usage
@@ -2173,6 +3171,19 @@ def _write_rhef_webp_artifacts(data, cmap, vmin, vmax, out_dir, base_name):
     return hq_name, rhq_name
 
 
+def _hq_out_name(date: datetime, wavelength: int, mission: str, detector: str, integrate: bool = False) -> tuple:
+    """(filename under OUTPUT_DIR, is_default_tuple) for one HQ render."""
+    _integ_suffix = "_integrated" if integrate else ""
+    _is_default = (
+        not integrate
+        and _is_default_tuple(date, wavelength, mission, detector)
+        and getattr(date, "hour", 0) == 12 and getattr(date, "minute", 0) == 0
+    )
+    if _is_default:
+        return DEFAULT_HQ_FILENAME, True
+    return f"hq_{mission}_{wavelength}_{date.strftime('%Y%m%d')}_{date.strftime('%H%M')}{_integ_suffix}.png", False
+
+
 def do_generate_sync(date: datetime, wavelength: int, mission: str, detector: str, integrate: bool = False):
     """
     Generate a HQ PNG using the full RHEF pipeline, caching result if already exists.
@@ -2200,17 +3211,7 @@ def do_generate_sync(date: datetime, wavelength: int, mission: str, detector: st
     # exception is the fixed landing default (canonically the NOON frame),
     # which keeps a stable, time-less filename (DEFAULT_HQ_FILENAME) so its
     # pre-warmed persistent /var/data PNG still restores across deploys.
-    date_str = date.strftime("%Y%m%d")
-    _integ_suffix = "_integrated" if integrate else ""
-    _is_default = (
-        not integrate
-        and _is_default_tuple(date, wavelength, mission, detector)
-        and getattr(date, "hour", 0) == 12 and getattr(date, "minute", 0) == 0
-    )
-    if _is_default:
-        out_name = DEFAULT_HQ_FILENAME
-    else:
-        out_name = f"hq_{mission}_{wavelength}_{date_str}_{date.strftime('%H%M')}{_integ_suffix}.png"
+    out_name, _is_default = _hq_out_name(date, wavelength, mission, detector, integrate)
     out_path = os.path.join(OUTPUT_DIR, out_name)
     url_path = f"/asset/{out_name}"
     # If already exists and is non-empty, return its URL (cached)
@@ -2237,17 +3238,18 @@ def do_generate_sync(date: datetime, wavelength: int, mission: str, detector: st
     # Fetch and process HQ map
     log_to_queue(f"[do_generate_sync] Generating HQ PNG: {out_path} (integrate={integrate})")
     smap = None
-    rhef_map = None
     data = None
     try:
+        _job_checkpoint("fetch")
         smap = fido_fetch_map(date, mission, wavelength, detector, integrate=integrate)
+        _job_checkpoint("rhef")
         # Apply RHEF filter at full resolution
         try:
-            rhef_map = rhef(smap, progress=True)
-            data = rhef_map.data
+            data = _rhef_cached(smap, progress=True)
         except Exception as e:
             log_to_queue(f"[do_generate_sync][warn] RHEF failed on Map, falling back to array: {e}")
-            data = rhef(smap.data, progress=True).data
+            data = _rhef_cached(smap.data, progress=True)
+        _job_checkpoint("render")
         # Colorize and save PNG
         import matplotlib.pyplot as plt
         import numpy as np
@@ -2263,7 +3265,7 @@ def do_generate_sync(date: datetime, wavelength: int, mission: str, detector: st
         plt.imshow(data, cmap=cmap, vmin=vmin, vmax=vmax, origin="lower")
         plt.tight_layout(pad=0)
         os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        _atomic_image_write(out_path, lambda _p: plt.savefig(_p, bbox_inches="tight", pad_inches=0))
+        _savefig_png(out_path)
         plt.close('all')
         # Ensure PNG is written and visible
         import time
@@ -2297,8 +3299,6 @@ def do_generate_sync(date: datetime, wavelength: int, mission: str, detector: st
         # resident at peak.
         try: del data
         except UnboundLocalError: pass
-        try: del rhef_map
-        except UnboundLocalError: pass
         try: del smap
         except UnboundLocalError: pass
         _finalize_render()
@@ -2321,36 +3321,27 @@ def do_generate_sync(date: datetime, wavelength: int, mission: str, detector: st
             log_to_queue(f"[do_generate_sync][warn] Persistent write-through failed: {e}")
     return url_path
 
-def _check_ram_headroom(min_free_mb: int = 400) -> None:
-    """LAUNCH-BLOCKER fix (workflow wx5fi2brl, rhef-oom-512mb):
-    refuse a fresh RHEF render when free RAM is below `min_free_mb`,
-    rather than crashing the process and taking the whole server with
-    it. Caller catches HTTPException and surfaces a friendly retry
-    message. Silent on import failure (psutil not installed → skip
-    guard). Tuneable via RAM_HEADROOM_MB env var; default 400 MB
-    matches the worst-case RHEF + matplotlib working set on a 2 GB
-    instance."""
-    try:
-        import psutil as _psutil
-    except Exception:
+def _check_ram_headroom() -> None:
+    """LAUNCH-BLOCKER fix (workflow wx5fi2brl, rhef-oom-512mb), now opt-in:
+    refuse a fresh HQ render while free RAM is under RAM_HEADROOM_MB.
+    Does nothing unless that deprecated variable is set (see the
+    heavy-render admission block); silent without psutil."""
+    if _RAM_HEADROOM_MB is None or _psutil is None:
         return
     try:
-        mem = _psutil.virtual_memory()
-        env_min = int(os.getenv("RAM_HEADROOM_MB", str(min_free_mb)))
-        free_mb = mem.available / (1024 * 1024)
-        if free_mb < env_min:
-            raise HTTPException(
-                status_code=503,
-                detail=(
-                    f"Server is busy ({free_mb:.0f} MB free; need ≥{env_min} MB). "
-                    f"Try one of the pre-rendered famous moments above, or try again in a minute."
-                ),
-            )
-    except HTTPException:
-        raise
+        free_mb = _psutil.virtual_memory().available / (1024 * 1024)
     except Exception:
         # Don't let a guard failure block the path — just log + continue.
         print(f"[ram_headroom] guard check failed (continuing): {sys.exc_info()[1]}")
+        return
+    if free_mb < _RAM_HEADROOM_MB:
+        raise HTTPException(
+            status_code=503,
+            detail=(
+                f"Server is busy ({free_mb:.0f} MB free; need ≥{_RAM_HEADROOM_MB} MB). "
+                f"Try one of the pre-rendered famous moments above, or try again in a minute."
+            ),
+        )
 
 
 @app.post("/api/generate")
@@ -2364,6 +3355,9 @@ async def start_generate(request: Request, background_tasks: BackgroundTasks, pa
     # dates can't run us into a VSO/JSOC block-list (breaks renders for all).
     enforce_origin(request)
     enforce_rate_limit(request, "generate", 40, 300.0)  # 40 renders / 5 min / IP
+    # The heavy-render scheduler admits by predicted memory, so a busy box
+    # queues the job instead of bouncing the customer. Only a deployment
+    # still setting the deprecated RAM_HEADROOM_MB gets the old 503.
     _check_ram_headroom()
     date = payload.get("date")
     time_raw = (payload.get("time") or "12:00").strip()
@@ -2388,20 +3382,158 @@ async def start_generate(request: Request, background_tasks: BackgroundTasks, pa
     except Exception:
         # Bad time → leave date as-is; downstream parser falls back to noon.
         pass
-    task_id = str(uuid.uuid4())
+    try:
+        _dt = datetime.fromisoformat(str(date).replace("Z", ""))
+        _note_user_render("hq_integrated" if integrate else "hq", _dt.strftime("%Y%m%d_%H%M"), int(wavelength))
+    except (TypeError, ValueError):
+        pass
+    _ensure_orphans_resumed()
+    # A completed task whose output is still on disk answers immediately —
+    # e.g. a client resubmitting after a restart it didn't notice.
+    output_key = None
+    try:
+        output_key = _hq_out_name(datetime.fromisoformat(str(date).replace("Z", "")),
+                                  int(wavelength), mission, detector, integrate)[0]
+    except (TypeError, ValueError):
+        pass
+    if output_key:
+        done = _JOB_STORE.find_completed(output_key)
+        if done and os.path.exists(os.path.join(OUTPUT_DIR, output_key)):
+            return {"task_id": done[0], "status_url": f"/api/status/{done[0]}"}
+    dedupe_key = _hq_dedupe_key(date, wavelength, mission, detector, integrate, format_type)
+    params = {"date": date, "wavelength": wavelength, "mission": mission, "detector": detector,
+              "format_type": format_type, "integrate": integrate}
     with status_lock:
-        tasks[task_id] = {"status": "queued", "message": "HQ generation queued"}
+        live = _hq_inflight.get(dedupe_key)
+        if live and tasks.get(live, {}).get("status") in ("queued", "started"):
+            log_to_queue(f"[hq-task][{live}] Joined by a duplicate request")
+            _touch_job(live)
+            return {"task_id": live, "status_url": f"/api/status/{live}"}
+        task_id = str(uuid.uuid4())
+        _hq_inflight[dedupe_key] = task_id
+        tasks.put(task_id, {"status": "queued", "message": "HQ generation queued"},
+                  params=params, output_key=output_key)
     background_tasks.add_task(run_generation_task, task_id, date, wavelength, mission, detector, format_type, integrate)
     return {"task_id": task_id, "status_url": f"/api/status/{task_id}"}
 
 @app.get("/api/status/{task_id}")
 async def get_status(task_id: str):
     """Poll generation task status."""
+    _ensure_orphans_resumed()
+    _touch_job(task_id)
     with status_lock:
         task_status = tasks.get(task_id, {"status": "unknown", "message": "No such task"})
+    if task_status.get("joined"):
+        task_status = _joined_status(task_id, task_status["joined"])
+    if task_status.get("status") == "abandoned":
+        task_status = _revive_abandoned_task(task_id)
+    if task_status.get("status") == "queued":
+        # Live, not the snapshot taken at submit: a queued job's place moves
+        # as renders finish and higher-priority work arrives.
+        pos = _heavy_queue_position(task_status.get("joined") or task_id)
+        if pos:
+            task_status = {**task_status, **pos, "queue_depth": _heavy_queue_depth()}
     return JSONResponse(content=task_status)
 
 
+def _joined_status(task_id: str, live: str) -> dict:
+    """Status of a revived task that joined the live task `live` for the
+    same render: the live task's, polled on this id. Its client is the one
+    waiting now, so it keeps `live` from being abandoned; once `live`
+    finishes, its result is stored under this id too."""
+    _touch_job(live)
+    with status_lock:
+        state = tasks.get(live)
+        if state is None or state.get("status") == "abandoned":
+            # Nobody else wanted it after all: run it as this task again.
+            tasks[task_id] = state = {"status": "abandoned", "message": "HQ generation stopped"}
+        elif state.get("status") not in ("queued", "started"):
+            tasks[task_id] = state = dict(state)
+        else:
+            state = {**state, "joined": live}
+    return state
+
+
+def _revive_abandoned_task(task_id: str) -> dict:
+    """The client of a task we dropped as abandoned is polling again —
+    re-launch it under the same id (a finished render is a cache hit).
+    When another task for the same render is already live, join it
+    instead, as start_generate would, rather than run the render twice."""
+    params = _JOB_STORE.get_params(task_id)
+    if not params:
+        state = {"status": "failed", "message": "Render was stopped while the page was away — please try again."}
+        with status_lock:
+            tasks[task_id] = state
+        return state
+    key = _hq_dedupe_key(params["date"], params["wavelength"], params["mission"], params["detector"],
+                         params.get("integrate", False), params.get("format_type", "rhef"))
+    with status_lock:
+        live = _hq_inflight.get(key)
+        if live and live != task_id and tasks.get(live, {}).get("status") in ("queued", "started"):
+            log_to_queue(f"[hq-task][{live}] Joined by revived task {task_id}")
+            tasks[task_id] = {"status": "queued", "message": "HQ generation queued", "joined": live}
+            joined = True
+        else:
+            tasks[task_id] = {"status": "queued", "message": "HQ generation queued"}
+            _hq_inflight[key] = task_id
+            joined = False
+        state = tasks[task_id]
+    if joined:
+        return _joined_status(task_id, live)
+    print(f"[abandon] {task_id}: client is back — re-launching", flush=True)
+    asyncio.get_running_loop().create_task(run_generation_task(
+        task_id, params["date"], params["wavelength"], params["mission"], params["detector"],
+        params.get("format_type", "rhef"), bool(params.get("integrate", False)),
+    ))
+    return state
+
+
+# Orphans older than this are failed rather than re-run: nobody is polling a
+# job from hours ago, and re-rendering it would only steal the heavy slot.
+_ORPHAN_RESUME_MAX_AGE_S = 2 * 3600
+_orphans_resumed = False
+
+
+def _ensure_orphans_resumed() -> None:
+    """Once per process, on the first request that reaches the event loop:
+    re-launch work a previous boot accepted but never finished. HQ tasks keep
+    their task_id (the client's poll URL just keeps working); preview keys are
+    re-rendered unless the output already landed."""
+    global _orphans_resumed
+    if _orphans_resumed or not _JOB_STORE.enabled:
+        return
+    _orphans_resumed = True
+    now = time.time()
+    for task_id, params, updated_at in _JOB_STORE.orphaned_tasks(_BOOT_ID):
+        if not params or now - updated_at > _ORPHAN_RESUME_MAX_AGE_S:
+            with status_lock:
+                tasks[task_id] = {"status": "failed",
+                                  "message": "Interrupted by a server restart — please try again."}
+            continue
+        print(f"[job-store] resuming HQ task {task_id} from a previous boot", flush=True)
+        with status_lock:
+            tasks[task_id] = {"status": "queued", "message": "HQ generation queued (resumed after restart)"}
+            _hq_inflight.setdefault(_hq_dedupe_key(
+                params["date"], params["wavelength"], params["mission"], params["detector"],
+                params.get("integrate", False), params.get("format_type", "rhef")), task_id)
+        asyncio.get_running_loop().create_task(run_generation_task(
+            task_id, params["date"], params["wavelength"], params["mission"], params["detector"],
+            params.get("format_type", "rhef"), bool(params.get("integrate", False)),
+        ))
+    for enc in _JOB_STORE.orphaned_keys("preview", _BOOT_ID):
+        _JOB_STORE.discard_key("preview", enc)
+        try:
+            date_str, wl = enc.split("|")
+            wl = int(wl)
+            dt = datetime.strptime(date_str, "%Y%m%d_%H%M")
+        except ValueError:
+            continue
+        if (date_str, wl) in _preview_in_progress or os.path.exists(_preview_paths(date_str, wl)[1]):
+            continue
+        print(f"[job-store] resuming preview {date_str} {wl}Å from a previous boot", flush=True)
+        _spawn_preview_job(dt, wl, date_str)
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Admin: warm the persistent default-image caches
 # ──────────────────────────────────────────────────────────────────────────────
@@ -2428,6 +3560,198 @@ def _check_warm_admin_key(provided: Optional[str]) -> None:
         raise HTTPException(status_code=401, detail="Invalid admin key")
 
 
+# ──────────────────────────────────────────────────────────────────────────────
+# Demand-driven idle warmer
+# ──────────────────────────────────────────────────────────────────────────────
+# Warming used to be manual (warm_cache.py, /api/admin/warm_default) and blind
+# to demand: the fixed default tuples stayed warm forever while the dates
+# customers actually pick went cold the moment the 2-day janitor swept them.
+# Every preview / HQ request now bumps a persisted counter (api/demand.py),
+# and while the box is idle — nothing queued or rendering, no customer render
+# request for IDLE_WARM_QUIET_S, RAM headroom healthy — this loop re-renders
+# the hottest missing artifacts one at a time, through the same heavy slot a
+# customer render takes.
+#
+# "Pause on traffic" is checked before every item AND again after the slot is
+# granted, so a customer arriving mid-pass stops the pass at the next item
+# boundary. A render already running is not interrupted (it's a thread); the
+# previews this warms are seconds long, and HQ can be dropped from the tier
+# list (IDLE_WARM_TIERS=preview) on boxes where that wait matters.
+#
+# Started lazily from the first customer request (there is no startup hook
+# here, and under scale-to-zero a box with no traffic is stopped anyway).
+from api import demand as _demand
+
+_IDLE_WARM_ENABLED = os.getenv("IDLE_WARM", "1").strip() not in ("0", "false", "no")
+_IDLE_WARM_QUIET_S = float(os.getenv("IDLE_WARM_QUIET_S", "45"))
+_IDLE_WARM_POLL_S = float(os.getenv("IDLE_WARM_POLL_S", "15"))
+_IDLE_WARM_TOP_N = int(os.getenv("IDLE_WARM_TOP_N", "20"))
+_IDLE_WARM_TIERS = tuple(
+    t.strip() for t in os.getenv("IDLE_WARM_TIERS", "preview,hq").split(",")
+    if t.strip() in ("preview", "hq")
+)
+_IDLE_WARM_RETRY_S = 6 * 3600   # a failed item sits out this long
+
+_last_user_render_at = 0.0
+_idle_warm_task = None
+_idle_warm_skip: dict = {}      # (tier, date_str, wl) → retry-after epoch
+_idle_warm_state = {"warmed": 0, "failed": 0, "current": None, "last_warm_at": None}
+
+
+def _note_user_render(tier: str, date_str: str, wl: int) -> None:
+    """Called by every customer render request: counts the demand, resets
+    the idle clock, and makes sure the warmer is running."""
+    global _last_user_render_at
+    _last_user_render_at = time.time()
+    try:
+        _demand.record(tier, date_str, wl)
+    except Exception as e:
+        print(f"[idle-warm] demand record failed: {e}", flush=True)
+    _ensure_idle_warmer()
+
+
+def _ensure_idle_warmer() -> None:
+    # Runs even with warming off: the loop is also what writes the demand
+    # counters and the learned memory factors to disk, so neither record()
+    # on the event loop (demand, _HeavyScheduler.release) ever has to.
+    global _idle_warm_task
+    if _idle_warm_task is not None and not _idle_warm_task.done():
+        return
+    try:
+        _idle_warm_task = asyncio.get_running_loop().create_task(_idle_warm_loop())
+    except RuntimeError:
+        pass    # no running loop (sync caller / tests) — next request retries
+
+
+def _idle_now(slots_held: int = 0) -> bool:
+    if _heavy_queue_depth() > slots_held:
+        return False
+    if time.time() - _last_user_render_at < _IDLE_WARM_QUIET_S:
+        return False
+    mem = _heavy_mem_probe()
+    if mem is not None and mem[0] < _HEAVY_RAM_MARGIN_MB + _mem_model.predict_mb("preview"):
+        return False
+    return True
+
+
+def _idle_warm_candidates() -> list:
+    """Top-N demanded (tier, date_str, wl) whose artifact is missing, hottest
+    first. Blocking (stats the volume) — call off the event loop."""
+    now = time.time()
+    out = []
+    for r in _demand.top(_IDLE_WARM_TOP_N, tiers=_IDLE_WARM_TIERS):
+        tier, date_str, wl = r["tier"], r["date_str"], r["wl"]
+        if _idle_warm_skip.get((tier, date_str, wl), 0) > now:
+            continue
+        try:
+            dt = datetime.strptime(date_str, "%Y%m%d_%H%M")
+        except ValueError:
+            continue
+        if tier == "preview":
+            key = (date_str, wl)
+            if key in _preview_in_progress or _preview_fail_reason(key):
+                continue
+            if os.path.exists(_preview_paths(date_str, wl)[1]):
+                continue
+        else:
+            out_name, _ = _hq_out_name(dt, wl, "SDO", "AIA", False)
+            p = os.path.join(OUTPUT_DIR, out_name)
+            if os.path.exists(p) and os.path.getsize(p) > 1000:
+                continue
+        out.append((tier, date_str, wl, dt))
+    return out
+
+
+async def _idle_warm_one(tier: str, date_str: str, wl: int, dt: datetime) -> None:
+    await run_in_pool("files", _disk_check, "idle-warm")
+    async with _HeavyRenderSlot("warm", job_id=f"idle-warm:{tier}:{date_str}:{wl}",
+                                workload="preview" if tier == "preview" else "hq"):
+        # Traffic may have arrived while we waited for the slot — yield to it.
+        if not _idle_now(slots_held=1):
+            return
+        _idle_warm_state["current"] = f"{tier}:{date_str}:{wl}"
+        try:
+            if tier == "preview":
+                key = (date_str, wl)
+                if key in _preview_in_progress:
+                    return
+                _preview_in_progress.add(key)
+                try:
+                    await run_in_pool("heavy", _generate_preview_sync, dt, wl, date_str, *_preview_paths(date_str, wl))
+                finally:
+                    _preview_in_progress.discard(key)
+            else:
+                await run_in_pool("heavy", do_generate_sync, dt, wl, "SDO", "AIA", False)
+            _idle_warm_state["warmed"] += 1
+            _idle_warm_state["last_warm_at"] = time.time()
+            print(f"[idle-warm] warmed {tier} {date_str} {wl}Å", flush=True)
+        except Exception as e:
+            _idle_warm_skip[(tier, date_str, wl)] = time.time() + _IDLE_WARM_RETRY_S
+            _idle_warm_state["failed"] += 1
+            print(f"[idle-warm] {tier} {date_str} {wl}Å failed (skipping {_IDLE_WARM_RETRY_S // 3600}h): {e}", flush=True)
+        finally:
+            _idle_warm_state["current"] = None
+
+
+async def _idle_warm_loop() -> None:
+    warming = _IDLE_WARM_ENABLED and bool(_IDLE_WARM_TIERS)
+    print(f"[idle-warm] started (tiers={','.join(_IDLE_WARM_TIERS)}, top_n={_IDLE_WARM_TOP_N}, "
+          f"quiet={_IDLE_WARM_QUIET_S:.0f}s{'' if warming else ', warming off: flushes only'})",
+          flush=True)
+    while True:
+        await asyncio.sleep(_IDLE_WARM_POLL_S)
+        try:
+            await run_in_pool("maintenance", _demand.flush)
+            await run_in_pool("maintenance", _mem_model.flush)
+            if not warming or not _idle_now():
+                continue
+            candidates = await run_in_pool("maintenance", _idle_warm_candidates)
+            if candidates:
+                await _idle_warm_one(*candidates[0])
+        except Exception as e:
+            print(f"[idle-warm] pass error: {e}", flush=True)
+
+
+@app.get("/api/admin/demand")
+async def admin_demand(request: Request, n: int = Query(50, ge=1, le=500)):
+    """Top demanded tuples + idle-warmer state (admin-key gated)."""
+    _check_warm_admin_key(request.headers.get("x-admin-key"))
+    candidates = await run_in_pool("maintenance", _idle_warm_candidates)
+    return {
+        "top": _demand.top(n),
+        "warmer": {
+            **_idle_warm_state,
+            "enabled": _IDLE_WARM_ENABLED,
+            "running": _idle_warm_task is not None and not _idle_warm_task.done(),
+            "tiers": list(_IDLE_WARM_TIERS),
+            "idle": _idle_now(),
+            "missing": [f"{t}:{d}:{w}" for t, d, w, _dt in candidates],
+        },
+    }
+
+
+@app.get("/api/admin/heavy")
+async def admin_heavy(request: Request):
+    """Heavy-render admission state, the learned memory model and the
+    upstream limiters' lanes (admin-key gated)."""
+    _check_warm_admin_key(request.headers.get("x-admin-key"))
+    from api import print_compose
+    return {
+        "scheduler": _HEAVY_SCHEDULER.stats(),
+        "memory_model": _mem_model.stats(),
+        "upstream": [_HELIOVIEWER_LIMITER.stats(), _VSO_LIMITER.stats()],
+        "hv_cache": _HV_DISK.stats(),
+        "print_masks": print_compose._MASKS.stats(),
+    }
+
+
+@app.get("/api/admin/pools")
+async def admin_pools(request: Request):
+    """Per-pool queue depth and thread-wait times (admin-key gated)."""
+    _check_warm_admin_key(request.headers.get("x-admin-key"))
+    return _executors.stats()
+
+
 # ── Phase B helpers ──────────────────────────────────────────────────────────
 # Pre-render REAL Printify mockups for each product using the cached default
 # HQ image. We call the Printify API DIRECTLY (not through /api/printify/*)
@@ -2647,6 +3971,21 @@ def _grid_cell_paths(wl, filt, pid):
     return d / f"{pid}.png", d / f"{pid}.thumb.webp"
 
 
+def _aspect_crop_box(w, h, ar):
+    """(left, top, right, bottom) of the centred cover crop of a w×h image
+    to aspect `ar`, on whole pixels; None when it is already within 2%."""
+    ratio = float(ar[0]) / float(ar[1])
+    if abs((w / h) - ratio) < 0.02:
+        return None
+    if (w / h) > ratio:
+        new_w, new_h = int(round(h * ratio)), h   # too wide → crop width
+    else:
+        new_w, new_h = w, int(round(w / ratio))   # too tall → crop height
+    left = max(0, (w - new_w) // 2)
+    top = max(0, (h - new_h) // 2)
+    return left, top, left + new_w, top + new_h
+
+
 def _crop_to_aspect(raw_bytes, ar):
     """Center cover-crop the (square) 1k source to the product's print aspect.
 
@@ -2660,18 +3999,11 @@ def _crop_to_aspect(raw_bytes, ar):
     try:
         import io
         from PIL import Image
-        ratio = float(ar[0]) / float(ar[1])
         im = Image.open(io.BytesIO(raw_bytes)).convert("RGB")
-        w, h = im.size
-        if abs((w / h) - ratio) < 0.02:
+        box = _aspect_crop_box(im.size[0], im.size[1], ar)
+        if box is None:
             return raw_bytes
-        if (w / h) > ratio:
-            new_w, new_h = int(round(h * ratio)), h   # too wide → crop width
-        else:
-            new_w, new_h = w, int(round(w / ratio))   # too tall → crop height
-        left = max(0, (w - new_w) // 2)
-        top = max(0, (h - new_h) // 2)
-        im = im.crop((left, top, left + new_w, top + new_h))
+        im = im.crop(box)
         buf = io.BytesIO()
         im.save(buf, "PNG")
         return buf.getvalue()
@@ -2680,6 +4012,28 @@ def _crop_to_aspect(raw_bytes, ar):
         return raw_bytes
 
 
+def _grid_crops(src_path, ars) -> dict:
+    """{"WxH": PNG bytes}: the grid source cover-cropped to every aspect in
+    `ars`, from a single decode (print_compose's _Source) instead of one
+    _crop_to_aspect decode + re-encode per product. Each crop is a slice of
+    the decoded pixels through _aspect_crop_box, so it is _crop_to_aspect's
+    window exactly, never a resample; RGB like its output. Aspects that
+    fail are left out; the caller falls back to _crop_to_aspect for those."""
+    from api import png_writer, print_compose
+    keys = list(dict.fromkeys(f"{ar[0]:g}x{ar[1]:g}" for ar in ars if ar))
+    out = {}
+    try:
+        px = print_compose._Source(str(src_path)).pixels(1)
+        h, w = px.shape[:2]
+        for key in keys:
+            box = _aspect_crop_box(w, h, [float(v) for v in key.split("x")])
+            left, top, right, bottom = box or (0, 0, w, h)
+            out[key] = png_writer.encode_png(px[top:bottom, left:right, :3])
+    except Exception as _e:
+        print(f"[warm_grid] batch crop failed after {len(out)}/{len(keys)} (falling back): {_e}", flush=True)
+    return out
+
+
 def _ensure_grid_sources_for_wl(wl, force=False):
     """Ensure the 1k raw + 1k rhef source PNGs exist for the canonical landing
     date at wavelength `wl`. One fido fetch feeds both filters. Renders through
@@ -2818,6 +4172,7 @@ def _phase_b_warm(image_id_cache, force=False, wavelengths=None, filters=None, m
     one Printify upload per distinct (wl, filter, print-aspect)."""
     from api.printify_routes import (
         _printify_request, _headers, _shop_id, PRINTIFY_BASE, _expand_print_areas,
+        _public_base_url,
     )
     import time
 
@@ -2828,23 +4183,38 @@ def _phase_b_warm(image_id_cache, force=False, wavelengths=None, filters=None, m
         image_id_cache = {}
 
     manifest = _load_default_manifest()
+    # Every aspect still to upload for the current (wl, filter), cropped in
+    # one batch on the first upload miss: (wl, filt) → {"WxH": PNG bytes}.
+    grid_crops = {}
 
     def _ensure_uploaded(wl, filt, prod):
-        import base64
         ar = prod.get("ar")
         ckey = f"{wl}_{filt}" + (f"_{ar[0]:g}x{ar[1]:g}" if ar else "")
         if image_id_cache.get(ckey):
             return image_id_cache[ckey]
         src = _grid_source_path(wl, filt)      # 1k square PNG (ensured per-wl by caller)
-        raw = src.read_bytes()
+        # Printify fetches the image through a signed link (api/signed_assets.py)
+        # instead of a base64 body: the source file as it sits on disk, or a
+        # crop staged privately for the length of the POST.
+        staged = None
         if ar:
-            raw = _crop_to_aspect(raw, ar)
-        b64 = base64.b64encode(raw).decode("ascii")
-        body = {"file_name": f"grid_{ckey}.png", "contents": b64}
-        r = _printify_request(
-            "POST", f"{PRINTIFY_BASE}/uploads/images.json",
-            headers=_headers(), json=body, timeout=120,
-        )
+            if (wl, filt) not in grid_crops:
+                grid_crops.clear()
+                grid_crops[(wl, filt)] = _grid_crops(src, [
+                    p["ar"] for p in _DEFAULT_MOCKUP_PRODUCTS
+                    if p.get("ar") and not image_id_cache.get(f"{wl}_{filt}_{p['ar'][0]:g}x{p['ar'][1]:g}")])
+            raw = (grid_crops[(wl, filt)].pop(f"{ar[0]:g}x{ar[1]:g}", None)
+                   or _crop_to_aspect(src.read_bytes(), ar))
+            staged = signed_assets.stage(raw)
+        url = _public_base_url() + signed_assets.sign_path(staged or src)
+        body = {"file_name": f"grid_{ckey}.png", "url": url}
+        try:
+            r = _printify_request(
+                "POST", f"{PRINTIFY_BASE}/uploads/images.json",
+                headers=_headers(), json=body, timeout=120,
+            )
+        finally:
+            signed_assets.unstage(staged)
         if r.status_code >= 400:
             raise RuntimeError(f"Printify upload failed: {r.status_code} {r.text[:200]}")
         image_id = r.json().get("id")
@@ -3055,13 +4425,13 @@ async def warm_default(request: Request):
         try:
             dt = datetime.strptime(DEFAULT_LANDING_DATE, "%Y-%m-%d").replace(hour=12, minute=0)
             # Funnel the cold render through the global heavy-render
-            # semaphore so a deploy-time warm doesn't fight a concurrent
+            # slots (lowest "warm" class) so a deploy-time warm doesn't fight a concurrent
             # user-triggered /api/generate for the 2GB RAM ceiling.
             # Reviewer/leak-audit follow-up: this was the one heavy
             # path missing the slot.
-            async with _HeavyRenderSlot():
-                png_url = await asyncio.to_thread(
-                    do_generate_sync, dt,
+            async with _HeavyRenderSlot("warm", job_id="warm_default"):
+                png_url = await run_in_pool(
+                    "heavy", do_generate_sync, dt,
                     DEFAULT_LANDING_WAVELENGTH,
                     DEFAULT_LANDING_MISSION,
                     DEFAULT_LANDING_DETECTOR,
@@ -3129,8 +4499,8 @@ async def warm_default(request: Request):
     _filters = [f.strip() for f in _filters_param.split(",") if f.strip()] or None
 
     try:
-        phase_b_result = await asyncio.to_thread(
-            _phase_b_warm, {}, _force, _wavelengths, _filters, _max_cells,
+        phase_b_result = await run_in_pool(
+            "batch", _phase_b_warm, {}, _force, _wavelengths, _filters, _max_cells,
         )
         phase_b_result["coverage"] = _mockup_coverage()
     except Exception as e:
@@ -3220,7 +4590,7 @@ async def warm_grid(request: Request):
                 "coverage": _mockup_coverage()}
 
     # Synchronous path (small/manual use only — can be long, avoid via a proxy).
-    res = await asyncio.to_thread(_phase_b_warm, {}, force, wavelengths, filters, max_cells)
+    res = await run_in_pool("batch", _phase_b_warm, {}, force, wavelengths, filters, max_cells)
     res["coverage"] = _mockup_coverage()
     return res
 
@@ -3331,7 +4701,7 @@ def _vibe_render_array_to_png(data, out_path: str, cmap, gamma: float = None):
             plt.imshow(arr, cmap=cmap, vmin=vmin, vmax=vmax, origin="lower")
         plt.tight_layout(pad=0)
         os.makedirs(os.path.dirname(out_path), exist_ok=True)
-        _atomic_image_write(out_path, lambda _p: plt.savefig(_p, bbox_inches="tight", pad_inches=0))
+        _savefig_png(out_path)
     finally:
         # plt.close(fig) would skip if fig wasn't bound (early exception
         # before plt.figure). plt.close('all') is the safe drain.
@@ -3454,11 +4824,10 @@ def _render_vibe_pair(vibe: dict) -> dict:
     if not (rhef_full.exists() and rhef_full.stat().st_size > 1000):
         print(f"[warm_vibe_grid] {slug}: applying RHEF + rendering → {rhef_full}", flush=True)
         try:
-            rhef_map = rhef(smap, progress=False)
-            rhef_data = rhef_map.data
+            rhef_data = _rhef_cached(smap, progress=False)
         except Exception as e:
             print(f"[warm_vibe_grid] {slug}: RHEF on Map failed ({e}); falling back to array path", flush=True)
-            rhef_data = rhef(smap.data, progress=False).data
+            rhef_data = _rhef_cached(smap.data, progress=False)
         _vibe_render_array_to_png(rhef_data, str(rhef_full), cmap)
     _vibe_write_thumb(str(rhef_full), str(rhef_thumb))
 
@@ -3572,8 +4941,8 @@ async def warm_vibe_grid(request: Request, force: int = 0):
     Idempotent — re-running picks up any vibe whose both `*_full.png`
     files aren't on disk yet. Pass `?force=1` to purge the existing
     cache + manifest first (use after changing tuple wavelengths so the
-    new renders actually get written). Held under the heavy-render
-    semaphore so we don't fight a concurrent /api/generate for memory.
+    new renders actually get written). Held under a "warm"-class heavy-render
+    slot so we don't fight a concurrent /api/generate for memory.
 
     **NOTE:** On Render's 2 GB Standard instance this routinely OOMs
     on the RHEF step (a 4096² float64 array + matplotlib at 300dpi
@@ -3581,9 +4950,9 @@ async def warm_vibe_grid(request: Request, force: int = 0):
     Prefer `POST /api/admin/upload_vibe_bundle` from a local machine
     with more headroom; see that route's docstring."""
     _check_warm_admin_key(request.headers.get("x-admin-key"))
-    async with _HeavyRenderSlot():
+    async with _HeavyRenderSlot("warm", job_id="warm_vibe_grid"):
         try:
-            result = await asyncio.to_thread(_warm_vibe_grid, bool(force))
+            result = await run_in_pool("heavy", _warm_vibe_grid, bool(force))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"warm_vibe_grid failed: {e}")
     return result
@@ -4800,6 +6169,125 @@ def soho_eit_fallback(dt: datetime) -> Map:
             detail=f"No files could be downloaded for SDO on {dt.date()} (fallback to SOHO-EIT also failed)."
         )
 
+# ──────────────────────────────────────────────────────────────────────────────
+# RHEF result cache
+# ──────────────────────────────────────────────────────────────────────────────
+# RHEF is the most expensive CPU step in the app, and the same frame used to be
+# filtered separately at the preview, HQ, webp and vibe tiers. Results are now
+# keyed by the CONTENT of the array actually handed to rhef() plus every
+# parameter that changes its output, so any two callers with identical input
+# share one result no matter which tier asked first. (The old
+# temp_filtered_{key}_{date}.npz cache was keyed by calendar date alone, so
+# two different times on the same day could collide.)
+#
+# Entries are raw float32 .npy, NOT compressed: a hit is np.load(mmap_mode="r")
+# — page-cache reads of only what matplotlib touches, instead of a full
+# decompress into a fresh 64 MB array. They live under OUTPUT_DIR, so the
+# daily cache janitor ages them out and the disk guard prunes them with the
+# other derived caches; a hit bumps mtime so hot frames outlive cold ones.
+_RHEF_CACHE_DIR = os.path.join(OUTPUT_DIR, "rhef_cache")
+_RHEF_CACHE_VERSION = 1     # bump when sunkit_image's rhef output changes
+try:
+    _RHEF_CACHE_MAX_BYTES = int(float(os.environ.get("RHEF_CACHE_MAX_MB", "768")) * 1024 * 1024)
+except ValueError:
+    _RHEF_CACHE_MAX_BYTES = 768 * 1024 * 1024
+# rhef() on a Map bins pixels by radius from disk centre, so the geometry that
+# defines that radius is part of the input even though it isn't pixel data.
+_RHEF_GEOMETRY_KEYS = ("crpix1", "crpix2", "cdelt1", "cdelt2", "rsun_obs", "rsun_ref", "dsun_obs")
+
+
+def _rhef_cache_key(data, meta, params: dict) -> str:
+    arr = np.ascontiguousarray(data)
+    h = hashlib.blake2b(digest_size=20)
+    h.update(f"v{_RHEF_CACHE_VERSION}|{arr.dtype.str}|{arr.shape}|".encode())
+    for k in sorted(params):
+        h.update(f"{k}={params[k]}|".encode())
+    if meta is None:
+        h.update(b"input=array|")
+    else:
+        for k in _RHEF_GEOMETRY_KEYS:
+            h.update(f"{k}={meta.get(k)}|".encode())
+    h.update(memoryview(arr).cast("B"))
+    return h.hexdigest()
+
+
+def _trim_rhef_cache() -> int:
+    """Evict least-recently-used entries until the cache fits its byte budget."""
+    try:
+        entries = [
+            (e.stat().st_mtime, e.stat().st_size, e.path)
+            for e in os.scandir(_RHEF_CACHE_DIR)
+            if e.name.endswith(".npy")
+        ]
+    except OSError:
+        return 0
+    total = sum(sz for _, sz, _ in entries)
+    removed = 0
+    for _mt, sz, p in sorted(entries):
+        if total <= _RHEF_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(p)
+            total -= sz
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+def _rhef_cached(src, *, progress: bool = False, vignette=None, upsilon=None, block: int = 1):
+    """rhef(src).data as float32, served from the content-addressed cache.
+
+    `src` is a Map or a bare 2D array — exactly what would have been passed to
+    rhef(). `block` is the downsample factor the caller already applied (it is
+    part of the key so a cache entry is self-describing, even though the shape
+    usually gives it away). On a hit the returned array is a READ-ONLY memmap;
+    callers that need to write must copy first. Failures inside rhef()
+    propagate unchanged and are never cached.
+    """
+    meta = getattr(src, "meta", None)
+    data = getattr(src, "data", src)
+    params = {"block": int(block), "vignette": vignette, "upsilon": upsilon}
+    key = _rhef_cache_key(data, meta, params)
+    path = os.path.join(_RHEF_CACHE_DIR, f"{key}.npy")
+    if os.path.exists(path):
+        try:
+            hit = np.load(path, mmap_mode="r")
+            try:
+                os.utime(path, None)
+            except OSError:
+                pass
+            log_to_queue(f"[rhef-cache] hit {key[:12]} shape={hit.shape}")
+            return hit
+        except Exception as e:
+            log_to_queue(f"[rhef-cache][warn] unreadable entry {key[:12]} ({e}); recomputing")
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    kwargs = {"progress": progress}
+    if vignette is not None:
+        kwargs["vignette"] = vignette
+    if upsilon is not None:
+        kwargs["upsilon"] = upsilon
+    out = rhef(src, **kwargs)
+    result = np.asarray(getattr(out, "data", out), dtype=np.float32)
+
+    def _save(tmp_path):
+        with open(tmp_path, "wb") as fh:
+            np.save(fh, result)
+
+    try:
+        os.makedirs(_RHEF_CACHE_DIR, exist_ok=True)
+        _atomic_image_write(path, _save)
+        _trim_rhef_cache()
+    except Exception as e:
+        # A full disk must not fail the render — the result is still good.
+        log_to_queue(f"[rhef-cache][warn] could not store {key[:12]}: {e}")
+    return result
+
+
 # ──────────────────────────────────────────────────────────────────────────────
 # Image processing (plug your filter here)
 # ──────────────────────────────────────────────────────────────────────────────
@@ -4877,24 +6365,21 @@ def default_filter(smap: Map) -> Map:
 
         prep_map = _SunpyMap(data, header)
 
-        # ── 2) Run RHEF ───────────────────────────────────────────────────────
+        # ── 2) Run RHEF (content-addressed cache; see _rhef_cached) ───────────
         with tqdm_stream_adapter():
             t1 = _time.time()
-            filtered = rhef(
+            filtered_data = _rhef_cached(
                 prep_map,
                 progress=True,               # show tqdm into the SSE stream
-                vignette=1.51 * _u.R_sun     # robust limb vignette
+                vignette=1.51 * _u.R_sun,    # robust limb vignette
+                block=block_size,
             )
             t2 = _time.time()
-        # Ensure we always return a Map
-        # from sunpy.map import Map
-        if not isinstance(filtered, _SunpyMap):
-            filtered = _SunpyMap(_np.asarray(filtered, dtype=_np.float32), header)
 
-        # Clean any residual infs/nans
-        arr = _np.array(filtered.data, dtype=_np.float32, copy=True)
+        # Clean any residual infs/nans (copy: a cache hit is a read-only memmap)
+        arr = _np.array(filtered_data, dtype=_np.float32, copy=True)
         arr[~_np.isfinite(arr)] = _np.nan
-        filtered = _SunpyMap(arr, filtered.meta)
+        filtered = _SunpyMap(arr, header)
 
         log_to_queue(f"[render] RHEF complete in {t2 - t1:.2f}s (total {t2 - t0:.2f}s); shape={arr.shape}")
         return filtered
@@ -4952,66 +6437,18 @@ def map_to_png(
         log_to_queue(f"[render] Using colormap: {cmap_name}")
 
 
-    # Caching for filtered data
-    # Try to determine instrument and date for cache name
-    inst = smap.meta.get("instrume") or smap.meta.get("instrument") or ""
-    wl_meta = smap.meta.get('wavelnth') or smap.meta.get('WAVELNTH')
-    # Use date from meta if possible
-    date_for_cache = None
-    if hasattr(smap, "date") and getattr(smap, "date", None):
-        try:
-            date_for_cache = smap.date.strftime("%Y%m%d")
-        except Exception:
-            date_for_cache = None
-    if not date_for_cache:
-        # fallback: try to extract from meta
-        date_obs = smap.meta.get("date-obs") or smap.meta.get("DATE-OBS")
-        if date_obs:
-            try:
-                date_for_cache = str(date_obs).replace("-", "").replace(":", "").split("T")[0]
-            except Exception:
-                date_for_cache = "unknown"
-        else:
-            date_for_cache = "unknown"
-    # Also normalize wavelength and detector for cache key
-    try:
-        wl_value_int = int(wl_meta) if wl_meta else None
-    except Exception:
-        wl_value_int = None
-    det_meta = (smap.meta.get('detector') or smap.meta.get('DETECTOR') or '').strip()
-    # Cache key includes instrument + wavelength (and detector if available) + date
-    cache_key_parts = [str(inst).upper()]
-    if wl_value_int:
-        cache_key_parts.append(str(wl_value_int))
-    if det_meta:
-        cache_key_parts.append(det_meta.upper())
-    cache_key = "_".join(cache_key_parts)
-    filtered_cache_file = os.path.join(OUTPUT_DIR, f"temp_filtered_{cache_key}_{date_for_cache}.npz")
-    log_to_queue(f"[cache] Filter cache file: {filtered_cache_file}")
-    rhef_failed = False
-    # Try to load from cache, but rerun filter if previous run failed (rhef_failed marker)
-    if os.path.exists(filtered_cache_file):
-        log_to_queue(f"[cache] Using cached filtered data from {filtered_cache_file}...")
-        with np.load(filtered_cache_file, allow_pickle=True) as npz:
-            data = npz["data"]
-            rhef_failed = bool(npz.get("rhef_failed", False))
-        if rhef_failed:
-            log_to_queue("[cache] Previous filter run failed (rhef_failed=True); rerunning filter...")
-            filtered_map = default_filter(smap)
-            # If filtered_map is a Map, extract .data and check for fallback
-            data = filtered_map.data if hasattr(filtered_map, "data") else filtered_map
-            rhef_failed = bool(getattr(filtered_map, "meta", {}).get("rhef_failed", False))
-            np.savez_compressed(filtered_cache_file, data=data, rhef_failed=rhef_failed)
-            log_to_queue(f"[cache] Saved filtered data to {filtered_cache_file}")
-    else:
-        filtered_map = default_filter(smap)
-        # If filtered_map is a Map, extract .data and check for fallback
-        data = filtered_map.data if hasattr(filtered_map, "data") else filtered_map
-        if dolog:
-            data = np.log10(data)
-        rhef_failed = bool(getattr(filtered_map, "meta", {}).get("rhef_failed", False))
-        np.savez_compressed(filtered_cache_file, data=data, rhef_failed=rhef_failed)
-        log_to_queue(f"[cache] Saved filtered data to {filtered_cache_file}")
+    # Filtered data comes from default_filter, whose RHEF step is content-
+    # addressed (_rhef_cached). The old per-date temp_filtered_*.npz layer
+    # here is gone: it could serve another time-of-day's frame for the same
+    # date, and its compressed copy had to be fully inflated on every hit.
+    # A failed RHEF (asinh fallback, meta["rhef_failed"]) is never cached,
+    # so the next render retries the filter exactly as before.
+    filtered_map = default_filter(smap)
+    data = filtered_map.data if hasattr(filtered_map, "data") else filtered_map
+    if bool(getattr(filtered_map, "meta", {}).get("rhef_failed", False)):
+        log_to_queue("[render] RHEF failed for this frame; rendering the asinh fallback.")
+    if dolog:
+        data = np.log10(data)
     lo, hi = np.nanmin(data), np.nanmax(data)
     if not np.isfinite(lo) or not np.isfinite(hi) or hi <= lo:
         lo, hi = 0.0, 1.0
@@ -5198,12 +6635,16 @@ async def shopify_preview_options():
 # Dedicated endpoint to serve image assets (preview RHE + HQ) so Render serves correctly
 # -------------------------------------------------------------------
 @app.get("/asset/preview/{filename:path}")
-async def serve_preview_asset(filename: str):
+async def serve_preview_asset(filename: str, request: Request):
     """Serve RHE preview PNGs from PREVIEW_DIR. Used when StaticFiles mount is not enough (e.g. Render)."""
     safe_path = os.path.normpath(filename)
     if ".." in safe_path or os.path.isabs(safe_path):
         raise HTTPException(status_code=400, detail="Invalid path")
     file_path = os.path.join(PREVIEW_DIR, safe_path)
+    headers = {**CORS_HEADERS, "Cache-Control": "public, max-age=300"}
+    entry = await run_in_pool("files", hot_cache.get_file, os.path.realpath(file_path))
+    if entry is not None:
+        return entry_response(entry, request.headers, headers, media_type="image/png")
     if not os.path.exists(file_path) or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="Preview not found")
     return FileResponse(
@@ -5214,7 +6655,7 @@ async def serve_preview_asset(filename: str):
 
 
 @app.get("/asset/{subpath:path}")
-async def serve_asset(subpath: str):
+async def serve_asset(subpath: str, request: Request):
     """Serve any file under OUTPUT_DIR, including previews and HQ renders.
 
     NOTE: in practice the StaticFiles mount at "/asset" shadows this route
@@ -5225,11 +6666,16 @@ async def serve_asset(subpath: str):
     if ".." in safe.split(os.sep) or os.path.isabs(safe):
         raise HTTPException(status_code=404, detail="File not found")
     file_path = os.path.join(OUTPUT_DIR, safe)
-    if not os.path.realpath(file_path).startswith(os.path.realpath(OUTPUT_DIR) + os.sep):
+    real_path = os.path.realpath(file_path)
+    if not real_path.startswith(os.path.realpath(OUTPUT_DIR) + os.sep):
         raise HTTPException(status_code=404, detail="File not found")
+    headers = {**CORS_HEADERS, "Cache-Control": "no-cache"}
+    entry = await run_in_pool("files", hot_cache.get_file, real_path)
+    if entry is not None:
+        return entry_response(entry, request.headers, headers, media_type="image/png")
     if not os.path.exists(file_path) or not os.path.isfile(file_path):
         raise HTTPException(status_code=404, detail="File not found")
-    return FileResponse(file_path, media_type="image/png", headers={**CORS_HEADERS, "Cache-Control": "no-cache"})
+    return FileResponse(file_path, media_type="image/png", headers=headers)
 
 
 # -------------------------------------------------------------------
@@ -5266,6 +6712,19 @@ async def serve_css(request: Request):
         headers=_asset_cache_headers(request),
     )
 
+# Fonts the print compositor draws with (api/print_text.FONT_FILES). The
+# editor loads these exact files so a caption or text overlay rasterises
+# from the same outlines in the browser and in the server-composed print.
+# Whitelisted through FONT_FILES; the files never change, so long-cache.
+@app.get("/fonts/{name}")
+async def serve_font(name: str):
+    from api import print_text
+    if name not in {f for faces in print_text.FONT_FILES.values() for f in faces.values()}:
+        raise HTTPException(status_code=404)
+    return FileResponse(Path(__file__).parent / "fonts" / name, media_type="font/ttf",
+                        headers=_LONG_CACHE_HEADERS)
+
+
 # ES-module siblings of solar-archive.js. The module's `import "./foo.js"`
 # resolves to `/foo.js`, so each extracted module needs its own route at
 # the root path. Whitelisted (rather than a catch-all on /{name}.js) to
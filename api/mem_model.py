@@ -0,0 +1,150 @@
+"""
+Peak-RSS model for heavy renders.
+
+The heavy-render scheduler in main.py used to admit a fixed number of jobs
+(SOLAR_ARCHIVE_HEAVY_CONCURRENCY, 1 on the 2GB box), so a 512² preview and
+a full-res integrated print render each took "the" slot. This module
+predicts how many MB a job will add to the process's resident set so the
+scheduler can admit by memory instead: several previews beside one HQ,
+never two integrated renders on a box that can only fit one.
+
+A prediction is a hand-tuned prior from the job's workload, working-array
+size and frame count, times a per-workload correction factor learned from
+measured runs (EWMA of measured / prior). Only runs that had the process to
+themselves are fed back — with two jobs overlapping, neither one's RSS
+growth can be attributed. The factors persist to a small JSON file on the
+shared persistent disk (FEEDBACK_DATA_DIR) so a redeploy doesn't forget
+what the box learned; record() only updates memory, and main.py's idle
+loop writes the file (flush) on the maintenance pool, off the event loop.
+
+The factor only ever raises a prior, never lowers it (_FACTOR_MIN = 1.0).
+A run is measured as peak RSS minus RSS at admission, and on a warm heap
+glibc still holds the previous render's arenas, so later runs show little
+growth. Learning from those walked the factor down to its floor, and the
+scheduler then admitted several HQ renders that each needed the full
+prior — the OOM it exists to prevent. Under-measuring is the common error;
+over-measuring is not, so only the upward correction is trusted.
+
+Workloads:
+  preview        — 512² preview trio (reads the full FITS, block-reduces)
+  hq             — single-frame 4096² HQ RHEF
+  hq_integrated  — multi-frame integrated checkout render (streaming stack)
+"""
+
+import json
+import os
+import threading
+
+from api.feedback_routes import _data_dir  # shared persistent disk
+
+MODEL_FILE = _data_dir() / "render_memory.json"
+
+# AIA full-disk level-1 frame; also what the preview pipeline reads before
+# block-reducing, so it's the right working size for every workload today.
+FULL_RES_MP = 4096 * 4096 / 1e6
+# An integrated render asks for ±1 min of 12 s AIA cadence.
+INTEGRATE_FRAMES = 10
+
+# (base MB, MB per working megapixel, extra MB per megapixel per extra frame)
+# A 4096² float32 plane is 64 MB; RHEF + matplotlib hold ~10–12 of them at
+# peak. The integrated stack streams frames into one accumulator, so frames
+# cost far less than a full copy each. Seeds only — the learned factor
+# corrects them within a few runs.
+PRIORS = {
+    "preview": (120.0, 15.0, 0.0),
+    "hq": (200.0, 50.0, 0.0),
+    "hq_integrated": (200.0, 55.0, 2.0),
+}
+
+_ALPHA = 0.3
+_FACTOR_MIN, _FACTOR_MAX = 1.0, 3.0      # learn upward only; see the module docstring
+# Below this the sample is noise (a fully cached render) — don't learn from it.
+_MIN_SAMPLE_MB = 32.0
+
+_lock = threading.Lock()
+_factors: dict = {}         # workload → [factor, samples]
+_loaded = False
+_dirty = False
+
+
+def _load_locked() -> None:
+    global _loaded
+    if _loaded:
+        return
+    _loaded = True
+    try:
+        with MODEL_FILE.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            for k, v in data.items():
+                if k in PRIORS and isinstance(v, list) and len(v) == 2:
+                    # A file from before the floor may hold a lower factor.
+                    _factors[k] = [min(_FACTOR_MAX, max(_FACTOR_MIN, float(v[0]))), int(v[1])]
+    except (OSError, ValueError):
+        pass
+
+
+def _save(snapshot: dict) -> None:
+    try:
+        MODEL_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = MODEL_FILE.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(snapshot, f, separators=(",", ":"))
+        os.replace(tmp, MODEL_FILE)
+    except OSError as e:
+        print(f"[mem-model] save failed: {e}", flush=True)
+
+
+def prior_mb(workload: str, megapixels: float = FULL_RES_MP, frames: int = 1) -> float:
+    base, per_mp, per_frame = PRIORS.get(workload, PRIORS["hq"])
+    return base + megapixels * (per_mp + per_frame * max(0, int(frames) - 1))
+
+
+def predict_mb(workload: str, megapixels: float = FULL_RES_MP, frames: int = 1) -> float:
+    """Expected peak RSS growth (MB) for one job of this shape."""
+    with _lock:
+        _load_locked()
+        factor = _factors.get(workload, [1.0, 0])[0]
+    return prior_mb(workload, megapixels, frames) * factor
+
+
+def record(workload: str, megapixels: float, frames: int, measured_mb: float) -> None:
+    """Feed back one solo run's measured peak RSS growth. Memory only —
+    flush() persists it. Never raises."""
+    global _dirty
+    if workload not in PRIORS or measured_mb < _MIN_SAMPLE_MB:
+        return
+    ratio = measured_mb / prior_mb(workload, megapixels, frames)
+    with _lock:
+        _load_locked()
+        factor, n = _factors.get(workload, [1.0, 0])
+        # First sample replaces the seed outright; the prior is a guess.
+        factor = ratio if n == 0 else (1 - _ALPHA) * factor + _ALPHA * ratio
+        _factors[workload] = [min(_FACTOR_MAX, max(_FACTOR_MIN, factor)), n + 1]
+        _dirty = True
+
+
+def flush() -> None:
+    """Write the factors if record() changed them. Blocking file I/O: call
+    it from a pool, not the event loop."""
+    global _dirty
+    with _lock:
+        if not _dirty:
+            return
+        _dirty = False
+        snapshot = {k: list(v) for k, v in _factors.items()}
+    _save(snapshot)
+
+
+def stats() -> dict:
+    with _lock:
+        _load_locked()
+        factors = {k: list(v) for k, v in _factors.items()}
+    return {
+        w: {
+            "predicted_mb": round(predict_mb(w, frames=INTEGRATE_FRAMES if w == "hq_integrated" else 1)),
+            "factor": round(factors.get(w, [1.0, 0])[0], 3),
+            "samples": factors.get(w, [1.0, 0])[1],
+        }
+        for w in PRIORS
+    }
@@ -0,0 +1,183 @@
+"""
+Band-parallel PNG encoder for large print files and HQ renders.
+
+A 4096² RGBA print file is 64 MB of pixels, and PIL deflates it on one
+thread. On the shared-CPU machine a default-level encode took seconds, and
+it sits in the checkout critical path (/api/print_file) and at the end of
+every HQ render.
+
+A PNG's pixel data is one zlib stream, but deflate blocks do not have to
+share a compressor. The rows are split into bands, and each band is
+filtered and deflated on its own thread; zlib releases the GIL while it
+compresses, and so do the numpy filters. Every band but the last ends with
+Z_FULL_FLUSH, which byte-aligns the output and keeps later blocks from
+referring back across the seam, so the raw deflate pieces simply
+concatenate. The last band ends with Z_FINISH. The stream gets its
+two-byte zlib header up front and the Adler-32 of all the filtered rows at
+the end, and goes out as one IDAT chunk per band. Any PNG decoder reads
+the result; a band seam costs a few bytes of compression. Within a band,
+rows are filtered a chunk at a time into one reused buffer and fed to the
+compressor as they go, so the only full-size array is the caller's.
+
+One filter is applied to the whole image rather than chosen per row as
+libpng's adaptive heuristic does, which is much of why even one band beats
+PIL. On solar renders the filters land within a few percent of each other
+in size, and "up" is the cheap default; "paeth" costs about twice the
+filter time at level 1. api/scripts/bench_png.py measures all of them
+against Image.save("PNG").
+
+Bands run on the "encode" executor pool (api/executors.py).
+"""
+
+import struct
+import zlib
+from typing import Optional
+
+import numpy as np
+
+from api import executors
+
+FILTERS = {"none": 0, "sub": 1, "up": 2, "average": 3, "paeth": 4}
+_COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}      # channels → PNG colour type
+_MIN_BAND_ROWS = 64
+_CHUNK_BYTES = 1 << 18                       # rows filtered per compress() call
+
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return (struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
+
+
+def _zlib_header(level: int) -> bytes:
+    # FLEVEL is informational only; FCHECK makes the pair a multiple of 31.
+    flevel = 0 if level in (0, 1) else 1 if level < 6 else 2 if level == 6 else 3
+    cmf = 0x78
+    flg = flevel << 6
+    flg |= 31 - ((cmf << 8) | flg) % 31
+    return bytes((cmf, flg))
+
+
+def _filter_rows(rows: np.ndarray, prev: Optional[np.ndarray], kind: int, bpp: int,
+                 out: np.ndarray) -> np.ndarray:
+    """Filtered scanlines (filter byte + bytes) for `rows`, shaped
+    (n, width * channels) uint8, `bpp` bytes per pixel, written into the
+    first n rows of `out` and returned as that view. `prev` is the
+    unfiltered row above, or None at the top of the image.
+
+    PNG filters are byte arithmetic modulo 256, so everything but paeth's
+    predictor choice runs on uint8 and wraps for free; paeth widens to
+    int16 for its distances. Callers pass a few rows at a time, so no
+    temporary here is more than a chunk (see _encode_band)."""
+    n, stride = rows.shape
+    out = out[:n]
+    out[:, 0] = kind
+    res = out[:, 1:]
+    if kind == 0:
+        res[...] = rows
+        return out
+    up = np.empty_like(rows)
+    up[0] = 0 if prev is None else prev
+    up[1:] = rows[:-1]
+    if kind == 1:
+        res[:, :bpp] = rows[:, :bpp]
+        np.subtract(rows[:, bpp:], rows[:, :-bpp], out=res[:, bpp:], dtype=np.uint8)
+    elif kind == 2:
+        np.subtract(rows, up, out=res, dtype=np.uint8)
+    elif kind == 3:
+        # floor((left + up) / 2) without a ninth bit.
+        left = np.zeros_like(rows)
+        left[:, bpp:] = rows[:, :-bpp]
+        avg = (left >> 1) + (up >> 1) + (left & up & 1)
+        np.subtract(rows, avg, out=res, dtype=np.uint8)
+    else:
+        a = np.zeros((n, stride), np.int16)
+        a[:, bpp:] = rows[:, :-bpp]
+        b = up.astype(np.int16)
+        c = np.zeros_like(a)
+        c[:, bpp:] = b[:, :-bpp]
+        pa = np.abs(b - c)                      # |p - a| with p = a + b - c
+        pb = np.abs(a - c)
+        pc = np.abs(a + b - 2 * c)
+        pred = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+        np.subtract(rows, pred, out=res, dtype=np.uint8, casting="unsafe")
+    return out
+
+
+def _encode_band(rows, prev, kind, bpp, level, strategy, last):
+    """Deflate one band, a chunk of _CHUNK_BYTES of rows at a time: the
+    filtered rows go straight from a reused buffer into the compressor and
+    the checksum, so a band never exists whole in filtered form."""
+    h, stride = rows.shape
+    step = max(1, _CHUNK_BYTES // (stride + 1))
+    buf = np.empty((min(step, h), stride + 1), np.uint8)
+    comp = zlib.compressobj(level, zlib.DEFLATED, -15, 9, strategy)
+    pieces, adler = [], 1
+    for y in range(0, h, step):
+        raw = _filter_rows(rows[y:y + step], rows[y - 1] if y else prev, kind, bpp, buf)
+        pieces.append(comp.compress(raw))
+        adler = zlib.adler32(raw, adler)
+    pieces.append(comp.flush(zlib.Z_FINISH if last else zlib.Z_FULL_FLUSH))
+    return b"".join(pieces), adler, h * (stride + 1)
+
+
+def _adler32_combine(a1: int, a2: int, len2: int) -> int:
+    """zlib's adler32_combine: the checksum of A+B from those of A and B."""
+    base = 65521
+    rem = len2 % base
+    s1 = a1 & 0xFFFF
+    s2 = (rem * s1) % base
+    s1 = (s1 + (a2 & 0xFFFF) + base - 1) % base
+    s2 = (s2 + ((a1 >> 16) & 0xFFFF) + ((a2 >> 16) & 0xFFFF) + base - rem) % base
+    return (s2 << 16) | s1
+
+
+def encode_png(pixels, level: int = 6, filter: str = "up",
+               strategy: int = zlib.Z_DEFAULT_STRATEGY,
+               bands: Optional[int] = None) -> bytes:
+    """PNG bytes for `pixels`: a PIL image or an (h, w[, c]) uint8 array
+    with 1–4 channels (L, LA, RGB, RGBA).
+
+    `level` and `strategy` go to zlib (Z_RLE and Z_FILTERED are worth
+    trying on flat graphics); `filter` is one of FILTERS. `bands` defaults
+    to the encode pool's size, never fewer than _MIN_BAND_ROWS rows each.
+    """
+    arr = np.asarray(pixels)
+    if arr.dtype != np.uint8:
+        raise ValueError(f"8-bit pixels only, got {arr.dtype}")
+    if arr.ndim == 2:
+        arr = arr[:, :, None]
+    if arr.ndim != 3 or arr.shape[2] not in _COLOR_TYPES:
+        raise ValueError(f"unsupported pixel shape {arr.shape}")
+    if filter not in FILTERS:
+        raise ValueError(f"unknown PNG filter {filter!r}")
+    h, w, c = arr.shape
+    rows = np.ascontiguousarray(arr).reshape(h, w * c)
+    pool = executors.pool("encode")
+    n = bands or pool.max_workers
+    n = max(1, min(n, h // _MIN_BAND_ROWS or 1))
+    edges = [h * i // n for i in range(n + 1)]
+    jobs = [pool.submit(_encode_band, rows[y0:y1], rows[y0 - 1] if y0 else None,
+                        FILTERS[filter], c, level, strategy, i == n - 1)
+            for i, (y0, y1) in enumerate(zip(edges, edges[1:]))]
+    parts = [j.result() for j in jobs]
+
+    adler = 1
+    for _body, band_adler, band_len in parts:
+        adler = _adler32_combine(adler, band_adler, band_len)
+    out = [b"\x89PNG\r\n\x1a\n",
+           _chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, _COLOR_TYPES[c], 0, 0, 0))]
+    for i, (body, _a, _l) in enumerate(parts):
+        if i == 0:
+            body = _zlib_header(level) + body
+        if i == n - 1:
+            body = body + struct.pack(">I", adler)
+        out.append(_chunk(b"IDAT", body))
+    out.append(_chunk(b"IEND", b""))
+    return b"".join(out)
+
+
+def write_png(path: str, pixels, **kwargs) -> None:
+    """encode_png(pixels, **kwargs) written to `path`."""
+    body = encode_png(pixels, **kwargs)
+    with open(path, "wb") as fh:
+        fh.write(body)
@@ -11,14 +11,15 @@ This module reproduces the geometry and colour stages of the editor's
 `renderCanvas` (api/solar-archive.js) so the print file can be produced
 here from a few hundred bytes of parameters.
 
-SCOPE (phase 1): geometry (product aspect, zoom, pan, rotation, flips),
-colour (invert, brightness, contrast, saturation, hue), vignette, crop-edge
-feather, circular clip, background fill. TEXT OVERLAY IS DELIBERATELY OUT —
-canvas text metrics and font hinting will not match a server rasteriser
-without work that has to be proven, and a caption 3 px out of place on a
-$69 metal print is a refund. The caller keeps the browser upload path for
-text orders; `supports_params()` is the single source of truth for which
-side handles a given order.
+SCOPE: geometry (product aspect, zoom, pan, rotation, flips), colour
+(invert, brightness, contrast, saturation, hue), vignette, crop-edge
+feather, circular clip, background fill, and — since phase 2 — the
+timestamp caption, text overlay, wall-clock numerals (api/print_text.py)
+and dual-panel "match" files. Text is drawn only in the fonts bundled in
+api/fonts, which the editor loads too; a design in any other face keeps
+the browser upload path, because a caption in a substitute font on a $69
+metal print is a refund. `supports_params()` is the single source of truth
+for which side handles a given order.
 
 FIDELITY: every formula below is transcribed from renderCanvas, including
 the exact contrast factor, the YIQ hue matrix, the smoothstep ramps and the
@@ -26,17 +27,45 @@ the exact contrast factor, the YIQ hue matrix, the smoothstep ramps and the
 is the resampling kernel in the draw step (browser bilinear vs PIL); at 4096²
 that difference is sub-pixel. api/scripts/test_print_compose.py pins the
 formulas against hand-computed values.
+
+MEMORY: after the geometry step the canvas is processed in horizontal
+strips (STRIP_ROWS) in float32, every stage fused per strip. Against the
+old whole-canvas float64 pass that moves a few pixels in a million by one
+code value, which no print can show.
+
+SIZE: with `targetSize` (the product's print-area pixels, looked up from
+the Printify catalog by /api/print_file) the canvas is composed at that
+size rather than the source's. It is never composed larger than the source
+frame.
+
+DUAL PANEL: a "match" product (journals, mugs with a panel aspect) prints
+the composed face twice side by side, as getCanvasBase64 exports it, under
+the same 4096 px cap on the doubled width; "span" is an ordinary canvas.
+
+BATCH: render_batch / compose_batch compose one source for many products —
+the grid mockups, a multi-product checkout — decoding it once and drawing
+targets that share a sampling grid once (see render_batch).
 """
 from __future__ import annotations
 
 import math
+import os
+import threading
+from collections import OrderedDict
 from typing import Optional
 
 import numpy as np
 from PIL import Image
 
-# Parameters whose non-default presence means the browser must do the work.
-_CLIENT_ONLY_KEYS = ("textOverlay", "timestampStamp", "dualPanel")
+from api import png_writer, print_text
+
+# dualPanel values this module understands. `true` came from clients that
+# only flagged the feature and never said which mode; it stays unsupported.
+_DUAL_MODES = ("match", "span")
+
+# getCanvasBase64's export cap, applied to the doubled width of a
+# dual-panel "match" file.
+DUAL_MAX_DIM = 4096
 
 
 def supports_params(params: dict) -> bool:
@@ -47,18 +76,77 @@ def supports_params(params: dict) -> bool:
     risking a print that does not match what the customer approved."""
     if not isinstance(params, dict):
         return False
-    if params.get("textOverlay"):
-        return False
-    if params.get("timestampStamp"):
+    dual = params.get("dualPanel")
+    if not _absent(dual) and dual not in _DUAL_MODES:
         return False
-    if params.get("dualPanel"):
-        return False
-    # Clock numerals are drawn by the editor, not here.
-    if params.get("clockNumbers"):
+    # Text, caption and numerals only in bundled fonts (print_text.py).
+    if not print_text.supported(params):
         return False
     return True
 
 
+# Bump whenever a change here alters the output for the same inputs: the
+# print-file cache in main.py keys on it, so files composed under the old
+# rules stop matching instead of being served as if current.
+COMPOSE_VERSION = 3
+
+# Every parameter compose() reads. canonical_params keeps only these, so
+# editor state that never reaches the pixels can't split the cache.
+_PARAM_KEYS = (
+    "rotation", "aspectRatio", "cropZoom", "panX", "panY", "panRefW", "panRefH",
+    "flipH", "flipV", "inverted", "brightness", "contrast", "saturation", "hue",
+    "printShape", "productId", "vignette", "vignetteWidth", "vignetteFade",
+    "vignetteFadeColor", "vignetteModeR", "vignetteModeG", "vignetteModeB",
+    "cropEdgeFeatherX", "cropEdgeFeatherY", "background", "targetSize",
+    "timestampStamp", "timestampText", "timestampPos", "timestampVOffset",
+    "textOverlay", "clockNumbers", "dualPanel",
+)
+
+# Caption settings that only matter while the caption is on.
+_TIMESTAMP_KEYS = ("timestampText", "timestampPos", "timestampVOffset")
+
+
+def _absent(v) -> bool:
+    # Identity, not ==: 0 == False, and saturation 0 is a real setting.
+    return v is None or v is False or (isinstance(v, str) and not v)
+
+
+def _canonical_value(v):
+    if isinstance(v, bool) or v is None or isinstance(v, str):
+        return v
+    if isinstance(v, (int, float)):
+        f = float(v)
+        return int(f) if f.is_integer() else f
+    if isinstance(v, dict):
+        return {str(k): _canonical_value(x) for k, x in v.items() if not _absent(x)}
+    if isinstance(v, (list, tuple)):
+        return [_canonical_value(x) for x in v]
+    return str(v)
+
+
+def canonical_params(params: dict) -> str:
+    """`params` as a stable string, for keying composed output: only the
+    keys compose() reads, absent/None/False/"" dropped (compose treats them
+    alike), 20 and 20.0 the same, keys sorted. productId only matters as
+    "wall_clock" (the round clock), so every other product collapses, and
+    dualPanel only as "match"; caption settings drop with the caption."""
+    import json
+    out = {}
+    for k in _PARAM_KEYS:
+        v = params.get(k)
+        if _absent(v):
+            continue
+        if k == "productId":
+            if v != "wall_clock":
+                continue
+        if k == "dualPanel" and v != "match":
+            continue
+        if k in _TIMESTAMP_KEYS and not params.get("timestampStamp"):
+            continue
+        out[k] = _canonical_value(v)
+    return json.dumps(out, sort_keys=True, separators=(",", ":"))
+
+
 def _smoothstep(t: np.ndarray) -> np.ndarray:
     return t * t * (3.0 - 2.0 * t)
 
@@ -91,18 +179,306 @@ def _canvas_size(src_w: int, src_h: int, rotation: int, aspect: Optional[dict]):
     return int(cw), int(ch), int(ref_cw), int(ref_ch)
 
 
-def compose(src_path: str, params: dict, out_path: str) -> str:
-    """Render the print file. Returns `out_path`.
+def _target_canvas(cw: int, ch: int, target: Optional[dict]):
+    """Output size for a cw×ch frame printed on a `target` {w, h} placeholder:
+    the smallest canvas of the frame's aspect that still covers the target
+    on both axes, and never bigger than the frame itself — a product that
+    prints at 1200 px gets 1200 px, not the source's 4096.
 
-    `params` uses the editor's own state names so the client can pass its
-    state through without a translation layer that could drift.
+    Cover rather than fit: when the frame and placeholder aspects differ a
+    little, Printify scales the file to the placeholder and the short side
+    would otherwise be upsampled."""
+    try:
+        tw, th = float(target["w"]), float(target["h"])
+    except (TypeError, KeyError, ValueError):
+        return cw, ch
+    if not (tw > 0 and th > 0):
+        return cw, ch
+    s = max(tw / cw, th / ch)
+    if s >= 1.0:
+        return cw, ch
+    return max(1, int(round(cw * s))), max(1, int(round(ch * s)))
+
+
+def colour_matrix(params: dict) -> Optional[np.ndarray]:
+    """The editor's colour stages folded into one 3×4 affine matrix
+    [A | t], so rgb' = A·rgb + t; None when every stage is a no-op.
+
+    Invert, brightness, contrast, saturation (luma-weighted) and the YIQ hue
+    rotation are each affine in RGB and renderCanvas clamps only after the
+    last of them, so their product is exact: one pass over the canvas
+    instead of five or six full-size temporaries. Composed in float64, in
+    renderCanvas's order; test_print_compose.py checks it against the
+    stages applied one by one."""
+    m = np.eye(4)
+
+    def then(step):
+        nonlocal m
+        m = step @ m
+
+    def affine(a, t=(0.0, 0.0, 0.0)):
+        step = np.eye(4)
+        step[:3, :3] = a
+        step[:3, 3] = t
+        return step
+
+    if params.get("inverted"):
+        then(affine(-np.eye(3), (255.0, 255.0, 255.0)))
+
+    br = float(params.get("brightness") or 0)
+    if br:
+        then(affine(np.eye(3), (br, br, br)))
+
+    co = float(params.get("contrast") or 0) / 100.0
+    if co:
+        factor = (259.0 * (co * 255.0 + 255.0)) / (255.0 * (259.0 - co * 255.0))
+        k = 128.0 * (1.0 - factor)
+        then(affine(factor * np.eye(3), (k, k, k)))
+
+    sat = float(params.get("saturation", 100) if params.get("saturation") is not None else 100) / 100.0
+    if sat != 1.0:
+        # gray + sat·(c − gray), gray = 0.2989 r + 0.587 g + 0.114 b
+        luma = np.array([0.2989, 0.587, 0.114])
+        then(affine(sat * np.eye(3) + (1.0 - sat) * np.outer(np.ones(3), luma)))
+
+    hue_deg = float(params.get("hue") or 0)
+    if hue_deg % 360 != 0:
+        hc, hs = math.cos(math.radians(hue_deg)), math.sin(math.radians(hue_deg))
+        then(affine(np.array([
+            [0.213 + 0.787 * hc - 0.213 * hs, 0.715 - 0.715 * hc - 0.715 * hs, 0.072 - 0.072 * hc + 0.928 * hs],
+            [0.213 - 0.213 * hc + 0.143 * hs, 0.715 + 0.285 * hc + 0.140 * hs, 0.072 - 0.072 * hc - 0.283 * hs],
+            [0.213 - 0.213 * hc - 0.787 * hs, 0.715 - 0.715 * hc + 0.715 * hs, 0.072 + 0.928 * hc + 0.072 * hs],
+        ])))
+
+    if np.array_equal(m, np.eye(4)):
+        return None
+    return m[:3]
+
+
+# Rows per composition strip. 256 rows of a 4096-wide canvas is ~16 MB of
+# float32 RGBA working set, against ~770 MB when the whole canvas was
+# promoted to float64 with a full float64 mgrid beside it — enough to OOM
+# the 2 GB box while a render was running, which is why /api/print_file
+# had to be rate-limited so hard.
+STRIP_ROWS = 256
+
+
+def _mask_key(cw: int, ch: int, params: dict, is_circular: bool) -> tuple:
+    """Everything the vignette, feather and clip fields depend on. The fade
+    colour is not part of it: it is applied with the field, not baked in."""
+    vig = float(params.get("vignette") or 0)
+    return (cw, ch, is_circular, vig,
+            float(params.get("vignetteWidth") or 0) if vig > 0 else 0.0,
+            float(params.get("cropEdgeFeatherX") or 0),
+            float(params.get("cropEdgeFeatherY") or 0))
+
+
+def _mask_rows(key: tuple, y0: int, y1: int):
+    """(keep, cov) for canvas rows y0:y1, float32, each None when unused.
+
+    keep — 1 − fade. Vignette and crop-edge feather each fade towards the
+           same colour, and two fades in a row compose to one whose keep is
+           the product of theirs: c·(1−t₁)(1−t₂) + f·(1 − (1−t₁)(1−t₂)).
+    cov  — circular-clip coverage, applied after the fades.
+
+    Built from separable pieces: a column vector and a row vector per axis,
+    squared distances summed by broadcasting, so nothing but the output
+    rows is ever canvas-sized."""
+    cw, ch, is_circular, vig, vig_w, fx, fy = key
+    xx = np.arange(cw, dtype=np.float32)
+    yy = np.arange(y0, y1, dtype=np.float32)[:, None]
+    cx, cy = cw / 2.0, ch / 2.0
+    keep = None
+    d2 = None
+    if vig > 0 or is_circular:
+        d2 = (xx - cx) ** 2 + (yy - cy) ** 2
+
+    if vig > 0:
+        max_r = (min(cw, ch) / 2.0) if is_circular else math.sqrt(cx * cx + cy * cy)
+        vig_r = max_r * (1.0 - (vig / 100.0) * 0.9)
+        fade_len = (max_r - vig_r) * (vig_w / 100.0)
+        dist = np.sqrt(d2)
+        if fade_len > 0.5:
+            t = np.clip((dist - vig_r) / fade_len, 0.0, 1.0)
+        else:
+            t = (dist > vig_r).astype(np.float32)
+        keep = 1.0 - _smoothstep(t)
+
+    if fx > 0 or fy > 0:
+        # Each ramp depends on one axis only, so it is a row or column
+        # vector; np.maximum broadcasts them to the rows.
+        e_tx = np.zeros(xx.shape, np.float32)
+        e_ty = np.zeros(yy.shape, np.float32)
+        if fx > 0:
+            w_x = (fx / 100.0) * (cw * 0.25)
+            d_x = np.minimum(xx, (cw - 1) - xx)
+            e_tx = _smoothstep(np.clip(1.0 - (d_x / w_x), 0.0, 1.0))
+        if fy > 0:
+            w_y = (fy / 100.0) * (ch * 0.25)
+            d_y = np.minimum(yy, (ch - 1) - yy)
+            e_ty = _smoothstep(np.clip(1.0 - (d_y / w_y), 0.0, 1.0))
+        edge = 1.0 - np.maximum(e_tx, e_ty)
+        keep = edge if keep is None else keep * edge
+
+    cov = None
+    if is_circular:
+        # One-pixel coverage ramp at the rim, matching the canvas clip's
+        # antialiasing. A hard cut left a visible stair-step against the
+        # browser's smooth edge on round products.
+        cov = np.clip(min(cw, ch) / 2.0 + 0.5 - np.sqrt(d2), 0.0, 1.0)
+    if keep is not None:
+        keep = np.broadcast_to(keep, (y1 - y0, cw))
+    return keep, cov
+
+
+class _MaskCache:
+    """Small LRU of whole-canvas (keep, cov) fields, stored as float16.
+
+    Checkout and mockup generation compose the same product geometry over
+    and over — one print file, then a mockup per colourway — and every call
+    used to rebuild identical distance fields. float16 holds a [0, 1] field
+    to ~5e-4, a quarter of one code value at 255. Fields bigger than the
+    whole budget are never cached; compose builds those strip by strip.
+
+    PRINT_MASK_CACHE_MB sets the budget (default 64, ~one 4096² canvas with
+    both fields; 0 disables).
     """
-    src = Image.open(src_path).convert("RGBA")
-    src_w, src_h = src.size
 
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _nbytes(fields) -> int:
+        return sum(f.nbytes for f in fields if f is not None)
+
+    def get(self, key: tuple):
+        """The cached (keep, cov) for `key`, building it if it fits; None
+        when the fields are too big to cache."""
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return hit
+            self.misses += 1
+        cw, ch, is_circular, vig, _vw, fx, fy = key
+        has_keep = vig > 0 or fx > 0 or fy > 0
+        if (int(has_keep) + int(is_circular)) * cw * ch * 2 > self.max_bytes:
+            return None
+        keep = np.empty((ch, cw), np.float16) if has_keep else None
+        cov = np.empty((ch, cw), np.float16) if is_circular else None
+        for y0 in range(0, ch, STRIP_ROWS):
+            y1 = min(ch, y0 + STRIP_ROWS)
+            k, c = _mask_rows(key, y0, y1)
+            if keep is not None:
+                keep[y0:y1] = k
+            if cov is not None:
+                cov[y0:y1] = c
+        fields = (keep, cov)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = fields
+                self._bytes += self._nbytes(fields)
+            while self._bytes > self.max_bytes and self._entries:
+                _k, old = self._entries.popitem(last=False)
+                self._bytes -= self._nbytes(old)
+        return fields
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes,
+                    "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses}
+
+
+try:
+    _MASKS = _MaskCache(int(float(os.environ.get("PRINT_MASK_CACHE_MB", "64")) * 1024 * 1024))
+except (TypeError, ValueError):
+    _MASKS = _MaskCache(64 * 1024 * 1024)
+
+
+def _compose_strip(px: np.ndarray, colour: Optional[np.ndarray], keep, cov,
+                   fade_mode: str, fade_rgb, bg_rgb) -> np.ndarray:
+    """Colour (`colour_matrix`, or None), vignette + feather (`keep`),
+    circular clip (`cov`) and background fill for one horizontal strip of
+    the canvas, in float32. `px` is the strip's uint8 RGBA rows; `keep` and
+    `cov` are that strip's rows of the `_mask_rows` fields, or None.
+    Returns the finished uint8 rows."""
+    f = px.astype(np.float32)
+    r, g, b, a = f[..., 0], f[..., 1], f[..., 2], f[..., 3]
+
+    # ── Colour: one affine pass (see colour_matrix) ───────────────────
+    if colour is not None:
+        rgb = f[..., :3] @ colour[:, :3].T
+        rgb += colour[:, 3]
+        r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+
+    # ── Vignette + crop-edge feather, then the circular clip ──────────
+    if keep is not None:
+        if fade_mode == "transparent":
+            a = a * keep
+        else:
+            lose = 1.0 - keep
+            fr, fg, fb = fade_rgb
+            r = r * keep + fr * lose
+            g = g * keep + fg * lose
+            b = b * keep + fb * lose
+
+    if cov is not None:
+        # The browser does clearRect + drawImage(clipped), which leaves
+        # fully-transparent BLACK outside the disc. Zeroing only alpha and
+        # keeping the RGB underneath looks identical on screen but produces
+        # different bytes, and anything downstream that ignores alpha (a
+        # flattener, a proofing tool) would show the ghost. Match exactly.
+        a = a * cov
+        r, g, b = r * cov, g * cov, b * cov
+
+    out = np.empty(px.shape, np.uint8)
+    for i, c in enumerate((r, g, b, a)):
+        out[..., i] = np.clip(c, 0, 255)
+
+    # Background fill for transparent areas — matches renderCanvas's
+    # "fill any pixel with alpha < 10" pass, done as the "source over an
+    # opaque colour" composite PIL's alpha_composite did on the whole
+    # image. "transparent" leaves alpha.
+    if bg_rgb is not None:
+        alpha = out[..., 3:4].astype(np.float32) / 255.0
+        flat = out[..., :3] * alpha + np.asarray(bg_rgb, np.float32) * (1.0 - alpha)
+        out[..., :3] = np.floor(flat + 0.5)
+        out[..., 3] = 255
+    return out
+
+
+def _mat_mul(a, b):
+    return (
+        a[0] * b[0] + a[1] * b[3], a[0] * b[1] + a[1] * b[4], a[0] * b[2] + a[1] * b[5] + a[2],
+        a[3] * b[0] + a[4] * b[3], a[3] * b[1] + a[4] * b[4], a[3] * b[2] + a[4] * b[5] + a[5],
+    )
+
+
+def _plan(src_w: int, src_h: int, params: dict):
+    """(cw, ch, m, reduce_by) for one target: the canvas size, the forward
+    affine map m from source pixels to canvas pixels, and the box-reduce
+    factor the source is read at (m already maps the reduced source)."""
     rotation = int(params.get("rotation") or 0)
     aspect = params.get("aspectRatio") or None
-    cw, ch, ref_cw, ref_ch = _canvas_size(src_w, src_h, rotation, aspect)
+    frame_w, frame_h, ref_cw, ref_ch = _canvas_size(src_w, src_h, rotation, aspect)
+    # The geometry is worked out in frame pixels, as the editor does; the
+    # canvas itself is only as big as the product's placeholder needs.
+    target = params.get("targetSize")
+    dual = _is_dual(params)
+    if dual and isinstance(target, dict) and target.get("w"):
+        # The placeholder spans both faces; each face is half of it.
+        target = dict(target, w=float(target["w"]) / 2.0)
+    cw, ch = _target_canvas(frame_w, frame_h, target)
+    if dual:
+        cap = min(1.0, DUAL_MAX_DIM / float(max(2 * frame_w, frame_h)))
+        if cw > frame_w * cap:
+            cw, ch = max(1, int(round(frame_w * cap))), max(1, int(round(frame_h * cap)))
 
     zoom = float(params.get("cropZoom") or 100) / 100.0
     # panX/panY are expressed in the EDITOR's reference resolution (the preview
@@ -146,24 +522,76 @@ def compose(src_path: str, params: dict, out_path: str) -> str:
     sx = -1.0 if flip_h else 1.0
     sy = -1.0 if flip_v else 1.0
 
-    # Forward: src px -> canvas px. Build as matrix, then invert for PIL's
-    # AFFINE transform (which maps output -> input).
-    def mat_mul(a, b):
-        return (
-            a[0] * b[0] + a[1] * b[3], a[0] * b[1] + a[1] * b[4], a[0] * b[2] + a[1] * b[5] + a[2],
-            a[3] * b[0] + a[4] * b[3], a[3] * b[1] + a[4] * b[4], a[3] * b[2] + a[4] * b[5] + a[5],
-        )
-
-    m = (1, 0, cw / 2.0, 0, 1, ch / 2.0)                 # translate(cw/2, ch/2)
-    m = mat_mul(m, (zoom, 0, 0, 0, zoom, 0))              # scale(zoom)
-    m = mat_mul(m, (1, 0, -pan_x, 0, 1, -pan_y))          # translate(-pan)
-    m = mat_mul(m, (1, 0, ref_cw / 2.0, 0, 1, ref_ch / 2.0))
-    m = mat_mul(m, (cos_t, -sin_t, 0, sin_t, cos_t, 0))   # rotate
-    m = mat_mul(m, (sx, 0, 0, 0, sy, 0))                  # flip
-    m = mat_mul(m, (1, 0, -ref_cw / 2.0, 0, 1, -ref_ch / 2.0))
-    m = mat_mul(m, (1, 0, off_x, 0, 1, off_y))            # draw offset
-    m = mat_mul(m, (scale_img, 0, 0, 0, scale_img, 0))    # cover scale
-
+    # Forward: src px -> canvas px. Built as a matrix; _draw inverts it
+    # for PIL's AFFINE transform (which maps output -> input).
+    m = (cw / frame_w, 0, 0, 0, ch / frame_h, 0)          # frame → target canvas
+    m = _mat_mul(m, (1, 0, frame_w / 2.0, 0, 1, frame_h / 2.0))  # translate(cw/2, ch/2)
+    m = _mat_mul(m, (zoom, 0, 0, 0, zoom, 0))              # scale(zoom)
+    m = _mat_mul(m, (1, 0, -pan_x, 0, 1, -pan_y))          # translate(-pan)
+    m = _mat_mul(m, (1, 0, ref_cw / 2.0, 0, 1, ref_ch / 2.0))
+    m = _mat_mul(m, (cos_t, -sin_t, 0, sin_t, cos_t, 0))   # rotate
+    m = _mat_mul(m, (sx, 0, 0, 0, sy, 0))                  # flip
+    m = _mat_mul(m, (1, 0, -ref_cw / 2.0, 0, 1, -ref_ch / 2.0))
+    m = _mat_mul(m, (1, 0, off_x, 0, 1, off_y))            # draw offset
+    m = _mat_mul(m, (scale_img, 0, 0, 0, scale_img, 0))    # cover scale
+
+    # Bicubic sampling doesn't prefilter, so a 4096 source drawn onto a
+    # coaster-sized canvas would alias. Box-reduce the source first to
+    # within 2× of the output scale; the transform then reads the reduced
+    # image, whose pixel k·u is the original's u.
+    reduce_by = int(1.0 / math.sqrt(abs(m[0] * m[4] - m[1] * m[3]) or 1.0)) if cw < frame_w else 1
+    if reduce_by >= 2:
+        m = _mat_mul(m, (reduce_by, 0, 0, 0, reduce_by, 0))
+    else:
+        reduce_by = 1
+    return cw, ch, m, reduce_by
+
+
+class _Source:
+    """One decoded source, shared by every target of a render_batch: the
+    PNG is decoded and converted once, and each box-reduced copy and the
+    pixel array are made at most once."""
+
+    def __init__(self, src_path: str):
+        self.image = Image.open(src_path).convert("RGBA")
+        self.size = self.image.size
+        self._reduced = {1: self.image}
+        self._pixels = {}
+
+    def reduced(self, k: int) -> Image.Image:
+        if k not in self._reduced:
+            self._reduced[k] = self.image.reduce(k)
+        return self._reduced[k]
+
+    def pixels(self, k: int) -> np.ndarray:
+        if k not in self._pixels:
+            self._pixels[k] = np.asarray(self.reduced(k))
+        return self._pixels[k]
+
+
+def _is_shift(m) -> bool:
+    """True when m is a whole-pixel translation: the canvas is then a plain
+    copy of a source window and no resampling is needed."""
+    return (abs(m[0] - 1.0) < 1e-9 and abs(m[4] - 1.0) < 1e-9
+            and abs(m[1]) < 1e-9 and abs(m[3]) < 1e-9
+            and abs(m[2] - round(m[2])) < 1e-6 and abs(m[5] - round(m[5])) < 1e-6)
+
+
+def _draw(source: _Source, m, reduce_by: int, w: int, h: int) -> np.ndarray:
+    """The w×h uint8 RGBA canvas of `source` under the forward map m."""
+    if _is_shift(m):
+        # Copy the window (bicubic at whole-pixel offsets is a copy too,
+        # bar PIL's premultiply round trip on translucent pixels) and
+        # blank RGB under alpha 0, as the canvas's premultiplied store does.
+        px = source.pixels(reduce_by)
+        out = np.zeros((h, w, 4), np.uint8)
+        tx, ty = int(round(m[2])), int(round(m[5]))
+        x0, y0 = max(0, tx), max(0, ty)
+        x1, y1 = min(w, px.shape[1] + tx), min(h, px.shape[0] + ty)
+        if x1 > x0 and y1 > y0:
+            out[y0:y1, x0:x1] = px[y0 - ty:y1 - ty, x0 - tx:x1 - tx]
+            out[..., :3][out[..., 3] == 0] = 0
+        return out
     det = m[0] * m[4] - m[1] * m[3]
     if abs(det) < 1e-12:
         raise ValueError("degenerate transform")
@@ -171,52 +599,17 @@ def compose(src_path: str, params: dict, out_path: str) -> str:
         m[4] / det, -m[1] / det, (m[1] * m[5] - m[2] * m[4]) / det,
         -m[3] / det, m[0] / det, (m[2] * m[3] - m[0] * m[5]) / det,
     )
-    canvas = src.transform((cw, ch), Image.AFFINE, inv,
-                           resample=Image.BICUBIC, fillcolor=(0, 0, 0, 0))
-
-    arr = np.asarray(canvas).astype(np.float64)
-    r, g, b, a = arr[..., 0], arr[..., 1], arr[..., 2], arr[..., 3]
-
-    # ── Colour, in renderCanvas's order ───────────────────────────────
-    if params.get("inverted"):
-        r, g, b = 255.0 - r, 255.0 - g, 255.0 - b
-
-    br = float(params.get("brightness") or 0)
-    if br:
-        r, g, b = r + br, g + br, b + br
+    canvas = source.reduced(reduce_by).transform((w, h), Image.AFFINE, inv,
+                                                 resample=Image.BICUBIC, fillcolor=(0, 0, 0, 0))
+    return np.asarray(canvas)
 
-    co = float(params.get("contrast") or 0) / 100.0
-    if co:
-        factor = (259.0 * (co * 255.0 + 255.0)) / (255.0 * (259.0 - co * 255.0))
-        r = factor * (r - 128.0) + 128.0
-        g = factor * (g - 128.0) + 128.0
-        b = factor * (b - 128.0) + 128.0
 
-    sat = float(params.get("saturation", 100) if params.get("saturation") is not None else 100) / 100.0
-    if sat != 1.0:
-        gray = 0.2989 * r + 0.587 * g + 0.114 * b
-        r = gray + sat * (r - gray)
-        g = gray + sat * (g - gray)
-        b = gray + sat * (b - gray)
-
-    hue_deg = float(params.get("hue") or 0)
-    if hue_deg % 360 != 0:
-        hc, hs = math.cos(math.radians(hue_deg)), math.sin(math.radians(hue_deg))
-        hrr = 0.213 + 0.787 * hc - 0.213 * hs
-        hrg = 0.715 - 0.715 * hc - 0.715 * hs
-        hrb = 0.072 - 0.072 * hc + 0.928 * hs
-        hgr = 0.213 - 0.213 * hc + 0.143 * hs
-        hgg = 0.715 + 0.285 * hc + 0.140 * hs
-        hgb = 0.072 - 0.072 * hc - 0.283 * hs
-        hbr = 0.213 - 0.213 * hc - 0.787 * hs
-        hbg = 0.715 - 0.715 * hc + 0.715 * hs
-        hbb = 0.072 + 0.928 * hc + 0.072 * hs
-        r, g, b = (hrr * r + hrg * g + hrb * b,
-                   hgr * r + hgg * g + hgb * b,
-                   hbr * r + hbg * g + hbb * b)
-
-    is_circular = bool(params.get("printShape") == "circle"
-                       or params.get("productId") == "wall_clock")
+def _finish(arr: np.ndarray, params: dict, colour: Optional[np.ndarray],
+            frame: Optional[tuple] = None) -> np.ndarray:
+    """Colour, masks, text and background for a drawn canvas, strip by
+    strip. `frame` is the (w, h) the text parameters are relative to."""
+    ch, cw = arr.shape[:2]
+    is_circular = _is_circular(params)
     fade_mode = params.get("vignetteFade") or "transparent"
     fade_rgb = _hex_rgb(params.get("vignetteFadeColor"), (0, 0, 0))
     if fade_mode == "black":
@@ -227,80 +620,183 @@ def compose(src_path: str, params: dict, out_path: str) -> str:
         fade_rgb = (int(params.get("vignetteModeR") or 0),
                     int(params.get("vignetteModeG") or 0),
                     int(params.get("vignetteModeB") or 0))
+    bg = params.get("background")
+    bg_rgb = None
+    if bg and bg != "transparent":
+        bg_rgb = {"black": (0, 0, 0), "white": (255, 255, 255)}.get(bg, _hex_rgb(bg, (0, 0, 0)))
 
-    def _apply_fade(t):
-        nonlocal r, g, b, a
-        if fade_mode == "transparent":
-            a = a * (1.0 - t)
+    key = _mask_key(cw, ch, params, is_circular)
+    if frame is None or not print_text.has_text(params):
+        return _strips(arr, colour, key, True, fade_mode, fade_rgb, bg_rgb)
+    # renderCanvas draws text after its pixel loop (colour + vignette) and
+    # before the crop-edge feather, the circular clip and the background,
+    # so the feather fades the caption and the clip cuts the numerals just
+    # as they did in the editor. Two passes around the text.
+    _cw, _ch, _circ, vig, vig_w, fx, fy = key
+    out = _strips(arr, colour, (cw, ch, is_circular, vig, vig_w, 0.0, 0.0), False,
+                  fade_mode, fade_rgb, None)
+    print_text.draw(out, params, frame[0], frame[1])
+    return _strips(out, None, (cw, ch, is_circular, 0.0, 0.0, fx, fy), True,
+                   fade_mode, fade_rgb, bg_rgb)
+
+
+def _strips(arr: np.ndarray, colour: Optional[np.ndarray], key: tuple, clip: bool,
+            fade_mode: str, fade_rgb, bg_rgb) -> np.ndarray:
+    """_compose_strip over the whole canvas. `clip` False leaves the
+    circular clip out (the vignette still sizes itself to the disc)."""
+    ch = arr.shape[0]
+    out = np.empty_like(arr)
+    # Mask fields come from the geometry cache when they fit it; otherwise
+    # each strip builds its own rows, so nothing canvas-sized is float.
+    if not clip and key[3] <= 0:
+        cached = (None, None)
+    else:
+        cached = _MASKS.get(key) if _has_masks(key) else (None, None)
+    for y0 in range(0, ch, STRIP_ROWS):
+        y1 = min(ch, y0 + STRIP_ROWS)
+        if cached is not None:
+            keep, cov = (None if f is None else f[y0:y1] for f in cached)
         else:
-            fr, fg, fb = fade_rgb
-            r = r * (1.0 - t) + fr * t
-            g = g * (1.0 - t) + fg * t
-            b = b * (1.0 - t) + fb * t
+            keep, cov = _mask_rows(key, y0, y1)
+        out[y0:y1] = _compose_strip(arr[y0:y1], colour, keep, cov if clip else None,
+                                    fade_mode, fade_rgb, bg_rgb)
+    return out
 
-    yy, xx = np.mgrid[0:ch, 0:cw].astype(np.float64)
 
-    vig = float(params.get("vignette") or 0)
-    if vig > 0:
-        cx, cy = cw / 2.0, ch / 2.0
-        max_r = (min(cw, ch) / 2.0) if is_circular else math.sqrt(cx * cx + cy * cy)
-        vig_r = max_r * (1.0 - (vig / 100.0) * 0.9)
-        width_factor = float(params.get("vignetteWidth") or 0) / 100.0
-        dist = np.sqrt((xx - cx) ** 2 + (yy - cy) ** 2)
-        fade_len = (max_r - vig_r) * width_factor
-        t = np.zeros_like(dist)
-        outside = dist > vig_r
-        if fade_len > 0.5:
-            t[outside] = np.minimum((dist[outside] - vig_r) / fade_len, 1.0)
-        else:
-            t[outside] = 1.0
-        _apply_fade(_smoothstep(t))
+def _is_circular(params: dict) -> bool:
+    return bool(params.get("printShape") == "circle"
+                or params.get("productId") == "wall_clock")
 
-    fx = float(params.get("cropEdgeFeatherX") or 0)
-    fy = float(params.get("cropEdgeFeatherY") or 0)
-    if fx > 0 or fy > 0:
-        e_tx = np.zeros((ch, cw))
-        e_ty = np.zeros((ch, cw))
-        if fx > 0:
-            w_x = (fx / 100.0) * (cw * 0.25)
-            if w_x > 0:
-                d_x = np.minimum(xx, (cw - 1) - xx)
-                raw = np.clip(1.0 - (d_x / w_x), 0.0, 1.0)
-                e_tx = _smoothstep(raw)
-        if fy > 0:
-            w_y = (fy / 100.0) * (ch * 0.25)
-            if w_y > 0:
-                d_y = np.minimum(yy, (ch - 1) - yy)
-                raw = np.clip(1.0 - (d_y / w_y), 0.0, 1.0)
-                e_ty = _smoothstep(raw)
-        _apply_fade(np.maximum(e_tx, e_ty))
 
-    if is_circular:
-        # The browser does clearRect + drawImage(clipped), which leaves
-        # fully-transparent BLACK outside the disc. Zeroing only alpha and
-        # keeping the RGB underneath looks identical on screen but produces
-        # different bytes, and anything downstream that ignores alpha (a
-        # flattener, a proofing tool) would show the ghost. Match exactly.
-        circ_r = min(cw, ch) / 2.0
-        dist = np.sqrt((xx - cw / 2.0) ** 2 + (yy - ch / 2.0) ** 2)
-        # One-pixel coverage ramp at the rim, matching the canvas clip's
-        # antialiasing. A hard cut left a visible stair-step against the
-        # browser's smooth edge on round products.
-        cov = np.clip(circ_r + 0.5 - dist, 0.0, 1.0)
-        a = a * cov
-        r, g, b = r * cov, g * cov, b * cov
+def _is_dual(params: dict) -> bool:
+    return params.get("dualPanel") == "match"
 
-    out = np.clip(np.stack([r, g, b, a], axis=-1), 0, 255).astype(np.uint8)
-    img = Image.fromarray(out, mode="RGBA")
 
-    # Background fill for transparent areas — matches renderCanvas's
-    # "fill any pixel with alpha < 10" pass. "transparent" leaves alpha.
-    bg = params.get("background")
-    if bg and bg != "transparent":
-        bg_rgb = {"black": (0, 0, 0), "white": (255, 255, 255)}.get(bg, _hex_rgb(bg, (0, 0, 0)))
-        flat = Image.new("RGBA", img.size, bg_rgb + (255,))
-        flat.alpha_composite(img)
-        img = flat
+def _frame_size(src_w: int, src_h: int, params: dict):
+    """The editor's export canvas for `params` — what text is laid out on."""
+    return _canvas_size(src_w, src_h, int(params.get("rotation") or 0),
+                        params.get("aspectRatio") or None)[:2]
+
+
+def _has_masks(key: tuple) -> bool:
+    _cw, _ch, is_circular, vig, _vig_w, fx, fy = key
+    return bool(is_circular or vig > 0 or fx > 0 or fy > 0)
 
-    img.save(out_path, "PNG", optimize=False)
+
+def _colour_f32(params: dict) -> Optional[np.ndarray]:
+    colour = colour_matrix(params)
+    return None if colour is None else colour.astype(np.float32)
+
+
+def _aspect_dict(aspect) -> Optional[dict]:
+    if not aspect:
+        return None
+    if isinstance(aspect, dict):
+        return aspect
+    return {"w": aspect[0], "h": aspect[1]}
+
+
+def _groups(plans: list) -> list:
+    """Targets that sample the source on the same grid — same linear map
+    and reduce factor, translations a whole number of pixels apart — are
+    windows onto one shared drawing. A group whose shared drawing would
+    cost more than drawing its members apart is split up again."""
+    by_grid = OrderedDict()
+    for plan in plans:
+        _i, _p, _cw, _ch, m, k = plan
+        grid = (round(m[0], 9), round(m[1], 9), round(m[3], 9), round(m[4], 9), k,
+                round(m[2] % 1.0, 6) % 1.0, round(m[5] % 1.0, 6) % 1.0)
+        by_grid.setdefault(grid, []).append(plan)
+    out = []
+    for group in by_grid.values():
+        uw, uh = _union_size(group)
+        if len(group) > 1 and uw * uh > sum(cw * ch for _i, _p, cw, ch, _m, _k in group):
+            out.extend([plan] for plan in group)
+        else:
+            out.append(group)
+    return out
+
+
+def _union_size(group: list):
+    c = max(m[2] for *_x, m, _k in group)
+    f = max(m[5] for *_x, m, _k in group)
+    uw = max(int(round(c - m[2])) + cw for _i, _p, cw, _ch, m, _k in group)
+    uh = max(int(round(f - m[5])) + ch for _i, _p, _cw, ch, m, _k in group)
+    return uw, uh
+
+
+def render_batch(src_path: str, targets):
+    """Compose several print files from one source. Yields (index, pixels)
+    per target, the uint8 RGBA array compose() would have written, in
+    no particular order.
+
+    `targets` is a list of (aspect, params): aspect is [w, h] or {w, h}
+    and overrides params["aspectRatio"], or None to keep it. Against a
+    compose() per target, the source is decoded once; targets on the same
+    sampling grid (the same edits cut to different product aspects) are
+    drawn once as the union of their windows; and among those, targets
+    with no vignette, feather or clip share one colour pass too, since
+    colour then ends in a clamp that cropping commutes with. Targets with
+    masks run their own colour pass: before the clamp the masks still see
+    the unclipped values."""
+    source = _Source(src_path)
+    plans = []
+    for i, (aspect, params) in enumerate(targets):
+        params = dict(params or {})
+        if aspect:
+            params["aspectRatio"] = _aspect_dict(aspect)
+        cw, ch, m, k = _plan(source.size[0], source.size[1], params)
+        plans.append((i, params, cw, ch, m, k))
+    for group in _groups(plans):
+        yield from _render_group(source, group)
+
+
+def _render_group(source: _Source, group: list):
+    c = max(m[2] for *_x, m, _k in group)
+    f = max(m[5] for *_x, m, _k in group)
+    uw, uh = _union_size(group)
+    m0, k = group[0][4], group[0][5]
+    union = _draw(source, (m0[0], m0[1], c, m0[3], m0[4], f), k, uw, uh)
+
+    colours = {}
+    for i, params, cw, ch, _m, _k in group:
+        if not _has_masks(_mask_key(cw, ch, params, _is_circular(params))):
+            colour = _colour_f32(params)
+            if colour is not None:
+                colours.setdefault(colour.tobytes(), []).append(i)
+    graded = {}
+    for i, params, cw, ch, m, _k in group:
+        ox, oy = int(round(c - m[2])), int(round(f - m[5]))
+        colour = _colour_f32(params)
+        ckey = None if colour is None else colour.tobytes()
+        if ckey is not None and i in colours.get(ckey, ()) and len(colours[ckey]) > 1:
+            if ckey not in graded:
+                graded[ckey] = _finish(union, {}, colour)
+            window, colour = graded[ckey][oy:oy + ch, ox:ox + cw], None
+        else:
+            window = union[oy:oy + ch, ox:ox + cw]
+        out = _finish(window, params, colour, _frame_size(source.size[0], source.size[1], params))
+        if _is_dual(params):
+            out = np.concatenate([out, out], axis=1)
+        yield i, out
+
+
+def compose(src_path: str, params: dict, out_path: str) -> str:
+    """Render the print file. Returns `out_path`.
+
+    `params` uses the editor's own state names so the client can pass its
+    state through without a translation layer that could drift.
+    """
+    for _i, out in render_batch(src_path, [(None, params)]):
+        # Band-parallel deflate (api/png_writer.py): this encode is on the
+        # checkout critical path.
+        png_writer.write_png(out_path, out)
     return out_path
+
+
+def compose_batch(src_path: str, targets, out_paths) -> list:
+    """render_batch(src_path, targets), each written to its out_paths
+    entry. Returns out_paths."""
+    for i, out in render_batch(src_path, targets):
+        png_writer.write_png(out_paths[i], out)
+    return list(out_paths)
@@ -0,0 +1,373 @@
+"""Text for server-composed print files: the editor's timestamp caption,
+text overlay (straight and arc) and wall-clock numerals, drawn the way
+renderCanvas draws them (api/solar-archive.js), so print_compose can
+build those orders from parameters instead of a 45 MB browser canvas.
+
+FONTS: only faces bundled in api/fonts are drawn here — FONT_FILES is the
+whole list. The editor loads the SAME files from /fonts/, so browser and
+server rasterise one outline set at the same metrics. A design in a
+Google-hosted catalog font (Outfit, Bebas Neue, …) would come out in
+whatever the server has installed, which is exactly the mismatch a
+customer notices, so `supported()` refuses it and that order keeps the
+browser upload. To move a family server-side, commit its TTFs here, add
+it to FONT_FILES and give its FONT_CATALOG entry a `files` map.
+
+FIDELITY: positions, sizes, anchors, stroke widths and shadows are
+transcribed from renderCanvas / drawArcText. Canvas strokes are centred
+on the outline (lineWidth L is L/2 outside); FreeType's stroker grows the
+glyph by its radius, so radius = L/2 and the fill is drawn over it as the
+canvas does. Shadows are a Gaussian of σ = shadowBlur/2, the canvas
+definition, cast by each draw separately (stroke, then fill). Glyph
+antialiasing differs from the browser's by a fraction of a pixel at the
+edges; api/scripts/test_print_text.py pins the output against golden
+images.
+
+All geometry is in FRAME pixels (the editor's export canvas) and scaled
+to the composed canvas, so a file composed at a product's print-area size
+keeps the text the same fraction of the image.
+"""
+from __future__ import annotations
+
+import math
+import os
+import re
+from functools import lru_cache
+from typing import Optional
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+FONT_DIR = os.path.join(os.path.dirname(__file__), "fonts")
+
+# family → {css weight: file in FONT_DIR}. DejaVu is Bitstream Vera
+# derived (LICENSE_DEJAVU): free to embed and redistribute.
+FONT_FILES = {
+    "DejaVu Sans": {"normal": "DejaVuSans.ttf", "bold": "DejaVuSans-Bold.ttf"},
+    "DejaVu Serif": {"bold": "DejaVuSerif-Bold.ttf"},
+    "DejaVu Sans Mono": {"bold": "DejaVuSansMono-Bold.ttf"},
+}
+
+# The caption's face. The editor (live, mockups and its print export) draws
+# it from the same bundled file, so what is approved is what prints.
+TIMESTAMP_FONT = "DejaVu Sans"
+
+# Matches the editor's _TEXT_REF_SIZE / CLOCK_REF_HALF.
+_TEXT_REF_SIZE = 512
+_CLOCK_REF_HALF = 256
+_MAX_TEXT = 200
+ROMAN_NUMERALS = ["", "I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII"]
+
+
+def font_file(family, weight: str = "bold") -> Optional[str]:
+    """Path of the bundled `family` face at `weight`, or None."""
+    name = FONT_FILES.get(family, {}).get(weight) if isinstance(family, str) else None
+    if not name:
+        return None
+    path = os.path.join(FONT_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+@lru_cache(maxsize=64)
+def _font(path: str, size: float) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+
+def _text_ok(text) -> bool:
+    return isinstance(text, str) and 0 < len(text) <= _MAX_TEXT
+
+
+def supported(params: dict) -> bool:
+    """True when every text feature in `params` can be drawn here: the
+    text is sane and each face it names is bundled."""
+    if params.get("timestampStamp"):
+        if not _text_ok(params.get("timestampText")) or not font_file(TIMESTAMP_FONT, "normal"):
+            return False
+    tov = params.get("textOverlay")
+    if tov:
+        if not isinstance(tov, dict) or not _text_ok(tov.get("text")):
+            return False
+        if not font_file(tov.get("font"), "bold"):
+            return False
+    cn = params.get("clockNumbers")
+    if cn:
+        if not isinstance(cn, dict) or not font_file(cn.get("font") or "Inter", "bold"):
+            return False
+    return True
+
+
+def has_text(params: dict) -> bool:
+    return bool(params.get("timestampStamp") or params.get("textOverlay")
+                or params.get("clockNumbers"))
+
+
+_RGBA_RE = re.compile(r"rgba?\(\s*([\d.]+)\s*,\s*([\d.]+)\s*,\s*([\d.]+)\s*(?:,\s*([\d.]+)\s*)?\)")
+
+
+def _css_rgba(value, default=(0, 0, 0, 1.0)):
+    """(r, g, b, a) for a #rgb / #rrggbb / rgb() / rgba() string, with a
+    in 0..1; `default` for anything else."""
+    if not isinstance(value, str):
+        return default
+    v = value.strip()
+    m = _RGBA_RE.fullmatch(v)
+    if m:
+        a = float(m.group(4)) if m.group(4) is not None else 1.0
+        return (float(m.group(1)), float(m.group(2)), float(m.group(3)), min(1.0, a))
+    h = v.lstrip("#")
+    if len(h) == 3:
+        h = "".join(c * 2 for c in h)
+    if len(h) != 6:
+        return default
+    try:
+        return (int(h[0:2], 16), int(h[2:4], 16), int(h[4:6], 16), 1.0)
+    except ValueError:
+        return default
+
+
+def _num(v, default: float) -> float:
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return default
+    return f if math.isfinite(f) else default
+
+
+class _Layer:
+    """The masks one draw call produces, in canvas pixels: `fill` and
+    `stroke` (full-size "L" images, either None) plus their colours and
+    the shadow every draw of this call casts."""
+
+    def __init__(self, size, fill_rgba, stroke_rgba=None, shadow=None):
+        self.size = size
+        self.fill_rgba = fill_rgba
+        self.stroke_rgba = stroke_rgba
+        self.shadow = shadow              # (rgba, blur σ·2, offset x, offset y) or None
+        self.fill = Image.new("L", size, 0) if fill_rgba else None
+        self.stroke = Image.new("L", size, 0) if stroke_rgba else None
+
+
+def _erode(a: np.ndarray, r: int) -> np.ndarray:
+    """ImageFilter.MinFilter(2r+1) of the uint8 mask `a` (edges
+    replicated, as PIL does), as a row pass then a column pass: 4r+2
+    minimums per pixel instead of (2r+1)²."""
+    if r < 1:
+        return a
+    h, w = a.shape
+    p = np.pad(a, r, mode="edge")
+    rows = p[:, :w].copy()
+    for j in range(1, 2 * r + 1):
+        np.minimum(rows, p[:, j:j + w], out=rows)
+    out = rows[:h].copy()
+    for i in range(1, 2 * r + 1):
+        np.minimum(out, rows[i:i + h], out=out)
+    return out
+
+
+def _stroke_only(glyph: Image.Image, grown: Image.Image, radius: float) -> Image.Image:
+    """A centred stroke of width 2·radius without the fill: the grown glyph
+    minus the glyph eroded by the same radius.
+
+    Only the grown glyph's bounding box, padded by the radius, is eroded,
+    and separably (_erode): ImageFilter.MinFilter over the whole canvas
+    took ~20 s at 4096² with the editor's widest stroke. Outside that box
+    both masks are empty, and the padding gives every pixel inside it the
+    neighbourhood it has on the full canvas, so the result is identical."""
+    r = int(round(radius))
+    box = grown.getbbox()
+    if box is None:
+        return grown
+    box = (max(0, box[0] - r), max(0, box[1] - r),
+           min(grown.size[0], box[2] + r), min(grown.size[1], box[3] + r))
+    inner = _erode(np.asarray(glyph.crop(box)), r)
+    a = np.asarray(grown.crop(box), np.int16) - inner.astype(np.int16)
+    out = Image.new("L", grown.size, 0)
+    out.paste(Image.fromarray(np.clip(a, 0, 255).astype(np.uint8)), box[:2])
+    return out
+
+
+def _straight(layer: _Layer, text: str, font, x: float, y: float, anchor: str,
+              stroke_r: float, outlined: bool = False) -> None:
+    if layer.stroke is not None and stroke_r > 0:
+        ImageDraw.Draw(layer.stroke).text((x, y), text, fill=255, font=font, anchor=anchor,
+                                          stroke_width=stroke_r, stroke_fill=255)
+        if outlined:
+            glyph = Image.new("L", layer.size, 0)
+            ImageDraw.Draw(glyph).text((x, y), text, fill=255, font=font, anchor=anchor)
+            layer.stroke = _stroke_only(glyph, layer.stroke, stroke_r)
+    if layer.fill is not None:
+        ImageDraw.Draw(layer.fill).text((x, y), text, fill=255, font=font, anchor=anchor)
+
+
+def _stamp(dst: Image.Image, patch: Image.Image, tx: float, ty: float, angle: float) -> None:
+    """Lighten `patch` (drawn around its centre) into `dst`, rotated by
+    `angle` radians clockwise and centred on (tx, ty) — a canvas
+    translate + rotate, with the subpixel offset kept."""
+    p = patch.size[0]
+    q = int(math.ceil(p * 1.5)) + 2
+    x0, y0 = int(math.floor(tx)) - q // 2, int(math.floor(ty)) - q // 2
+    c, s = math.cos(angle), math.sin(angle)
+    ox, oy = tx - x0, ty - y0
+    # output (u, v) → patch: R(−angle)·((u, v) − (ox, oy)) + centre
+    data = (c, s, -c * ox - s * oy + p / 2.0,
+            -s, c, s * ox - c * oy + p / 2.0)
+    rotated = patch.transform((q, q), Image.AFFINE, data, resample=Image.BICUBIC)
+    box = (max(0, x0), max(0, y0), min(dst.size[0], x0 + q), min(dst.size[1], y0 + q))
+    if box[2] <= box[0] or box[3] <= box[1]:
+        return
+    part = rotated.crop((box[0] - x0, box[1] - y0, box[2] - x0, box[3] - y0))
+    under = dst.crop(box)
+    dst.paste(Image.fromarray(np.maximum(np.asarray(under), np.asarray(part))), box[:2])
+
+
+def _arc(layer: _Layer, text: str, font, x: float, y: float, radius: float,
+         stroke_r: float, outlined: bool = False) -> None:
+    """drawArcText: characters laid along a circle of `radius` whose top is
+    at (x, y), each advanced by its own measured width."""
+    if radius <= 0:
+        return
+    cx, cy = x, y + radius
+    widths = [font.getlength(ch) for ch in text]
+    angle = -math.pi / 2 - sum(widths) / radius / 2
+    p = int(math.ceil(font.size * 2 + 4 * stroke_r)) + 4
+    for ch, w in zip(text, widths):
+        angle += w / 2 / radius
+        tx, ty = cx + radius * math.cos(angle), cy + radius * math.sin(angle)
+        sub = _Layer((p, p), layer.fill_rgba, layer.stroke_rgba)
+        _straight(sub, ch, font, p / 2.0, p / 2.0, "mm", stroke_r, outlined)
+        for dst, src in ((layer.fill, sub.fill), (layer.stroke, sub.stroke)):
+            if dst is not None and src is not None:
+                _stamp(dst, src, tx, ty, angle + math.pi / 2)
+        angle += w / 2 / radius
+
+
+def _over(canvas: np.ndarray, mask: Image.Image, rgba, dx: float = 0.0, dy: float = 0.0,
+          sigma: float = 0.0) -> None:
+    """Source-over `rgba` through `mask` onto the uint8 RGBA `canvas`, in
+    place. With dx/dy/sigma the mask is first offset and blurred (a shadow).
+    Only the mask's bounding box is touched."""
+    bbox = mask.getbbox()
+    if bbox is None or rgba[3] <= 0:
+        return
+    h, w = canvas.shape[:2]
+    pad = int(math.ceil(3 * sigma + abs(dx) + abs(dy))) + 2 if (sigma or dx or dy) else 0
+    x0, y0 = max(0, bbox[0] - pad), max(0, bbox[1] - pad)
+    x1, y1 = min(w, bbox[2] + pad), min(h, bbox[3] + pad)
+    m = mask.crop((x0, y0, x1, y1))
+    if dx or dy:
+        m = m.transform(m.size, Image.AFFINE, (1, 0, -dx, 0, 1, -dy), resample=Image.BILINEAR)
+    if sigma > 0:
+        m = m.filter(ImageFilter.GaussianBlur(sigma))
+    a_s = np.asarray(m, np.float32) * (rgba[3] / 255.0 / 255.0)
+    region = canvas[y0:y1, x0:x1]
+    d = region.astype(np.float32)
+    a_d = d[..., 3] / 255.0
+    a_o = a_s + a_d * (1.0 - a_s)
+    safe = np.where(a_o > 0, a_o, 1.0)
+    for i in range(3):
+        c = (rgba[i] * a_s + d[..., i] * a_d * (1.0 - a_s)) / safe
+        region[..., i] = np.clip(np.floor(c + 0.5), 0, 255)
+    region[..., 3] = np.clip(np.floor(a_o * 255.0 + 0.5), 0, 255)
+
+
+def _paint(canvas: np.ndarray, layer: _Layer) -> None:
+    """The canvas's draw order: stroke (its shadow first), then fill (its
+    shadow first, so it falls on the stroke too)."""
+    for mask, rgba in ((layer.stroke, layer.stroke_rgba), (layer.fill, layer.fill_rgba)):
+        if mask is None:
+            continue
+        if layer.shadow is not None:
+            srgba, blur, sdx, sdy = layer.shadow
+            _over(canvas, mask, srgba, sdx, sdy, blur / 2.0)
+        _over(canvas, mask, rgba)
+
+
+def _rgba255(c):
+    return (c[0], c[1], c[2], c[3] * 255.0)
+
+
+def _timestamp(canvas, params, fw, fh, s):
+    text = params["timestampText"]
+    ref = min(fw, fh)
+    size = max(11, round(ref * 0.028))
+    inset = max(8, round(ref * 0.025))
+    pos = str(params.get("timestampPos") or "bottom-right").split("-")
+    top = pos[0] == "top"
+    halign = pos[1] if len(pos) > 1 and pos[1] in ("left", "center") else "right"
+    if halign == "left":
+        x, ax = inset, "l"
+    elif halign == "center":
+        x, ax = fw / 2.0, "m"
+    else:
+        x, ax = fw - inset, "r"
+    offset = (_num(params.get("timestampVOffset"), 0.0) / 100.0) * (ref * 0.30)
+    # textBaseline "top" is the font's ascent line; "alphabetic" the baseline.
+    y, ay = (inset + offset, "a") if top else (fh - inset - offset, "s")
+    font = _font(font_file(TIMESTAMP_FONT, "normal"), size * s)
+    layer = _Layer(canvas.shape[1::-1], (255, 255, 255, 0.92 * 255),
+                   shadow=((0, 0, 0, 0.55 * 255), max(2, round(size * 0.2)) * s, 0.0, 1.0 * s))
+    _straight(layer, text, font, x * s, y * s, ax + ay, 0)
+    _paint(canvas, layer)
+
+
+def _text_overlay(canvas, tov, fw, fh, s):
+    ref = min(fw, fh) or _TEXT_REF_SIZE
+    x = _num(tov.get("xNorm"), 0.5) * fw
+    y = _num(tov.get("yNorm"), 0.5) * fh
+    size_norm = tov.get("sizeNorm")
+    if size_norm is None:
+        size_norm = _num(tov.get("size"), 48) / _TEXT_REF_SIZE
+    size = max(4.0, _num(size_norm, 48 / _TEXT_REF_SIZE) * ref)
+    font = _font(font_file(tov.get("font"), "bold"), size * s)
+    stroke_w = max(0.0, _num(tov.get("strokeWidth"), 0))
+    outlined = bool(tov.get("outlined"))
+    shadow = None
+    sh = tov.get("shadow") or {}
+    if isinstance(sh, dict) and sh.get("enabled"):
+        shadow = (_rgba255(_css_rgba(sh.get("color"), (0, 0, 0, 1.0))),
+                  max(0.0, _num(sh.get("blur"), 0)) * s,
+                  _num(sh.get("offsetX"), 0) * s, _num(sh.get("offsetY"), 0) * s)
+    layer = _Layer(canvas.shape[1::-1],
+                   None if outlined else _rgba255(_css_rgba(tov.get("color"), (255, 255, 255, 1.0))),
+                   _rgba255(_css_rgba(tov.get("strokeColor"), (0, 0, 0, 1.0))) if stroke_w > 0 else None,
+                   shadow)
+    # lineWidth = strokeWidth·2, centred on the outline → radius strokeWidth.
+    arc = tov.get("arc") or {}
+    if isinstance(arc, dict) and arc.get("enabled"):
+        _arc(layer, tov["text"], font, x * s, y * s, _num(arc.get("radius"), 200) * s,
+             stroke_w * s, outlined)
+    else:
+        _straight(layer, tov["text"], font, x * s, y * s, "mm", stroke_w * s, outlined)
+    _paint(canvas, layer)
+
+
+def _clock_numbers(canvas, cn, fw, fh, s):
+    half = min(fw, fh) / 2.0
+    r = _num(cn.get("radiusPct"), 80) / 100.0 * half
+    size = _num(cn.get("size"), 50) * (half / _CLOCK_REF_HALF)
+    stroke_px = max(0.0, _num(cn.get("strokeWidth"), 0)) * 2 * (half / _CLOCK_REF_HALF)
+    if size <= 0:
+        return
+    font = _font(font_file(cn.get("font") or "Inter", "bold"), size * s)
+    layer = _Layer(canvas.shape[1::-1], _rgba255(_css_rgba(cn.get("color"), (255, 255, 255, 1.0))),
+                   _rgba255(_css_rgba(cn.get("strokeColor"), (0, 0, 0, 1.0))) if stroke_px > 0 else None)
+    for h in range(1, 13):
+        a = h * (math.pi * 2 / 12)
+        label = ROMAN_NUMERALS[h] if cn.get("style") == "roman" else str(h)
+        _straight(layer, label, font, (fw / 2.0 + r * math.sin(a)) * s,
+                  (fh / 2.0 - r * math.cos(a)) * s, "mm", stroke_px / 2.0 * s)
+    _paint(canvas, layer)
+
+
+def draw(canvas: np.ndarray, params: dict, frame_w: int, frame_h: int) -> np.ndarray:
+    """Draw the caption, text overlay and clock numerals of `params` onto
+    the uint8 RGBA `canvas`, in place and in renderCanvas's order.
+    `frame_w` × `frame_h` is the editor's export canvas the parameters
+    are relative to. Callers check supported() first."""
+    s = canvas.shape[1] / float(frame_w)
+    if params.get("timestampStamp"):
+        _timestamp(canvas, params, frame_w, frame_h, s)
+    if params.get("textOverlay"):
+        _text_overlay(canvas, params["textOverlay"], frame_w, frame_h, s)
+    if params.get("clockNumbers"):
+        _clock_numbers(canvas, params["clockNumbers"], frame_w, frame_h, s)
+    return canvas
@@ -13,6 +13,7 @@ Environment variables required:
 """
 
 import hmac
+import json
 import os
 import re
 import time
@@ -20,9 +21,12 @@ import threading
 from typing import Optional
 import requests
 import certifi
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse
-from starlette.concurrency import run_in_threadpool
+from api.executors import run_in_pool
+from api.feedback_routes import _data_dir  # shared persistent disk
+from api.token_bucket import TokenBucket
 import sys
 import logging
 
@@ -168,7 +172,7 @@ def _printify_request(method: str, url: str, **kwargs):
 # 1.  Upload image to Printify media library
 # ────────────────────────────────────────────────
 def _upload_image_sync(payload: dict) -> dict:
-    """Blocking upload — runs in a thread via run_in_threadpool."""
+    """Blocking upload — runs on the commerce pool via run_in_pool."""
     resp = _printify_request(
         "POST",
         f"{PRINTIFY_BASE}/uploads/images.json",
@@ -293,7 +297,7 @@ async def upload_image(request: Request):
             payload = {"file_name": file_name, "url": url}
             _log(f"[printify][upload] POST /v1/uploads/images.json  url-based upload: {url}")
 
-        result = await run_in_threadpool(_upload_image_sync, payload)
+        result = await run_in_pool("commerce", _upload_image_sync, payload)
         return JSONResponse(content=result)
 
     except HTTPException:
@@ -328,20 +332,22 @@ async def upload_image(request: Request):
 
 # Small in-process cache so we don't hit the catalog endpoint every
 # time the user generates a mockup. Catalog placeholder geometry is
-# effectively static, so a long TTL is fine. Keyed by (bp, pp).
+# effectively static, so a long TTL is fine. Keyed by (bp, pp); each
+# entry maps variant id → {position: (width_px, height_px)}.
 _variant_positions_cache: dict = {}
 _VARIANT_POS_TTL = 60 * 60  # 1 hour
 
 
-def _get_variant_positions(bp_id: int, pp_id: int, variant_id: int) -> list:
-    """Return the list of placeholder position names for one variant,
-    or [] if we can't look it up."""
+def _get_variant_placeholders(bp_id: int, pp_id: int, variant_id: int) -> dict:
+    """Return {position: (width, height)} for one variant's placeholders,
+    in catalog order, or {} if we can't look it up. A placeholder the
+    catalog lists without dimensions maps to (0, 0)."""
     try:
         bp_id_i = int(bp_id)
         pp_id_i = int(pp_id)
         variant_id_i = int(variant_id)
     except (TypeError, ValueError):
-        return []
+        return {}
     key = (bp_id_i, pp_id_i)
     now = time.time()
     cached = _variant_positions_cache.get(key)
@@ -352,20 +358,64 @@ def _get_variant_positions(bp_id: int, pp_id: int, variant_id: int) -> list:
             data = _list_variants_sync(bp_id_i, pp_id_i)
         except Exception as e:
             _log(f"[printify][expand-placeholders] catalog lookup failed bp={bp_id_i} pp={pp_id_i}: {e}")
-            return []
+            return {}
         variants_by_id = {}
         for v in (data.get("variants") or []):
             vid = v.get("id")
             if vid is None:
                 continue
-            positions = [
-                p.get("position")
-                for p in (v.get("placeholders") or [])
-                if p.get("position")
-            ]
-            variants_by_id[vid] = positions
+            placeholders = {}
+            for p in (v.get("placeholders") or []):
+                if not p.get("position"):
+                    continue
+                try:
+                    dims = (int(p.get("width") or 0), int(p.get("height") or 0))
+                except (TypeError, ValueError):
+                    dims = (0, 0)
+                placeholders[p["position"]] = dims
+            variants_by_id[vid] = placeholders
         _variant_positions_cache[key] = (now, variants_by_id)
-    return list(variants_by_id.get(variant_id_i) or [])
+    return dict(variants_by_id.get(variant_id_i) or {})
+
+
+def _get_variant_positions(bp_id: int, pp_id: int, variant_id: int) -> list:
+    """Return the list of placeholder position names for one variant,
+    or [] if we can't look it up."""
+    return list(_get_variant_placeholders(bp_id, pp_id, variant_id))
+
+
+def _resolve_positions(pos, valid_positions: list) -> list:
+    """The variant positions a requested position lands on, by the
+    resolution order above: exact, then substring (fan out), then all."""
+    if pos in valid_positions:
+        return [pos]
+    # Try a substring match — "front" → ["front_left_leg",
+    # "front_right_leg"]. Sock-shaped products want the same
+    # design on each matching panel.
+    substr_matches = [vp for vp in valid_positions if pos and pos in vp]
+    if not substr_matches:
+        # Last resort: stamp the design on every valid
+        # position. The user gets a working all-over preview
+        # instead of nothing.
+        substr_matches = list(valid_positions)
+    return substr_matches
+
+
+def placeholder_size(bp_id: int, pp_id: int, variant_id: int, position: str = "front"):
+    """(width, height) in pixels of the print area `position` resolves to
+    on this variant, or None when the catalog doesn't say.
+
+    This is the size Printify prints at, so a print file composed any
+    larger is pixels thrown away after they were composed, encoded and
+    uploaded: /api/print_file passes it to print_compose as targetSize.
+    When the position fans out to several panels the largest one wins,
+    since the same file goes on each."""
+    placeholders = _get_variant_placeholders(bp_id, pp_id, variant_id)
+    sizes = [placeholders[p] for p in _resolve_positions(position, list(placeholders))
+             if placeholders[p][0] > 0 and placeholders[p][1] > 0]
+    if not sizes:
+        return None
+    return max(sizes, key=lambda wh: wh[0] * wh[1])
 
 
 def _expand_print_areas(body: dict) -> dict:
@@ -399,16 +449,7 @@ def _expand_print_areas(body: dict) -> dict:
             if pos in valid_set:
                 new_placeholders.append(ph)
                 continue
-            # Try a substring match — "front" → ["front_left_leg",
-            # "front_right_leg"]. Sock-shaped products want the same
-            # design on each matching panel.
-            substr_matches = [vp for vp in valid_positions if pos and pos in vp]
-            if not substr_matches:
-                # Last resort: stamp the design on every valid
-                # position. The user gets a working all-over preview
-                # instead of nothing.
-                substr_matches = valid_positions
-            for m in substr_matches:
+            for m in _resolve_positions(pos, valid_positions):
                 clone = dict(ph)
                 clone["position"] = m
                 new_placeholders.append(clone)
@@ -431,7 +472,7 @@ def _expand_print_areas(body: dict) -> dict:
 
 
 def _create_product_sync(body: dict) -> dict:
-    """Blocking product creation — runs in a thread via run_in_threadpool."""
+    """Blocking product creation — runs on the commerce pool via run_in_pool."""
     shop_id = _shop_id()
     # Auto-expand placeholders before posting so all-over products
     # (socks, leggings, mugs with non-"front" placeholders) succeed
@@ -588,7 +629,7 @@ async def admin_sweep_mockup_drafts(request: Request):
         raise HTTPException(status_code=503, detail="Admin access disabled — set FEEDBACK_ADMIN_KEY to enable.")
     if not provided or not _hmac.compare_digest(provided, expected):
         raise HTTPException(status_code=401, detail="Invalid admin key")
-    deleted = await run_in_threadpool(_sweep_stale_mockup_drafts)
+    deleted = await run_in_pool("batch", _sweep_stale_mockup_drafts)
     return JSONResponse(content={"deleted": deleted})
 
 
@@ -702,9 +743,9 @@ async def admin_audit_personalized(request: Request):
         pass
     raw = body.get("dry_run", True)
     dry = not (raw is False or str(raw).strip().lower() in ("0", "false", "no"))
-    buckets = await run_in_threadpool(_scan_checkout_products)
+    buckets = await run_in_pool("batch", _scan_checkout_products)
     report = {k: {"count": len(v), "sample": v[:20]} for k, v in buckets.items()}
-    sweep = await run_in_threadpool(_sweep_personalized_products, dry, buckets)
+    sweep = await run_in_pool("batch", _sweep_personalized_products, dry, buckets)
     return JSONResponse(content={
         "dry_run": dry,
         "buckets": report,
@@ -726,7 +767,7 @@ async def create_product(request: Request):
     # blocked so a draft never becomes a real Shopify listing in beta.
     try:
         body = await request.json()
-        result = await run_in_threadpool(_create_product_sync, body)
+        result = await run_in_pool("commerce", _create_product_sync, body)
         # Opportunistic cleanup: [MOCKUP] preview drafts can't be deleted
         # immediately (they host the mockup image the editor shows), so sweep
         # abandoned older ones here. Throttled + backgrounded — never blocks
@@ -758,7 +799,7 @@ def _list_shops_sync() -> list:
 async def list_shops():
     """Returns all shops associated with the Printify API key."""
     try:
-        result = await run_in_threadpool(_list_shops_sync)
+        result = await run_in_pool("commerce", _list_shops_sync)
         return JSONResponse(content=result)
     except Exception as e:
         return JSONResponse(status_code=500, content={"detail": f"Failed to list shops: {e}"})
@@ -777,7 +818,7 @@ def _list_blueprints_sync() -> list:
 async def list_blueprints():
     """Returns the full Printify blueprint catalog."""
     try:
-        result = await run_in_threadpool(_list_blueprints_sync)
+        result = await run_in_pool("commerce", _list_blueprints_sync)
         return JSONResponse(content=result)
     except Exception as e:
         return JSONResponse(status_code=500, content={"detail": f"Failed to list blueprints: {e}"})
@@ -801,7 +842,7 @@ def _list_providers_sync(blueprint_id: int) -> list:
 async def list_providers(blueprint_id: int):
     """Returns all print providers available for a given blueprint."""
     try:
-        result = await run_in_threadpool(_list_providers_sync, blueprint_id)
+        result = await run_in_pool("commerce", _list_providers_sync, blueprint_id)
         return JSONResponse(content=result)
     except Exception as e:
         _log(f"[printify][providers] blueprint={blueprint_id} error: {e}")
@@ -826,7 +867,7 @@ def _list_variants_sync(blueprint_id: int, provider_id: int) -> dict:
 async def list_variants(blueprint_id: int, provider_id: int):
     """Returns all variants for a given blueprint + print provider combo."""
     try:
-        result = await run_in_threadpool(_list_variants_sync, blueprint_id, provider_id)
+        result = await run_in_pool("commerce", _list_variants_sync, blueprint_id, provider_id)
         return JSONResponse(content=result)
     except Exception as e:
         _log(f"[printify][variants] blueprint={blueprint_id} provider={provider_id} error: {e}")
@@ -837,119 +878,297 @@ async def list_variants(blueprint_id: int, provider_id: int):
 # Variant pricing — Printify catalog endpoint does NOT include variant cost
 # (only id/title/options/placeholders), so the only way to surface per-variant
 # pricing is to scan the shop's existing products and read the cost+price
-# fields off matching variants. We page through all shop products once and
-# build an index keyed by (blueprint_id, print_provider_id, variant_id).
-# Cached for 30 minutes — pricing changes are rare and a 12-request scan is
-# slow on a cold cache (1k+ products at 100/page).
+# fields off matching variants. We page through all shop products and build
+# an index keyed by (blueprint_id, print_provider_id, variant_id).
+#
+# The index is fresh for 30 minutes and persisted to the data disk
+# (printify_pricing.json), one entry per shop product with its updated_at:
+#   - a cold start reads the file instead of walking 1k+ products before
+#     the first checkout can be priced;
+#   - past the TTL, callers keep pricing from the stale index while one
+#     background refresh rewalks the shop (stale-while-revalidate). Before,
+#     the expiry made the next checkout/pricing call do the walk inline —
+#     up to 50 serial page fetches in the request path;
+#   - the walk fetches pages concurrently, under a token bucket so a
+#     refresh can't eat the shop's Printify rate limit. Every entry is
+#     rebuilt from the product it just fetched: Printify reprices a
+#     provider's costs without touching the updated_at of the products
+#     that use it, and the page is already in hand, so keeping the stored
+#     entry would save nothing but could serve a stale cost.
+# Only an empty index (no file, never built) still builds inline.
 # ────────────────────────────────────────────────
 _pricing_cache: dict = {}     # {(bp, pp): {variant_id: {"cost": cents, "price": cents}}}
 _pricing_index_built_at: float = 0.0
 _PRICING_TTL = 30 * 60         # seconds
+# {product_id: {"updated_at", "bp", "pp", "variants": [[vid, cost, price], ...]}}
+# — what _pricing_cache is folded from, and what the file stores.
+_pricing_products: dict = {}
+PRICING_INDEX_FILE = _data_dir() / "printify_pricing.json"
+_PRICING_FILE_VERSION = 1
+_pricing_loaded = False
+_pricing_refreshing = False
+_pricing_state_lock = threading.Lock()
+_pricing_build_lock = threading.Lock()     # one walk at a time
+_pricing_save_lock = threading.Lock()
+# Printify caps shop products list at limit=50 (validation error 8150 above).
+_PRICING_PAGE_LIMIT = 50
+# Hard safety cap so a runaway pagination doesn't hammer Printify.
+# 51 pages × 50 = 2550 products covers any reasonable shop.
+_PRICING_MAX_PAGES = 51
+_PRICING_SCAN_WORKERS = 4
+# Printify allows 600 requests/min per account. The scan takes at most 240
+# of them, so checkout, uploads and the catalog proxies keep the rest while
+# a refresh runs.
+_PRICING_SCAN_LIMITER = TokenBucket(240, "printify-pricing", burst=_PRICING_SCAN_WORKERS)
+
+
+def _product_pricing(prod: dict) -> Optional[dict]:
+    """One shop product's index entry, or None when it names no (bp, pp)."""
+    bp = prod.get("blueprint_id")
+    pp = prod.get("print_provider_id")
+    if bp is None or pp is None:
+        return None
+    return {
+        "updated_at": str(prod.get("updated_at") or ""),
+        "bp": int(bp),
+        "pp": int(pp),
+        "variants": [[int(v["id"]), v.get("cost"), v.get("price")]
+                     for v in (prod.get("variants") or []) if v.get("id") is not None],
+    }
 
-def _build_pricing_index_sync() -> None:
-    """Scan all shop products, populate _pricing_cache. Idempotent — replaces
-    the whole cache on each rebuild so deleted/edited products are reflected.
 
-    Robustness (Gilly's screenshot showed a Printify 502 on page 5 turning
-    into a 500 from us): if Printify returns a transient 5xx mid-pagination
-    we COMMIT the partial cache we've already built, log the failure, and
-    bail. Better to serve N-1 pages of fresh pricing than to throw the
-    whole rebuild away. The next call retries the build from page 1 once
-    the TTL expires.
-    """
-    global _pricing_cache, _pricing_index_built_at
-    shop_id = _shop_id()
-    new_cache: dict = {}
-    partial = False
-    page = 1
-    # Printify caps shop products list at limit=50 (validation error 8150 above).
-    limit = 50
-    pages_walked = 0
-    total_products = 0
-    while True:
-        try:
-            resp = _printify_request(
-                "GET",
-                f"{PRINTIFY_BASE}/shops/{shop_id}/products.json?limit={limit}&page={page}",
-                headers=_headers(),
-                timeout=60,
-            )
-            resp.raise_for_status()
-        except Exception as e:
-            # Partial-fail tolerance: stop pagination, keep whatever
-            # pages we already walked. The catch covers both connection
-            # errors and 5xx from Printify.
-            _log(f"[printify][pricing] page {page} fetch failed ({e}); committing partial cache "
-                 f"({pages_walked} pages walked, {len(new_cache)} (bp, pp) combos cached)")
-            partial = True
-            break
-        body = resp.json()
-        items = body.get("data") or []
-        total_products = body.get("total", total_products)
-        if not items:
-            break
-        for prod in items:
-            bp = prod.get("blueprint_id")
-            pp = prod.get("print_provider_id")
-            if bp is None or pp is None:
-                continue
-            key = (int(bp), int(pp))
-            bucket = new_cache.setdefault(key, {})
-            for v in (prod.get("variants") or []):
-                vid = v.get("id")
-                if vid is None:
-                    continue
-                # Keep the cheapest cost we've seen per variant — different
-                # products with the same blueprint may have set retail prices
-                # differently, but Printify's `cost` (their charge to us) is
-                # consistent across products. We display cost preferentially.
-                existing = bucket.get(int(vid))
-                cost = v.get("cost")
-                price = v.get("price")
-                if existing is None or (cost is not None and (existing.get("cost") is None or cost < existing["cost"])):
-                    bucket[int(vid)] = {"cost": cost, "price": price}
-        pages_walked += 1
-        if len(items) < limit:
-            break
-        # Hard safety cap so a runaway pagination doesn't hammer Printify.
-        # 50 pages × 50 = 2500 products covers any reasonable shop.
-        if pages_walked > 50:
-            _log(f"[printify][pricing] stopped at {pages_walked} pages (safety cap)")
-            break
-        page += 1
-    if partial and _pricing_cache and len(new_cache) < len(_pricing_cache):
-        # A truncated rebuild is worse than the prior complete index — don't
-        # overwrite good pricing with a subset (blueprints on un-walked pages
-        # would silently lose all pricing, and checkout fails closed for them).
-        # Keep the prior cache and force a retry on the next call (~60s) instead
-        # of stamping a full-TTL freshness onto a partial result.
-        _pricing_index_built_at = time.time() - (_PRICING_TTL - 60)
-        _log(f"[printify][pricing] partial rebuild ({len(new_cache)} combos) smaller than "
-             f"prior cache ({len(_pricing_cache)}); keeping prior, retry in ~60s")
-        return
+def _fold_pricing(products: dict) -> dict:
+    """The (bp, pp) → variant index from per-product entries."""
+    index: dict = {}
+    for entry in products.values():
+        bucket = index.setdefault((entry["bp"], entry["pp"]), {})
+        for vid, cost, price in entry["variants"]:
+            # Keep the cheapest cost we've seen per variant — different
+            # products with the same blueprint may have set retail prices
+            # differently, but Printify's `cost` (their charge to us) is
+            # consistent across products. We display cost preferentially.
+            existing = bucket.get(vid)
+            if existing is None or (cost is not None and (existing.get("cost") is None or cost < existing["cost"])):
+                bucket[vid] = {"cost": cost, "price": price}
     # Retain reference-product backfilled costs (see _backfill_variant_costs_sync)
     # across the rebuild — a fresh shop-scan doesn't know them, so without this
     # the per-size prices for never-sold variants would revert to the flat anchor
     # every 30 min. Only fills gaps; a real shop-product cost still wins.
-    for _bk, _costs in _backfilled_costs.items():
+    for _bk, _costs in list(_backfilled_costs.items()):
         if not _costs:
             continue
-        _b = new_cache.setdefault(_bk, {})
+        _b = index.setdefault(_bk, {})
         for _vid, _entry in _costs.items():
             if _vid not in _b or _b.get(_vid, {}).get("cost") is None:
                 _b[_vid] = _entry
-    _pricing_cache = new_cache
-    # On a partial-but-accepted rebuild, mark it stale soon so the gaps fill in;
-    # a clean full walk gets the normal TTL.
+    return index
+
+
+def _pricing_shop() -> str:
+    try:
+        return str(_shop_id())
+    except RuntimeError:
+        return ""
+
+
+def _save_pricing_index() -> None:
+    """Write the index to PRICING_INDEX_FILE (atomic replace). Best-effort:
+    a failed write only costs the next cold start a walk."""
+    snapshot = {
+        "version": _PRICING_FILE_VERSION,
+        "shop_id": _pricing_shop(),
+        "built_at": _pricing_index_built_at,
+        "products": _pricing_products,
+        # Empty entries are kept too: they mean "nothing to backfill".
+        "backfilled": [[bp, pp, [[vid, e.get("cost"), e.get("price")] for vid, e in costs.items()]]
+                       for (bp, pp), costs in list(_backfilled_costs.items())],
+    }
+    with _pricing_save_lock:
+        try:
+            PRICING_INDEX_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = PRICING_INDEX_FILE.with_suffix(".json.tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(snapshot, f, separators=(",", ":"))
+            os.replace(tmp, PRICING_INDEX_FILE)
+        except (OSError, TypeError, ValueError) as e:
+            _log(f"[printify][pricing] index save failed: {e}")
+
+
+def _load_pricing_index_locked() -> None:
+    """Adopt the persisted index once per process (call with
+    _pricing_state_lock held). Its built_at comes with it, so a file older
+    than the TTL is served and refreshed like any stale index."""
+    global _pricing_loaded, _pricing_products, _pricing_cache, _pricing_index_built_at
+    if _pricing_loaded:
+        return
+    _pricing_loaded = True
+    try:
+        with PRICING_INDEX_FILE.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != _PRICING_FILE_VERSION or data.get("shop_id") != _pricing_shop():
+            _log("[printify][pricing] persisted index is for another shop/format; ignoring it")
+            return
+        products = {
+            str(pid): {"updated_at": str(e.get("updated_at") or ""), "bp": int(e["bp"]), "pp": int(e["pp"]),
+                       "variants": [[int(v[0]), v[1], v[2]] for v in e["variants"]]}
+            for pid, e in data["products"].items()
+        }
+        backfilled = {(int(bp), int(pp)): {int(v): {"cost": c, "price": p} for v, c, p in costs}
+                      for bp, pp, costs in (data.get("backfilled") or [])}
+        built_at = float(data.get("built_at") or 0.0)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError, TypeError, KeyError, AttributeError, IndexError) as e:
+        _log(f"[printify][pricing] persisted index unreadable ({e}); rebuilding")
+        return
+    for key, costs in backfilled.items():
+        _backfilled_costs.setdefault(key, costs)
+    _pricing_products = products
+    _pricing_cache = _fold_pricing(products)
+    _pricing_index_built_at = built_at
+    _log(f"[printify][pricing] index loaded from disk: {len(products)} products, "
+         f"{len(_pricing_cache)} (bp, pp) combos, {int(time.time() - built_at)}s old")
+
+
+def _fetch_pricing_page(shop_id: str, page: int) -> dict:
+    _PRICING_SCAN_LIMITER.wait()
+    resp = _printify_request(
+        "GET",
+        f"{PRINTIFY_BASE}/shops/{shop_id}/products.json?limit={_PRICING_PAGE_LIMIT}&page={page}",
+        headers=_headers(),
+        timeout=60,
+    )
+    resp.raise_for_status()
+    return resp.json()
+
+
+def _build_pricing_index_sync() -> None:
+    """Walk all shop products and replace _pricing_cache (call with
+    _pricing_build_lock held). Deleted products drop out and every product
+    read is re-indexed from what was just fetched; updated_at only counts
+    the unchanged ones for the log.
+
+    Page 1 gives the page count; the rest are fetched concurrently by
+    _PRICING_SCAN_WORKERS threads under _PRICING_SCAN_LIMITER. Not on a
+    named pool: a cold build already runs on "commerce", and a commerce
+    task must not wait on other commerce tasks (executors.NamedPool.submit).
+
+    Robustness (Gilly's screenshot showed a Printify 502 on page 5 turning
+    into a 500 from us): if Printify fails a page mid-walk we stop fetching,
+    keep every product we did read, keep the prior entries of products we
+    didn't get to (a failed page can't tell us they were deleted), commit,
+    and mark the index stale in ~60s so a refresh retries it. Better to
+    serve N-1 pages of fresh pricing than to throw the whole rebuild away.
+    """
+    global _pricing_cache, _pricing_index_built_at, _pricing_products
+    shop_id = _shop_id()
+    prior = _pricing_products
+    seen: dict = {}
+    failed: list = []
+    unchanged = 0
+
+    def take(body: dict) -> int:
+        nonlocal unchanged
+        items = body.get("data") or []
+        for prod in items:
+            pid = str(prod.get("id") or "")
+            if not pid:
+                continue
+            entry = _product_pricing(prod)
+            if entry is None:
+                continue
+            old = prior.get(pid)
+            if old is not None and old["updated_at"] and old["updated_at"] == entry["updated_at"]:
+                unchanged += 1
+            seen[pid] = entry
+        return len(items)
+
+    total_products = 0
+    pages_walked = 0
+    try:
+        first = _fetch_pricing_page(shop_id, 1)
+    except Exception as e:
+        failed.append((1, e))
+        first = None
+    if first is not None:
+        pages_walked = 1
+        total_products = int(first.get("total") or 0)
+        if take(first) < _PRICING_PAGE_LIMIT:
+            last_page = 1
+        else:
+            last_page = int(first.get("last_page") or 0) or -(-total_products // _PRICING_PAGE_LIMIT)
+        if last_page > _PRICING_MAX_PAGES:
+            _log(f"[printify][pricing] {last_page} pages; stopping at {_PRICING_MAX_PAGES} (safety cap)")
+            last_page = _PRICING_MAX_PAGES
+        if last_page > 1:
+            with ThreadPoolExecutor(max_workers=_PRICING_SCAN_WORKERS,
+                                    thread_name_prefix="pricing-scan") as ex:
+                futures = {ex.submit(_fetch_pricing_page, shop_id, p): p for p in range(2, last_page + 1)}
+                for fut in as_completed(futures):
+                    try:
+                        take(fut.result())
+                        pages_walked += 1
+                    except Exception as e:
+                        failed.append((futures[fut], e))
+                        # Stop the walk: don't keep firing at a failing API.
+                        for other in futures:
+                            other.cancel()
+    partial = bool(failed)
+    if partial:
+        page, e = min(failed, key=lambda pe: pe[0])
+        _log(f"[printify][pricing] page {page} fetch failed ({e}); committing partial walk "
+             f"({pages_walked} pages walked), prior entries kept for the rest")
+        for pid, entry in prior.items():
+            seen.setdefault(pid, entry)
+    _pricing_products = seen
+    _pricing_cache = _fold_pricing(seen)
+    # On a partial walk, mark it stale soon so the gaps fill in; a clean full
+    # walk gets the normal TTL.
     _pricing_index_built_at = time.time() - (_PRICING_TTL - 60) if partial else time.time()
+    _save_pricing_index()
     _log(f"[printify][pricing] index built: {pages_walked} pages, "
-         f"{total_products} products, {len(new_cache)} (bp, pp) combos"
+         f"{total_products} products ({unchanged} not edited since the last walk), {len(_pricing_cache)} (bp, pp) combos"
          f"{' (PARTIAL — retry ~60s)' if partial else ''}")
 
 
+def _refresh_pricing_index_sync() -> None:
+    global _pricing_refreshing
+    try:
+        with _pricing_build_lock:
+            if (time.time() - _pricing_index_built_at) > _PRICING_TTL:
+                _build_pricing_index_sync()
+    except Exception as e:
+        _log(f"[printify][pricing] background refresh failed: {e}")
+    finally:
+        with _pricing_state_lock:
+            _pricing_refreshing = False
+
+
 def _ensure_pricing_index_sync() -> None:
-    if (time.time() - _pricing_index_built_at) > _PRICING_TTL or not _pricing_cache:
-        _build_pricing_index_sync()
+    """Make _pricing_cache usable. Loads the persisted index on first use;
+    builds inline only when there is nothing at all to price from; past the
+    TTL returns at once and leaves one refresh running on its own thread:
+    a walk takes minutes of paced requests and must not hold a worker of a
+    shared pool."""
+    global _pricing_refreshing
+    with _pricing_state_lock:
+        _load_pricing_index_locked()
+    if not _pricing_cache:
+        with _pricing_build_lock:
+            if not _pricing_cache:          # a concurrent caller may have built it
+                _build_pricing_index_sync()
+        return
+    if (time.time() - _pricing_index_built_at) > _PRICING_TTL:
+        with _pricing_state_lock:
+            if _pricing_refreshing:
+                return
+            _pricing_refreshing = True
+        try:
+            threading.Thread(target=_refresh_pricing_index_sync,
+                             name="pricing-refresh", daemon=True).start()
+        except RuntimeError:                # can't start a thread
+            with _pricing_state_lock:
+                _pricing_refreshing = False
 
 
 # ────────────────────────────────────────────────
@@ -1129,6 +1348,7 @@ def _backfill_variant_costs_sync(blueprint_id, print_provider_id) -> dict:
                 if vid not in bucket or bucket.get(vid, {}).get("cost") is None:
                     bucket[vid] = entry
             _backfilled_costs[key] = result
+            _save_pricing_index()     # a restart must not create the reference products again
             _log(f"[pricing-backfill] bp={key[0]} pp={key[1]}: discovered "
                  f"{len(result)} variant cost(s) from reference product(s) "
                  f"({-(-len(missing) // _BATCH)} batch(es))")
@@ -1254,7 +1474,7 @@ async def blueprints_cheapest_costs():
     uses, so this is essentially free after the index is warm.
     """
     try:
-        await run_in_threadpool(_ensure_pricing_index_sync)
+        await run_in_pool("commerce", _ensure_pricing_index_sync)
         # _pricing_cache is keyed by (bp, pp); flatten across all variants
         # within each (bp, pp) and keep the global min per blueprint id.
         cheapest: dict = {}
@@ -1277,11 +1497,11 @@ async def variant_pricing(blueprint_id: int, provider_id: int):
     """Returns per-variant cost+price for a blueprint+provider. Sourced from
     the shop's existing products (the catalog API doesn't expose costs)."""
     try:
-        await run_in_threadpool(_ensure_pricing_index_sync)
+        await run_in_pool("commerce", _ensure_pricing_index_sync)
         # Fill any per-variant cost gaps for this (bp, pp) so the picker shows
         # true per-size prices instead of the flat anchor. Cached; runs at most
         # once per (bp, pp). Best-effort — pricing still returns on failure.
-        await run_in_threadpool(_backfill_variant_costs_sync, blueprint_id, provider_id)
+        await run_in_pool("commerce", _backfill_variant_costs_sync, blueprint_id, provider_id)
         bucket = _pricing_cache.get((int(blueprint_id), int(provider_id)), {})
         return JSONResponse(content={
             "blueprint_id": blueprint_id,
@@ -1321,7 +1541,7 @@ async def publish_product(product_id: str, request: Request):
     if not _PRINTIFY_ID_RE.match(product_id):
         raise HTTPException(status_code=400, detail="Invalid product_id format")
     try:
-        await run_in_threadpool(_publish_product_sync, product_id)
+        await run_in_pool("commerce", _publish_product_sync, product_id)
         return JSONResponse(content={"success": True})
     except Exception as e:
         return JSONResponse(status_code=500, content={"detail": f"Publish failed: {e}"})
@@ -1360,33 +1580,6 @@ async def store_config():
 # ────────────────────────────────────────────────
 # 8.  Checkout: upload + create product + publish
 # ────────────────────────────────────────────────
-def _shrink_b64_png_under(image_b64: str, max_chars: int) -> str:
-    """Downscale a base64 PNG until its encoded length is under max_chars.
-
-    Safety valve for the personalized (PII) upload path only: those files may
-    not be staged to a public URL, so if they exceed Printify's base64 POST
-    ceiling we shrink rather than leak. ponytail: this is a size guard, not a
-    quality knob — most text prints are already under budget and untouched."""
-    if len(image_b64) <= max_chars:
-        return image_b64
-    import base64 as _b64
-    import io as _io
-    from PIL import Image as _Image
-    img = _Image.open(_io.BytesIO(_b64.b64decode(image_b64)))
-    out = image_b64
-    for _ in range(6):
-        w, h = img.size
-        img = img.resize((max(1, int(w * 0.85)), max(1, int(h * 0.85))), _Image.LANCZOS)
-        buf = _io.BytesIO()
-        img.save(buf, "PNG", optimize=True)
-        out = _b64.b64encode(buf.getvalue()).decode("ascii")
-        if len(out) <= max_chars:
-            _log(f"[checkout] Personalized print shrunk to {img.size} ({len(out)} chars) to fit base64 upload")
-            return out
-    _log("[checkout] WARNING: personalized print still over base64 budget after shrink; upload may 413")
-    return out
-
-
 def _find_reusable_product(design_hash: str) -> Optional[dict]:
     """Return {printify_product_id, variant_count} for an already-published
     product carrying tag `design-<hash>`, or None. Uses the Shopify Admin
@@ -1429,6 +1622,44 @@ def _find_reusable_product(design_hash: str) -> Optional[dict]:
     return {"printify_product_id": pfy_id, "variant_count": vcount}
 
 
+# Printify image ids of server-composed print files, by /asset path.
+# Those names are content digests (main.py's print-file cache), so the same
+# path is the same bytes and an upload already in the shop's media library
+# can be reused: a retried checkout, or the same design on a second
+# product, skips Printify ingesting a multi-MB PNG again. Personalized and
+# base64 uploads never get here.
+_COMPOSED_UPLOAD_IDS: dict = {}
+_COMPOSED_UPLOAD_MAX = 512
+_composed_upload_lock = threading.Lock()
+_COMPOSED_NAME_RE = re.compile(r"^/asset/print_uploads/[0-9a-f]{32}\.png$")
+
+
+def _asset_file(asset_url: str) -> str:
+    """The local file behind a served /asset/ path (the /asset/default/
+    mount included), or behind a live signed link — how /api/print_file
+    hands out prints with customer text. Raises when it doesn't exist,
+    escapes its mount, or the link is forged or expired."""
+    from api import signed_assets
+    from api.main import DEFAULT_CACHE_DIR, OUTPUT_DIR  # runtime import; no cycle at import time
+    path = asset_url.split("?", 1)[0]
+    if path.startswith(signed_assets.ROUTE_PREFIX + "/"):
+        try:
+            return signed_assets.resolve_path(path)
+        except signed_assets.SignedURLError as e:
+            raise Exception(f"Print file link refused ({e.status} {e.detail}): {asset_url}")
+    if path.startswith("/asset/default/"):
+        root, rel = str(DEFAULT_CACHE_DIR), path[len("/asset/default/"):]
+    elif path.startswith("/asset/"):
+        root, rel = OUTPUT_DIR, path[len("/asset/"):]
+    else:
+        raise Exception(f"Not a served asset path: {asset_url}")
+    root = os.path.realpath(root)
+    full = os.path.realpath(os.path.join(root, rel))
+    if not full.startswith(root + os.sep) or not os.path.isfile(full):
+        raise Exception(f"Print file not found: {asset_url}")
+    return full
+
+
 def _do_checkout_sync(
     image_base64: str,
     file_name: str,
@@ -1444,7 +1675,7 @@ def _do_checkout_sync(
     design_hash: str = "",
     personalized: bool = False,
 ) -> dict:
-    """Blocking checkout logic — runs in a thread via run_in_threadpool.
+    """Blocking checkout logic — runs on the commerce pool via run_in_pool.
 
     variant_ids is a list of all Printify variant IDs to enable on the product,
     so customers can choose their preferred size/color on the Shopify storefront.
@@ -1502,68 +1733,61 @@ def _do_checkout_sync(
         raise Exception("No priceable variants for this product")
     variant_ids = priced_variant_ids
 
-    _log(f"[checkout] Step 1: uploading image ({len(image_base64)} chars)")
-    # Printify's base64 `contents` upload 413s ("The POST data is too
-    # large") somewhere above ~35 MB — hit live 2026-08-08 with a
-    # 41.7 MB HQ acrylic print file (the HQ auto-start made 4096-px
-    # PNG exports the norm at checkout). For big payloads, stage the
-    # PNG under OUTPUT_DIR (served at /asset/) and hand Printify a URL
-    # instead — their URL ingester takes files the POST body can't.
-    _URL_UPLOAD_THRESHOLD = 20 * 1024 * 1024  # b64 chars; ~15 MB binary
+    _log(f"[checkout] Step 1: uploading image "
+         f"({image_url or f'{len(image_base64)} base64 chars from the browser'})")
+    # Printify always fetches the print file by URL now: a short-lived
+    # signed link (api/signed_assets.py) to the composed file, or to the
+    # browser's upload staged outside every public mount. base64 `contents`
+    # 413'd above ~35 MB (hit live 2026-08-08 with a 41.7 MB HQ acrylic
+    # print) and made personalised orders — which must never sit at a
+    # public /asset/ URL — shrink until they fit. The signed link is as
+    # private as the base64 body was and has neither limit.
+    from api import signed_assets
     _staged_upload_path = None
-    if image_url:
-        # Server-composed print file (api/print_compose.py): the bytes never
-        # left this box, so hand Printify the URL and skip base64 entirely.
-        _abs = image_url if image_url.startswith("http") else f"{_public_base_url()}{image_url}"
-        _log(f"[checkout] Server-composed print file, uploading by URL: {_abs}")
-        upload_json = {"file_name": file_name, "url": _abs}
-    elif personalized:
-        # PII path: the print file has customer text baked in. Staging it under
-        # /asset would expose that text at a world-reachable URL for the upload
-        # window, so ALWAYS upload as base64 `contents` instead. If it exceeds
-        # Printify's ~35 MB POST ceiling, downscale to fit rather than leak.
-        image_base64 = _shrink_b64_png_under(image_base64, _URL_UPLOAD_THRESHOLD)
-        _log(f"[checkout] Personalized order — base64 upload ({len(image_base64)} chars), no /asset staging")
-        upload_json = {"file_name": file_name, "contents": image_base64}
-    elif len(image_base64) > _URL_UPLOAD_THRESHOLD:
-        import base64 as _b64
-        import uuid as _uuid
-        from api.main import OUTPUT_DIR  # runtime import; no cycle at import time
-        _updir = os.path.join(OUTPUT_DIR, "print_uploads")
-        os.makedirs(_updir, exist_ok=True)
-        _staged_name = f"{_uuid.uuid4().hex}.png"
-        _staged_upload_path = os.path.join(_updir, _staged_name)
-        with open(_staged_upload_path, "wb") as _fh:
-            _fh.write(_b64.b64decode(image_base64))
-        _staged_url = f"{_public_base_url()}/asset/print_uploads/{_staged_name}"
-        _log(f"[checkout] Large print file — staging for URL upload: {_staged_url}")
-        upload_json = {"file_name": file_name, "url": _staged_url}
+    _reusable_upload = bool(image_url and _COMPOSED_NAME_RE.match(image_url))
+    with _composed_upload_lock:
+        image_id = _COMPOSED_UPLOAD_IDS.get(image_url) if _reusable_upload else None
+    if image_id:
+        _log(f"[checkout] Print file already uploaded as {image_id}; reusing ({image_url})")
+        upload_json = None
     else:
-        upload_json = {"file_name": file_name, "contents": image_base64}
-    try:
-        upload_resp = _printify_request(
-            "POST",
-            f"{PRINTIFY_BASE}/uploads/images.json",
-            headers=_headers(),
-            json=upload_json,
-            timeout=180,
-        )
-    finally:
-        # Printify ingests the URL during the POST, so the staged file is
-        # disposable as soon as the call returns (success or not).
-        if _staged_upload_path:
-            try:
-                os.remove(_staged_upload_path)
-            except OSError:
-                pass
-    if upload_resp.status_code not in (200, 201):
-        raise Exception(f"Image upload failed ({upload_resp.status_code}): {upload_resp.text[:300]}")
-
-    image_data = upload_resp.json()
-    image_id = image_data.get("id")
-    if not image_id:
-        raise Exception("No image ID in upload response")
-    _log(f"[checkout] Image uploaded: {image_id}")
+        if image_url:
+            _src_path = _asset_file(image_url)
+        else:
+            import base64 as _b64
+            _staged_upload_path = signed_assets.stage(_b64.b64decode(image_base64))
+            image_base64 = ""       # the decoded file is the only copy we need
+            _src_path = _staged_upload_path
+        _signed = f"{_public_base_url()}{signed_assets.sign_path(_src_path)}"
+        _log(f"[checkout] Uploading by signed URL ({'personalized, ' if personalized else ''}"
+             f"{os.path.getsize(_src_path)} bytes, {signed_assets.DEFAULT_TTL_S}s link)")
+        upload_json = {"file_name": file_name, "url": _signed}
+    if upload_json is not None:
+        try:
+            upload_resp = _printify_request(
+                "POST",
+                f"{PRINTIFY_BASE}/uploads/images.json",
+                headers=_headers(),
+                json=upload_json,
+                timeout=180,
+            )
+        finally:
+            # Printify ingests the URL during the POST, so the staged file is
+            # disposable as soon as the call returns (success or not).
+            signed_assets.unstage(_staged_upload_path)
+        if upload_resp.status_code not in (200, 201):
+            raise Exception(f"Image upload failed ({upload_resp.status_code}): {upload_resp.text[:300]}")
+
+        image_data = upload_resp.json()
+        image_id = image_data.get("id")
+        if not image_id:
+            raise Exception("No image ID in upload response")
+        _log(f"[checkout] Image uploaded: {image_id}")
+        if _reusable_upload:
+            with _composed_upload_lock:
+                if len(_COMPOSED_UPLOAD_IDS) >= _COMPOSED_UPLOAD_MAX:
+                    _COMPOSED_UPLOAD_IDS.pop(next(iter(_COMPOSED_UPLOAD_IDS)))
+                _COMPOSED_UPLOAD_IDS[image_url] = image_id
 
     # ── Step 2: Create product with all requested variants enabled ──
     _log(
@@ -1726,14 +1950,15 @@ async def checkout(request: Request):
             raise HTTPException(status_code=400, detail="Missing image_base64 or image_url")
         # Only our own staged assets may be referenced (never a caller-
         # supplied external URL — that would make this a fetch gadget).
-        if image_url and not image_url.startswith("/asset/"):
-            raise HTTPException(status_code=400, detail="image_url must be a served /asset/ path")
+        if image_url and not image_url.startswith(("/asset/", "/signed/")):
+            raise HTTPException(status_code=400,
+                                detail="image_url must be a served /asset/ path or a signed link")
         if not blueprint_id or not print_provider_id or not variant_ids:
             raise HTTPException(status_code=400, detail="Missing blueprint_id, print_provider_id, or variant_ids")
 
         _log(f"[checkout] Received: blueprint={blueprint_id} provider={print_provider_id} variants={len(variant_ids)}")
-        result = await run_in_threadpool(
-            _do_checkout_sync,
+        result = await run_in_pool(
+            "commerce", _do_checkout_sync,
             image_base64, file_name, title, description,
             blueprint_id, print_provider_id, variant_ids,
             price, position, tags, image_url,
@@ -1757,7 +1982,7 @@ _PRINTIFY_ID_RE = re.compile(r"^[a-f0-9]{24}$")
 
 
 def _fetch_shopify_url_sync(product_id: str) -> dict:
-    """Blocking lookup — runs in a thread via run_in_threadpool."""
+    """Blocking lookup — runs on the commerce pool via run_in_pool."""
     shop_id = _shop_id()
     resp = _printify_request(
         "GET",
@@ -1813,7 +2038,7 @@ async def get_shopify_url(product_id: str, request: Request):
     if not _PRINTIFY_ID_RE.match(product_id):
         raise HTTPException(status_code=400, detail="Invalid product_id format")
     try:
-        result = await run_in_threadpool(_fetch_shopify_url_sync, product_id)
+        result = await run_in_pool("commerce", _fetch_shopify_url_sync, product_id)
         return JSONResponse(content=result)
     except Exception as e:
         _log(f"[shopify-url] Error checking product {product_id}: {e}")
@@ -1946,8 +2171,8 @@ async def get_cart_url(product_id: str, variant_id: int, request: Request):
     if not _PRINTIFY_ID_RE.match(product_id):
         raise HTTPException(status_code=400, detail="Invalid product_id format")
     try:
-        result = await run_in_threadpool(
-            _build_cart_url_sync, product_id, int(variant_id)
+        result = await run_in_pool(
+            "commerce", _build_cart_url_sync, product_id, int(variant_id)
         )
         return JSONResponse(content=result)
     except Exception as e:
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Self-check for dropping jobs whose client has gone away.
+
+Run: python3 api/scripts/test_abandon.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. an abandoned waiter is dropped instead of granted; the next one runs
+  2. a running job stops at its next checkpoint once interest lapses
+  3. jobs nobody ever asked about (warms) are never abandoned
+  4. an abandoned HQ task comes back to life when its client polls again,
+     joining a live task for the same render instead of running it twice
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ.setdefault("SOLAR_ARCHIVE_SKIP_HEAVY_IMPORTS", "1")
+os.environ["JOB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+
+import api.main as m  # noqa: E402
+
+
+def test_abandoned_waiter_is_dropped():
+    gone = {"stale"}
+
+    async def go():
+        sched = m._HeavyScheduler(1, abandoned=lambda j: j in gone)
+        held = await sched.acquire("hq", "live-a")
+        stale = asyncio.ensure_future(sched.acquire("preview", "stale"))
+        live = asyncio.ensure_future(sched.acquire("warm", "live-b"))
+        await asyncio.sleep(0)
+        sched.release(held)
+        tok = await asyncio.wait_for(live, 1)
+        try:
+            await stale
+        except m._JobAbandoned:
+            pass
+        else:
+            raise AssertionError("abandoned waiter must not get the slot")
+        sched.release(tok)
+        assert not sched._running and not sched._waiting
+    asyncio.run(go())
+
+
+def test_checkpoint_stops_only_stale_jobs():
+    m._touch_job("job-stale")
+    m._job_interest["job-stale"] -= m._JOB_ABANDON_S + 1
+    m._touch_job("job-live")
+    tok = m._job_ctx.set("job-live")
+    try:
+        m._job_checkpoint("rhef")
+    finally:
+        m._job_ctx.reset(tok)
+    tok = m._job_ctx.set("warm_default")     # never touched → never abandoned
+    try:
+        m._job_checkpoint("rhef")
+    finally:
+        m._job_ctx.reset(tok)
+    tok = m._job_ctx.set("job-stale")
+    try:
+        m._job_checkpoint("rhef")
+    except m._JobAbandoned:
+        pass
+    else:
+        raise AssertionError("stale job must stop at the checkpoint")
+    finally:
+        m._job_ctx.reset(tok)
+        m._forget_job("job-stale")
+        m._forget_job("job-live")
+
+
+def test_abandoned_hq_task_revives_on_poll():
+    calls = []
+
+    def fake_generate(dt, wl, mission, detector, integrate=False):
+        calls.append(m._job_ctx.get())
+        if len(calls) == 1:
+            # The tab closed mid-fetch: interest lapses before the next stage.
+            m._job_interest[calls[0]] = time.time() - m._JOB_ABANDON_S - 1
+            m._job_checkpoint("rhef")
+        return "/asset/hq_SDO_171_20190307_0830.png"
+
+    orig = m.do_generate_sync
+    m.do_generate_sync = fake_generate
+    try:
+        async def go():
+            task_id = "abandon-selfcheck"
+            params = {"date": "2019-03-07T08:30:00", "wavelength": 171, "mission": "SDO",
+                      "detector": "AIA", "format_type": "rhef", "integrate": False}
+            m._JOB_STORE.put_task(task_id, {"status": "queued"}, m._BOOT_ID, params=params)
+            await m.run_generation_task(task_id, params["date"], 171, "SDO", "AIA")
+            assert m.tasks.get(task_id)["status"] == "abandoned", m.tasks.get(task_id)
+            assert task_id not in m._job_interest
+
+            r = json.loads((await m.get_status(task_id)).body)
+            assert r["status"] in ("queued", "started"), r
+            for _ in range(100):
+                if m.tasks.get(task_id)["status"] == "completed":
+                    break
+                await asyncio.sleep(0.01)
+            assert m.tasks.get(task_id)["status"] == "completed", m.tasks.get(task_id)
+            assert calls == [task_id, task_id]
+        asyncio.run(go())
+    finally:
+        m.do_generate_sync = orig
+
+
+def test_revived_task_joins_a_live_duplicate():
+    calls = []
+    orig = m.do_generate_sync
+    m.do_generate_sync = lambda *a, **k: calls.append(a) or "/asset/x.png"
+    try:
+        async def go():
+            params = {"date": "2019-03-08T08:30:00", "wavelength": 193, "mission": "SDO",
+                      "detector": "AIA", "format_type": "rhef", "integrate": False}
+            key = m._hq_dedupe_key(params["date"], 193, "SDO", "AIA", False, "rhef")
+            m._JOB_STORE.put_task("gone", {"status": "queued"}, m._BOOT_ID, params=params)
+            with m.status_lock:
+                m.tasks["gone"] = {"status": "abandoned", "message": "Stopped"}
+                m.tasks["live"] = {"status": "started", "message": "HQ generation started"}
+                m._hq_inflight[key] = "live"
+            r = json.loads((await m.get_status("gone")).body)
+            assert r["status"] == "started" and r["joined"] == "live", r
+            await asyncio.sleep(0.05)
+            assert calls == [] and m._hq_inflight[key] == "live", "no second render"
+            with m.status_lock:
+                m.tasks["live"] = {"status": "completed", "image_url": "/asset/hq.png"}
+            r = json.loads((await m.get_status("gone")).body)
+            assert r == {"status": "completed", "image_url": "/asset/hq.png"}, r
+            assert m.tasks.get("gone") == r, "the result is kept under the revived id"
+            m._hq_inflight.pop(key, None)
+        asyncio.run(go())
+    finally:
+        m.do_generate_sync = orig
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all abandon checks passed")
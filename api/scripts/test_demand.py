@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Self-check for the render-demand counters behind the idle warmer.
+
+Run: python3 api/scripts/test_demand.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. counts rank hottest-first, per tier
+  2. counters survive a "restart" (fresh module state, same file)
+  3. the key set stays compact — the coldest keys go first
+  4. record() never writes the file (it runs on the event loop); flush()
+     does, from main.py's idle loop on a worker thread
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+import api.demand as d  # noqa: E402
+
+
+def _fresh(path):
+    d.DEMAND_FILE = Path(path)
+    d._counts.clear()
+    d._loaded = False
+    d._dirty = False
+    d._last_flush = 0.0
+
+
+def test_ranks_hottest_first_per_tier():
+    with tempfile.TemporaryDirectory() as tmp:
+        _fresh(os.path.join(tmp, "render_demand.json"))
+        for _ in range(3):
+            d.record("preview", "20141024_1200", 193)
+        d.record("preview", "20240101_0000", 171)
+        d.record("hq", "20240101_0000", 171)
+        d.record("bogus", "20240101_0000", 171)
+        top = d.top(10, tiers=("preview",))
+        assert [(r["date_str"], r["wl"]) for r in top] == [("20141024_1200", 193), ("20240101_0000", 171)]
+        assert top[0]["count"] == 3
+        assert [r["tier"] for r in d.top(10)].count("hq") == 1
+        assert all(r["tier"] in d.TIERS for r in d.top(10))
+
+
+def test_survives_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "render_demand.json")
+        _fresh(path)
+        d.record("hq", "20230615_0830", 304)
+        d.record("hq", "20230615_0830", 304)
+        assert d.flush(force=True) or os.path.exists(path)
+        _fresh(path)            # new process: empty memory, same disk
+        top = d.top(1)
+        assert top and top[0]["count"] == 2 and top[0]["wl"] == 304, top
+
+
+def test_compaction_drops_coldest():
+    with tempfile.TemporaryDirectory() as tmp:
+        _fresh(os.path.join(tmp, "render_demand.json"))
+        orig = d._MAX_KEYS
+        d._MAX_KEYS = 3
+        try:
+            for _ in range(5):
+                d.record("preview", "20200101_1200", 171)
+            for i in range(4):
+                d.record("preview", "2020010%d_1200" % (i + 2), 193)
+            assert len(d._counts) == 3
+            assert "preview|20200101_1200|171" in d._counts, "hottest key must survive"
+        finally:
+            d._MAX_KEYS = orig
+
+
+def test_record_never_touches_disk():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "render_demand.json")
+        _fresh(path)
+        d.record("preview", "20240101_0000", 171)
+        assert not os.path.exists(path), "record() must not write"
+        assert d.flush() and os.path.exists(path)
+        assert not d.flush(), "nothing new to write"
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all demand checks passed")
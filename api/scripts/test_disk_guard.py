@@ -8,9 +8,15 @@ Covers the 2026-07-24 outage: a full volume made every render raise
 customers forever. The rules that must hold:
   1. infrastructure failures are NOT remembered (they retry)
   2. genuine no-data failures ARE remembered, but expire
-  3. the temp cache prunes oldest-first when the disk is over target
+  3. the temp cache prunes oldest-first when the disk is over target, and
+     Helioviewer screenshots go through _HV_DISK so its byte count follows;
+     the daily janitor leaves them to _HV_DISK's own LRU
+  4. a customer render's disk check doesn't queue behind operator warms
+     and sweeps (the "batch" pool) or background chores ("maintenance")
 """
+import asyncio
 import os
+import threading
 import sys
 import time
 import tempfile
@@ -75,11 +81,86 @@ def test_prune_removes_oldest_first():
             m.OUTPUT_DIR, m._disk_used_pct = orig_dir, orig_pct
 
 
+def test_prune_keeps_the_screenshot_index_honest():
+    import api.main as m
+    from datetime import datetime
+    from api.hv_cache import ScreenshotCache
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = ScreenshotCache(os.path.join(d, "hv_cache"), 1 << 20)
+        old = datetime(2019, 3, 7, 8, 30)
+        for i in range(3):
+            assert cache.store(171, old.replace(minute=i), 12, 256, 256, b"\x89PNG" + b"x" * 1000)
+        assert cache.stats()["bytes"] == 3 * 1004
+        orig = m.OUTPUT_DIR, m._disk_used_pct, m._HV_DISK
+        m.OUTPUT_DIR, m._HV_DISK = d, cache
+        try:
+            left = lambda: [f for _r, _d, fs in os.walk(os.path.join(d, "hv_cache")) for f in fs]
+            m._disk_used_pct = lambda path=None: 0.0 if len(left()) <= 1 else 99.0
+            assert m._prune_temp_cache() == 2
+            st = cache.stats()
+            assert st["entries"] == 1 and st["bytes"] == 1004, st
+        finally:
+            m.OUTPUT_DIR, m._disk_used_pct, m._HV_DISK = orig
+
+
+def test_janitor_leaves_the_screenshot_cache():
+    import api.main as m
+    from datetime import datetime
+    from api.hv_cache import ScreenshotCache
+
+    with tempfile.TemporaryDirectory() as d:
+        cache = ScreenshotCache(os.path.join(d, "hv_cache"), 1 << 20)
+        assert cache.store(171, datetime(2019, 3, 7, 8, 30), 12, 256, 256, b"\x89PNG" + b"x" * 1000)
+        stale = os.path.join(d, "previews", "old.png")
+        os.makedirs(os.path.dirname(stale))
+        open(stale, "wb").close()
+        week_ago = time.time() - 7 * 86400
+        for root, _d, fs in os.walk(d):
+            for f in fs:
+                os.utime(os.path.join(root, f), (week_ago, week_ago))
+        orig = m.OUTPUT_DIR
+        m.OUTPUT_DIR = d
+        try:
+            m._sweep_output_cache()
+        finally:
+            m.OUTPUT_DIR = orig
+        assert not os.path.exists(stale)
+        st = cache.stats()
+        assert st["entries"] == 1 and st["bytes"] == 1004, st
+        assert cache.lookup(171, datetime(2019, 3, 7, 8, 30), 12, 256, 256), "still on disk"
+
+
 def test_disk_pct_is_sane():
     pct = _disk_used_pct("/")
     assert 0.0 <= pct <= 100.0, pct
 
 
+def test_render_does_not_wait_on_batch_work():
+    import api.main as m
+    from api import executors
+    from api.job_store import JobStore
+    m._JOB_STORE = JobStore(os.path.join(tempfile.mkdtemp(), "jobs.sqlite3"))
+    gate = threading.Event()
+    blockers = [executors.pool(name).submit(gate.wait, 30)
+                for name in ("batch", "maintenance") for _ in range(4)]
+    orig = m.do_generate_sync
+    m.do_generate_sync = lambda *a, **k: "/asset/hq_SDO_171_20190307_0830.png"
+    try:
+        async def go():
+            task_id = "disk-guard-selfcheck"
+            m._JOB_STORE.put_task(task_id, {"status": "queued"}, m._BOOT_ID)
+            await asyncio.wait_for(
+                m.run_generation_task(task_id, "2019-03-07T08:30:00", 171, "SDO", "AIA"), 5)
+            assert m.tasks.get(task_id)["status"] == "completed", m.tasks.get(task_id)
+        asyncio.run(go())
+    finally:
+        gate.set()
+        m.do_generate_sync = orig
+        for b in blockers:
+            b.result(5)
+
+
 if __name__ == "__main__":
     for name, fn in sorted(globals().items()):
         if name.startswith("test_") and callable(fn):
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Self-check for the named, bounded executor pools.
+
+Run: python3 api/scripts/test_executors.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. a saturated pool doesn't delay work on another pool
+  2. queue depth and wait time are counted
+  3. the caller's contextvars reach the worker (job id, limiter lane)
+  4. a job cancelled before it started doesn't leak a queue slot
+  5. pool sizes come from configure() unless the env overrides them
+  6. submit() from a plain thread runs concurrently, carries contextvars
+     and is counted like run()
+"""
+import asyncio
+import contextvars
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from api import executors  # noqa: E402
+from api.executors import NamedPool  # noqa: E402
+
+
+def test_saturated_pool_is_isolated():
+    async def go():
+        slow, fast = NamedPool("slow", 2), NamedPool("fast", 1)
+        gate = threading.Event()
+        stalled = [asyncio.ensure_future(slow.run(gate.wait)) for _ in range(5)]
+        try:
+            await asyncio.sleep(0.05)
+            t0 = time.monotonic()
+            assert await asyncio.wait_for(fast.run(lambda: "ok"), 1) == "ok"
+            assert time.monotonic() - t0 < 0.5
+            st = slow.stats()
+            assert st["active"] == 2 and st["queued"] == 3 and st["peak_queued"] >= 3, st
+        finally:
+            gate.set()
+        await asyncio.gather(*stalled)
+        st = slow.stats()
+        assert st["completed"] == 5 and st["queued"] == 0 and st["max_wait_s"] > 0, st
+    asyncio.run(go())
+
+
+def test_contextvars_reach_the_worker():
+    var = contextvars.ContextVar("job", default=None)
+
+    async def go():
+        var.set("task-123")
+        return await NamedPool("ctx", 1).run(var.get)
+    assert asyncio.run(go()) == "task-123"
+
+
+def test_cancelled_before_start_frees_its_slot():
+    async def go():
+        p = NamedPool("cancel", 1)
+        gate = threading.Event()
+        running = asyncio.ensure_future(p.run(gate.wait))
+        await asyncio.sleep(0.02)
+        waiting = asyncio.ensure_future(p.run(lambda: "never"))
+        await asyncio.sleep(0.02)
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert p.stats()["queued"] == 0, p.stats()
+        gate.set()
+        await running
+        assert p.stats()["completed"] == 1
+    asyncio.run(go())
+
+
+def test_sizes_and_registry():
+    executors.configure("compose", 3)
+    os.environ["POOL_FILES_WORKERS"] = "7"
+    try:
+        executors._pools.pop("compose", None)
+        executors._pools.pop("files", None)
+        assert executors.pool("compose").max_workers == 3
+        assert executors.pool("files").max_workers == 7
+        assert executors.pool("files") is executors.pool("files")
+        assert asyncio.run(executors.run_in_pool("files", sum, [1, 2, 3])) == 6
+        assert executors.stats()["files"]["completed"] == 1
+    finally:
+        del os.environ["POOL_FILES_WORKERS"]
+    try:
+        executors.pool("default")
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("unknown pools must be rejected")
+
+
+def test_submit_from_a_plain_thread():
+    var = contextvars.ContextVar("job", default=None)
+    var.set("job-7")
+    p = NamedPool("stages-test", 2)
+    gate = threading.Event()
+    blocked = p.submit(gate.wait, 2)
+    got = p.submit(var.get)
+    assert got.result(timeout=1) == "job-7"      # not queued behind the blocked task
+    assert not blocked.done()
+    gate.set()
+    assert blocked.result(timeout=1) is True
+    st = p.stats()
+    assert st["completed"] == 2 and st["queued"] == 0 and st["active"] == 0, st
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all executor checks passed")
@@ -53,6 +53,32 @@ def test_crop_to_aspect_geometry():
     assert main._crop_to_aspect(src, [1, 1]) is src
 
 
+def test_grid_crops_batch():
+    import tempfile
+    from api import print_compose
+    src = pathlib.Path(tempfile.mkdtemp()) / "raw.png"
+    src.write_bytes(_noise_png_bytes(1000, 1000))
+    decodes = []
+    real = print_compose._Source.__init__
+    print_compose._Source.__init__ = lambda self, p: decodes.append(p) or real(self, p)
+    try:
+        crops = main._grid_crops(src, [[11, 14], [3, 4], [4, 3], [11, 14], [1, 1], None])
+    finally:
+        print_compose._Source.__init__ = real
+    assert len(decodes) == 1 and sorted(crops) == ["11x14", "1x1", "3x4", "4x3"], (decodes, sorted(crops))
+    assert Image.open(io.BytesIO(crops["11x14"])).size == (786, 1000)
+    whole = Image.open(src)
+    for key, ratio in (("11x14", 11 / 14), ("3x4", 3 / 4), ("4x3", 4 / 3)):
+        im = Image.open(io.BytesIO(crops[key]))
+        assert im.mode == "RGB" and max(im.size) == 1000 and abs(im.size[0] / im.size[1] - ratio) < 0.02
+        # a centred window of the source, pixel for pixel
+        left, top = (1000 - im.size[0]) // 2, (1000 - im.size[1]) // 2
+        assert im.tobytes() == whole.crop((left, top, left + im.size[0], top + im.size[1])).tobytes()
+        fallback = main._crop_to_aspect(src.read_bytes(), [float(v) for v in key.split("x")])
+        assert Image.open(io.BytesIO(fallback)).tobytes() == im.tobytes(), "the fallback's crop"
+    assert Image.open(io.BytesIO(crops["1x1"])).tobytes() == whole.tobytes()
+
+
 def test_grid_cell_count():
     cells = main._grid_all_cells()
     assert len(cells) == len(main._GRID_WAVELENGTHS) * 2 * len(main._DEFAULT_MOCKUP_PRODUCTS)
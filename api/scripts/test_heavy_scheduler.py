@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Self-check for the priority heavy-render scheduler.
+
+Run: python3 api/scripts/test_heavy_scheduler.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. a freed slot goes to the best class (preview > hq > checkout > warm)
+  2. equal class → FIFO
+  3. aging lets a long-waiting low class beat a fresh high one
+  4. position/ETA are reported for waiting and running jobs
+  5. a waiter cancelled mid-queue never leaks a slot
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ.setdefault("SOLAR_ARCHIVE_SKIP_HEAVY_IMPORTS", "1")
+
+import api.main as m  # noqa: E402
+
+
+async def _order_of(sched, jobs):
+    """Start `jobs` [(cls, id)] while a warm job holds the only slot, then
+    release it and return the order the waiters were granted in."""
+    order = []
+    blocker = await sched.acquire("warm", "blocker")
+
+    async def run(cls, jid):
+        tok = await sched.acquire(cls, jid)
+        order.append(jid)
+        await asyncio.sleep(0)
+        sched.release(tok)
+
+    tasks = []
+    for cls, jid in jobs:
+        tasks.append(asyncio.ensure_future(run(cls, jid)))
+        await asyncio.sleep(0)
+    sched.release(blocker)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_priority_beats_arrival_order():
+    sched = m._HeavyScheduler(1)
+    order = asyncio.run(_order_of(sched, [
+        ("warm", "w1"), ("checkout", "c1"), ("hq", "h1"), ("preview", "p1"), ("preview", "p2"),
+    ]))
+    assert order == ["p1", "p2", "h1", "c1", "w1"], order
+
+
+def test_aging_prevents_starvation():
+    orig = m._HEAVY_AGING_S
+    m._HEAVY_AGING_S = 0.01        # 10 ms of waiting = one class of rank
+    try:
+        async def go():
+            sched = m._HeavyScheduler(1)
+            order = []
+            blocker = await sched.acquire("hq", "blocker")
+
+            async def run(cls, jid):
+                tok = await sched.acquire(cls, jid)
+                order.append(jid)
+                sched.release(tok)
+
+            old = asyncio.ensure_future(run("warm", "old-warm"))
+            await asyncio.sleep(0.1)          # ages far past 3 classes
+            new = asyncio.ensure_future(run("preview", "fresh-preview"))
+            await asyncio.sleep(0)
+            sched.release(blocker)
+            await asyncio.gather(old, new)
+            return order
+        assert asyncio.run(go()) == ["old-warm", "fresh-preview"]
+    finally:
+        m._HEAVY_AGING_S = orig
+
+
+def test_position_and_eta():
+    async def go():
+        sched = m._HeavyScheduler(1)
+        running = await sched.acquire("hq", "task-running")
+        w = asyncio.ensure_future(sched.acquire("warm", "task-warm"))
+        p = asyncio.ensure_future(sched.acquire("preview", "task-preview"))
+        await asyncio.sleep(0)
+        r = sched.position("task-running")
+        pp = sched.position("task-preview")
+        pw = sched.position("task-warm")
+        assert r["queue_position"] == 1 and r["eta_s"] == 0, r
+        assert pp["queue_position"] == 2 and pw["queue_position"] == 3, (pp, pw)
+        assert 0 < pp["eta_s"] < pw["eta_s"], (pp, pw)
+        assert sched.position("nope") is None
+        sched.release(running)
+        sched.release(await p)
+        sched.release(await w)
+    asyncio.run(go())
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def go():
+        sched = m._HeavyScheduler(1)
+        held = await sched.acquire("hq", "a")
+        waiter = asyncio.ensure_future(sched.acquire("preview", "b"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        sched.release(held)
+        tok = await asyncio.wait_for(sched.acquire("warm", "c"), timeout=1)
+        assert sched.position("c")["queue_position"] == 1
+        sched.release(tok)
+        assert not sched._running and not sched._waiting
+    asyncio.run(go())
+
+
+def test_slot_keeps_queue_depth_honest():
+    async def go():
+        assert m._heavy_queue_depth() == 0
+        async with m._HeavyRenderSlot("preview", job_id="x"):
+            assert m._heavy_queue_depth() == 1
+            assert m._heavy_queue_position("x")["priority"] == "preview"
+        assert m._heavy_queue_depth() == 0
+    asyncio.run(go())
+    try:
+        m._HeavyRenderSlot("urgent")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("unknown priority must be rejected")
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all heavy-scheduler checks passed")
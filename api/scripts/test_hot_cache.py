@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Self-check for the in-RAM hot byte cache (api/hot_cache.py).
+
+Run: python3 api/scripts/test_hot_cache.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. a second hit within the revalidate window never touches the disk
+  2. a re-warm under the same name is picked up once the window lapses
+  3. oversize files and missing files fall through (None → FileResponse)
+  4. the byte budget evicts least-recently-used first
+  5. the mount answers If-None-Match with a 304 and ranges go to StaticFiles
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from api.hot_cache import HotByteCache, HotStaticFiles  # noqa: E402
+
+
+def _write(path, data: bytes, mtime=None):
+    with open(path, "wb") as fh:
+        fh.write(data)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_hit_within_window_skips_disk():
+    c = HotByteCache(max_bytes=1 << 20, max_entry_bytes=1 << 16, revalidate_s=60)
+    with tempfile.TemporaryDirectory() as d:
+        p = os.path.join(d, "a.thumb.webp")
+        _write(p, b"x" * 100)
+        e1 = c.get_file(p)
+        assert e1 is not None and e1.media_type == "image/webp", e1
+        os.remove(p)  # a disk read now would fail
+        e2 = c.get_file(p)
+        assert e2 is e1 and c.hits == 1 and c.misses == 1
+
+
+def test_rewarm_is_seen_after_window():
+    c = HotByteCache(max_bytes=1 << 20, max_entry_bytes=1 << 16, revalidate_s=0)
+    with tempfile.TemporaryDirectory() as d:
+        p = os.path.join(d, "default_mockups.json")
+        _write(p, b'{"v":1}', mtime=1000)
+        first = c.get_file(p)
+        _write(p, b'{"v":22}', mtime=2000)
+        second = c.get_file(p)
+        assert second.body == b'{"v":22}' and second.etag != first.etag
+
+
+def test_oversize_and_missing_fall_through():
+    c = HotByteCache(max_bytes=1 << 20, max_entry_bytes=10, revalidate_s=60)
+    with tempfile.TemporaryDirectory() as d:
+        p = os.path.join(d, "big.png")
+        _write(p, b"y" * 11)
+        assert c.get_file(p) is None
+        assert c.get_file(os.path.join(d, "nope.png")) is None
+        assert c.get_file(d) is None
+        assert c.stats()["entries"] == 0
+
+
+def test_budget_evicts_lru():
+    c = HotByteCache(max_bytes=250, max_entry_bytes=200, revalidate_s=60)
+    c.put("a", b"a" * 100, "image/png")
+    c.put("b", b"b" * 100, "image/png")
+    assert c.get("a") is not None           # a is now most recent
+    c.put("c", b"c" * 100, "image/png")     # over budget → b goes
+    assert c.get("b") is None
+    assert c.get("a") is not None and c.get("c") is not None
+    assert c.stats()["bytes"] == 200
+
+
+def test_ttl_expires_opaque_entries():
+    c = HotByteCache(max_bytes=1 << 20, max_entry_bytes=1 << 16, revalidate_s=60)
+    c.put("hv:x", b"jpg", "image/jpeg", ttl_s=0.01)
+    time.sleep(0.02)
+    assert c.get("hv:x") is None
+
+
+def test_mount_serves_etag_and_304():
+    from starlette.applications import Starlette
+    from starlette.testclient import TestClient
+
+    c = HotByteCache(max_bytes=1 << 20, max_entry_bytes=64, revalidate_s=60)
+    with tempfile.TemporaryDirectory() as d:
+        _write(os.path.join(d, "small.png"), b"p" * 32)
+        _write(os.path.join(d, "large.png"), b"q" * 128)
+        app = Starlette()
+        app.mount("/asset", HotStaticFiles(directory=d, cache=c))
+        client = TestClient(app)
+
+        r = client.get("/asset/small.png")
+        assert r.status_code == 200 and r.content == b"p" * 32
+        assert r.headers["content-length"] == "32"
+        etag = r.headers["etag"]
+        assert c.stats()["entries"] == 1
+
+        r = client.get("/asset/small.png", headers={"If-None-Match": etag})
+        assert r.status_code == 304, r.status_code
+
+        r = client.get("/asset/large.png")       # over entry cap → StaticFiles
+        assert r.status_code == 200 and len(r.content) == 128
+        r = client.get("/asset/small.png", headers={"Range": "bytes=0-3"})
+        assert r.status_code == 206 and r.content == b"pppp"
+        assert client.get("/asset/missing.png").status_code == 404
+        assert client.get("/asset/../etc/passwd").status_code == 404
+        assert c.stats()["entries"] == 1
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all hot-cache checks passed")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Self-check for in-flight dedupe of identical /api/generate requests.
+
+Run: python3 api/scripts/test_hq_dedupe.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. an identical request while the job is queued/running gets its task_id
+  2. any difference in the tuple (integrate, format, wavelength) is a new job
+  3. once the job finishes, the same request starts a fresh one
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ.setdefault("SOLAR_ARCHIVE_SKIP_HEAVY_IMPORTS", "1")
+os.environ["INTERNAL_AUTH_TOKEN"] = "dedupe-selfcheck"
+# A private job store: a shared one would hand this run the previous run's
+# still-"queued" tasks to resume as orphans.
+os.environ["JOB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+
+import api.main as m  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+_HDR = {"X-Internal-Auth": "dedupe-selfcheck"}
+_started = []
+
+
+async def _fake_run(task_id, date, wavelength, mission, detector, format_type="rhef", integrate=False):
+    # Stands in for the render: leaves the task "queued" like a job still
+    # waiting for the heavy slot.
+    _started.append(task_id)
+
+
+def _post(client, **over):
+    body = {"date": "2019-03-07", "time": "08:30", "wavelength": 211}
+    body.update(over)
+    r = client.post("/api/generate", json=body, headers=_HDR)
+    assert r.status_code == 200, r.text
+    return r.json()["task_id"]
+
+
+def test_identical_requests_share_one_task():
+    orig = m.run_generation_task
+    m.run_generation_task = _fake_run
+    try:
+        client = TestClient(m.app)
+        _started.clear()
+        a = _post(client)
+        b = _post(client, time="08:30")
+        assert a == b and _started == [a], (a, b, _started)
+
+        c = _post(client, integrate=True)
+        d = _post(client, format="raw")
+        e = _post(client, wavelength=171)
+        assert len({a, c, d, e}) == 4 and len(_started) == 4
+
+        with m.status_lock:
+            m.tasks[a] = {"status": "failed", "message": "x"}
+        m._hq_inflight_release(a)
+        f = _post(client)
+        assert f != a and _started[-1] == f
+    finally:
+        m.run_generation_task = orig
+        for tid in list(m._hq_inflight.values()):
+            m._hq_inflight_release(tid)
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all hq-dedupe checks passed")
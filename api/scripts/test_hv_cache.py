@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Self-check for the persistent Helioviewer screenshot cache.
+
+Run: python3 api/scripts/test_hv_cache.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. times snap to the channel's cadence (12 s EUV, 24 s UV, 1 h 4500)
+  2. the key separates source, frame, scale and size
+  3. frames from the last two days are never persisted
+  4. the byte budget evicts least-recently-used entries, and a new process
+     rebuilds the size index from disk
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from api.hv_cache import ScreenshotCache, snap_time  # noqa: E402
+
+PNG = b"\x89PNG\r\n\x1a\n"
+OLD = datetime(2019, 3, 7, 8, 30)
+
+
+def test_snap_to_cadence():
+    assert snap_time(datetime(2019, 3, 7, 8, 30, 5), 171) == datetime(2019, 3, 7, 8, 30, 0)
+    assert snap_time(datetime(2019, 3, 7, 8, 30, 7), 171) == datetime(2019, 3, 7, 8, 30, 12)
+    assert snap_time(datetime(2019, 3, 7, 8, 30, 0), 1600).second % 12 == 0
+    assert snap_time(datetime(2019, 3, 7, 8, 40), 4500) == datetime(2019, 3, 7, 9, 0)
+
+
+def test_key_fields():
+    c = ScreenshotCache(tempfile.mkdtemp(), 1 << 20)
+    base = c.path_for(171, OLD, 2.9296875, 1024, 1024)
+    assert base != c.path_for(193, OLD, 2.9296875, 1024, 1024)
+    assert base != c.path_for(171, OLD + timedelta(seconds=12), 2.9296875, 1024, 1024)
+    assert base != c.path_for(171, OLD, 11.71875, 1024, 1024)
+    assert base != c.path_for(171, OLD, 2.9296875, 512, 512)
+    assert c.path_for(6173, OLD, 1, 256, 256) is None     # not an AIA source
+
+
+def test_recent_frames_not_persisted():
+    c = ScreenshotCache(tempfile.mkdtemp(), 1 << 20)
+    now = snap_time(datetime.utcnow() - timedelta(hours=3), 171)
+    p = c.path_for(171, now, 12, 256, 256)
+    assert not c.put(p, now, PNG + b"x" * 200) and c.get(p) is None
+    p = c.path_for(171, OLD, 12, 256, 256)
+    assert c.put(p, OLD, PNG + b"x" * 200)
+    assert c.get(p) == (PNG + b"x" * 200, "image/png")
+
+
+def test_budget_and_reindex():
+    root = tempfile.mkdtemp()
+    c = ScreenshotCache(root, 3100)          # room for three 1008-byte bodies
+    paths = [c.path_for(171, OLD + timedelta(minutes=i), 12, 256, 256) for i in range(3)]
+    for p in paths:
+        assert c.put(p, OLD, PNG + b"x" * 1000)
+        time.sleep(0.01)
+    assert c.get(paths[0]) is not None            # touch: 0 is now the newest
+    time.sleep(0.01)
+    extra = c.path_for(193, OLD, 12, 256, 256)
+    c.put(extra, OLD, PNG + b"y" * 1000)
+    assert c.get(paths[1]) is None
+    assert all(c.get(p) is not None for p in (paths[0], paths[2], extra))
+    st = c.stats()
+    assert st["entries"] == 3 and st["bytes"] <= 3100 and st["evictions"] == 1, st
+
+    fresh = ScreenshotCache(root, 3100)
+    fresh.put(paths[1], OLD, PNG + b"z" * 1000)
+    assert fresh.stats()["entries"] == 3 and fresh.stats()["evictions"] == 1, fresh.stats()
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all hv-cache checks passed")
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Self-check for the aiohttp Helioviewer thumbnail proxy.
+
+Run: python3 api/scripts/test_hv_stream.py   (no framework, no fixtures)
+
+Points HELIOVIEWER_BASE at a local aiohttp server standing in for
+takeScreenshot. The rules that must hold:
+  1. the proxy streams the upstream bytes through unchanged, and a repeat
+     is served from the hot cache without another upstream call
+  2. a body too big for the hot cache still streams; only the disk cache
+     (_HV_DISK) keeps it, and a restart-cold hot cache falls back to disk
+  3. a JSON error body or a tiny body is a sanitised 502
+  4. the sync fetcher (worker threads) gets the same bytes
+  5. a gzip-encoded upstream reply is served decoded, with no stale
+     Content-Length
+  6. the batch endpoint returns every tile as a multipart/form-data part,
+     marks the failed ones in its index, and shares the hot cache
+  7. a batch is charged per tile against the single endpoint's 60/min
+"""
+import asyncio
+import email.parser
+import gzip
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ.setdefault("SOLAR_ARCHIVE_SKIP_HEAVY_IMPORTS", "1")
+os.environ["JOB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+# A private OUTPUT_DIR, so the persistent screenshot cache starts empty.
+os.environ["SOLAR_ARCHIVE_OUTPUT_DIR"] = tempfile.mkdtemp()
+
+import httpx  # noqa: E402
+from aiohttp import web  # noqa: E402
+
+import api.main as m  # noqa: E402
+
+_hits = []
+
+
+def _png(n: int) -> bytes:
+    return b"\x89PNG\r\n\x1a\n" + bytes(i % 251 for i in range(n))
+
+
+async def _shot(request):
+    width = int(request.query["width"])
+    _hits.append(width)
+    if width == 64:
+        return web.json_response({"error": "No images found"})
+    if width == 65:
+        return web.Response(body=b"tiny", content_type="image/png")
+    if width == 66:
+        return web.Response(body=gzip.compress(_png(66 * 1000)), content_type="image/png",
+                            headers={"Content-Encoding": "gzip"})
+    resp = web.StreamResponse(headers={"Content-Type": "image/png"})
+    await resp.prepare(request)
+    body = _png(width * 1000)
+    for i in range(0, len(body), 10000):
+        await resp.write(body[i:i + 10000])
+        await asyncio.sleep(0)
+    await resp.write_eof()
+    return resp
+
+
+async def _with_upstream(fn):
+    app = web.Application()
+    app.router.add_get("/shot/", _shot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    orig = m.HELIOVIEWER_BASE
+    m.HELIOVIEWER_BASE = f"http://127.0.0.1:{port}/shot"
+    try:
+        transport = httpx.ASGITransport(app=m.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await fn(client)
+    finally:
+        m.HELIOVIEWER_BASE = orig
+        await m._hv_app_sessions().close()
+        await runner.cleanup()
+
+
+def _thumb(client, size):
+    return client.get("/api/helioviewer_thumb", params={
+        "date": "2019-03-07T08:30:00Z", "wavelength": 171, "size": size})
+
+
+def test_streams_and_caches():
+    async def go(client):
+        _hits.clear()
+        r = await _thumb(client, 300)
+        assert r.status_code == 200, r.text
+        assert r.content == _png(300 * 1000) and r.headers["content-type"] == "image/png"
+        r2 = await _thumb(client, 300)
+        assert r2.content == r.content and _hits == [300], _hits
+    asyncio.run(_with_upstream(go))
+
+
+def test_compressed_upstream_has_no_stale_length():
+    async def go(client):
+        r = await _thumb(client, 66)
+        assert r.status_code == 200 and r.content == _png(66 * 1000), r.status_code
+        assert int(r.headers.get("content-length", len(r.content))) == len(r.content)
+    asyncio.run(_with_upstream(go))
+
+
+def test_oversized_body_streams_to_disk_only():
+    size = m.hot_cache.max_entry_bytes // 1000 + 10
+
+    async def go(client):
+        _hits.clear()
+        for _ in range(2):
+            r = await _thumb(client, size)
+            assert r.status_code == 200 and r.content == _png(size * 1000), r.status_code
+        assert _hits == [size], _hits
+        assert m._HV_DISK.stats()["hits"] >= 1
+    asyncio.run(_with_upstream(go))
+
+
+def test_disk_cache_outlives_the_hot_cache():
+    async def go(client):
+        _hits.clear()
+        r = await _thumb(client, 200)
+        assert r.status_code == 200 and _hits == [200]
+        url = m._hv_thumb_request("2019-03-07T08:30:00Z", 171, 12, 200)[0]
+        m.hot_cache.discard(f"hv:{url}")          # as after a restart
+        # 08:30:04 snaps to the same 12 s AIA frame as 08:30:00.
+        r2 = await client.get("/api/helioviewer_thumb", params={
+            "date": "2019-03-07T08:30:04Z", "wavelength": 171, "size": 200})
+        assert r2.status_code == 200 and r2.content == r.content and _hits == [200], _hits
+    asyncio.run(_with_upstream(go))
+
+
+def test_upstream_errors_are_502():
+    async def go(client):
+        for size in (64, 65):
+            r = await _thumb(client, size)
+            assert r.status_code == 502, (size, r.status_code)
+            assert "temporarily unavailable" in r.json()["detail"]
+            assert "127.0.0.1" not in r.text
+    asyncio.run(_with_upstream(go))
+
+
+def test_sync_fetch_from_a_worker_thread():
+    async def go(client):
+        url = f"{m.HELIOVIEWER_BASE}/?width=120"
+        content, ctype = await asyncio.to_thread(m._fetch_helioviewer_screenshot, url, 10)
+        assert content == _png(120 * 1000) and ctype.startswith("image/png")
+        try:
+            await asyncio.to_thread(m._fetch_helioviewer_screenshot, f"{m.HELIOVIEWER_BASE}/?width=64", 10)
+        except m._HelioviewerError as e:
+            assert "No images found" in str(e)
+        else:
+            raise AssertionError("JSON error body must raise")
+    asyncio.run(_with_upstream(go))
+
+
+def _parts(r):
+    msg = email.parser.BytesParser().parsebytes(
+        b"Content-Type: " + r.headers["content-type"].encode() + b"\r\n\r\n" + r.content)
+    return {p.get_param("name", header="content-disposition"): p.get_payload(decode=True)
+            for p in msg.get_payload()}
+
+
+def test_batch_returns_every_tile():
+    async def go(client):
+        _hits.clear()
+        r = await client.get("/api/helioviewer_thumbs", params={
+            "date": "2019-03-07T08:30:00Z", "wavelengths": "171,193", "sizes": "100,64"})
+        assert r.status_code == 200, r.text
+        assert r.headers["content-type"].startswith("multipart/form-data; boundary=")
+        parts = _parts(r)
+        assert parts["171_100"] == _png(100 * 1000) and parts["193_100"] == _png(100 * 1000)
+        index = json.loads(parts["index"])
+        assert index["171_100"]["ok"] and not index["193_64"]["ok"], index
+        assert "171_64" not in parts and r.headers["x-thumbs-missing"] == "2"
+        assert sorted(_hits) == [64, 64, 100, 100], _hits
+
+        # The single-tile endpoint reuses what the batch fetched.
+        r = await _thumb(client, 100)
+        assert r.status_code == 200 and len(_hits) == 4, _hits
+
+        r = await client.get("/api/helioviewer_thumbs", params={
+            "date": "2019-03-07T08:30:00Z", "wavelengths": "171", "sizes": "4096"})
+        assert r.status_code == 400
+    asyncio.run(_with_upstream(go))
+
+
+def test_batch_is_charged_per_tile():
+    from api import security
+
+    async def go(client):
+        security._rate_state.clear()
+        batch = {"date": "2019-03-07T08:30:00Z", "wavelengths": "94,131,335",
+                 "sizes": "200,220,240,260,280"}              # 15 tiles
+        for _ in range(4):
+            r = await client.get("/api/helioviewer_thumbs", params=batch)
+            assert r.status_code == 200, r.text
+        r = await client.get("/api/helioviewer_thumbs", params=batch)
+        assert r.status_code == 429 and int(r.headers["retry-after"]) >= 1, r.status_code
+        r = await _thumb(client, 100)
+        assert r.status_code == 429, "60 tiles spent, whichever endpoint spent them"
+        security._rate_state.clear()
+    asyncio.run(_with_upstream(go))
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all helioviewer-stream checks passed")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Self-check for the durable job registry (api/job_store.py).
+
+Run: python3 api/scripts/test_job_store.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. task state written by one process is readable by the next
+  2. non-terminal rows from an earlier boot are orphans; finished ones aren't
+  3. completed tasks can be found by their output key
+  4. an unusable path disables the store instead of raising
+  5. nothing is opened until first use, and a write never waits on the
+     database: it is queued and committed by the writer thread
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from api.job_store import JobStore  # noqa: E402
+
+
+def test_state_survives_reopen_in_wal_mode():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "jobs.sqlite3")
+        a = JobStore(path)
+        a.put_task("t1", {"status": "queued", "message": "HQ generation queued"}, "boot-a",
+                   params={"date": "2014-10-24T12:00:00", "wavelength": 193}, output_key="hq.png")
+        a.put_task("t1", {"status": "started", "message": "HQ generation started"}, "boot-a")
+        a.flush()                               # what the writer thread does within ms
+        b = JobStore(path)                      # "restart"
+        assert b.get_task("t1") == {"status": "started", "message": "HQ generation started"}
+        assert b._exec("PRAGMA journal_mode")[0][0] == "wal"
+        # Later state-only writes must not wipe the params recorded at submit.
+        orphans = b.orphaned_tasks("boot-b")
+        assert [(t, p["wavelength"]) for t, p, _ts in orphans] == [("t1", 193)], orphans
+
+
+def test_orphans_are_only_unfinished_foreign_rows():
+    with tempfile.TemporaryDirectory() as d:
+        s = JobStore(os.path.join(d, "jobs.sqlite3"))
+        s.put_task("mine", {"status": "started"}, "boot-b")
+        s.put_task("done", {"status": "completed", "image_url": "/asset/x.png"}, "boot-a")
+        s.put_task("dead", {"status": "failed"}, "boot-a")
+        s.put_task("lost", {"status": "queued"}, "boot-a")
+        assert [t for t, _p, _ts in s.orphaned_tasks("boot-b")] == ["lost"]
+        s.add_key("preview", "20141024_1200|193", "boot-a")
+        s.add_key("preview", "20141024_1200|171", "boot-b")
+        assert s.orphaned_keys("preview", "boot-b") == ["20141024_1200|193"]
+        s.discard_key("preview", "20141024_1200|193")
+        assert s.orphaned_keys("preview", "boot-b") == []
+
+
+def test_find_completed_by_output_key():
+    with tempfile.TemporaryDirectory() as d:
+        s = JobStore(os.path.join(d, "jobs.sqlite3"))
+        s.put_task("t1", {"status": "queued"}, "b", output_key="hq_SDO_171_20240101_1200.png")
+        assert s.find_completed("hq_SDO_171_20240101_1200.png") is None
+        s.put_task("t1", {"status": "completed", "image_url": "/asset/hq_SDO_171_20240101_1200.png"}, "b")
+        tid, state = s.find_completed("hq_SDO_171_20240101_1200.png")
+        assert tid == "t1" and state["status"] == "completed"
+
+
+def test_unusable_path_disables_quietly():
+    with tempfile.TemporaryDirectory() as d:
+        blocker = os.path.join(d, "file")
+        open(blocker, "w").close()
+        s = JobStore(os.path.join(blocker, "jobs.sqlite3"))   # parent is a file
+        assert not s.enabled
+        s.put_task("t", {"status": "queued"}, "b")
+        assert s.get_task("t") is None and s.orphaned_tasks("b") == []
+
+
+def test_lazy_open_and_queued_writes():
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "jobs.sqlite3")
+        s = JobStore(path)
+        assert not os.path.exists(path), "constructing the store touches no disk"
+        with s._lock:                           # the database is busy
+            t0 = time.monotonic()
+            s.put_task("t1", {"status": "queued"}, "b", params={"wavelength": 171})
+            s.put_task("t1", {"status": "started"}, "b")
+            s.add_key("preview", "k", "b")
+            assert time.monotonic() - t0 < 0.5, "writes are queued, not committed here"
+        assert s.get_task("t1") == {"status": "started"}, "a read sees every queued write"
+        assert s.get_params("t1") == {"wavelength": 171}
+        for _ in range(100):
+            if s._writer is None:
+                break
+            time.sleep(0.01)
+        assert s._writer is None and not s._pending, "the writer drains and exits"
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all job-store checks passed")
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""Self-check for memory-predicted heavy-render admission.
+
+Run: python3 api/scripts/test_mem_admission.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. cheap previews run beside an HQ when the predicted memory fits
+  2. a job that doesn't fit waits, and blocks the cheaper ones behind it
+  3. an empty box always admits, however big the prediction
+  4. a solo run's measured RSS growth corrects the model upward only;
+     overlapping runs don't, and a small (warm-heap) measurement never
+     lowers a prediction below its prior
+  5. the learned factors survive a "restart"; recording never touches the
+     disk, flush() does
+  6. the margin is HEAVY_RAM_MARGIN_MB; the deprecated RAM_HEADROOM_MB
+     only gates /api/generate when a deployment still sets it
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ.setdefault("SOLAR_ARCHIVE_SKIP_HEAVY_IMPORTS", "1")
+os.environ["HEAVY_RAM_MARGIN_MB"] = "150"
+os.environ.pop("RAM_HEADROOM_MB", None)
+
+import api.main as m  # noqa: E402
+import api.mem_model as mm  # noqa: E402
+
+
+class _FakeMem:
+    """Probe stand-in: a box with `avail` MB free whose process RSS is `rss`."""
+    def __init__(self, avail, rss=500.0):
+        self.avail, self.rss = avail, rss
+
+    def __call__(self):
+        return (self.avail, self.rss)
+
+
+def _fresh_model(path):
+    mm.MODEL_FILE = Path(path)
+    mm._factors.clear()
+    mm._loaded = False
+
+
+def test_previews_run_beside_hq():
+    with tempfile.TemporaryDirectory() as tmp:
+        _fresh_model(os.path.join(tmp, "render_memory.json"))
+
+        async def go():
+            hq_mb = mm.predict_mb("hq")
+            pv_mb = mm.predict_mb("preview")
+            mem = _FakeMem(avail=hq_mb + 2 * pv_mb + m._HEAVY_RAM_MARGIN_MB + 1)
+            sched = m._HeavyScheduler(8, probe=mem)
+            hq = await sched.acquire("hq", "hq-1")
+            p1 = await asyncio.wait_for(sched.acquire("preview", "p1"), 1)
+            p2 = await asyncio.wait_for(sched.acquire("preview", "p2"), 1)
+            p3 = asyncio.ensure_future(sched.acquire("preview", "p3"))
+            await asyncio.sleep(0)
+            assert not p3.done(), "third preview must wait for memory"
+            assert sched.position("p3")["queue_position"] == 4
+            sched.release(p1)
+            tok = await asyncio.wait_for(p3, 1)
+            for t in (hq, p2, tok):
+                sched.release(t)
+        asyncio.run(go())
+
+
+def test_big_waiter_blocks_cheaper_ones_behind_it():
+    with tempfile.TemporaryDirectory() as tmp:
+        _fresh_model(os.path.join(tmp, "render_memory.json"))
+
+        async def go():
+            pv_mb = mm.predict_mb("preview")
+            mem = _FakeMem(avail=pv_mb * 3 + m._HEAVY_RAM_MARGIN_MB)
+            sched = m._HeavyScheduler(8, probe=mem)
+            held = await sched.acquire("hq", "hq-1")
+            big = asyncio.ensure_future(sched.acquire("checkout", "chk"))
+            await asyncio.sleep(0.05)       # ages ahead of the fresh preview
+            m_aging, m._HEAVY_AGING_S = m._HEAVY_AGING_S, 0.001
+            try:
+                small = asyncio.ensure_future(sched.acquire("preview", "p1"))
+                await asyncio.sleep(0)
+                assert not big.done() and not small.done()
+                sched.release(held)         # empty box → the big one goes first
+                tok = await asyncio.wait_for(big, 1)
+                await asyncio.sleep(0)
+                assert not small.done()
+                sched.release(tok)
+                sched.release(await asyncio.wait_for(small, 1))
+            finally:
+                m._HEAVY_AGING_S = m_aging
+        asyncio.run(go())
+
+
+def test_empty_box_always_admits():
+    async def go():
+        sched = m._HeavyScheduler(4, probe=_FakeMem(avail=0))
+        tok = await asyncio.wait_for(sched.acquire("checkout", "huge"), 1)
+        sched.release(tok)
+    asyncio.run(go())
+
+
+def test_solo_runs_teach_the_model():
+    with tempfile.TemporaryDirectory() as tmp:
+        _fresh_model(os.path.join(tmp, "render_memory.json"))
+        prior = mm.prior_mb("hq")
+
+        async def go():
+            mem = _FakeMem(avail=100000, rss=500)
+            sched = m._HeavyScheduler(4, probe=mem)
+            tok = await sched.acquire("hq", "solo")
+            mem.rss = 500 + prior * 2   # grew twice the prior
+            sched.release(tok)
+            assert abs(mm.predict_mb("hq") - prior * 2) < 1, mm.predict_mb("hq")
+
+            learned = mm.predict_mb("preview")
+            a = await sched.acquire("preview", "a")
+            b = await sched.acquire("preview", "b")
+            mem.rss += 5000             # can't tell whose this was
+            sched.release(a)
+            sched.release(b)
+            assert mm.predict_mb("preview") == learned
+        asyncio.run(go())
+
+
+def test_factors_survive_restart():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "render_memory.json")
+        _fresh_model(path)
+        mm.record("hq_integrated", mm.FULL_RES_MP, 10, mm.prior_mb("hq_integrated", frames=10) * 1.5)
+        assert not os.path.exists(path), "record() is memory-only"
+        mm.flush()
+        _fresh_model(path)
+        assert mm.stats()["hq_integrated"]["samples"] == 1
+        assert abs(mm.predict_mb("hq_integrated", frames=10)
+                   - mm.prior_mb("hq_integrated", frames=10) * 1.5) < 1
+        mm.record("hq", mm.FULL_RES_MP, 1, 1.0)        # noise → ignored
+        assert mm.stats()["hq"]["samples"] == 0
+
+
+def test_warm_heap_never_lowers_the_prior():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "render_memory.json")
+        _fresh_model(path)
+        prior = mm.prior_mb("hq")
+        for _ in range(20):                         # arenas already mapped: little growth
+            mm.record("hq", mm.FULL_RES_MP, 1, prior * 0.2)
+        assert mm.predict_mb("hq") == prior
+        with open(path, "w") as f:                  # written before the floor existed
+            f.write('{"hq": [0.3, 40]}')
+        _fresh_model(path)
+        assert mm.predict_mb("hq") == prior
+
+
+def test_deprecated_ram_headroom_is_opt_in():
+    assert m._HEAVY_RAM_MARGIN_MB == 150 and m._RAM_HEADROOM_MB is None
+    m._check_ram_headroom()                     # unset: never refuses
+
+    class _VM:
+        available = 300 * 1024 * 1024
+
+    class _Psutil:
+        @staticmethod
+        def virtual_memory():
+            return _VM()
+    orig = (m._psutil, m._RAM_HEADROOM_MB)
+    m._psutil, m._RAM_HEADROOM_MB = _Psutil, 400
+    try:
+        try:
+            m._check_ram_headroom()
+            raise AssertionError("a deployment that sets RAM_HEADROOM_MB keeps its floor")
+        except m.HTTPException as e:
+            assert e.status_code == 503
+        m._RAM_HEADROOM_MB = 200
+        m._check_ram_headroom()
+    finally:
+        m._psutil, m._RAM_HEADROOM_MB = orig
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all memory-admission checks passed")
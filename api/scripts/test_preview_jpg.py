@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Self-check for the preview pipeline's JPG tier and PNG stages.
+
+Run: python3 api/scripts/test_preview_jpg.py   (no framework, no fixtures)
+
+A synthetic FITS frame sits in the local FITS cache, so none is fetched,
+and the Helioviewer fetcher is swapped for a counter that returns a
+1024² PNG. The rules that must hold:
+  1. with the FITS already resolvable, takeScreenshot is called exactly
+     once, at the frame's DATE-OBS snapped to the AIA cadence
+  2. the JPG tier is written at the 512² preview size
+  3. a smaller screenshot of the same frame and field of view is derived
+     from that 1024² one on disk, not fetched
+  4. the fetch runs on the "stages" pool, and has landed by the time
+     _generate_preview_sync returns or raises
+  5. the raw/RHEF PNG writer is pyplot-free: size², NaN transparent, rows
+     flipped for origin="lower", and identical bytes when run concurrently
+"""
+import io
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ.setdefault("SOLAR_ARCHIVE_SKIP_HEAVY_IMPORTS", "1")
+os.environ["JOB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+os.environ["SOLAR_ARCHIVE_OUTPUT_DIR"] = tempfile.mkdtemp()
+
+import numpy as np  # noqa: E402
+from astropy.io import fits  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import api.main as m  # noqa: E402
+
+_calls = []
+
+
+def _png(size):
+    buf = io.BytesIO()
+    Image.fromarray(np.full((size, size, 3), 128, dtype=np.uint8)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def _fake_fetch(url, timeout=60, throttled=False):
+    _calls.append((url, threading.current_thread().name))
+    return _png(1024), "image/png"
+
+
+def _fits_frame(dt_obs: str):
+    # OUTPUT_DIR is on the pipeline's local-FITS search path.
+    path = os.path.join(m.OUTPUT_DIR, "aia.lev1.171A_2019_03_07T08_30_00.00Z.image_lev1.fits")
+    hdu = fits.PrimaryHDU(np.ones((512, 512), dtype=np.int16))
+    hdu.header["DATE-OBS"] = dt_obs
+    hdu.writeto(path, overwrite=True)
+
+
+def test_jpg_fetched_once_at_date_obs():
+    _fits_frame("2019-03-07T08:30:03.500")
+    dt = datetime(2019, 3, 7, 8, 31)          # the user asked for 08:31
+    date_str = dt.strftime("%Y%m%d_%H%M")
+    paths = m._preview_paths(date_str, 171)
+    orig = m._fetch_helioviewer_screenshot
+    m._fetch_helioviewer_screenshot = _fake_fetch
+    try:
+        try:
+            m._generate_preview_sync(dt, 171, date_str, *paths)
+        except Exception:
+            pass        # the RAW/RHEF stages need the science stack; not under test
+    finally:
+        m._fetch_helioviewer_screenshot = orig
+    assert len(_calls) == 1, _calls
+    url, thread = _calls[0]
+    assert "2019-03-07T08%3A30%3A00Z" in url, url
+    assert thread.startswith("pool-stages"), thread
+    with Image.open(paths[2]) as im:
+        assert im.size == (512, 512), im.size
+
+
+def test_smaller_thumb_derived_from_cached_screenshot():
+    when = datetime(2019, 3, 7, 8, 30)
+    assert m._HV_DISK.lookup(171, when, 3000.0 / 1024.0, 1024, 1024) is not None
+    hit = m._HV_DISK.lookup(171, when, 3000.0 / 256, 256, 256)
+    assert hit is not None and hit[1] == "image/png"
+    with Image.open(io.BytesIO(hit[0])) as im:
+        assert im.size == (256, 256)
+    assert m._HV_DISK.stats()["derived"] == 1
+    assert m._HV_DISK.lookup(171, when, 3000.0 / 2048, 2048, 2048) is None   # never upsample
+
+
+def test_preview_png_writer():
+    lut = m._PREVIEW_LUTS.get(171)      # built by the stack warm-up above
+    if lut is None:
+        import matplotlib
+        from sunpy.visualization import colormaps  # noqa: F401
+        lut = (matplotlib.colormaps["sdoaia171"](np.linspace(0, 1, 256)) * 255).astype(np.uint8)
+    arr = np.tile(np.linspace(1.0, 100.0, 256, dtype=np.float32)[:, None], (1, 256))
+    arr[:32, :32] = np.nan                  # bottom-left corner of the sky
+    out = os.path.join(m.OUTPUT_DIR, "png_writer_%d.png")
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda i: m._write_preview_png(arr, lut, out % i, 512), range(4)))
+    bodies = [open(out % i, "rb").read() for i in range(4)]
+    assert all(b == bodies[0] for b in bodies)
+    with Image.open(out % 0) as im:
+        assert im.size == (512, 512) and im.mode == "RGBA"
+        px = np.asarray(im)
+    assert px[-1, 0, 3] == 0 and px[0, -1, 3] == 255      # NaN corner is now bottom-left
+    assert px[0, 256, :3].sum() > px[-1, 256, :3].sum()    # high values at the top
+
+
+if __name__ == "__main__":
+    test_jpg_fetched_once_at_date_obs()
+    print("ok  test_jpg_fetched_once_at_date_obs")
+    test_smaller_thumb_derived_from_cached_screenshot()
+    print("ok  test_smaller_thumb_derived_from_cached_screenshot")
+    test_preview_png_writer()
+    print("ok  test_preview_png_writer")
+    print("all preview-jpg checks passed")
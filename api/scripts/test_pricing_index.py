@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Self-check for the persisted Printify pricing index (printify_routes).
+
+Run: python3 api/scripts/test_pricing_index.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. a cold build walks every page, pages 2..N concurrently, each under the
+     scan's token bucket, and keeps the cheapest cost per variant
+  2. a restart prices from printify_pricing.json without calling Printify,
+     backfilled costs included
+  3. past the TTL, callers price from the stale index at once while one
+     background refresh rewalks on its own thread; deleted products drop out
+  4. every walk re-reads each product's costs, even when its updated_at
+     hasn't moved (Printify reprices providers without touching it)
+  5. a failed page commits the pages read, keeps the prior entries of the
+     products not reached, and retries in ~60 s
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ["FEEDBACK_DATA_DIR"] = tempfile.mkdtemp()
+os.environ.setdefault("PRINTIFY_API_KEY", "test-key")
+os.environ["PRINTIFY_SHOP_ID"] = "77"
+
+from api import printify_routes as pr  # noqa: E402
+
+
+class _Resp:
+    def __init__(self, status, body):
+        self.status_code, self._body = status, body
+
+    def json(self):
+        return self._body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"{self.status_code} from Printify")
+
+
+class _Shop:
+    """A fake Printify shop: products.json pages over `products`."""
+
+    def __init__(self, products):
+        self.products = products
+        self.pages = []
+        self.fail_pages = set()
+        self.gate = threading.Event()
+        self.gate.set()
+        self.active = self.peak = 0
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kw):
+        assert method == "GET" and "/shops/77/products.json" in url, url
+        page = int(url.rsplit("page=", 1)[1])
+        with self._lock:
+            self.pages.append(page)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            self.gate.wait(10)
+            time.sleep(0.02)
+            if page in self.fail_pages:
+                return _Resp(502, {})
+            limit = pr._PRICING_PAGE_LIMIT
+            data = self.products[(page - 1) * limit:page * limit]
+            return _Resp(200, {"data": data, "total": len(self.products),
+                               "last_page": max(1, -(-len(self.products) // limit))})
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _product(i, cost, updated="2026-10-01"):
+    return {"id": f"p{i}", "blueprint_id": 6 + i % 2, "print_provider_id": 9,
+            "updated_at": updated,
+            "variants": [{"id": 100 + i % 3, "cost": cost, "price": cost * 2},
+                         {"id": 200, "cost": cost + 1, "price": 999}]}
+
+
+def _restart(keep_file=True):
+    """What a new process sees: nothing in memory, the file on disk."""
+    if not keep_file and pr.PRICING_INDEX_FILE.exists():
+        pr.PRICING_INDEX_FILE.unlink()
+    pr._pricing_cache = {}
+    pr._pricing_products = {}
+    pr._pricing_index_built_at = 0.0
+    pr._pricing_loaded = False
+    pr._backfilled_costs.clear()
+
+
+_waits = []
+_real_wait = pr._PRICING_SCAN_LIMITER.wait
+pr._PRICING_SCAN_LIMITER.wait = lambda lane=None: _waits.append(1) or _real_wait(lane)
+
+
+def _cold(shop):
+    _restart(keep_file=False)
+    pr._printify_request = shop.request
+    pr._ensure_pricing_index_sync()
+
+
+def _products(n=180):
+    return [_product(i, 500 + i) for i in range(n)]
+
+
+def test_cold_build_walks_pages_concurrently():
+    shop = _Shop(_products())
+    _waits.clear()
+    _cold(shop)
+    assert sorted(shop.pages) == [1, 2, 3, 4] and shop.pages[0] == 1, shop.pages
+    assert 1 < shop.peak <= pr._PRICING_SCAN_WORKERS, shop.peak
+    assert len(_waits) == 4, "every page waits on the scan budget"
+    assert len(pr._pricing_products) == 180
+    assert pr._pricing_cache[(6, 9)][200] == {"cost": 501, "price": 999}, "cheapest cost wins"
+    assert pr._pricing_cache[(7, 9)][101] == {"cost": 501, "price": 1002}
+    assert pr.PRICING_INDEX_FILE.exists()
+
+
+def test_restart_prices_from_disk():
+    _cold(_Shop(_products()))
+    pr._backfilled_costs[(8, 9)] = {300: {"cost": 42, "price": 99}}
+    pr._save_pricing_index()
+    before = pr._pricing_cache
+    _restart()
+    pr._printify_request = lambda *a, **k: (_ for _ in ()).throw(AssertionError("no Printify call"))
+    pr._ensure_pricing_index_sync()
+    assert pr._pricing_cache == {**before, (8, 9): {300: {"cost": 42, "price": 99}}}
+    assert pr._backfilled_costs[(8, 9)] == {300: {"cost": 42, "price": 99}}
+    assert time.time() - pr._pricing_index_built_at < 60
+    pr._backfilled_costs.clear()
+
+
+def test_stale_index_is_served_while_refreshing():
+    shop = _Shop(_products())
+    _cold(shop)
+    pr._pricing_index_built_at = time.time() - pr._PRICING_TTL - 1
+    shop.products = [_product(i, 400 + i, "2026-10-02") for i in range(120)]  # cheaper; 60 deleted
+    shop.pages.clear()
+    shop.gate.clear()                                             # Printify is slow today
+    t0 = time.monotonic()
+    prices = pr._compute_variant_prices(6, 9, [200], 0)
+    pr._ensure_pricing_index_sync()                               # a second caller: no second walk
+    assert time.monotonic() - t0 < 1.0, "priced without waiting for the walk"
+    assert prices and pr._pricing_cache[(6, 9)][200]["cost"] == 501, "from the stale index"
+    walkers = [t for t in threading.enumerate() if t.name == "pricing-refresh"]
+    assert len(walkers) == 1 and walkers[0].daemon, "its own thread, not a shared pool"
+    shop.gate.set()
+    for _ in range(200):
+        if not pr._pricing_refreshing:
+            break
+        time.sleep(0.05)
+    assert not pr._pricing_refreshing
+    assert sorted(shop.pages) == [1, 2, 3], shop.pages
+    assert pr._pricing_cache[(6, 9)][200]["cost"] == 401 and len(pr._pricing_products) == 120
+    assert time.time() - pr._pricing_index_built_at < 60
+
+
+def test_repriced_products_are_reread():
+    shop = _Shop(_products(60))
+    _cold(shop)
+    shop.products[3] = _product(3, 7)                     # new cost, same updated_at
+    shop.products[4] = _product(4, 1, updated="2026-10-02")
+    with pr._pricing_build_lock:
+        pr._build_pricing_index_sync()
+    assert pr._pricing_products["p3"]["variants"][0][1] == 7
+    assert pr._pricing_products["p4"]["variants"][0][1] == 1
+    assert pr._pricing_cache[(7, 9)][100] == {"cost": 7, "price": 14}
+    assert pr._pricing_cache[(6, 9)][200]["cost"] == 2
+
+
+def test_failed_page_keeps_prior_entries():
+    shop = _Shop(_products())
+    _cold(shop)
+    shop.products = [_product(i, 300 + i, "2026-10-02") for i in range(180)]
+    shop.fail_pages = {3}
+    with pr._pricing_build_lock:
+        pr._build_pricing_index_sync()
+    assert len(pr._pricing_products) == 180, "page 3's products come from the prior walk"
+    assert pr._pricing_products["p0"]["variants"][0][1] == 300
+    assert pr._pricing_products["p120"]["variants"][0][1] == 620, "not reached: prior entry"
+    age = time.time() - pr._pricing_index_built_at
+    assert pr._PRICING_TTL - 61 < age < pr._PRICING_TTL, "stale again in ~60 s"
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all pricing-index checks passed")
@@ -8,14 +8,18 @@ the server matches the browser; that is what
 api/scripts/compare_print_compose.mjs does, by rendering the same params in
 a real canvas and diffing. Run both before trusting this path with an order.
 """
+import itertools
+import math
 import sys
 import tempfile
+import tracemalloc
 from pathlib import Path
 
 import numpy as np
 from PIL import Image
 
 sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from api import print_compose  # noqa: E402
 from api.print_compose import compose, supports_params  # noqa: E402
 
 tmp = Path(tempfile.mkdtemp())
@@ -37,7 +41,8 @@ def _px(path, x, y):
 
 # ── scope gate ────────────────────────────────────────────────────────
 assert supports_params({}) is True
-assert supports_params({"textOverlay": {"text": "hi"}}) is False, "text must go to the browser"
+assert supports_params({"textOverlay": {"text": "hi"}}) is False, "no bundled font: the browser draws it"
+assert supports_params({"textOverlay": {"text": "hi", "font": "DejaVu Sans"}}) is True
 assert supports_params({"timestampStamp": True}) is False
 assert supports_params({"dualPanel": True}) is False
 assert supports_params(None) is False
@@ -193,6 +198,161 @@ nx, _ny = _bright_centroid(compose(
 assert nx is not None and abs((nx - SRC / 2) - 8 * SRC / PREV) <= 4, \
     f"nudge must scale to source space (~{8 * SRC / PREV}px), got dx={nx - SRC / 2}"
 
+# ── fused colour matrix == the stages one by one ──────────────────────
+# colour_matrix folds invert/brightness/contrast/saturation/hue into one
+# affine map. This is renderCanvas's step-by-step order, transcribed as it
+# stood before the fold; the two must agree to float64 rounding for every
+# combination, not just the defaults.
+def _colour_steps(rgb, p):
+    r, g, b = rgb[..., 0].copy(), rgb[..., 1].copy(), rgb[..., 2].copy()
+    if p.get("inverted"):
+        r, g, b = 255.0 - r, 255.0 - g, 255.0 - b
+    br = float(p.get("brightness") or 0)
+    if br:
+        r, g, b = r + br, g + br, b + br
+    co = float(p.get("contrast") or 0) / 100.0
+    if co:
+        f = (259.0 * (co * 255.0 + 255.0)) / (255.0 * (259.0 - co * 255.0))
+        r, g, b = f * (r - 128.0) + 128.0, f * (g - 128.0) + 128.0, f * (b - 128.0) + 128.0
+    sat = float(p.get("saturation", 100) if p.get("saturation") is not None else 100) / 100.0
+    if sat != 1.0:
+        gray = 0.2989 * r + 0.587 * g + 0.114 * b
+        r, g, b = gray + sat * (r - gray), gray + sat * (g - gray), gray + sat * (b - gray)
+    hue = float(p.get("hue") or 0)
+    if hue % 360 != 0:
+        hc, hs = math.cos(math.radians(hue)), math.sin(math.radians(hue))
+        r, g, b = ((0.213 + 0.787 * hc - 0.213 * hs) * r + (0.715 - 0.715 * hc - 0.715 * hs) * g
+                   + (0.072 - 0.072 * hc + 0.928 * hs) * b,
+                   (0.213 - 0.213 * hc + 0.143 * hs) * r + (0.715 + 0.285 * hc + 0.140 * hs) * g
+                   + (0.072 - 0.072 * hc - 0.283 * hs) * b,
+                   (0.213 - 0.213 * hc - 0.787 * hs) * r + (0.715 - 0.715 * hc + 0.715 * hs) * g
+                   + (0.072 + 0.928 * hc + 0.072 * hs) * b)
+    return np.stack([r, g, b], axis=-1)
+
+
+_rgb = np.random.default_rng(3).uniform(0, 255, (500, 3))
+assert print_compose.colour_matrix({}) is None
+assert print_compose.colour_matrix({"saturation": 100, "hue": 360, "brightness": 0}) is None
+for inv, br, co, sat, hue in itertools.product(
+        (False, True), (0, -35, 20), (0, 50, -80), (None, 0, 140), (0, 73, -200)):
+    p = {"inverted": inv, "brightness": br, "contrast": co, "saturation": sat, "hue": hue}
+    m = print_compose.colour_matrix(p)
+    fused = _rgb if m is None else _rgb @ m[:, :3].T + m[:, 3]
+    assert np.abs(fused - _colour_steps(_rgb, p)).max() < 1e-9, p
+
+# ── strip processing: seams are invisible, working set stays small ────
+# The canvas is composed in STRIP_ROWS-row strips. Every stage must give
+# the same bytes whether a row lands at a strip edge or not, and the float
+# working set must not scale with the whole canvas again.
+_full = {"vignette": 60, "vignetteWidth": 40, "cropEdgeFeatherX": 20, "cropEdgeFeatherY": 30,
+         "printShape": "circle", "contrast": 25, "saturation": 130, "hue": 40,
+         "vignetteFade": "white", "background": "#336699"}
+_rng = np.random.default_rng(7)
+_noise = tmp / "noise.png"
+Image.fromarray(_rng.integers(0, 256, (200, 150, 4), dtype=np.uint8)).save(_noise)
+_rows = print_compose.STRIP_ROWS
+try:
+    print_compose.STRIP_ROWS = 7
+    striped = np.asarray(Image.open(compose(str(_noise), _full, _out("strip7.png"))))
+    print_compose.STRIP_ROWS = 10_000
+    whole = np.asarray(Image.open(compose(str(_noise), _full, _out("strip_all.png"))))
+finally:
+    print_compose.STRIP_ROWS = _rows
+assert np.array_equal(striped, whole), "strip seams must not change any pixel"
+
+_big = tmp / "big.png"
+Image.new("RGBA", (1024, 1024), (120, 60, 30, 255)).save(_big)
+tracemalloc.start()
+compose(str(_big), _full, _out("big_out.png"))
+_peak = tracemalloc.get_traced_memory()[1]
+tracemalloc.stop()
+# float64 whole-canvas + mgrid peaked at ~220 MB here; strips need ~30 MB.
+assert _peak < 64e6, f"compose peak {_peak / 1e6:.0f} MB — float working set is canvas-sized again"
+
+# ── mask fields: cached per geometry, bounded, equal to the uncached path ──
+_masks = print_compose._MASKS
+_vig = {"vignette": 60, "vignetteWidth": 40, "printShape": "circle", "cropEdgeFeatherY": 30}
+_solid = _src(150, 200)
+_before = _masks.stats()
+first = np.asarray(Image.open(compose(_solid, _vig, _out("mask_a.png")))).astype(int)
+again = np.asarray(Image.open(compose(_solid, dict(_vig, vignetteFade="white"),
+                                      _out("mask_b.png"))))
+st = _masks.stats()
+assert st["misses"] == _before["misses"] + 1 and st["hits"] == _before["hits"] + 1, st
+assert again[0, 0, 3] == 0 and again[100, 75, 3] == 255          # fade colour isn't in the key
+print_compose._MASKS = print_compose._MaskCache(0)                 # too small: strip-built fields
+try:
+    uncached = np.asarray(Image.open(compose(_solid, _vig, _out("mask_c.png")))).astype(int)
+finally:
+    print_compose._MASKS = _masks
+assert np.abs(first - uncached).max() <= 1, "float16 fields must stay within one code value"
+assert print_compose._MaskCache(0).stats()["entries"] == 0
+
+_lru = print_compose._MaskCache(2 * 150 * 200 * 2)                 # two single-field entries
+for v in (10, 20, 30):
+    _lru.get(print_compose._mask_key(150, 200, {"vignette": v}, False))
+assert _lru.stats()["entries"] == 2 and _lru.stats()["bytes"] <= _lru.max_bytes, _lru.stats()
+assert _lru.get(print_compose._mask_key(150, 200, {}, False)) == (None, None)
+
+# ── targetSize: compose at the placeholder's pixels, never above the frame ──
+_full_disk = np.asarray(Image.open(compose(_dsrc, _sq, _out("t_full.png")))).astype(int)
+_small = Image.open(compose(_dsrc, dict(_sq, targetSize={"w": 128, "h": 128}), _out("t_128.png")))
+assert _small.size == (128, 128), _small.size
+_ref = np.asarray(Image.fromarray(_full_disk.astype(np.uint8)).resize((128, 128), Image.BOX)).astype(int)
+assert np.abs(np.asarray(_small).astype(int) - _ref).mean() < 2.0, "prefiltered, not aliased"
+cx, cy = _bright_centroid(_out("t_128.png"))
+assert abs(cx - 64) <= 1 and abs(cy - 64) <= 1, (cx, cy)
+_big_t = np.asarray(Image.open(compose(_dsrc, dict(_sq, targetSize={"w": 9000, "h": 9000}),
+                                       _out("t_big.png")))).astype(int)
+assert np.array_equal(_big_t, _full_disk), "a bigger placeholder must not upsample"
+# 11:14 frame on a square placeholder: cover it, keep the frame's aspect
+w, h = Image.open(compose(_dsrc, {"aspectRatio": {"w": 11, "h": 14}, "targetSize": {"w": 300, "h": 300}},
+                          _out("t_cover.png"))).size
+assert (w, h) == (300, 382), (w, h)
+_noise = tmp / "noise.png"
+_n = np.random.default_rng(0).integers(0, 256, (1024, 1024, 4), dtype=np.uint8)
+_n[..., 3] = 255
+Image.fromarray(_n).save(_noise)
+_down = np.asarray(Image.open(compose(str(_noise), {"targetSize": {"w": 200, "h": 200}},
+                                      _out("t_noise.png"))))[..., :3]
+assert _down.std() < 30, f"noise std {_down.std():.0f} — point-sampled (~74), not box-reduced"
+assert print_compose.canonical_params({"targetSize": {"w": 128, "h": 128}}) != print_compose.canonical_params({})
+
+# ── batch: one decode, shared draws, same pixels as compose() per target ──
+_bsrc = tmp / "batch_src.png"
+_b = np.random.default_rng(5).integers(0, 256, (240, 300, 4), dtype=np.uint8)
+_b[..., 3] = 255
+_b[:20, :40, 3] = 0                                   # a transparent corner
+Image.fromarray(_b).save(_bsrc)
+_edit = {"brightness": 40, "contrast": 25, "hue": 30}
+_targets = [([11, 14], _edit), ([1, 1], _edit), ({"w": 2250, "h": 1650}, _edit),
+            ([1, 1], dict(_edit, vignette=50, vignetteWidth=30)),
+            ([3, 4], {"cropZoom": 150, "rotation": 90, "saturation": 0}),
+            ([4, 3], {"cropZoom": 150, "rotation": 90, "saturation": 0}),
+            ([1, 1], dict(_edit, targetSize={"w": 60, "h": 60})),
+            (None, {})]
+_draws, _sources = [], []
+_real_draw, _real_source = print_compose._draw, print_compose._Source.__init__
+print_compose._draw = lambda *a: _draws.append(a[3:]) or _real_draw(*a)
+print_compose._Source.__init__ = lambda self, p: _sources.append(p) or _real_source(self, p)
+try:
+    _batch = dict(print_compose.render_batch(str(_bsrc), _targets))
+finally:
+    print_compose._draw, print_compose._Source.__init__ = _real_draw, _real_source
+assert sorted(_batch) == list(range(len(_targets))) and len(_sources) == 1
+# one draw for the five whole-pixel crops, one for the coaster, and one per
+# rotated aspect: their windows sit half a pixel apart, off each other's grid
+assert len(_draws) == 4, _draws
+for _i, (_ar, _p) in enumerate(_targets):
+    _one = dict(_p, aspectRatio={"w": _ar[0], "h": _ar[1]} if isinstance(_ar, list) else _ar)
+    _solo = np.asarray(Image.open(compose(str(_bsrc), _one, _out(f"solo_{_i}.png")))).astype(int)
+    _d = np.abs(_batch[_i].astype(int) - _solo)
+    assert _d.max() <= 1 and (_d > 0).mean() < 1e-3, (_i, _d.max(), (_d > 0).mean())
+assert _batch[7].shape == (240, 300, 4) and np.array_equal(_batch[7][30:, 50:], _b[30:, 50:])
+assert not _batch[7][:20, :40].any(), "alpha-0 pixels come out transparent black"
+_paths = print_compose.compose_batch(str(_bsrc), _targets[:2], [_out("cb_0.png"), _out("cb_1.png")])
+assert Image.open(_paths[0]).size == (188, 240) and Image.open(_paths[1]).size == (240, 240)
+
 print("print_compose: all checks passed")
 
 print("print-compose formula self-check OK")
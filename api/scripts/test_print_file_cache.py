@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Self-check for the composed print-file cache in front of /api/print_file.
+
+Run: python3 api/scripts/test_print_file_cache.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. the same source + the same effective params return the same
+     print_uploads file without composing again, even when the params are
+     spelled differently (20 vs 20.0, None/False extras, non-clock productId),
+     however small the file compresses
+  2. identical requests in flight share one compose
+  3. new source bytes or a param compose() reads make a new file
+  4. hits don't spend the 12 / 300 s compose budget
+  5. a product placement composes at its catalog print-area size, never
+     above the source's, under its own cache key
+  6. a `targets` batch composes all its misses in one job from one decode,
+     and files the same keys a single request would
+  7. text in a bundled font is composed here, and the editor can load that
+     font from /fonts/; any other font is refused to the browser path
+  8. a print with text is never filed under OUTPUT_DIR (all of it is public
+     at /asset/): it lands in PRIVATE_PRINT_DIR and the reply is a signed
+     link to it, which serves the file and is accepted by checkout
+"""
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ.setdefault("SOLAR_ARCHIVE_SKIP_HEAVY_IMPORTS", "1")
+os.environ["JOB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+os.environ["SOLAR_ARCHIVE_OUTPUT_DIR"] = tempfile.mkdtemp()
+os.environ["FEEDBACK_DATA_DIR"] = tempfile.mkdtemp()     # PRIVATE_PRINT_DIR lives here
+os.environ["INTERNAL_AUTH_TOKEN"] = "test-internal"
+
+import httpx  # noqa: E402
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import api.main as m  # noqa: E402
+from api import print_compose, printify_routes, security, signed_assets  # noqa: E402
+
+_composed = []
+_real_compose = print_compose.compose
+
+
+def _counting_compose(src, params, out):
+    _composed.append(dict(params))
+    return _real_compose(src, params, out)
+
+
+print_compose.compose = _counting_compose
+_SRC = os.path.join(m.OUTPUT_DIR, "render_for_print.png")
+
+
+def _write_source(seed):
+    rng = np.random.default_rng(seed)
+    Image.fromarray(rng.integers(0, 256, (160, 160, 4), dtype=np.uint8)).save(_SRC)
+
+
+async def _post(client, params, placement=None):
+    r = await client.post("/api/print_file", headers={"x-internal-auth": "test-internal"},
+                          json={"source_url": "/asset/render_for_print.png", "params": params,
+                                "placement": placement})
+    assert r.status_code == 200, r.text
+    body = r.json()
+    assert body["supported"], body
+    return body
+
+
+def _run(fn):
+    async def go():
+        transport = httpx.ASGITransport(app=m.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await fn(client)
+    return asyncio.run(go())
+
+
+def test_canonical_params():
+    c = print_compose.canonical_params
+    assert c({"brightness": 20}) == c({"brightness": 20.0, "flipH": False, "textOverlay": None})
+    assert c({"productId": "mug"}) == c({}) != c({"productId": "wall_clock"})
+    assert c({"saturation": 0}) != c({}), "saturation 0 is a real setting"
+    assert c({"aspectRatio": {"w": 11, "h": 14}}) == c({"aspectRatio": {"h": 14.0, "w": 11}})
+
+
+def test_same_design_is_composed_once():
+    _write_source(1)
+
+    async def go(client):
+        _composed.clear()
+        first = await _post(client, {"brightness": 20, "aspectRatio": {"w": 1, "h": 1}})
+        again = await _post(client, {"brightness": 20.0, "aspectRatio": {"w": 1, "h": 1},
+                                     "textOverlay": None, "productId": "mug", "flipV": False})
+        assert not first["cached"] and again["cached"], (first, again)
+        assert first["url"] == again["url"] and len(_composed) == 1, _composed
+        path = os.path.join(m.OUTPUT_DIR, "print_uploads", os.path.basename(first["url"]))
+        assert os.path.getsize(path) == first["size_bytes"]
+        other = await _post(client, {"brightness": 21, "aspectRatio": {"w": 1, "h": 1}})
+        assert other["url"] != first["url"] and len(_composed) == 2
+    _run(go)
+
+
+def test_tiny_print_file_is_a_hit():
+    _write_source(6)
+
+    async def go(client):
+        _composed.clear()
+        first = await _post(client, {"brightness": 5})
+        path = os.path.join(m.OUTPUT_DIR, "print_uploads", os.path.basename(first["url"]))
+        Image.new("RGB", (4, 4)).save(path)          # a flat design: well under 1 KB
+        again = await _post(client, {"brightness": 5})
+        assert again["cached"] and again["url"] == first["url"] and len(_composed) == 1
+        assert again["size_bytes"] == os.path.getsize(path) < 1000
+    _run(go)
+    assert not m._cached_print_file(os.path.join(m.OUTPUT_DIR, "print_uploads", "missing.png"))
+
+
+def test_concurrent_requests_share_one_compose():
+    _write_source(2)
+
+    async def go(client):
+        _composed.clear()
+        bodies = await asyncio.gather(*(_post(client, {"contrast": 30}) for _ in range(4)))
+        assert len({b["url"] for b in bodies}) == 1 and len(_composed) == 1, _composed
+    _run(go)
+
+
+def test_new_source_bytes_miss():
+    async def go(client):
+        _write_source(3)
+        a = await _post(client, {"hue": 40})
+        _write_source(4)
+        b = await _post(client, {"hue": 40})
+        assert a["url"] != b["url"] and not b["cached"]
+    _run(go)
+
+
+def test_hits_do_not_spend_the_compose_budget():
+    _write_source(5)
+
+    async def go(client):
+        for _ in range(15):
+            assert (await _post(client, {"saturation": 0}))["url"]
+    _run(go)
+
+
+def test_placement_composes_at_the_print_area_size():
+    _write_source(6)
+    security._rate_state.clear()        # a fresh compose budget for this test's misses
+    catalog = {"variants": [
+        {"id": 11, "placeholders": [{"position": "front", "width": 90, "height": 90}]},
+        {"id": 12, "placeholders": [{"position": "front_left_leg", "width": 40, "height": 60},
+                                    {"position": "front_right_leg", "width": 50, "height": 70}]},
+        {"id": 13, "placeholders": [{"position": "front", "width": 4000, "height": 4000}]},
+    ]}
+    lookups = []
+    orig = printify_routes._list_variants_sync
+    printify_routes._list_variants_sync = lambda bp, pp: lookups.append((bp, pp)) or catalog
+    printify_routes._variant_positions_cache.clear()
+
+    def _size(body):
+        path = os.path.join(m.OUTPUT_DIR, "print_uploads", os.path.basename(body["url"]))
+        with Image.open(path) as im:
+            return im.size
+
+    async def go(client):
+        params = {"aspectRatio": {"w": 1, "h": 1}}
+        full = await _post(client, params)
+        coaster = await _post(client, params, {"blueprint_id": 7, "print_provider_id": 3,
+                                               "variant_id": 11, "position": "front"})
+        sock = await _post(client, params, {"blueprint_id": 7, "print_provider_id": 3,
+                                            "variant_id": 12, "position": "front"})
+        poster = await _post(client, params, {"blueprint_id": 7, "print_provider_id": 3,
+                                              "variant_id": 13})
+        assert _size(full) == (160, 160) and _size(coaster) == (90, 90), (_size(full), _size(coaster))
+        assert _size(sock) == (70, 70), "fans out to both legs; the larger one sizes the file"
+        assert _size(poster) == (160, 160), "never composed above the source"
+        assert len({full["url"], coaster["url"], sock["url"]}) == 3
+        assert lookups == [(7, 3)], "catalog geometry comes from the cache after the first call"
+    try:
+        _run(go)
+    finally:
+        printify_routes._list_variants_sync = orig
+    assert printify_routes._get_variant_positions(7, 3, 12) == ["front_left_leg", "front_right_leg"]
+
+
+def test_batch_composes_misses_together():
+    _write_source(7)
+    security._rate_state.clear()        # a fresh compose budget for this test's misses
+    jobs = []
+    orig = m._compose_print_files
+    m._compose_print_files = lambda src, js: jobs.append(len(js)) or orig(src, js)
+
+    async def go(client):
+        _composed.clear()
+        warm = await _post(client, {"aspectRatio": {"w": 1, "h": 1}, "hue": 10})
+        r = await client.post("/api/print_file", headers={"x-internal-auth": "test-internal"}, json={
+            "source_url": "/asset/render_for_print.png",
+            "targets": [{"params": {"aspectRatio": {"w": 11, "h": 14}, "hue": 10}},
+                        {"params": {"aspectRatio": {"w": 1, "h": 1}, "hue": 10}},
+                        {"params": {"hue": 10, "textOverlay": True}},
+                        {"params": {"aspectRatio": {"w": 14, "h": 11}, "hue": 10}},
+                        {"params": {"aspectRatio": {"w": 11, "h": 14}, "hue": 10.0}}]})
+        assert r.status_code == 200, r.text
+        files = r.json()["files"]
+        assert [f["supported"] for f in files] == [True, True, False, True, True], files
+        assert files[1]["cached"] and files[1]["url"] == warm["url"]
+        assert files[0]["url"] == files[4]["url"], "one key, composed once"
+        assert jobs == [1, 2] and len(_composed) == 1, (jobs, _composed)
+        single = await _post(client, {"aspectRatio": {"w": 14, "h": 11}, "hue": 10})
+        assert single["cached"] and single["url"] == files[3]["url"]
+        with Image.open(os.path.join(m.OUTPUT_DIR, "print_uploads",
+                                     os.path.basename(files[0]["url"]))) as im:
+            assert im.size == (125, 160), im.size
+        bad = await client.post("/api/print_file", headers={"x-internal-auth": "test-internal"},
+                                json={"source_url": "/asset/render_for_print.png", "targets": [{}] * 13})
+        assert bad.status_code == 400
+    try:
+        _run(go)
+    finally:
+        m._compose_print_files = orig
+
+
+def test_text_orders_compose_here():
+    _write_source(8)
+    security._rate_state.clear()        # a fresh compose budget for this test's misses
+    text = {"text": "Hello Sun", "font": "DejaVu Sans", "xNorm": 0.5, "yNorm": 0.5,
+            "sizeNorm": 0.2, "color": "#ffffff"}
+
+    async def go(client):
+        body = await _post(client, {"textOverlay": text, "dualPanel": "match"})
+        with Image.open(signed_assets.resolve_path(body["url"])) as im:
+            assert im.size == (320, 160), im.size
+        r = await client.post("/api/print_file", headers={"x-internal-auth": "test-internal"},
+                              json={"source_url": "/asset/render_for_print.png",
+                                    "params": {"textOverlay": dict(text, font="Pacifico")}})
+        assert r.status_code == 200 and r.json()["supported"] is False, r.text
+        font = await client.get("/fonts/DejaVuSans.ttf")
+        assert font.status_code == 200 and font.content[:4] == b"\x00\x01\x00\x00"
+        assert (await client.get("/fonts/LICENSE_DEJAVU")).status_code == 404
+    _run(go)
+
+
+def test_text_prints_are_never_public():
+    _write_source(9)
+    security._rate_state.clear()
+    caption = {"timestampStamp": True, "timestampText": "2026-10-19 Jane Doe"}
+
+    async def go(client):
+        for cached in (False, True):
+            body = await _post(client, caption)
+            assert body["cached"] is cached, body
+            url = body["url"]
+            assert url.startswith("/signed/private/") and "/asset/" not in url, url
+            path = signed_assets.resolve_path(url)
+            assert path.startswith(os.path.realpath(str(m.PRIVATE_PRINT_DIR)) + os.sep)
+            name = os.path.basename(path)
+            served = await client.get(url)
+            assert served.status_code == 200 and served.content[:4] == b"\x89PNG"
+            assert "no-store" in served.headers["cache-control"]
+            assert (await client.get(f"/asset/print_uploads/{name}")).status_code == 404
+            assert printify_routes._asset_file(url) == path
+        for root, _dirs, names in os.walk(m.OUTPUT_DIR):
+            assert name not in names, f"text print under OUTPUT_DIR: {root}"
+        plain = await _post(client, {})
+        assert plain["url"] == f"/asset/print_uploads/{os.path.basename(plain['url'])}", plain
+    _run(go)
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all print-file-cache checks passed")
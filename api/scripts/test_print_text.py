@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Golden-image checks for server-composed text, caption, clock numerals
+and dual panels (api/print_text.py through api/print_compose.py).
+
+Run: python3 api/scripts/test_print_text.py            (no framework)
+     python3 api/scripts/test_print_text.py --update   (rewrite goldens)
+
+The goldens in api/scripts/golden/ were rendered from the bundled fonts in
+api/fonts, so they only move when the layout rules do. A different
+FreeType build may shift antialiasing by a level or two at glyph edges;
+the comparison allows that and nothing a viewer could see. After an
+intentional change, rerun with --update and look at the new PNGs before
+committing them.
+
+The rules that must hold:
+  1. text orders are supported only in bundled fonts; unknown dualPanel
+     values and caption settings without a caption are refused/ignored
+  2. caption, straight and arc text, shadows, outlines and numerals render
+     as the goldens
+  3. text scales with the composed canvas (print-area targetSize)
+  4. the circular clip and the crop-edge feather apply on top of the text,
+     as renderCanvas orders them
+  5. dual-panel "match" prints the face twice; the placeholder width is
+     split between the two
+  6. one numeral rule for both print paths: a wall clock's print file
+     carries the numerals the mockup shows. The server draws them in a
+     bundled font; any other font (the default Inter) goes to the browser
+     export, which draws them too (getCanvasBase64 sets _printExport)
+  7. an outlined stroke is exact and costs its text's size, not the
+     canvas's (a 4096² print with the widest stroke took ~20 s)
+  8. one caption face everywhere: the editor, the mockups and both print
+     paths draw the timestamp in print_text.TIMESTAMP_FONT
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from api import print_compose, print_text  # noqa: E402
+
+_GOLDEN = os.path.join(os.path.dirname(__file__), "golden")
+_UPDATE = "--update" in sys.argv
+_tmp = tempfile.mkdtemp()
+
+_CAPTION = "21 April 2026 · 12:00 UTC · 171 Å"
+_TEXT = {"text": "Hello Sun", "font": "DejaVu Sans", "xNorm": 0.5, "yNorm": 0.3,
+         "sizeNorm": 0.16, "color": "#ffcc00", "strokeColor": "#000000", "strokeWidth": 3,
+         "shadow": {"enabled": True, "color": "#000000", "blur": 6, "offsetX": 3, "offsetY": 3}}
+_ARC = {"text": "SOLAR MAXIMUM", "font": "DejaVu Serif", "xNorm": 0.5, "yNorm": 0.2,
+        "sizeNorm": 0.08, "color": "#ffffff", "strokeColor": "#202060", "strokeWidth": 2,
+        "outlined": True, "arc": {"enabled": True, "radius": 150}}
+_CLOCK = {"font": "DejaVu Sans Mono", "style": "roman", "size": 40, "radiusPct": 78,
+          "color": "#ffffff", "strokeColor": "#000000", "strokeWidth": 2}
+
+
+def _source(w=320, h=400):
+    """A smooth radial gradient — text edges against it are easy to see."""
+    path = os.path.join(_tmp, f"src_{w}x{h}.png")
+    if not os.path.exists(path):
+        y, x = np.mgrid[0:h, 0:w].astype(np.float32)
+        r = np.hypot(x - w / 2, y - h / 2) / (0.5 * min(w, h))
+        px = np.empty((h, w, 4), np.uint8)
+        px[..., 0] = np.clip(230 - 120 * r, 0, 255)
+        px[..., 1] = np.clip(140 - 90 * r, 0, 255)
+        px[..., 2] = np.clip(40 + 30 * r, 0, 255)
+        px[..., 3] = 255
+        Image.fromarray(px).save(path)
+    return path
+
+
+def _render(params, w=320, h=400):
+    for _i, out in print_compose.render_batch(_source(w, h), [(None, params)]):
+        return out
+
+
+def _golden(name, got):
+    path = os.path.join(_GOLDEN, name + ".png")
+    if _UPDATE:
+        os.makedirs(_GOLDEN, exist_ok=True)
+        Image.fromarray(got).save(path, optimize=True)
+        return
+    with Image.open(path) as im:
+        want = np.asarray(im.convert("RGBA"))
+    assert want.shape == got.shape, (name, want.shape, got.shape)
+    diff = np.abs(want.astype(np.int16) - got.astype(np.int16))
+    assert diff.mean() < 0.25, (name, "mean", float(diff.mean()))
+    assert (diff > 24).mean() < 0.002, (name, "edge", float((diff > 24).mean()))
+
+
+def test_support_gate():
+    s = print_compose.supports_params
+    assert s({"textOverlay": dict(_TEXT)}) and s({"clockNumbers": dict(_CLOCK)})
+    assert s({"timestampStamp": True, "timestampText": _CAPTION})
+    assert not s({"textOverlay": dict(_TEXT, font="Outfit")}), "Google font → browser path"
+    assert not s({"clockNumbers": {"size": 50}}), "the editor's default numeral font is Inter"
+    assert not s({"timestampStamp": True}), "no caption text"
+    assert not s({"textOverlay": dict(_TEXT, text="x" * 201)})
+    assert s({"dualPanel": "match"}) and s({"dualPanel": "span"}) and not s({"dualPanel": True})
+    c = print_compose.canonical_params
+    assert c({"dualPanel": "span", "timestampPos": "top-left"}) == c({})
+    assert c({"dualPanel": "match"}) != c({})
+    assert c({"textOverlay": dict(_TEXT, shadow=None)}) == c({"textOverlay": dict(_TEXT, shadow=None, arc=None)})
+
+
+def test_goldens():
+    _golden("caption_and_text", _render({
+        "timestampStamp": True, "timestampText": _CAPTION, "timestampPos": "bottom-right",
+        "textOverlay": _TEXT, "aspectRatio": {"w": 4, "h": 5}}))
+    _golden("caption_top_arc", _render({
+        "timestampStamp": True, "timestampText": _CAPTION, "timestampPos": "top-center",
+        "timestampVOffset": 20, "textOverlay": _ARC, "vignette": 40, "vignetteWidth": 50,
+        "vignetteFade": "black"}))
+    _golden("clock_numerals", _render({
+        "productId": "wall_clock", "clockNumbers": _CLOCK, "aspectRatio": {"w": 1, "h": 1}}))
+
+
+def test_text_scales_with_the_target():
+    params = {"textOverlay": dict(_TEXT, shadow=None), "aspectRatio": {"w": 4, "h": 5}}
+    full = _render(params)
+    half = _render(dict(params, targetSize={"w": 160, "h": 200}))
+    assert half.shape == (200, 160, 4), half.shape
+
+    def yellow(px):                                   # the overlay's fill
+        m = (px[..., 0] > 240) & (px[..., 1] > 190) & (px[..., 1] < 215) & (px[..., 2] < 40)
+        ys, xs = np.nonzero(m)
+        return m.sum(), xs.mean(), ys.mean()
+    n_full, x_full, y_full = yellow(full)
+    n_half, x_half, y_half = yellow(half)
+    # FreeType snaps advances to whole pixels, which at this 30 px size
+    # moves a glyph run by a pixel or two; at print sizes it is nothing.
+    assert abs(n_half * 4 / n_full - 1) < 0.2, (n_full, n_half)
+    assert abs(x_half * 2 - x_full) < 0.01 * 320 and abs(y_half * 2 - y_full) < 0.01 * 400
+
+
+def test_clip_and_feather_apply_over_text():
+    clock = _render({"productId": "wall_clock", "aspectRatio": {"w": 1, "h": 1},
+                     "clockNumbers": dict(_CLOCK, radiusPct=100, size=80)})
+    y, x = np.mgrid[0:320, 0:320]
+    outside = np.hypot(x - 160, y - 160) > 160.5           # _mask_rows' coverage ramp
+    white = (clock[..., :3].min(axis=2) > 250) & (clock[..., 3] > 0)
+    assert white[np.hypot(x - 160, y - 160) > 150].any(), "numerals reach the rim"
+    assert not clock[outside, 3].any(), "and are clipped with the disc, not drawn over it"
+    params = {"timestampStamp": True, "timestampText": _CAPTION, "timestampPos": "bottom-center",
+              "vignetteFade": "black"}
+    plain = _render(params)
+    feathered = _render(dict(params, cropEdgeFeatherY=100))
+    rows = slice(400 - 22, 400 - 8)                   # the caption's band
+    assert plain[rows, :, :3].max() > 240, "the caption is drawn"
+    assert feathered[rows, :, :3].max() < plain[rows, :, :3].max() - 60, "the feather fades it"
+
+
+def test_dual_panel_match():
+    face = _render({"aspectRatio": {"w": 1, "h": 1}, "textOverlay": _TEXT})
+    dual = _render({"aspectRatio": {"w": 1, "h": 1}, "textOverlay": _TEXT, "dualPanel": "match"})
+    assert dual.shape == (320, 640, 4), dual.shape
+    assert np.array_equal(dual[:, :320], face) and np.array_equal(dual[:, 320:], face)
+    sized = _render({"aspectRatio": {"w": 1, "h": 1}, "dualPanel": "match",
+                     "targetSize": {"w": 400, "h": 200}})
+    assert sized.shape == (200, 400, 4), "each face covers half the placeholder"
+    span = _render({"aspectRatio": {"w": 1, "h": 1}, "dualPanel": "span"})
+    assert span.shape == (320, 320, 4)
+    big = os.path.join(_tmp, "wide.png")
+    Image.new("RGBA", (3000, 3000), (9, 9, 9, 255)).save(big)
+    w, h = print_compose._plan(3000, 3000, {"dualPanel": "match"})[:2]
+    assert (w, h) == (2048, 2048), "the 4096 export cap is on the doubled width"
+
+
+def _editor_js():
+    with open(os.path.join(os.path.dirname(__file__), "..", "solar-archive.js"), encoding="utf-8") as fh:
+        return fh.read()
+
+
+def test_one_numeral_rule_for_both_print_paths():
+    bare = _render({"productId": "wall_clock", "aspectRatio": {"w": 1, "h": 1}})
+    clock = _render({"productId": "wall_clock", "clockNumbers": _CLOCK, "aspectRatio": {"w": 1, "h": 1}})
+    assert not np.array_equal(bare, clock), "the server prints the numerals"
+    js = _editor_js()
+    export = js[js.index("function getCanvasBase64()"):]
+    assert "state._printExport = true" in export[:export.index("renderCanvas()")]
+    assert "(!state._burningCanvas || state._printExport)\n          && state.clockNumbers" in js, \
+        "the browser export draws the numerals too"
+
+
+def test_one_caption_face_everywhere():
+    js = _editor_js()
+    block = js[js.index("var tsText = _composeTimestampCaption();"):js.index("ctx.fillText(tsText")]
+    fonts = [ln.strip() for ln in block.splitlines() if "ctx.font" in ln]
+    assert fonts == ["ctx.font = \"normal \" + tsSize + \"px '%s', sans-serif\";" % print_text.TIMESTAMP_FONT], \
+        fonts
+
+
+def test_outline_is_exact_and_cheap():
+    from PIL import ImageDraw, ImageFilter
+    font = print_text._font(print_text.font_file("DejaVu Sans", "bold"), 300)
+    for size, xy in ((700, (350, 350)), (700, (10, 690)), (4096, (2048, 2048))):
+        glyph, grown = Image.new("L", (size, size)), Image.new("L", (size, size))
+        ImageDraw.Draw(glyph).text(xy, "Sun", fill=255, font=font, anchor="mm")
+        ImageDraw.Draw(grown).text(xy, "Sun", fill=255, font=font, anchor="mm",
+                                   stroke_width=10, stroke_fill=255)
+        t0 = time.monotonic()
+        got = np.asarray(print_text._stroke_only(glyph, grown, 10))
+        assert time.monotonic() - t0 < 1.0, size
+        if size < 4096:                         # the full-canvas filter it replaces
+            inner = np.asarray(glyph.filter(ImageFilter.MinFilter(21)), np.int16)
+            want = np.clip(np.asarray(grown, np.int16) - inner, 0, 255)
+            assert np.array_equal(got, want), xy
+
+
+def test_fonts_are_bundled():
+    for family, faces in print_text.FONT_FILES.items():
+        for weight in faces:
+            assert print_text.font_file(family, weight), (family, weight)
+    assert os.path.exists(os.path.join(print_text.FONT_DIR, "LICENSE_DEJAVU"))
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all print-text checks passed" + (" (goldens rewritten)" if _UPDATE else ""))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Self-check for the content-addressed RHEF result cache.
+
+Run: python3 api/scripts/test_rhef_cache.py   (no framework, no fixtures)
+
+rhef() is stubbed with a counter so this runs without sunkit_image. The
+rules that must hold:
+  1. identical input + params → one rhef() call, second call is a memmap hit
+  2. any change to pixels, params or disk geometry is a different entry
+  3. a failing rhef() propagates and leaves nothing cached
+  4. the byte budget evicts least-recently-used entries first
+"""
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ.setdefault("SOLAR_ARCHIVE_SKIP_HEAVY_IMPORTS", "1")
+
+import api.main as m  # noqa: E402
+
+
+class _FakeMap:
+    def __init__(self, data, meta):
+        self.data = data
+        self.meta = meta
+
+
+class _CountingRhef:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, src, **kwargs):
+        self.calls += 1
+        data = getattr(src, "data", src)
+        return _FakeMap(np.asarray(data, dtype=np.float64) * 2.0, getattr(src, "meta", {}))
+
+
+def _with_cache(fn):
+    def wrapper():
+        orig_dir, orig_rhef = m._RHEF_CACHE_DIR, m.rhef
+        with tempfile.TemporaryDirectory() as d:
+            m._RHEF_CACHE_DIR = d
+            m.rhef = _CountingRhef()
+            try:
+                fn(d)
+            finally:
+                m._RHEF_CACHE_DIR, m.rhef = orig_dir, orig_rhef
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
+
+@_with_cache
+def test_second_call_is_a_memmap_hit(d):
+    src = _FakeMap(np.arange(64, dtype=np.float32).reshape(8, 8), {"crpix1": 4.5})
+    first = m._rhef_cached(src)
+    second = m._rhef_cached(src)
+    assert m.rhef.calls == 1, m.rhef.calls
+    assert first.dtype == np.float32
+    assert isinstance(second, np.memmap), type(second)
+    assert not second.flags.writeable, "a hit must never be mutable in place"
+    assert np.array_equal(first, second)
+
+
+@_with_cache
+def test_key_covers_pixels_params_and_geometry(d):
+    base = np.ones((8, 8), dtype=np.float32)
+    m._rhef_cached(_FakeMap(base, {"crpix1": 4.5}))
+    m._rhef_cached(_FakeMap(base + 1, {"crpix1": 4.5}))          # pixels
+    m._rhef_cached(_FakeMap(base, {"crpix1": 4.5}), block=2)     # RHEF_BLOCK
+    m._rhef_cached(_FakeMap(base, {"crpix1": 4.5}), vignette="1.51 solRad")
+    m._rhef_cached(_FakeMap(base, {"crpix1": 4.5}), upsilon=0.4)
+    m._rhef_cached(_FakeMap(base, {"crpix1": 3.5}))              # disk centre
+    m._rhef_cached(base)                                         # array path
+    assert m.rhef.calls == 7, m.rhef.calls
+    assert len(os.listdir(d)) == 7
+
+
+@_with_cache
+def test_failure_is_not_cached(d):
+    def boom(src, **kwargs):
+        raise RuntimeError("rhef exploded")
+    m.rhef = boom
+    try:
+        m._rhef_cached(np.ones((4, 4), dtype=np.float32))
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError("rhef failure should propagate")
+    assert os.listdir(d) == []
+
+
+@_with_cache
+def test_budget_evicts_least_recently_used(d):
+    orig_budget = m._RHEF_CACHE_MAX_BYTES
+    try:
+        arrs = [np.full((32, 32), i, dtype=np.float32) for i in range(3)]
+        for i, a in enumerate(arrs):
+            m._rhef_cached(a)
+            for name in os.listdir(d):
+                p = os.path.join(d, name)
+                if os.path.getmtime(p) > 10_000:   # just written → age it by order
+                    os.utime(p, (1000 + i, 1000 + i))
+        one = os.path.getsize(os.path.join(d, os.listdir(d)[0]))
+        m._rhef_cached(arrs[0])                    # hit bumps the oldest to newest
+        m._RHEF_CACHE_MAX_BYTES = 2 * one
+        assert m._trim_rhef_cache() == 1
+        calls = m.rhef.calls
+        m._rhef_cached(arrs[0])
+        m._rhef_cached(arrs[2])
+        assert m.rhef.calls == calls, "recently used entries must survive the trim"
+        m._rhef_cached(arrs[1])
+        assert m.rhef.calls == calls + 1, "the least recently used entry goes first"
+    finally:
+        m._RHEF_CACHE_MAX_BYTES = orig_budget
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all rhef-cache checks passed")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""Self-check for the signed asset links Printify uploads go through.
+
+Run: python3 api/scripts/test_signed_assets.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. a signed link serves exactly its file, until it expires (410), and a
+     changed root, path, expiry or signature is refused (403)
+  2. a link can't reach outside its root, even when signed that way
+  3. the /signed route serves uncacheable responses
+  4. checkout hands Printify a signed URL for every order — composed,
+     browser base64, personalised — never base64 `contents`; browser
+     uploads are staged outside the public /asset/ mount and removed once
+     the POST returns
+"""
+import asyncio
+import base64
+import os
+import sys
+import tempfile
+import time
+from urllib.parse import unquote, urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+os.environ.setdefault("SOLAR_ARCHIVE_SKIP_HEAVY_IMPORTS", "1")
+os.environ["JOB_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "jobs.sqlite3")
+os.environ["SOLAR_ARCHIVE_OUTPUT_DIR"] = tempfile.mkdtemp()
+os.environ["FEEDBACK_DATA_DIR"] = tempfile.mkdtemp()
+os.environ["INTERNAL_AUTH_TOKEN"] = "test-internal"
+os.environ.setdefault("PRINTIFY_API_KEY", "test-key")
+
+import httpx  # noqa: E402
+
+import api.main as m  # noqa: E402
+from api import printify_routes, signed_assets  # noqa: E402
+from api.signed_assets import SignedURLError  # noqa: E402
+
+
+def _write(rel, data=b"\x89PNG fake print"):
+    path = os.path.join(m.OUTPUT_DIR, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(data)
+    return path
+
+
+def _parts(url):
+    """(root, expires, sig, rel) of a signed path or URL."""
+    path = urlparse(url).path
+    assert path.startswith(signed_assets.ROUTE_PREFIX + "/"), url
+    root, expires, sig, rel = path[len(signed_assets.ROUTE_PREFIX) + 1:].split("/", 3)
+    return root, expires, sig, unquote(rel)
+
+
+def _refused(status, *args, **kw):
+    try:
+        signed_assets.resolve(*args, **kw)
+    except SignedURLError as e:
+        assert e.status == status, (e.status, status, args)
+        return
+    raise AssertionError(f"expected {status} for {args}")
+
+
+def test_round_trip_and_tampering():
+    path = _write("print_uploads/a b.png")
+    root, exp, sig, rel = _parts(signed_assets.sign_path(path, ttl=60))
+    assert (root, rel) == ("asset", "print_uploads/a b.png")
+    assert signed_assets.resolve(root, exp, sig, rel) == os.path.realpath(path)
+    _refused(403, root, exp, sig[:-1] + ("0" if sig[-1] != "0" else "1"), rel)
+    _refused(403, root, str(int(exp) + 1), sig, rel)
+    _refused(403, "default", exp, sig, rel)
+    _refused(403, root, exp, sig, "print_uploads/other.png")
+    _refused(403, "nope", exp, sig, rel)
+    _refused(410, root, exp, sig, rel, now=int(exp) + 1)
+    os.remove(path)
+    _refused(404, root, exp, sig, rel)
+
+
+def test_no_escape_from_the_root():
+    _root, exp, sig, rel = _parts(signed_assets.sign("asset", "../jobs.sqlite3"))
+    _refused(403, "asset", exp, sig, rel)
+    try:
+        signed_assets.sign_path(os.environ["JOB_DB_PATH"])
+    except ValueError:
+        return
+    raise AssertionError("a file outside every root must not be signable")
+
+
+def test_route():
+    path = _write("print_uploads/route.png", b"served bytes")
+
+    async def go():
+        transport = httpx.ASGITransport(app=m.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            good = await client.get(signed_assets.sign_path(path))
+            assert good.status_code == 200 and good.content == b"served bytes", good.status_code
+            assert "no-store" in good.headers["cache-control"]
+            root, exp, sig, rel = _parts(signed_assets.sign_path(path))
+            bad = await client.get(f"/signed/{root}/{exp}/{'0' * 32}/{rel}")
+            assert bad.status_code == 403, bad.status_code
+            old = signed_assets.sign("asset", "print_uploads/route.png", ttl=30, now=time.time() - 60)
+            assert (await client.get(old)).status_code == 410
+    asyncio.run(go())
+
+
+def test_checkout_uploads_by_signed_url():
+    uploads = []
+
+    class _Resp:
+        def __init__(self, status, body):
+            self.status_code, self._body, self.text = status, body, str(body)
+
+        def json(self):
+            return self._body
+
+    def fake_request(method, url, **kw):
+        if url.endswith("/uploads/images.json"):
+            body = kw["json"]
+            assert "contents" not in body, "no base64 uploads"
+            # What Printify would fetch, while the POST is open.
+            served = signed_assets.resolve(*_parts(body["url"]))
+            with open(served, "rb") as fh:
+                uploads.append((body["url"], served, fh.read()))
+            return _Resp(200, {"id": f"img{len(uploads)}"})
+        return _Resp(400, {"error": "stop after the upload"})
+
+    orig = (printify_routes._printify_request, printify_routes._compute_variant_prices,
+            printify_routes._shop_id)
+    printify_routes._printify_request = fake_request
+    printify_routes._compute_variant_prices = lambda bp, pp, vids, price: {int(v): 1000 for v in vids}
+    printify_routes._shop_id = lambda: "1"
+
+    def checkout(**kw):
+        args = dict(image_base64="", file_name="p.png", title="t", description="",
+                    blueprint_id=1, print_provider_id=1, variant_ids=[5], price=1000,
+                    position="front", tags=[])
+        args.update(kw)
+        try:
+            printify_routes._do_checkout_sync(**args)
+        except Exception as e:
+            assert "stop after the upload" in str(e) or "400" in str(e), e
+
+    try:
+        composed = _write("print_uploads/" + "c" * 32 + ".png", b"composed")
+        checkout(image_url="/asset/print_uploads/" + "c" * 32 + ".png")
+        checkout(image_base64=base64.b64encode(b"browser canvas").decode())
+        checkout(image_base64=base64.b64encode(b"customer text").decode(), personalized=True)
+    finally:
+        (printify_routes._printify_request, printify_routes._compute_variant_prices,
+         printify_routes._shop_id) = orig
+
+    assert [u[2] for u in uploads] == [b"composed", b"browser canvas", b"customer text"]
+    assert uploads[0][1] == os.path.realpath(composed)
+    staging = os.path.realpath(str(m.SIGNED_STAGING_DIR))
+    for url, served, _data in uploads[1:]:
+        assert url.startswith(printify_routes._public_base_url() + "/signed/staged/"), url
+        assert served.startswith(staging + os.sep) and not os.path.exists(served), \
+            "staged privately and removed after the POST"
+    assert not staging.startswith(os.path.realpath(m.OUTPUT_DIR) + os.sep)
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all signed-asset checks passed")
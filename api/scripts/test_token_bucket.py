@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""Self-check for the priority token-bucket upstream limiter.
+
+Run: python3 api/scripts/test_token_bucket.py   (no framework, no fixtures)
+
+The rules that must hold:
+  1. the burst goes out at once, then calls space out at the rate
+  2. a freed token goes to the best lane, FIFO within a lane
+  3. async waiters park on the loop — no thread per waiter
+  4. threads and coroutines share one bucket
+  5. the lane defaults from the contextvar
+  6. a waiter cancelled after the pump granted it hands the token back,
+     even before the grant's wake callback has run
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from api.token_bucket import TokenBucket, current_lane  # noqa: E402
+
+
+def test_burst_then_rate():
+    b = TokenBucket(600, "t", burst=3)     # 10/s
+    t0 = time.monotonic()
+    for _ in range(3):
+        b.wait()
+    assert time.monotonic() - t0 < 0.05
+    for _ in range(3):
+        b.wait()
+    elapsed = time.monotonic() - t0
+    assert 0.25 <= elapsed < 0.6, elapsed
+
+
+def test_best_lane_first():
+    async def go():
+        b = TokenBucket(1200, "t")          # 20/s, no burst
+        await b.acquire()                   # drain the bucket
+        order = []
+
+        async def one(lane, tag):
+            await b.acquire(lane)
+            order.append(tag)
+        jobs = [asyncio.ensure_future(one("background", "bg"))]
+        await asyncio.sleep(0)
+        jobs += [asyncio.ensure_future(one("thumb", "t%d" % i)) for i in range(3)]
+        await asyncio.sleep(0)
+        jobs.append(asyncio.ensure_future(one("interactive", "main")))
+        await asyncio.gather(*jobs)
+        return order
+    assert asyncio.run(go()) == ["main", "t0", "t1", "t2", "bg"]
+
+
+def test_async_waiters_hold_no_threads():
+    async def go():
+        b = TokenBucket(3000, "t")          # 50/s
+        await b.acquire()
+        before = threading.active_count()
+        waiters = [asyncio.ensure_future(b.acquire("thumb")) for _ in range(40)]
+        await asyncio.sleep(0.05)
+        assert threading.active_count() <= before + 1, threading.active_count()   # the pump
+        assert b.stats()["waiting"]["thumb"] > 0
+        await asyncio.gather(*waiters)
+        assert b.stats()["granted"]["thumb"] == 40
+    asyncio.run(go())
+
+
+def test_threads_and_coroutines_share_a_bucket():
+    b = TokenBucket(1200, "t")
+    b.wait()
+    got = []
+    th = threading.Thread(target=lambda: (b.wait("background"), got.append("thread")))
+    th.start()
+    time.sleep(0.01)
+
+    async def go():
+        await b.acquire("interactive")
+        got.append("loop")
+    asyncio.run(go())
+    th.join(2)
+    assert got == ["loop", "thread"], got
+
+
+def test_lane_from_context():
+    b = TokenBucket(60, "t")
+    b.wait()
+    tok = current_lane.set("background")
+    try:
+        assert b._lane(None) == "background"
+        assert b._lane("thumb") == "thumb"
+    finally:
+        current_lane.reset(tok)
+    assert b._lane(None) == "interactive" and b._lane("bogus") == "interactive"
+
+
+def test_cancel_after_grant_refunds():
+    async def go():
+        b = TokenBucket(6, "t")              # one token per 10 s: the pump won't
+        await b.acquire()                    # drain the bucket
+        task = asyncio.ensure_future(b.acquire())
+        await asyncio.sleep(0)               # parked in the queue
+        with b._lock:                        # what the pump does when a token frees
+            b._tokens = 1.0
+            w = b._pop_best_locked()
+            b._tokens -= 1.0
+            w.granted = True
+            b.granted[w.lane] += 1
+            w.wake()                         # set_result is queued, not yet run
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0.01)            # let the queued wake callback run
+        assert b._tokens >= 1.0, b._tokens
+        assert b.granted["interactive"] == 1
+    asyncio.run(go())
+
+
+if __name__ == "__main__":
+    for name, fn in sorted(globals().items()):
+        if name.startswith("test_") and callable(fn):
+            fn()
+            print("ok  %s" % name)
+    print("all token-bucket checks passed")
@@ -146,10 +146,12 @@ def enforce_rate_limit(
     key: str,
     max_calls: int,
     window_seconds: float,
+    cost: int = 1,
 ) -> None:
     """Sliding-window per-IP rate-limit. Raises HTTPException(429)
     when the caller has exceeded `max_calls` against `key` inside the
-    last `window_seconds`.
+    last `window_seconds`. A request that does `cost` calls' worth of
+    work (a batch) is charged `cost` calls.
     """
     ip = _client_ip(request)
     bucket_key = (ip, key)
@@ -165,14 +167,16 @@ def enforce_rate_limit(
             i += 1
         if i:
             del bucket[:i]
-        if len(bucket) >= max_calls:
-            retry_after = max(1, int(bucket[0] + window_seconds - now))
+        if len(bucket) + cost > max_calls:
+            # Wait until enough of the oldest hits expire to fit `cost`.
+            freed = bucket[min(len(bucket), len(bucket) + cost - max_calls) - 1] if bucket else now
+            retry_after = max(1, int(freed + window_seconds - now))
             raise HTTPException(
                 status_code=429,
                 detail=f"Rate limit exceeded. Try again in {retry_after}s.",
                 headers={"Retry-After": str(retry_after)},
             )
-        bucket.append(now)
+        bucket.extend([now] * cost)
         # Opportunistic cleanup so the dict doesn't grow without bound
         # in a long-lived process. Run when this bucket is cheap to
         # touch (i.e., we're already holding the lock).
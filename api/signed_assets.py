@@ -0,0 +1,174 @@
+"""
+Short-lived HMAC-signed URLs for the images Printify fetches.
+
+Printify ingests an upload either as base64 `contents` in the POST body or
+from a URL its servers fetch. base64 inflates the body by a third, holds
+the whole image in memory as text on both ends, and 413s above ~35 MB, so
+the checkout kept a shrink loop that re-encoded a personalised print up to
+six times to squeeze it under. URL ingestion has none of that; what it
+needed was a URL that is not simply public. Personalised prints carry the
+customer's text, and the grid-warm crops only ever existed in memory —
+neither could be staged under the public /asset/ mount.
+
+A signed URL names one file, under one registered root, until one time:
+
+    /signed/<root>/<expires>/<sig>/<path>
+
+sig = HMAC-SHA256(key, "<root>/<path>:<expires>"), 32 hex. The /signed
+route in main.py serves the file only while the signature matches and the
+expiry is in the future, and only from inside the root. Nothing is stored
+per URL; revoking one is deleting its file.
+
+ASSET_SIGNING_KEY sets the key. Without it each process makes a random
+one: URLs then die with the process, which costs nothing, since each only
+has to outlive the Printify POST that fetches it. ASSET_URL_TTL_S sets
+the default lifetime (900 s).
+
+stage() writes bytes into the "staged" root for one upload; unstage()
+removes them once Printify has them, and stage() sweeps anything a crash
+left behind. The "private" root holds the server-composed print files
+that carry customer text: /api/print_file answers those with a signed
+link into it, never an /asset/ URL, and checkout takes that link back
+(resolve_path) as it would an /asset/ path.
+"""
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+import uuid
+from typing import Optional
+from urllib.parse import quote, unquote, urlparse
+
+ROUTE_PREFIX = "/signed"
+STAGED_ROOT = "staged"
+PRIVATE_ROOT = "private"
+
+try:
+    DEFAULT_TTL_S = max(30, int(os.getenv("ASSET_URL_TTL_S", "900")))
+except ValueError:
+    DEFAULT_TTL_S = 900
+
+# name → directory. main.py registers OUTPUT_DIR ("asset"), the private
+# staging directory (STAGED_ROOT) and the private print files (PRIVATE_ROOT)
+# at import.
+_ROOTS: dict = {}
+_key_lock = threading.Lock()
+_process_key: Optional[bytes] = None
+
+
+class SignedURLError(Exception):
+    """A signed URL that must not be served; `status` is the HTTP answer."""
+
+    def __init__(self, status: int, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def register_root(name: str, directory) -> None:
+    directory = os.path.realpath(str(directory))
+    os.makedirs(directory, exist_ok=True)
+    _ROOTS[name] = directory
+
+
+def _key() -> bytes:
+    global _process_key
+    env = os.getenv("ASSET_SIGNING_KEY", "").strip()
+    if env:
+        return env.encode()
+    with _key_lock:
+        if _process_key is None:
+            _process_key = secrets.token_bytes(32)
+        return _process_key
+
+
+def signature(root: str, rel: str, expires: int) -> str:
+    msg = f"{root}/{rel}:{int(expires)}".encode()
+    return hmac.new(_key(), msg, hashlib.sha256).hexdigest()[:32]
+
+
+def sign(root: str, rel: str, ttl: Optional[int] = None, now: Optional[float] = None) -> str:
+    """The signed path (no host) for `rel` under `root`, valid for `ttl`
+    seconds."""
+    rel = rel.lstrip("/")
+    expires = int((time.time() if now is None else now) + (ttl or DEFAULT_TTL_S))
+    return f"{ROUTE_PREFIX}/{root}/{expires}/{signature(root, rel, expires)}/{quote(rel)}"
+
+
+def sign_path(path, ttl: Optional[int] = None) -> str:
+    """sign() for a file given by absolute path; ValueError when no
+    registered root contains it."""
+    real = os.path.realpath(str(path))
+    for name, directory in _ROOTS.items():
+        if real.startswith(directory + os.sep):
+            return sign(name, os.path.relpath(real, directory).replace(os.sep, "/"), ttl)
+    raise ValueError(f"{path} is not under a signed-asset root")
+
+
+def resolve(root: str, expires: str, sig: str, rel: str, now: Optional[float] = None) -> str:
+    """The file a signed URL names. Raises SignedURLError: 403 for a bad
+    signature or root, 410 once expired, 404 when the file is gone."""
+    directory = _ROOTS.get(root)
+    try:
+        exp = int(expires)
+    except (TypeError, ValueError):
+        raise SignedURLError(403, "bad signature")
+    if directory is None or not hmac.compare_digest(signature(root, rel, exp), str(sig)):
+        raise SignedURLError(403, "bad signature")
+    if exp < (time.time() if now is None else now):
+        raise SignedURLError(410, "link expired")
+    path = os.path.realpath(os.path.join(directory, rel))
+    if not path.startswith(directory + os.sep):
+        raise SignedURLError(403, "bad signature")
+    if not os.path.isfile(path):
+        raise SignedURLError(404, "not found")
+    return path
+
+
+def resolve_path(url: str, now: Optional[float] = None) -> str:
+    """resolve() for a whole signed path (or URL) as sign() returns it."""
+    path = urlparse(url).path
+    parts = path[len(ROUTE_PREFIX) + 1:].split("/", 3) if path.startswith(ROUTE_PREFIX + "/") else []
+    if len(parts) != 4:
+        raise SignedURLError(403, "bad signature")
+    root, expires, sig, rel = parts
+    return resolve(root, expires, sig, unquote(rel), now=now)
+
+
+def _sweep(directory: str, older_than: float) -> None:
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < older_than:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def stage(data: bytes, suffix: str = ".png") -> str:
+    """Write `data` to a fresh file in the staging root; returns its path.
+    Files left from crashed uploads (older than two TTLs) are removed."""
+    directory = _ROOTS[STAGED_ROOT]
+    _sweep(directory, time.time() - 2 * DEFAULT_TTL_S)
+    path = os.path.join(directory, uuid.uuid4().hex + suffix)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+def unstage(path: Optional[str]) -> None:
+    if not path:
+        return
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1096,7 +1096,14 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
       // Monospace
       { name: "JetBrains Mono",   category: "Monospace",   gquery: "JetBrains+Mono:wght@400;500;700" },
       { name: "Fira Code",        category: "Monospace",   gquery: "Fira+Code:wght@400;700" },
-      { name: "Space Mono",       category: "Monospace",   gquery: "Space+Mono:wght@400;700" }
+      { name: "Space Mono",       category: "Monospace",   gquery: "Space+Mono:wght@400;700" },
+      // Bundled — served from /fonts/ (api/fonts), the same files the
+      // server's print compositor draws with (api/print_text.py), so text
+      // in these faces is composed server-side at checkout instead of
+      // uploading the whole canvas. `files` maps CSS weight → file.
+      { name: "DejaVu Sans",      category: "Print-Exact", files: { normal: "DejaVuSans.ttf", bold: "DejaVuSans-Bold.ttf" } },
+      { name: "DejaVu Serif",     category: "Print-Exact", files: { bold: "DejaVuSerif-Bold.ttf" } },
+      { name: "DejaVu Sans Mono", category: "Print-Exact", files: { bold: "DejaVuSansMono-Bold.ttf" } }
     ];
 
     var loadedFonts = {};
@@ -1117,6 +1124,7 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
 
     function loadGoogleFont(fontEntry) {
       if (loadedFonts[fontEntry.name]) return Promise.resolve();
+      if (fontEntry.files) return _loadBundledFont(fontEntry);
       return new Promise(function(resolve) {
         var link = document.createElement("link");
         link.rel = "stylesheet";
@@ -1131,6 +1139,26 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
       });
     }
 
+    // Bundled faces load through the FontFace API from our own /fonts/
+    // route; a failure resolves anyway so text falls back like a Google
+    // font that didn't arrive.
+    function _loadBundledFont(fontEntry) {
+      if (typeof FontFace === "undefined" || !document.fonts) return Promise.resolve();
+      var loads = Object.keys(fontEntry.files).map(function(weight) {
+        var face = new FontFace(fontEntry.name, "url(/fonts/" + fontEntry.files[weight] + ")", { weight: weight });
+        return face.load().then(function(f) { document.fonts.add(f); });
+      });
+      return Promise.all(loads).then(function() {
+        loadedFonts[fontEntry.name] = true;
+      }).catch(function() {});
+    }
+
+    // The timestamp caption is always drawn in the bundled DejaVu Sans, so
+    // load it up front rather than on first use (a print export renders
+    // synchronously and can't wait for a face to arrive).
+    _loadBundledFont(FONT_CATALOG.find(function(f) { return f.name === "DejaVu Sans"; }))
+      .then(function() { if (state.timestampStamp && typeof renderCanvas === "function") renderCanvas(); });
+
     function populateFontSelect() {
       var sel = document.getElementById("textFontSelect");
       if (!sel) return;
@@ -2833,6 +2861,11 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
       thumbCache = {};  // clear cache for new date/time
 
       var isoDate = dateVal + "T" + _solarTimeValue() + ":00Z";
+      // Tiles that need the proxy are fetched in ONE /api/helioviewer_thumbs
+      // batch (256 tile + 512 editor canvas for every wavelength) instead of
+      // two requests per tile; any tile the batch misses falls back to its
+      // own /api/helioviewer_thumb URL below.
+      var batchTiles = [];
 
       thumbDivs.forEach(function(div) {
         var wl = parseInt(div.dataset.wl, 10);
@@ -2865,6 +2898,7 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
           : null);
 
         var tileImg = document.createElement("img");
+        var batchCanvasSrc = null;   // blob: URL of the batched 512 canvas
         tileImg.alt = wl + " Å";
         tileImg.style.width = "100%";
         tileImg.style.height = "100%";
@@ -2882,11 +2916,13 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
           // (served directly via cachedThumbUrl above), show a filtered tile.
           // Warm the 512px canvas cache for editor preview. Goes through the
           // same proxy so it's reliable behind corp filters.
+          if (tileImg.src.indexOf("blob:") === 0) URL.revokeObjectURL(tileImg.src);
           if (API_BASE) {
-            var canvasUrl = API_BASE + "/api/helioviewer_thumb?date=" +
-              encodeURIComponent(isoDate) + "&wavelength=" + wl + "&image_scale=12&size=512";
+            var canvasUrl = batchCanvasSrc || (API_BASE + "/api/helioviewer_thumb?date=" +
+              encodeURIComponent(isoDate) + "&wavelength=" + wl + "&image_scale=12&size=512");
             var proxyImg = new Image();
             proxyImg.onload = function() {
+              if (batchCanvasSrc) URL.revokeObjectURL(batchCanvasSrc);
               try {
                 var c = document.createElement("canvas");
                 c.width  = proxyImg.naturalWidth  || 512;
@@ -2920,8 +2956,58 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
         };
         div.innerHTML = "";
         div.appendChild(tileImg);
+        if (!cachedThumbUrl && API_BASE) {
+          batchTiles.push({
+            wl: wl,
+            img: tileImg,
+            src: proxyUrl256 || directUrl,
+            setCanvas: function(u) { batchCanvasSrc = u; },
+          });
+          return;
+        }
         tileImg.src = proxyUrl256 || directUrl;
       });
+
+      if (!batchTiles.length) return;
+      _fetchThumbBatch(isoDate, batchTiles.map(function(t) { return t.wl; }))
+        .then(function(blobs) {
+          batchTiles.forEach(function(t) {
+            var b512 = blobs[t.wl + "_512"], b256 = blobs[t.wl + "_256"];
+            if (b512) t.setCanvas(URL.createObjectURL(b512));
+            t.img.src = b256 ? URL.createObjectURL(b256) : t.src;
+          });
+        }, function(err) {
+          tileLog("thumb batch failed, per-tile fallback", err && err.message);
+          batchTiles.forEach(function(t) { t.img.src = t.src; });
+        });
+    }
+
+    // One multipart request for every (wavelength, 256/512) thumb of a date.
+    // Resolves to { "<wl>_<size>": Blob } for the tiles the server got; the
+    // caller falls back per tile for anything missing. Own AbortController
+    // (not fetchWithTimeout): that one replaces the shared currentAbort.
+    function _fetchThumbBatch(isoDate, wls) {
+      if (typeof FormData === "undefined" || !window.Response || !Response.prototype.formData) {
+        return Promise.reject(new Error("formData unsupported"));
+      }
+      var url = API_BASE + "/api/helioviewer_thumbs?date=" + encodeURIComponent(isoDate) +
+        "&wavelengths=" + wls.join(",") + "&sizes=256,512&image_scale=12";
+      var ctrl = new AbortController();
+      var timer = setTimeout(function() { ctrl.abort(); }, 30000);
+      return fetch(url, { method: "GET", signal: ctrl.signal })
+        .then(function(r) {
+          if (!r.ok) throw new Error("HTTP " + r.status);
+          return r.formData();
+        })
+        .then(function(fd) {
+          clearTimeout(timer);
+          var out = {};
+          fd.forEach(function(v, k) { if (k !== "index" && typeof v !== "string") out[k] = v; });
+          return out;
+        }, function(err) {
+          clearTimeout(timer);
+          throw err;
+        });
     }
 
     /**
@@ -7816,7 +7902,10 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
           var tsRefH = Math.min(cw, ch);
           var tsSize = Math.max(11, Math.round(tsRefH * 0.028));
           var tsInset = Math.max(8, Math.round(tsRefH * 0.025));
-          ctx.font = "500 " + tsSize + "px 'Inter', 'Helvetica Neue', Helvetica, Arial, sans-serif";
+          // Bundled DejaVu Sans (api/fonts) everywhere — editor, mockups and
+          // both print paths (the server draws it in api/print_text.py) —
+          // so the caption the customer approves is the one printed.
+          ctx.font = "normal " + tsSize + "px 'DejaVu Sans', sans-serif";
           // Position resolves to one of six anchors (top|bottom × left|center|right).
           var tsPos = state.timestampPos || "bottom-right";
           var tsParts = tsPos.split("-");
@@ -7891,8 +7980,13 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
       // Skipped when burning: the clean snapshot that feeds drawProductMockup
       // must be numeral-free, or the mockup's own numeral pass doubles them
       // (2026-07-25, Conner's clock report). drawProductMockup is the single
-      // source of truth for numerals on every displayed/exported surface.
-      if (!state._burningCanvas && state.clockNumbers && _isWallClock(state.selectedProduct)) {
+      // source of truth for numerals on every displayed surface.
+      // The print export (getCanvasBase64, _printExport) is the exception:
+      // a wall clock's print file carries the numerals the mockup showed,
+      // whether the browser exports it or the server composes it
+      // (print_compose via api/print_text.py) — one rule for both paths.
+      if ((!state._burningCanvas || state._printExport)
+          && state.clockNumbers && _isWallClock(state.selectedProduct)) {
         var cn = state.clockNumbers;
         var cw = solarCanvas.width;
         var ch = solarCanvas.height;
@@ -9318,7 +9412,13 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
         liveUpdateClockNumbers();
       });
     }
-    if (clockNumbersFontSelect) clockNumbersFontSelect.addEventListener("change", liveUpdateClockNumbers);
+    if (clockNumbersFontSelect) clockNumbersFontSelect.addEventListener("change", function() {
+      // Load the face first (Google or bundled) so the numerals don't paint
+      // in the fallback and stay there until the next edit.
+      var entry = FONT_CATALOG.find(function(f) { return f.name === clockNumbersFontSelect.value; });
+      if (entry && !loadedFonts[entry.name]) loadGoogleFont(entry).then(liveUpdateClockNumbers);
+      else liveUpdateClockNumbers();
+    });
     if (clockNumbersColorPicker) clockNumbersColorPicker.addEventListener("input", liveUpdateClockNumbers);
     if (clockNumbersStrokePicker) clockNumbersStrokePicker.addEventListener("input", liveUpdateClockNumbers);
     if (clockNumbersStyleSelect) clockNumbersStyleSelect.addEventListener("change", liveUpdateClockNumbers);
@@ -12602,11 +12702,15 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
       // Set `_fullResRender` so the pixel-work branch in renderCanvas uses
       // the main canvas directly (no 1/4 downsample) — print output must
       // stay at full source resolution.
+      // `_printExport` marks this render as the print file itself, so the
+      // clock numerals are drawn (see renderCanvas).
       var wasBurning = state._burningCanvas;
       var wasFullRes = state._fullResRender;
       state._burningCanvas = true;
       state._fullResRender = true;
+      state._printExport = true;
       try { renderCanvas(); } catch (_e) {}
+      state._printExport = false;
 
       var product = (typeof PRODUCTS !== "undefined" && state.selectedProduct)
         ? PRODUCTS.find(function(p) { return p.id === state.selectedProduct; })
@@ -13129,7 +13233,7 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
       // Resolve the print file. Preferred path: the server composites it
       // from parameters and we send a URL (a few hundred bytes). Fallback:
       // the browser composites and uploads base64, as before.
-      _resolveCheckoutPrintSource(dateStr).then(function(src) {
+      _resolveCheckoutPrintSource(dateStr, product).then(function(src) {
         var base64Data = src && src.base64;
         var printUrl = src && src.url;
         var step1 = document.getElementById("ckStep1");
@@ -13432,11 +13536,39 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
         cropEdgeFeatherX: state.cropEdgeFeatherX || 0,
         cropEdgeFeatherY: state.cropEdgeFeatherY || 0,
         background: state.background || null,
-        // Flags that force the browser path (server refuses them).
-        textOverlay: (state.textOverlay && state.textOverlay.text) ? true : null,
+        // Text, caption and numerals travel as their settings; the server
+        // draws them when the font is bundled (api/print_text.py) and
+        // answers supported:false otherwise.
+        textOverlay: _printTextOverlay(),
         timestampStamp: state.timestampStamp ? true : null,
-        dualPanel: !!(product && product.dualPanel) || null,
-        clockNumbers: state.clockNumbers ? true : null,
+        timestampText: state.timestampStamp ? (_composeTimestampCaption() || null) : null,
+        timestampPos: state.timestampStamp ? (state.timestampPos || "bottom-right") : null,
+        timestampVOffset: state.timestampStamp ? (state.timestampVOffset || 0) : null,
+        // Same mode rule as getCanvasBase64: "match" prints the face twice.
+        dualPanel: (product && product.dualPanel)
+          ? ((product.panelAspectRatio
+              && ((state.dualPanelModeByProduct && state.dualPanelModeByProduct[product.id]) || "match") === "match")
+              ? "match" : "span")
+          : null,
+        clockNumbers: (state.clockNumbers && _isWallClock(state.selectedProduct))
+          ? Object.assign({}, state.clockNumbers) : null,
+      };
+    }
+
+    // The overlay's normalised settings only: the resolved _pixel* fields
+    // and legacy absolute x/y/size depend on the canvas they were last
+    // drawn on and would split the server's print-file cache.
+    function _printTextOverlay() {
+      var tov = state.textOverlay;
+      if (!tov || !tov.text) return null;
+      _resolveTextPx(tov, solarCanvas.width, solarCanvas.height);
+      return {
+        text: tov.text, font: tov.font,
+        xNorm: tov.xNorm, yNorm: tov.yNorm, sizeNorm: tov.sizeNorm,
+        color: tov.color, strokeColor: tov.strokeColor, strokeWidth: tov.strokeWidth || 0,
+        outlined: !!tov.outlined,
+        shadow: (tov.shadow && tov.shadow.enabled) ? tov.shadow : null,
+        arc: (tov.arc && tov.arc.enabled) ? tov.arc : null,
       };
     }
 
@@ -13445,14 +13577,21 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
     // failure mode (unsupported params, missing source, compose error,
     // network) resolves null rather than rejecting, so checkout degrades to
     // the pre-2026-08-09 behaviour instead of breaking.
-    function _serverComposePrintFile(sourceUrl) {
+    // With a product, the server composes at that product's print-area
+    // size from the Printify catalog instead of the full source size.
+    function _serverComposePrintFile(sourceUrl, product) {
       try {
         var params = _printParams();
-        if (params.textOverlay || params.timestampStamp || params.dualPanel || params.clockNumbers) {
-          return Promise.resolve(null);
+        var body = { source_url: sourceUrl, params: params };
+        if (product && product.blueprintId) {
+          body.placement = {
+            blueprint_id: product.blueprintId,
+            print_provider_id: product.printProviderId,
+            variant_id: state.selectedVariantByProduct[product.id] || product.variantId,
+            position: product.position || "front"
+          };
         }
-        return postJSON(API_BASE + "/api/print_file",
-                        { source_url: sourceUrl, params: params }, 120000)
+        return postJSON(API_BASE + "/api/print_file", body, 120000)
           .then(function (r) {
             if (r && r.supported && r.url) {
               markCheckoutStep("ckStep1", "done", "Print file prepared on the server");
@@ -13468,14 +13607,14 @@ import { initMotion, scrollToTarget, refreshTriggers, sunSurge, initInteractions
 
     // Print source for checkout: {url} when the server composited it,
     // {base64} when the browser had to. Always resolves.
-    function _resolveCheckoutPrintSource(dateStr) {
+    function _resolveCheckoutPrintSource(dateStr, product) {
       var isWarmVibe = !!(state.activeVibeSlug && state.activeVibeSlug !== "birthday");
       var sourcePromise = (isWarmVibe && state.hqReady && state.hqImageUrl)
         ? Promise.resolve(state.hqImageUrl)
         : _ensureIntegratedHqUrl(dateStr);
       return sourcePromise.then(function (srcUrl) {
         if (!srcUrl) return null;
-        return _serverComposePrintFile(srcUrl);
+        return _serverComposePrintFile(srcUrl, product);
       }).then(function (composedUrl) {
         if (composedUrl) return { url: composedUrl };
         return _getCheckoutImageBase64(dateStr).then(function (b64) { return { base64: b64 }; });
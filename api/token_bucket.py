@@ -0,0 +1,169 @@
+"""
+Priority token-bucket limiter for the upstream NASA APIs (Helioviewer, VSO).
+
+Replaces main.py's old _RateLimiter, which spaced calls by `time.sleep`-ing
+inside whichever threadpool thread made them. Two problems with that under
+load: every waiting call pinned an executor thread doing nothing, and the
+queue was first-come — a grid of nine /api/helioviewer_thumb tiles fired
+the instant a user picks a date sat ahead of that same user's main preview
+fetch.
+
+Here one bucket refills at the configured rate and waiters queue in
+priority lanes:
+
+  interactive  — a user is staring at this fetch (preview pipeline, HQ, canvas)
+  thumb        — wavelength-grid thumbnails, bursty and individually cheap
+  background   — admin / idle warms; nobody is waiting
+
+A freed token always goes to the oldest waiter of the best non-empty lane.
+The bucket can be awaited from the event loop (`await acquire()`, parks on
+a future — no thread held) or called from a worker thread (`wait()`, blocks
+on an Event). A single daemon "pump" thread per bucket hands out tokens
+while anyone is waiting and exits when the queue drains.
+
+The lane defaults to `current_lane`, a contextvar: main.py sets it per
+heavy job, and the pool runner carries it into the sync pipelines, so
+the existing `_VSO_LIMITER.wait()` call sites pick the right lane without
+new parameters.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from collections import deque
+
+LANES = ("interactive", "thumb", "background")
+
+current_lane = contextvars.ContextVar("upstream_lane", default="interactive")
+
+
+class _Waiter:
+    __slots__ = ("wake", "cancelled", "granted", "lane", "since")
+
+    def __init__(self, wake, lane: str):
+        self.wake = wake
+        self.cancelled = False
+        self.granted = False        # set under the bucket lock with the deduction
+        self.lane = lane
+        self.since = time.monotonic()
+
+
+class TokenBucket:
+    def __init__(self, max_per_minute: float, name: str = "", burst: float = 1.0):
+        self.rate = max(1e-6, float(max_per_minute)) / 60.0
+        self.capacity = max(1.0, float(burst))
+        self.name = name or "token-bucket"
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._stamp = time.monotonic()
+        self._waiters = {lane: deque() for lane in LANES}
+        self._pump_thread = None
+        self.granted = {lane: 0 for lane in LANES}
+        self.waited_s = {lane: 0.0 for lane in LANES}
+
+    # ── internals (call with _lock held) ─────────────────────────────
+    def _refill_locked(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def _lane(self, lane) -> str:
+        lane = lane or current_lane.get()
+        return lane if lane in self._waiters else "interactive"
+
+    def _take_now_locked(self, lane: str) -> bool:
+        # Never jump a waiter of the same or a better lane.
+        for name in LANES[: LANES.index(lane) + 1]:
+            if any(not w.cancelled for w in self._waiters[name]):
+                return False
+        self._refill_locked()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            self.granted[lane] += 1
+            return True
+        return False
+
+    def _pop_best_locked(self):
+        for name in LANES:
+            q = self._waiters[name]
+            while q:
+                w = q.popleft()
+                if not w.cancelled:
+                    return w
+        return None
+
+    def _enqueue_locked(self, waiter: _Waiter) -> None:
+        self._waiters[waiter.lane].append(waiter)
+        if self._pump_thread is None:
+            self._pump_thread = threading.Thread(target=self._pump, name=f"{self.name}-pump", daemon=True)
+            self._pump_thread.start()
+
+    def _pump(self) -> None:
+        while True:
+            with self._lock:
+                self._refill_locked()
+                while self._tokens >= 1.0:
+                    w = self._pop_best_locked()
+                    if w is None:
+                        break
+                    self._tokens -= 1.0
+                    w.granted = True
+                    self.granted[w.lane] += 1
+                    self.waited_s[w.lane] += time.monotonic() - w.since
+                    w.wake()
+                if not any(self._waiters.values()):
+                    self._pump_thread = None
+                    return
+                delay = (1.0 - self._tokens) / self.rate
+            time.sleep(max(0.001, delay))
+
+    # ── public ───────────────────────────────────────────────────────
+    def wait(self, lane=None) -> None:
+        """Block the calling (worker) thread until a token is ours."""
+        lane = self._lane(lane)
+        with self._lock:
+            if self._take_now_locked(lane):
+                return
+            ev = threading.Event()
+            self._enqueue_locked(_Waiter(ev.set, lane))
+        ev.wait()
+
+    async def acquire(self, lane=None) -> None:
+        """Await a token on the event loop without holding a thread."""
+        lane = self._lane(lane)
+        with self._lock:
+            if self._take_now_locked(lane):
+                return
+            loop = asyncio.get_running_loop()
+            fut = loop.create_future()
+
+            def _wake():
+                loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(None))
+            waiter = _Waiter(_wake, lane)
+            self._enqueue_locked(waiter)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            with self._lock:
+                waiter.cancelled = True
+                if waiter.granted:
+                    # The pump granted us before the cancel landed — whether
+                    # or not its wake callback has run yet, hand it back.
+                    self._tokens = min(self.capacity, self._tokens + 1.0)
+                    self.granted[lane] -= 1
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "name": self.name,
+                "per_minute": round(self.rate * 60.0, 1),
+                "burst": self.capacity,
+                "waiting": {k: sum(1 for w in q if not w.cancelled) for k, q in self._waiters.items()},
+                "granted": dict(self.granted),
+                "avg_wait_s": {
+                    k: round(self.waited_s[k] / self.granted[k], 3) if self.granted[k] else 0.0
+                    for k in LANES
+                },
+            }
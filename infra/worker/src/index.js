@@ -17,6 +17,8 @@
 //       caching by full URL turns 27 origin round-trips per landing (~3 MB,
 //       and a cold-Fly wake on the first) into edge HITs for everyone after
 //       the first. Deterministic historical frames → treat as immutable.
+//       /api/helioviewer_thumbs (the batched multipart variant) caches the
+//       same way, but only when the origin reports no missing tiles.
 //   everything else (/api/**, /logs/stream, /shopify/*, /favicon.ico, …)
 //       → transparent proxy to Fly (fetch streams bodies, so SSE + long
 //       polls pass through).
@@ -60,7 +62,9 @@ async function cacheThumb(request, env, ctx) {
   if (hit) return hit;
 
   const resp = await toOrigin(request, env);
-  if (resp.status >= 200 && resp.status < 300) {
+  // A batch with failed tiles is still a 200; don't freeze the gaps.
+  const partial = (resp.headers.get("X-Thumbs-Missing") || "0") !== "0";
+  if (resp.status >= 200 && resp.status < 300 && !partial) {
     const headers = new Headers(resp.headers);
     headers.delete("Vary");
     headers.delete("Set-Cookie");
@@ -92,7 +96,8 @@ export default {
     // Accept-Encoding as uncacheable. The image is identical regardless of
     // Origin, so we cache explicitly with Vary stripped. The origin's Origin
     // gate still runs on every MISS (we only reach it then).
-    if (pathname === "/api/helioviewer_thumb" && request.method === "GET") {
+    if ((pathname === "/api/helioviewer_thumb" || pathname === "/api/helioviewer_thumbs")
+        && request.method === "GET") {
       return cacheThumb(request, env, ctx);
     }
     return toOrigin(request, env);